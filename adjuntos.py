@@ -0,0 +1,524 @@
+# ========================================
+# FOTOS ADJUNTAS A CITAS Y VEHÍCULOS
+# Taller Automotriz - Sistema de Gestión
+# ========================================
+
+"""
+Fotos de ingreso e inspección de los vehículos.
+
+- Almacén por contenido: cada archivo se guarda una sola vez con su SHA-256
+  como nombre (blobs/ab/cd/abcd...). Subir la misma foto dos veces solo agrega
+  otra fila en Adjuntos. La subida se copia por trozos mientras se calcula el
+  hash, sin tener el archivo entero en memoria.
+- Miniaturas: se generan la primera vez que alguien las pide y quedan en
+  miniaturas/<lado>/. Un historial solo genera las de la página que se ve.
+- Servidor: los originales y las miniaturas se sirven desde un servidor HTTP
+  aparte (puerto 8503) con enlaces firmados, por trozos y con soporte de Range.
+  Streamlit solo recibe la URL; el navegador pide los bytes directamente.
+
+Uso:
+    almacen = AlmacenBlobs('adjuntos')
+    adjuntar(db, almacen, archivo, 'frente.jpg', 'image/jpeg', cita_id=15, tipo='ingreso')
+    columnas, filas = adjuntos_de_citas(db, [15, 16])
+    python adjuntos.py --demo
+    python adjuntos.py --limpiar --db taller_automotriz.db --carpeta adjuntos
+"""
+
+import argparse
+import hashlib
+import hmac
+import os
+import re
+import secrets
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+from bd_sqlite import conexion_lectura, en_transaccion
+from exportacion import _firmar
+from migraciones import motor_de
+
+CARPETA_POR_DEFECTO = 'adjuntos'
+PUERTO_POR_DEFECTO = 8503
+VALIDEZ_ENLACE_SEGUNDOS = 3600
+TAMANO_TROZO = 64 * 1024
+LADO_MINIATURA = 256
+TIPOS_ADJUNTO = ('ingreso', 'inspeccion')
+# Los archivos recién guardados no se borran aunque todavía no tengan fila
+GRACIA_LIMPIEZA_SEGUNDOS = 3600
+
+_SHA256 = re.compile(r'^[0-9a-f]{64}$')
+
+COLUMNAS_ADJUNTO = ['id', 'sha256', 'cita_id', 'vehiculo_id', 'tipo', 'nombre_archivo',
+                    'tipo_contenido', 'tamano', 'descripcion', 'fecha_creacion']
+
+
+# ========================================
+# ALMACÉN POR CONTENIDO
+# ========================================
+
+class AlmacenBlobs:
+    """Archivos en disco con su SHA-256 como nombre"""
+
+    def __init__(self, carpeta=CARPETA_POR_DEFECTO):
+        # Ruta absoluta: el servidor sigue sirviendo aunque el proceso cambie de carpeta
+        self.carpeta = os.path.abspath(carpeta)
+        os.makedirs(os.path.join(self.carpeta, 'tmp'), exist_ok=True)
+
+    def ruta(self, sha256):
+        if not _SHA256.match(sha256):
+            raise ValueError(f"Hash no válido: {sha256!r}")
+        return os.path.join(self.carpeta, 'blobs', sha256[:2], sha256[2:4], sha256)
+
+    def existe(self, sha256):
+        return os.path.exists(self.ruta(sha256))
+
+    def guardar(self, flujo):
+        """Copia el flujo al almacén; devuelve (sha256, tamaño, nuevo)
+
+        flujo es cualquier objeto con read() (archivo, UploadedFile de Streamlit...).
+        """
+        digest = hashlib.sha256()
+        tamano = 0
+        descriptor, temporal = tempfile.mkstemp(dir=os.path.join(self.carpeta, 'tmp'))
+        try:
+            with os.fdopen(descriptor, 'wb') as destino:
+                while True:
+                    trozo = flujo.read(TAMANO_TROZO)
+                    if not trozo:
+                        break
+                    digest.update(trozo)
+                    destino.write(trozo)
+                    tamano += len(trozo)
+            sha256 = digest.hexdigest()
+            ruta = self.ruta(sha256)
+            if os.path.exists(ruta):
+                os.remove(temporal)
+                return sha256, tamano, False
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            # os.replace es atómico: otro proceso nunca ve un archivo a medias
+            os.replace(temporal, ruta)
+            return sha256, tamano, True
+        except BaseException:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+
+    def ruta_miniatura(self, sha256, lado=LADO_MINIATURA):
+        if not _SHA256.match(sha256):
+            raise ValueError(f"Hash no válido: {sha256!r}")
+        return os.path.join(self.carpeta, 'miniaturas', str(int(lado)), sha256[:2], sha256 + '.jpg')
+
+    def miniatura(self, sha256, lado=LADO_MINIATURA):
+        """Ruta de la miniatura JPEG, generándola la primera vez (None si no es una imagen)"""
+        ruta = self.ruta_miniatura(sha256, lado)
+        if os.path.exists(ruta):
+            return ruta
+        try:
+            from PIL import Image, ImageOps
+        except ImportError:
+            return None
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        descriptor, temporal = tempfile.mkstemp(dir=os.path.join(self.carpeta, 'tmp'), suffix='.jpg')
+        os.close(descriptor)
+        try:
+            with Image.open(self.ruta(sha256)) as imagen:
+                # En JPEG draft decodifica ya reducida (1/2, 1/4, 1/8): no se carga la foto entera
+                imagen.draft('RGB', (lado, lado))
+                imagen = ImageOps.exif_transpose(imagen)
+                imagen.thumbnail((lado, lado))
+                imagen.convert('RGB').save(temporal, 'JPEG', quality=80)
+            os.replace(temporal, ruta)
+            return ruta
+        except (OSError, Image.DecompressionBombError):
+            return None
+        finally:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+
+    def hashes(self):
+        """Todos los archivos guardados: (sha256, segundos desde la última modificación)"""
+        ahora = time.time()
+        for raiz, _, archivos in os.walk(os.path.join(self.carpeta, 'blobs')):
+            for nombre in archivos:
+                if _SHA256.match(nombre):
+                    yield nombre, ahora - os.path.getmtime(os.path.join(raiz, nombre))
+
+    def eliminar(self, sha256):
+        """Borra el archivo y sus miniaturas"""
+        for ruta in [self.ruta(sha256)] + [
+                os.path.join(self.carpeta, 'miniaturas', lado, sha256[:2], sha256 + '.jpg')
+                for lado in _subcarpetas(os.path.join(self.carpeta, 'miniaturas'))]:
+            if os.path.exists(ruta):
+                os.remove(ruta)
+
+
+def _subcarpetas(carpeta):
+    return os.listdir(carpeta) if os.path.isdir(carpeta) else []
+
+
+# ========================================
+# FILAS EN LA BASE
+# ========================================
+
+_INSERTAR_DE_CITA = """
+INSERT INTO Adjuntos (sha256, cita_id, vehiculo_id, tipo, nombre_archivo, tipo_contenido, tamano, descripcion, usuario_id)
+{salida}
+SELECT ?, id, COALESCE(?, vehiculo_id), ?, ?, ?, ?, ?, ?
+FROM Citas WHERE id = ?
+"""
+
+_INSERTAR_DE_VEHICULO = """
+INSERT INTO Adjuntos (sha256, cita_id, vehiculo_id, tipo, nombre_archivo, tipo_contenido, tamano, descripcion, usuario_id)
+{salida}
+VALUES (?, NULL, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def adjuntar(destino, almacen, flujo, nombre_archivo=None, tipo_contenido=None, cita_id=None,
+             vehiculo_id=None, tipo='inspeccion', descripcion=None, usuario_id=None):
+    """Guarda el archivo en el almacén y lo vincula a la cita (y su vehículo) o al vehículo
+
+    Devuelve el id del adjunto. Con cita_id el vehículo sale de la cita si no se indica.
+    """
+    if tipo not in TIPOS_ADJUNTO:
+        raise ValueError(f"Tipo de adjunto no válido: {tipo}")
+    if cita_id is None and vehiculo_id is None:
+        raise ValueError("Indicar la cita o el vehículo")
+    # El archivo va primero y fuera de la transacción: escribir megas no bloquea al escritor
+    sha256, tamano, _ = almacen.guardar(flujo)
+    datos = (tipo, nombre_archivo, tipo_contenido, tamano, descripcion, usuario_id)
+    if cita_id is not None:
+        consulta = _INSERTAR_DE_CITA
+        params = (sha256, vehiculo_id) + datos + (int(cita_id),)
+    else:
+        consulta = _INSERTAR_DE_VEHICULO
+        params = (sha256, int(vehiculo_id)) + datos
+
+    if motor_de(destino) == 'sqlserver':
+        cursor = destino.cursor()
+        try:
+            cursor.execute(consulta.format(salida='OUTPUT INSERTED.id'), params)
+            fila = cursor.fetchone()
+            destino.commit()
+        except Exception:
+            destino.rollback()
+            raise
+        if fila is None:
+            raise ValueError(f"Cita no encontrada: {cita_id}")
+        return int(fila[0])
+
+    def _insertar(conn):
+        cursor = conn.execute(consulta.format(salida=''), params)
+        if not cursor.rowcount:
+            raise ValueError(f"Cita no encontrada: {cita_id}")
+        return cursor.lastrowid
+
+    return en_transaccion(destino, _insertar)
+
+
+def _listar(origen, condicion, params):
+    consulta = (f"SELECT {', '.join(COLUMNAS_ADJUNTO)} FROM Adjuntos "
+                f"WHERE {condicion} ORDER BY fecha_creacion, id")
+    with conexion_lectura(origen) as conn:
+        cursor = conn.cursor()
+        cursor.execute(consulta, params)
+        return [desc[0] for desc in cursor.description], cursor.fetchall()
+
+
+def adjuntos_de_citas(origen, cita_ids):
+    """Adjuntos de las citas indicadas (una página del historial); devuelve (columnas, filas)"""
+    cita_ids = [int(i) for i in cita_ids]
+    if not cita_ids:
+        return list(COLUMNAS_ADJUNTO), []
+    return _listar(origen, f"cita_id IN ({', '.join('?' * len(cita_ids))})", cita_ids)
+
+
+def adjuntos_de_vehiculo(origen, vehiculo_id):
+    """Todos los adjuntos del vehículo, de sus citas o sueltos; devuelve (columnas, filas)"""
+    return _listar(origen, "vehiculo_id = ?", (int(vehiculo_id),))
+
+
+def limpiar_huerfanos(origen, almacen, gracia=GRACIA_LIMPIEZA_SEGUNDOS):
+    """Borra del almacén los archivos que ni Adjuntos ni Comprobantes usan; devuelve cuántos"""
+    with conexion_lectura(origen) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT sha256 FROM Adjuntos UNION SELECT sha256_html FROM Comprobantes "
+                       "UNION SELECT sha256_pdf FROM Comprobantes")
+        en_uso = {fila[0] for fila in cursor.fetchall()}
+    borrados = 0
+    for sha256, antiguedad in list(almacen.hashes()):
+        # adjuntar() guarda el archivo antes de insertar la fila
+        if sha256 not in en_uso and antiguedad > gracia:
+            almacen.eliminar(sha256)
+            borrados += 1
+    return borrados
+
+
+# ========================================
+# SERVIDOR DE ARCHIVOS
+# ========================================
+
+def _rango(cabecera, tamano):
+    """(inicio, fin) inclusivos de una cabecera Range de un solo tramo
+
+    None si no hay cabecera o no se entiende (se sirve el archivo entero);
+    ValueError si el tramo queda fuera del archivo.
+    """
+    if not cabecera or not cabecera.startswith('bytes=') or ',' in cabecera:
+        return None
+    desde, _, hasta = cabecera[len('bytes='):].strip().partition('-')
+    try:
+        if desde == '':
+            # bytes=-N: los últimos N bytes
+            inicio, fin = max(tamano - int(hasta), 0), tamano - 1
+        else:
+            inicio = int(desde)
+            fin = min(int(hasta), tamano - 1) if hasta else tamano - 1
+    except ValueError:
+        return None
+    if inicio > fin or inicio >= tamano:
+        raise ValueError("Rango fuera del archivo")
+    return inicio, fin
+
+
+class ServidorAdjuntos:
+    """Servidor HTTP en segundo plano para originales y miniaturas con enlaces firmados
+
+    Las respuestas llevan ETag = SHA-256 y caché larga: el contenido de un hash
+    nunca cambia.
+    """
+
+    def __init__(self, almacen, puerto=PUERTO_POR_DEFECTO, host='0.0.0.0', url_base=None, secreto=None):
+        self.almacen = almacen
+        self.secreto = secreto or secrets.token_bytes(32)
+        self.url_base = (url_base or os.environ.get('ADJUNTOS_URL_BASE')
+                         or f"http://localhost:{puerto}")
+        self._servidor = ThreadingHTTPServer((host, puerto), self._manejador())
+        self._servidor.daemon_threads = True
+        self._hilo = threading.Thread(target=self._servidor.serve_forever, name='adjuntos', daemon=True)
+        self._hilo.start()
+
+    def _url(self, ruta, params, validez):
+        params = dict(params, expira=str(int(time.time()) + validez))
+        params['firma'] = _firmar(self.secreto, ruta, params)
+        return f"{self.url_base}{ruta}?{urlencode(params)}"
+
+    def url(self, sha256, tipo_contenido=None, validez=VALIDEZ_ENLACE_SEGUNDOS):
+        """Enlace firmado al archivo original"""
+        params = {'tipo': tipo_contenido} if tipo_contenido else {}
+        return self._url(f"/adjuntos/{sha256}", params, validez)
+
+    def url_miniatura(self, sha256, lado=LADO_MINIATURA, validez=VALIDEZ_ENLACE_SEGUNDOS):
+        """Enlace firmado a la miniatura (se genera cuando el navegador la pide)"""
+        return self._url(f"/miniaturas/{int(lado)}/{sha256}.jpg", {}, validez)
+
+    def _verificar(self, ruta, params):
+        firma = params.pop('firma', '')
+        if not hmac.compare_digest(firma, _firmar(self.secreto, ruta, params)):
+            return "Firma inválida"
+        if int(params.get('expira', 0)) < time.time():
+            return "El enlace venció"
+        return None
+
+    def _manejador(self):
+        servidor = self
+        almacen = self.almacen
+
+        class Manejador(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                partes = url.path.strip('/').split('/')
+                problema = servidor._verificar(url.path, params)
+                if problema:
+                    return self._error(403, problema)
+
+                if len(partes) == 2 and partes[0] == 'adjuntos' and _SHA256.match(partes[1]):
+                    sha256, tipo = partes[1], params.get('tipo') or 'application/octet-stream'
+                    if not almacen.existe(sha256):
+                        return self._error(404, "Archivo no encontrado")
+                    ruta = almacen.ruta(sha256)
+                elif (len(partes) == 3 and partes[0] == 'miniaturas' and partes[1].isdigit()
+                      and partes[2].endswith('.jpg') and _SHA256.match(partes[2][:-4])):
+                    sha256, tipo = partes[2][:-4], 'image/jpeg'
+                    if not almacen.existe(sha256):
+                        return self._error(404, "Archivo no encontrado")
+                    ruta = almacen.miniatura(sha256, int(partes[1]))
+                    if ruta is None:
+                        return self._error(415, "El archivo no es una imagen")
+                else:
+                    return self._error(404, "No encontrado")
+
+                etag = f'"{sha256}"'
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self._enviar(ruta, tipo, etag)
+
+            def _enviar(self, ruta, tipo, etag):
+                tamano = os.path.getsize(ruta)
+                try:
+                    rango = _rango(self.headers.get('Range'), tamano)
+                except ValueError:
+                    self.send_response(416)
+                    self.send_header('Content-Range', f'bytes */{tamano}')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                inicio, fin = rango or (0, tamano - 1)
+                self.send_response(206 if rango else 200)
+                self.send_header('Content-Type', tipo)
+                self.send_header('Content-Length', str(fin - inicio + 1))
+                self.send_header('Accept-Ranges', 'bytes')
+                if rango:
+                    self.send_header('Content-Range', f'bytes {inicio}-{fin}/{tamano}')
+                self.send_header('ETag', etag)
+                self.send_header('Cache-Control', 'private, max-age=31536000, immutable')
+                self.end_headers()
+                try:
+                    with open(ruta, 'rb') as archivo:
+                        archivo.seek(inicio)
+                        restante = fin - inicio + 1
+                        while restante > 0:
+                            trozo = archivo.read(min(TAMANO_TROZO, restante))
+                            if not trozo:
+                                break
+                            self.wfile.write(trozo)
+                            restante -= len(trozo)
+                except (BrokenPipeError, ConnectionResetError):
+                    # El navegador dejó de leer (cambio de página, video cortado...)
+                    pass
+
+            def _error(self, codigo, mensaje):
+                cuerpo = mensaje.encode('utf-8')
+                self.send_response(codigo)
+                self.send_header('Content-Type', 'text/plain; charset=utf-8')
+                self.send_header('Content-Length', str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, formato, *args):
+                pass
+
+        return Manejador
+
+    def cerrar(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+
+# ========================================
+# DEMO
+# ========================================
+
+def _foto_de_prueba(ancho, alto, semilla):
+    """JPEG determinista: la misma semilla da los mismos bytes"""
+    import io
+    import random
+    from PIL import Image, ImageOps
+
+    aleatorio = random.Random(semilla)
+    colores = [tuple(aleatorio.randrange(256) for _ in range(3)) for _ in range(2)]
+    imagen = ImageOps.colorize(Image.linear_gradient('L').resize((ancho, alto)).rotate(aleatorio.randrange(360)),
+                               *colores)
+    salida = io.BytesIO()
+    imagen.save(salida, 'JPEG', quality=90)
+    salida.seek(0)
+    return salida
+
+
+def _demo(fotos=20):
+    """Sube fotos (con repetidas), mide miniaturas perezosas y pide un rango al servidor"""
+    import sqlite3
+    import urllib.request
+    from migraciones import migrar_sqlite
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta_db = os.path.join(carpeta, 'adjuntos.db')
+        migrar_sqlite(ruta_db)
+        conn = sqlite3.connect(ruta_db)
+        conn.execute("INSERT INTO Clientes (nombre, telefono) VALUES ('Demo', '999000111')")
+        conn.execute("INSERT INTO Vehiculos (cliente_id, marca, modelo, año, placa) VALUES (1, 'Toyota', 'Yaris', 2020, 'DEMO-1')")
+        for i in range(fotos):
+            conn.execute("INSERT INTO Citas (cliente_id, vehiculo_id, servicio_id, fecha_hora) VALUES (1, 1, 1, ?)",
+                         (f"2024-01-{i % 28 + 1:02d} {8 + i // 28:02d}:00:00",))
+        conn.commit()
+
+        almacen = AlmacenBlobs(os.path.join(carpeta, 'adjuntos'))
+        t0 = time.perf_counter()
+        # La mitad de las subidas repiten una foto ya subida
+        for i in range(fotos):
+            adjuntar(conn, almacen, _foto_de_prueba(1600, 1200, i // 2), f"foto_{i}.jpg", 'image/jpeg',
+                     cita_id=i + 1, tipo=TIPOS_ADJUNTO[i % 2])
+        t_subida = time.perf_counter() - t0
+        archivos = sum(1 for _ in almacen.hashes())
+        print(f"{fotos} fotos subidas en {t_subida:.2f} s -> {archivos} archivos en el almacén (deduplicadas)")
+
+        # Una página del historial (5 citas): solo esas miniaturas se generan
+        _, filas = adjuntos_de_citas(conn, range(1, 6))
+        t0 = time.perf_counter()
+        for fila in filas:
+            almacen.miniatura(fila[1])
+        t_primera = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for fila in filas:
+            almacen.miniatura(fila[1])
+        t_cache = time.perf_counter() - t0
+        generadas = sum(len(a) for _, _, a in os.walk(os.path.join(almacen.carpeta, 'miniaturas')))
+        print(f"Página de 5 citas: miniaturas en {t_primera * 1000:.0f} ms la primera vez, "
+              f"{t_cache * 1000:.1f} ms desde la caché ({generadas} generadas de {archivos})")
+
+        servidor = ServidorAdjuntos(almacen, puerto=0, host='127.0.0.1')
+        servidor.url_base = f"http://127.0.0.1:{servidor._servidor.server_address[1]}"
+        sha256 = filas[0][1]
+        pedido = urllib.request.Request(servidor.url(sha256, 'image/jpeg'), headers={'Range': 'bytes=0-1023'})
+        with urllib.request.urlopen(pedido) as respuesta:
+            cuerpo = respuesta.read()
+            print(f"Range bytes=0-1023: HTTP {respuesta.status}, {len(cuerpo)} bytes, "
+                  f"{respuesta.headers['Content-Range']}")
+        with urllib.request.urlopen(servidor.url_miniatura(sha256)) as respuesta:
+            print(f"Miniatura por HTTP: {respuesta.headers['Content-Type']}, {len(respuesta.read())} bytes")
+        servidor.cerrar()
+
+        conn.execute("DELETE FROM Adjuntos WHERE cita_id > 2")
+        conn.commit()
+        print(f"Limpieza tras borrar adjuntos: {limpiar_huerfanos(conn, almacen, gracia=0)} archivos huérfanos borrados")
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fotos adjuntas a citas y vehículos")
+    parser.add_argument('--demo', action='store_true', help="Probar el almacén con una base temporal")
+    parser.add_argument('--limpiar', action='store_true', help="Borrar archivos que ningún adjunto usa")
+    parser.add_argument('--db', default='taller_automotriz.db', help="Archivo SQLite")
+    parser.add_argument('--dsn', help="Cadena de conexión ODBC (SQL Server)")
+    parser.add_argument('--carpeta', default=CARPETA_POR_DEFECTO, help="Carpeta del almacén")
+    args = parser.parse_args()
+
+    if args.demo:
+        _demo()
+        return
+    if not args.limpiar:
+        parser.error("indicar --demo o --limpiar")
+    if args.dsn:
+        import pyodbc
+        conn = pyodbc.connect(args.dsn)
+    else:
+        import sqlite3
+        conn = sqlite3.connect(args.db)
+    try:
+        print(f"✅ {limpiar_huerfanos(conn, AlmacenBlobs(args.carpeta))} archivos huérfanos borrados")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
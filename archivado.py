@@ -0,0 +1,263 @@
+# ========================================
+# ARCHIVO DE DATOS FRÍOS (CITAS Y MOVIMIENTOS)
+# Taller Automotriz - Sistema de Gestión
+# ========================================
+
+"""
+Mueve a CitasHistorico las citas cerradas (Completado/Cancelado) con más de N
+meses y a MovimientosInventarioHistorico los movimientos antiguos, en lotes
+pequeños: cada lote es una transacción corta, así que el proceso se puede
+interrumpir y volver a lanzar sin perder ni duplicar filas.
+
+Las funciones obtener_citas / obtener_movimientos leen de las tablas activas y
+solo agregan el archivo (UNION ALL) cuando el rango pedido empieza antes del
+corte registrado en ArchivoCorte.
+
+Uso:
+    python archivado.py --db taller_automotriz.db --meses-citas 12 --meses-movimientos 24
+    python archivado.py --dsn "Driver={ODBC Driver 17 for SQL Server};..."
+"""
+
+import argparse
+import sqlite3
+import time
+from datetime import date, datetime
+
+from bd_sqlite import conexion_lectura, en_transaccion
+
+LOTE_POR_DEFECTO = 500
+MESES_CITAS = 12
+MESES_MOVIMIENTOS = 24
+ESTADOS_CERRADOS = ('Completado', 'Cancelado')
+
+COLUMNAS_CITAS = ['id', 'cliente_id', 'vehiculo_id', 'servicio_id', 'fecha_hora',
+                  'descripcion_problema', 'estado', 'observaciones', 'costo_total',
+                  'fecha_creacion', 'fecha_actualizacion', 'sede_id']
+COLUMNAS_MOVIMIENTOS = ['id', 'inventario_id', 'tipo_movimiento', 'cantidad', 'motivo',
+                        'fecha', 'usuario_id', 'sede_id']
+
+
+def restar_meses(fecha, meses):
+    """Misma fecha N meses atrás (ajustada al último día del mes si hace falta)"""
+    total = fecha.year * 12 + fecha.month - 1 - meses
+    anio, mes = divmod(total, 12)
+    dia = fecha.day
+    while True:
+        try:
+            return date(anio, mes + 1, dia)
+        except ValueError:
+            dia -= 1
+
+
+def _texto_fecha(valor):
+    if isinstance(valor, datetime):
+        return valor.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(valor, date):
+        return valor.strftime('%Y-%m-%d')
+    return valor
+
+
+# ========================================
+# ARCHIVADO (SQLite)
+# ========================================
+
+def _publicar_corte(conn, tabla, corte):
+    # Nunca retrocede: un corte anterior ya archivado sigue siendo válido
+    conn.execute("""
+        INSERT INTO ArchivoCorte (tabla, corte) VALUES (?, ?)
+        ON CONFLICT(tabla) DO UPDATE SET corte = excluded.corte WHERE excluded.corte > ArchivoCorte.corte
+    """, (tabla, corte))
+
+
+def _mover_lote(conn, origen, destino, columnas, condicion, params, lote):
+    ids = [fila[0] for fila in conn.execute(
+        f"SELECT id FROM {origen} WHERE {condicion} LIMIT ?", (*params, lote))]
+    if not ids:
+        return 0
+    marcas = ','.join('?' * len(ids))
+    lista = ', '.join(columnas)
+    conn.execute(f"INSERT OR IGNORE INTO {destino} ({lista}) "
+                 f"SELECT {lista} FROM {origen} WHERE id IN ({marcas})", ids)
+    conn.execute(f"DELETE FROM {origen} WHERE id IN ({marcas})", ids)
+    return len(ids)
+
+
+def archivar_citas(destino, meses=MESES_CITAS, lote=LOTE_POR_DEFECTO, pausa=0.0, hoy=None):
+    """Archiva citas cerradas con más de `meses` meses; devuelve cuántas se movieron"""
+    corte = _texto_fecha(restar_meses(hoy or date.today(), meses))
+    condicion = f"estado IN ({','.join('?' * len(ESTADOS_CERRADOS))}) AND fecha_hora < ?"
+    params = (*ESTADOS_CERRADOS, corte)
+
+    en_transaccion(destino, lambda conn: _publicar_corte(conn, 'Citas', corte))
+    total = 0
+    while True:
+        movidas = en_transaccion(destino, lambda conn: _mover_lote(
+            conn, 'Citas', 'CitasHistorico', COLUMNAS_CITAS, condicion, params, lote))
+        total += movidas
+        if movidas < lote:
+            return total
+        # Deja pasar a las escrituras de las sesiones entre lote y lote
+        time.sleep(pausa)
+
+
+def archivar_movimientos(destino, meses=MESES_MOVIMIENTOS, lote=LOTE_POR_DEFECTO, pausa=0.0, hoy=None):
+    """Archiva movimientos de inventario con más de `meses` meses"""
+    corte = _texto_fecha(restar_meses(hoy or date.today(), meses))
+
+    en_transaccion(destino, lambda conn: _publicar_corte(conn, 'MovimientosInventario', corte))
+    total = 0
+    while True:
+        movidos = en_transaccion(destino, lambda conn: _mover_lote(
+            conn, 'MovimientosInventario', 'MovimientosInventarioHistorico',
+            COLUMNAS_MOVIMIENTOS, 'fecha < ?', (corte,), lote))
+        total += movidos
+        if movidos < lote:
+            return total
+        time.sleep(pausa)
+
+
+# ========================================
+# LECTURA (activas + archivo solo si hace falta)
+# ========================================
+
+def corte_archivo(conn, tabla):
+    """Fecha límite de lo archivado para la tabla (None si nunca se archivó)"""
+    fila = conn.execute("SELECT corte FROM ArchivoCorte WHERE tabla = ?", (tabla,)).fetchone()
+    return fila[0] if fila else None
+
+
+def necesita_archivo(corte, fecha_inicio):
+    """True si un rango que empieza en fecha_inicio puede tener filas archivadas"""
+    if corte is None:
+        return False
+    return fecha_inicio is None or _texto_fecha(fecha_inicio) < corte
+
+
+def _leer(conn, consulta, params, arrow=False, esquema=None):
+    if arrow:
+        from carga_arrow import leer_arrow
+        return leer_arrow(conn, consulta, params, esquema)
+    cursor = conn.execute(consulta, params)
+    columnas = [desc[0] for desc in cursor.description]
+    return columnas, cursor.fetchall()
+
+
+def obtener_citas(origen, fecha_inicio=None, fecha_fin=None, estado=None, cliente_id=None, sede_id=None,
+                  arrow=False):
+    """Equivalente SQLite de sp_obtener_citas; devuelve (columnas, filas) o, con arrow, una tabla Arrow"""
+    columnas_base = "id, cliente_id, vehiculo_id, servicio_id, fecha_hora, estado, descripcion_problema, costo_total"
+    filtros, params = [], []
+    if sede_id is not None:
+        filtros.append("sede_id = ?")
+        params.append(sede_id)
+    if fecha_inicio is not None:
+        filtros.append("fecha_hora >= ?")
+        params.append(_texto_fecha(fecha_inicio))
+    if fecha_fin is not None:
+        # fecha_fin es inclusiva (como en el procedimiento): hasta el final del día
+        filtros.append("fecha_hora < date(?, '+1 day')")
+        params.append(_texto_fecha(fecha_fin))
+    if estado is not None:
+        filtros.append("estado = ?")
+        params.append(estado)
+    if cliente_id is not None:
+        filtros.append("cliente_id = ?")
+        params.append(cliente_id)
+    where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+
+    with conexion_lectura(origen) as conn:
+        origen_sql = f"SELECT {columnas_base} FROM Citas {where}"
+        if necesita_archivo(corte_archivo(conn, 'Citas'), fecha_inicio):
+            origen_sql += f" UNION ALL SELECT {columnas_base} FROM CitasHistorico {where}"
+            params = params * 2
+        consulta = f"""
+        SELECT
+            c.id,
+            cl.nombre as cliente_nombre,
+            cl.telefono,
+            v.marca,
+            v.modelo,
+            v.placa,
+            s.nombre as servicio,
+            c.fecha_hora,
+            c.estado,
+            c.descripcion_problema,
+            c.costo_total,
+            s.precio as precio_base
+        FROM ({origen_sql}) c
+        JOIN Clientes cl ON c.cliente_id = cl.id
+        JOIN Vehiculos v ON c.vehiculo_id = v.id
+        JOIN Servicios s ON c.servicio_id = s.id
+        ORDER BY c.fecha_hora
+        """
+        return _leer(conn, consulta, params, arrow, 'sp_obtener_citas')
+
+
+def obtener_movimientos(origen, inventario_id=None, fecha_inicio=None, fecha_fin=None, sede_id=None,
+                        arrow=False):
+    """Equivalente SQLite de sp_obtener_movimientos_inventario; devuelve (columnas, filas) o una tabla Arrow"""
+    columnas_base = ', '.join(COLUMNAS_MOVIMIENTOS)
+    filtros, params = [], []
+    if sede_id is not None:
+        filtros.append("sede_id = ?")
+        params.append(sede_id)
+    if inventario_id is not None:
+        filtros.append("inventario_id = ?")
+        params.append(inventario_id)
+    if fecha_inicio is not None:
+        filtros.append("fecha >= ?")
+        params.append(_texto_fecha(fecha_inicio))
+    if fecha_fin is not None:
+        filtros.append("fecha < date(?, '+1 day')")
+        params.append(_texto_fecha(fecha_fin))
+    where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+
+    with conexion_lectura(origen) as conn:
+        origen_sql = f"SELECT {columnas_base} FROM MovimientosInventario {where}"
+        if necesita_archivo(corte_archivo(conn, 'MovimientosInventario'), fecha_inicio):
+            origen_sql += f" UNION ALL SELECT {columnas_base} FROM MovimientosInventarioHistorico {where}"
+            params = params * 2
+        consulta = f"""
+        SELECT
+            m.id,
+            i.nombre as producto,
+            m.tipo_movimiento,
+            m.cantidad,
+            m.motivo,
+            m.fecha,
+            u.nombre as usuario
+        FROM ({origen_sql}) m
+        JOIN Inventario i ON m.inventario_id = i.id
+        LEFT JOIN Usuarios u ON m.usuario_id = u.id
+        ORDER BY m.fecha DESC
+        """
+        return _leer(conn, consulta, params, arrow, 'sp_obtener_movimientos_inventario')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archivado de citas cerradas y movimientos antiguos")
+    parser.add_argument('--db', default='taller_automotriz.db', help="Archivo SQLite")
+    parser.add_argument('--dsn', help="Cadena de conexión ODBC (SQL Server)")
+    parser.add_argument('--meses-citas', type=int, default=MESES_CITAS)
+    parser.add_argument('--meses-movimientos', type=int, default=MESES_MOVIMIENTOS)
+    parser.add_argument('--lote', type=int, default=LOTE_POR_DEFECTO)
+    parser.add_argument('--pausa', type=float, default=0.05,
+                        help="Segundos de espera entre lotes (SQLite)")
+    args = parser.parse_args()
+
+    if args.dsn:
+        import pyodbc
+        conn = pyodbc.connect(args.dsn, autocommit=True)
+        fila = conn.execute("EXEC sp_archivar_historico ?, ?, ?",
+                            (args.meses_citas, args.meses_movimientos, args.lote)).fetchone()
+        citas, movimientos = fila
+    else:
+        conn = sqlite3.connect(args.db)
+        citas = archivar_citas(conn, args.meses_citas, args.lote, args.pausa)
+        movimientos = archivar_movimientos(conn, args.meses_movimientos, args.lote, args.pausa)
+    conn.close()
+    print(f"✅ Citas archivadas: {citas} | Movimientos archivados: {movimientos}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+# ========================================
+# BACKEND SQLITE CONCURRENTE
+# Taller Automotriz - Sistema de Gestión
+# ========================================
+
+"""
+Backend SQLite para varias sesiones de Streamlit a la vez.
+
+- Journal en modo WAL: los lectores no bloquean al escritor ni viceversa.
+- Pool de conexiones de solo lectura (una por sesión activa).
+- Un único hilo escritor que serializa las escrituras y agrupa en una
+  sola transacción (un solo fsync) todo lo que llegue mientras trabaja.
+
+Uso:
+    db = BaseDatosSQLite('taller_automotriz.db')
+    with db.lector() as conn:
+        df = pd.read_sql_query("SELECT * FROM Servicios", conn)
+    db.ejecutar("UPDATE Citas SET estado = ? WHERE id = ?", ('Confirmado', 1))
+    cita_id = db.transaccion(lambda conn: crear_cita(conn, ...))
+"""
+
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+# Ajustes por defecto (pensados para un servidor pequeño)
+LECTORES_POR_DEFECTO = 4
+LOTE_MAXIMO_ESCRITURAS = 64
+MMAP_MB = 256
+CACHE_MB = 64
+TIMEOUT_SEGUNDOS = 30
+
+_FIN = object()
+
+
+def _aplicar_pragmas(conn, mmap_mb, cache_mb, timeout):
+    """Pragmas comunes a lectores y escritor"""
+    conn.execute(f"PRAGMA busy_timeout = {int(timeout * 1000)}")
+    conn.execute(f"PRAGMA mmap_size = {int(mmap_mb) * 1024 * 1024}")
+    # cache_size negativo = tamaño en KiB
+    conn.execute(f"PRAGMA cache_size = {-int(cache_mb) * 1024}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+
+
+class _Tarea:
+    """Escritura pendiente en la cola del hilo escritor"""
+
+    __slots__ = ('funcion', 'futuro')
+
+    def __init__(self, funcion):
+        self.funcion = funcion
+        self.futuro = Future()
+
+
+class BaseDatosSQLite:
+    """Acceso concurrente a un archivo SQLite: N lectores y un escritor"""
+
+    def __init__(self, ruta='taller_automotriz.db', lectores=LECTORES_POR_DEFECTO,
+                 lote_maximo=LOTE_MAXIMO_ESCRITURAS, mmap_mb=MMAP_MB,
+                 cache_mb=CACHE_MB, timeout=TIMEOUT_SEGUNDOS):
+        self.ruta = ruta
+        self.lote_maximo = lote_maximo
+        self._mmap_mb = mmap_mb
+        self._cache_mb = cache_mb
+        self._timeout = timeout
+
+        # La conexión de escritura se abre primero: crea el archivo y activa WAL
+        self._escritor = self._conectar_escritor()
+        self._cola = queue.Queue()
+
+        self._lectores = queue.LifoQueue()
+        self._total_lectores = lectores
+        self._lectores_en_uso = 0
+        self._candado = threading.Lock()
+        for _ in range(lectores):
+            self._lectores.put(self._conectar_lector())
+
+        self._hilo = threading.Thread(target=self._bucle_escritor,
+                                      name='sqlite-escritor', daemon=True)
+        self._hilo.start()
+
+    # ---------------------------------------- conexiones
+
+    def _conectar_escritor(self):
+        conn = sqlite3.connect(self.ruta, timeout=self._timeout,
+                               isolation_level=None, check_same_thread=False)
+        modo = conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+        if modo.lower() != 'wal':
+            raise sqlite3.OperationalError(f"No se pudo activar WAL (modo actual: {modo})")
+        # En WAL, NORMAL solo puede perder la última transacción ante un corte de
+        # energía, nunca corromper la base; evita un fsync por commit
+        conn.execute("PRAGMA synchronous = NORMAL")
+        _aplicar_pragmas(conn, self._mmap_mb, self._cache_mb, self._timeout)
+        return conn
+
+    def _conectar_lector(self):
+        conn = sqlite3.connect(f"file:{self.ruta}?mode=ro", uri=True,
+                               timeout=self._timeout, check_same_thread=False)
+        conn.execute("PRAGMA query_only = 1")
+        _aplicar_pragmas(conn, self._mmap_mb, self._cache_mb, self._timeout)
+        return conn
+
+    # ---------------------------------------- lectura
+
+    @contextmanager
+    def lector(self, timeout=None):
+        """Presta una conexión de solo lectura del pool"""
+        try:
+            conn = self._lectores.get(timeout=timeout or self._timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError("No hay conexiones de lectura disponibles")
+        with self._candado:
+            self._lectores_en_uso += 1
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            with self._candado:
+                self._lectores_en_uso -= 1
+            self._lectores.put(conn)
+
+    def consultar(self, query, params=None):
+        """Ejecuta un SELECT y devuelve (columnas, filas)"""
+        with self.lector() as conn:
+            cursor = conn.execute(query, params or ())
+            columnas = [desc[0] for desc in cursor.description or ()]
+            return columnas, cursor.fetchall()
+
+    # ---------------------------------------- escritura
+
+    def enviar(self, funcion):
+        """Encola funcion(conn) para el hilo escritor y devuelve un Future"""
+        tarea = _Tarea(funcion)
+        self._cola.put(tarea)
+        return tarea.futuro
+
+    def transaccion(self, funcion, timeout=None):
+        """Ejecuta funcion(conn) dentro de la transacción del escritor y espera"""
+        return self.enviar(funcion).result(timeout=timeout)
+
+    def ejecutar(self, query, params=None, timeout=None):
+        """Ejecuta un INSERT/UPDATE/DELETE; devuelve (lastrowid, rowcount)"""
+        def _ejecutar(conn):
+            cursor = conn.execute(query, params or ())
+            return cursor.lastrowid, cursor.rowcount
+        return self.transaccion(_ejecutar, timeout=timeout)
+
+    def ejecutar_muchos(self, query, filas, timeout=None):
+        """executemany en una sola escritura; devuelve el rowcount total"""
+        def _ejecutar(conn):
+            return conn.executemany(query, filas).rowcount
+        return self.transaccion(_ejecutar, timeout=timeout)
+
+    def _bucle_escritor(self):
+        conn = self._escritor
+        while True:
+            primera = self._cola.get()
+            if primera is _FIN:
+                break
+            lote = [primera]
+            terminar = False
+            # Agrupar todo lo que ya esté esperando (hasta lote_maximo)
+            while len(lote) < self.lote_maximo:
+                try:
+                    tarea = self._cola.get_nowait()
+                except queue.Empty:
+                    break
+                if tarea is _FIN:
+                    terminar = True
+                    break
+                lote.append(tarea)
+
+            self._procesar_lote(conn, lote)
+            if terminar:
+                break
+
+    def _procesar_lote(self, conn, lote):
+        resultados = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except Exception as e:
+            for tarea in lote:
+                tarea.futuro.set_exception(e)
+            return
+
+        # Cada tarea va en su propio SAVEPOINT: si una falla, solo se deshace esa
+        for tarea in lote:
+            try:
+                conn.execute("SAVEPOINT tarea")
+                resultado = tarea.funcion(conn)
+                conn.execute("RELEASE tarea")
+                resultados.append((tarea, resultado, None))
+            except Exception as e:
+                try:
+                    conn.execute("ROLLBACK TO tarea")
+                    conn.execute("RELEASE tarea")
+                except sqlite3.Error:
+                    pass
+                resultados.append((tarea, None, e))
+
+        try:
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for tarea in lote:
+                tarea.futuro.set_exception(e)
+            return
+
+        # Los futuros se resuelven solo después del COMMIT
+        for tarea, resultado, error in resultados:
+            if error is None:
+                tarea.futuro.set_result(resultado)
+            else:
+                tarea.futuro.set_exception(error)
+
+    # ---------------------------------------- estado y cierre
+
+    def estadisticas(self):
+        """Uso actual del pool y de la cola de escritura"""
+        with self._candado:
+            en_uso = self._lectores_en_uso
+        return {
+            'lectores_total': self._total_lectores,
+            'lectores_en_uso': en_uso,
+            'escrituras_en_cola': self._cola.qsize(),
+        }
+
+    def cerrar(self):
+        """Termina el hilo escritor (vaciando la cola) y cierra las conexiones"""
+        if not self._hilo.is_alive():
+            return
+        self._cola.put(_FIN)
+        self._hilo.join()
+        self._escritor.close()
+        while True:
+            try:
+                self._lectores.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def en_transaccion(destino, funcion):
+    """Ejecuta funcion(conn) en una transacción, sea destino un BaseDatosSQLite o una conexión"""
+    if isinstance(destino, BaseDatosSQLite):
+        return destino.transaccion(funcion)
+    with destino:
+        return funcion(destino)
+
+
+@contextmanager
+def conexion_lectura(origen):
+    """Conexión para leer: del pool si origen es un BaseDatosSQLite, o la conexión misma"""
+    if isinstance(origen, BaseDatosSQLite):
+        with origen.lector() as conn:
+            yield conn
+    else:
+        yield origen
@@ -0,0 +1,218 @@
+# ========================================
+# BENCHMARK DE CONCURRENCIA SQLITE
+# Taller Automotriz - Sistema de Gestión
+# ========================================
+
+"""
+Simula N sesiones simultáneas (lecturas de servicios/citas y reservas) y
+compara el esquema clásico (una conexión por sesión, journal de rollback)
+con el backend WAL + pool de lectores + hilo escritor de bd_sqlite.
+
+Uso:
+    python benchmark_concurrencia.py --sesiones 24 --segundos 10
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from bd_sqlite import BaseDatosSQLite
+from migraciones import migrar_sqlite
+
+CONSULTA_SERVICIOS = "SELECT * FROM Servicios WHERE activo = 1 ORDER BY nombre"
+CONSULTA_CITAS_DIA = """
+SELECT c.id, cl.nombre, s.nombre, c.fecha_hora, c.estado
+FROM Citas c
+JOIN Clientes cl ON c.cliente_id = cl.id
+JOIN Servicios s ON c.servicio_id = s.id
+WHERE c.fecha_hora >= ? AND c.fecha_hora < ?
+ORDER BY c.fecha_hora
+"""
+
+
+def preparar_base(ruta, citas_iniciales=20000):
+    """Crea el esquema (migraciones) y datos de prueba"""
+    migrar_sqlite(ruta)
+    conn = sqlite3.connect(ruta)
+    conn.executemany("INSERT INTO Servicios (nombre, precio) VALUES (?, ?)",
+                     [(f"Servicio {i}", 50 + i * 10) for i in range(10)])
+    conn.executemany("INSERT INTO Clientes (nombre, telefono) VALUES (?, ?)",
+                     [(f"Cliente {i}", f"9{i:08d}") for i in range(2000)])
+    inicio = datetime(2024, 1, 1, 8)
+    conn.executemany(
+        "INSERT INTO Citas (cliente_id, servicio_id, fecha_hora) VALUES (?, ?, ?)",
+        [(random.randint(1, 2000), random.randint(1, 10),
+          (inicio + timedelta(hours=i)).strftime('%Y-%m-%d %H:%M:%S'))
+         for i in range(citas_iniciales)])
+    conn.commit()
+    conn.close()
+
+
+def _reservar(conn):
+    cursor = conn.execute("INSERT INTO Clientes (nombre, telefono) VALUES (?, ?)",
+                          ('Cliente benchmark', '900000000'))
+    cliente_id = cursor.lastrowid
+    # Segundos impares: no choca con las citas en punto de preparar_base (HorariosReservados)
+    fecha = datetime(2024, 6, 1, 8, 0, 1) + timedelta(seconds=2 * random.randint(0, 10 ** 8))
+    conn.execute("INSERT INTO Citas (cliente_id, servicio_id, fecha_hora) VALUES (?, ?, ?)",
+                 (cliente_id, random.randint(1, 10), fecha.strftime('%Y-%m-%d %H:%M:%S')))
+
+
+def _leer(conn):
+    conn.execute(CONSULTA_SERVICIOS).fetchall()
+    dia = datetime(2024, 1, 1) + timedelta(days=random.randint(0, 800))
+    conn.execute(CONSULTA_CITAS_DIA, (dia.strftime('%Y-%m-%d'),
+                                      (dia + timedelta(days=1)).strftime('%Y-%m-%d'))).fetchall()
+
+
+class Sesion:
+    """Interfaz común para los dos modos de acceso"""
+
+    def leer(self):
+        raise NotImplementedError
+
+    def reservar(self):
+        raise NotImplementedError
+
+    def cerrar(self):
+        pass
+
+
+class SesionClasica(Sesion):
+    """Una conexión por sesión en modo rollback-journal (comportamiento original)"""
+
+    def __init__(self, ruta):
+        self.conn = sqlite3.connect(ruta, timeout=5)
+
+    def leer(self):
+        _leer(self.conn)
+
+    def reservar(self):
+        try:
+            _reservar(self.conn)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def cerrar(self):
+        self.conn.close()
+
+
+class SesionWAL(Sesion):
+    """Sesión sobre el backend compartido de bd_sqlite"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def leer(self):
+        with self.db.lector() as conn:
+            _leer(conn)
+
+    def reservar(self):
+        self.db.transaccion(_reservar)
+
+
+def correr_sesiones(fabrica, sesiones, segundos, proporcion_escritura):
+    """Ejecuta las sesiones en hilos y devuelve latencias y errores"""
+    latencias = {'lectura': [], 'escritura': []}
+    errores = {'lectura': 0, 'escritura': 0}
+    candado = threading.Lock()
+    fin = time.perf_counter() + segundos
+    barrera = threading.Barrier(sesiones)
+
+    def trabajar():
+        sesion = fabrica()
+        barrera.wait()
+        propias = {'lectura': [], 'escritura': []}
+        fallos = {'lectura': 0, 'escritura': 0}
+        try:
+            while time.perf_counter() < fin:
+                tipo = 'escritura' if random.random() < proporcion_escritura else 'lectura'
+                t0 = time.perf_counter()
+                try:
+                    if tipo == 'escritura':
+                        sesion.reservar()
+                    else:
+                        sesion.leer()
+                    propias[tipo].append(time.perf_counter() - t0)
+                except sqlite3.Error:
+                    fallos[tipo] += 1
+        finally:
+            sesion.cerrar()
+        with candado:
+            for tipo in latencias:
+                latencias[tipo].extend(propias[tipo])
+                errores[tipo] += fallos[tipo]
+
+    hilos = [threading.Thread(target=trabajar) for _ in range(sesiones)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return latencias, errores
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+def imprimir_resultado(modo, latencias, errores, segundos):
+    total = sum(len(v) for v in latencias.values())
+    print(f"\n=== {modo} ===")
+    print(f"Operaciones/s: {total / segundos:,.0f}")
+    for tipo, valores in latencias.items():
+        if valores:
+            print(f"  {tipo:<10} n={len(valores):>7}  "
+                  f"p50={statistics.median(valores) * 1000:7.2f} ms  "
+                  f"p95={percentil(valores, 95) * 1000:7.2f} ms  "
+                  f"p99={percentil(valores, 99) * 1000:7.2f} ms  "
+                  f"errores={errores[tipo]}")
+        else:
+            print(f"  {tipo:<10} sin operaciones exitosas  errores={errores[tipo]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de concurrencia SQLite")
+    parser.add_argument('--sesiones', type=int, default=24)
+    parser.add_argument('--segundos', type=float, default=10)
+    parser.add_argument('--escrituras', type=float, default=0.2,
+                        help="Proporción de operaciones que son reservas (0-1)")
+    parser.add_argument('--lectores', type=int, default=8)
+    parser.add_argument('--modo', choices=['clasico', 'wal', 'ambos'], default='ambos')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        if args.modo in ('clasico', 'ambos'):
+            ruta = os.path.join(carpeta, 'clasico.db')
+            preparar_base(ruta)
+            latencias, errores = correr_sesiones(lambda: SesionClasica(ruta), args.sesiones,
+                                                 args.segundos, args.escrituras)
+            imprimir_resultado(f"Clásico (rollback journal, {args.sesiones} sesiones)",
+                               latencias, errores, args.segundos)
+
+        if args.modo in ('wal', 'ambos'):
+            ruta = os.path.join(carpeta, 'wal.db')
+            preparar_base(ruta)
+            db = BaseDatosSQLite(ruta, lectores=args.lectores)
+            try:
+                latencias, errores = correr_sesiones(lambda: SesionWAL(db), args.sesiones,
+                                                     args.segundos, args.escrituras)
+            finally:
+                db.cerrar()
+            imprimir_resultado(f"WAL + {args.lectores} lectores + escritor único "
+                               f"({args.sesiones} sesiones)",
+                               latencias, errores, args.segundos)
+
+
+if __name__ == "__main__":
+    main()
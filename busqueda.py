@@ -0,0 +1,207 @@
+# ========================================
+# BÚSQUEDA DE CLIENTES, VEHÍCULOS Y PLACAS
+# Taller Automotriz - Sistema de Gestión
+# ========================================
+
+"""
+Búsqueda tolerante a errores sobre nombre, teléfono, email, placa, marca y
+modelo. Usa el índice que mantienen los triggers de las migraciones:
+
+- SQLite: tabla FTS5 BusquedaClientes con tokenizador de trigramas. Primero se
+  busca cada palabra como subcadena exacta; si no alcanza para el top-k, se
+  completa con una búsqueda difusa (algún trigrama de cada palabra). El top-k
+  siempre sale ordenado por bm25, calculado sobre los PRESUPUESTO_RANKING
+  candidatos más recientes: si una búsqueda poco selectiva tiene más, los más
+  antiguos quedan fuera del ranking, así el costo no crece con el tamaño de
+  la tabla.
+- SQL Server: procedimiento sp_buscar_clientes sobre BusquedaTrigramas.
+
+Uso:
+    with db.lector() as conn:
+        resultados = buscar_clientes(conn, 'toyta corola', limite=10)
+
+    python busqueda.py --benchmark 1000000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+import unicodedata
+
+from migraciones import motor_de
+
+LIMITE_POR_DEFECTO = 10
+PRESUPUESTO_RANKING = 2000
+
+COLUMNAS_RESULTADO = ['id', 'nombre', 'telefono', 'email', 'placa', 'marca', 'modelo', 'relevancia']
+
+# bm25 (rank) de los candidatos más recientes (rowid descendente, el orden en
+# que FTS5 los recorre sin ordenar) y top-k por rank entre ellos
+_CONSULTA_RANKING = """
+SELECT c.id, c.nombre, c.telefono, c.email, b.placa, b.marca, b.modelo, -b.rank AS relevancia
+FROM (
+    SELECT rowid, placa, marca, modelo, rank
+    FROM BusquedaClientes
+    WHERE BusquedaClientes MATCH ?
+    ORDER BY rowid DESC
+    LIMIT ?
+) b
+JOIN Clientes c ON c.id = b.rowid
+ORDER BY b.rank, b.rowid DESC
+LIMIT ?
+"""
+
+
+def normalizar(texto):
+    """Minúsculas y sin tildes (igual que el texto indexado)"""
+    descompuesto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(ch for ch in descompuesto if not unicodedata.combining(ch)).lower().strip()
+
+
+def _palabras(texto):
+    # El tokenizador de trigramas no puede encontrar subcadenas de menos de 3 caracteres
+    return [p for p in normalizar(texto).split() if len(p) >= 3]
+
+
+def _frase(texto):
+    return '"' + texto.replace('"', '""') + '"'
+
+
+def expresion_exacta(texto):
+    """MATCH que exige cada palabra como subcadena (AND implícito)"""
+    return ' '.join(_frase(p) for p in _palabras(texto))
+
+
+def _trigramas(palabra):
+    trigramas = []
+    for i in range(len(palabra) - 2):
+        if palabra[i:i + 3] not in trigramas:
+            trigramas.append(palabra[i:i + 3])
+    return trigramas
+
+
+def expresion_difusa(texto, todas_las_palabras=True):
+    """MATCH que tolera errores de tipeo: algún trigrama de cada palabra
+
+    Con todas_las_palabras=False basta un trigrama de cualquier palabra.
+    """
+    grupos = ['(' + ' OR '.join(_frase(t) for t in _trigramas(p)) + ')'
+              for p in _palabras(texto)]
+    return (' AND ' if todas_las_palabras else ' OR ').join(grupos)
+
+
+def _filas_como_dict(cursor):
+    columnas = [desc[0] for desc in cursor.description]
+    return [dict(zip(columnas, fila)) for fila in cursor.fetchall()]
+
+
+def buscar_clientes(conn, texto, limite=LIMITE_POR_DEFECTO):
+    """Top-k clientes que coinciden con el texto, del más al menos relevante"""
+    if not _palabras(texto):
+        return []
+
+    if motor_de(conn) == 'sqlserver':
+        cursor = conn.cursor()
+        cursor.execute("EXEC sp_buscar_clientes ?, ?", (texto, limite))
+        return _filas_como_dict(cursor)
+
+    resultados = []
+    vistos = set()
+    for expresion in (expresion_exacta(texto), expresion_difusa(texto),
+                      expresion_difusa(texto, todas_las_palabras=False)):
+        for fila in _top_k(conn, expresion, limite):
+            if fila['id'] not in vistos:
+                vistos.add(fila['id'])
+                resultados.append(fila)
+        if len(resultados) >= limite:
+            break
+    return resultados[:limite]
+
+
+def _top_k(conn, expresion, limite):
+    # bm25 se calcula como mucho para PRESUPUESTO_RANKING filas
+    return _filas_como_dict(conn.execute(_CONSULTA_RANKING, (expresion, PRESUPUESTO_RANKING, limite)))
+
+
+# ========================================
+# BENCHMARK
+# ========================================
+
+_NOMBRES = ['Juan', 'María', 'Carlos', 'Ana', 'Pedro', 'Lucía', 'José', 'Rosa', 'Luis', 'Sofía']
+_APELLIDOS = ['Pérez', 'González', 'Rodríguez', 'Martín', 'Ruiz', 'Quispe', 'Flores',
+              'Sánchez', 'Ramírez', 'Torres', 'Muñoz', 'Castro', 'Vargas', 'Huamán']
+_VEHICULOS = [('Toyota', 'Corolla'), ('Toyota', 'Yaris'), ('Nissan', 'Sentra'),
+              ('Hyundai', 'Accent'), ('Kia', 'Rio'), ('Chevrolet', 'Spark'),
+              ('Suzuki', 'Swift'), ('Volkswagen', 'Gol'), ('Mazda', 'CX-5')]
+
+
+def _poblar(ruta, cantidad):
+    import sqlite3
+    from migraciones import migrar_sqlite
+
+    migrar_sqlite(ruta)
+    conn = sqlite3.connect(ruta)
+    letras = 'ABCDEFGHJKLMNPRSTUVWXYZ'
+    lote = 50000
+    for inicio in range(0, cantidad, lote):
+        n = min(lote, cantidad - inicio)
+        clientes = []
+        for _ in range(n):
+            nombre, apellido = random.choice(_NOMBRES), random.choice(_APELLIDOS)
+            clientes.append((f"{nombre} {apellido} {random.choice(_APELLIDOS)}",
+                             f"9{random.randint(0, 99999999):08d}",
+                             f"{normalizar(nombre[0] + apellido)}{random.randint(1, 9999)}@email.com"))
+        conn.executemany("INSERT INTO Clientes (nombre, telefono, email) VALUES (?, ?, ?)", clientes)
+        primer_id = conn.execute("SELECT MAX(id) FROM Clientes").fetchone()[0] - n + 1
+        vehiculos = []
+        for i in range(n):
+            marca, modelo = random.choice(_VEHICULOS)
+            placa = (''.join(random.choice(letras) for _ in range(3))
+                     + f"-{random.randint(0, 999):03d}")
+            vehiculos.append((primer_id + i, marca, modelo, random.randint(2005, 2024), placa))
+        conn.executemany("INSERT INTO Vehiculos (cliente_id, marca, modelo, año, placa) VALUES (?, ?, ?, ?, ?)",
+                         vehiculos)
+        conn.commit()
+    conn.execute("INSERT INTO BusquedaClientes(BusquedaClientes) VALUES ('optimize')")
+    conn.commit()
+    return conn
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Búsqueda de clientes")
+    parser.add_argument('texto', nargs='?', help="Texto a buscar")
+    parser.add_argument('--db', default='taller_automotriz.db')
+    parser.add_argument('--limite', type=int, default=LIMITE_POR_DEFECTO)
+    parser.add_argument('--benchmark', type=int, metavar='N',
+                        help="Generar N clientes en una base temporal y medir consultas")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        with tempfile.TemporaryDirectory() as carpeta:
+            t0 = time.perf_counter()
+            conn = _poblar(os.path.join(carpeta, 'busqueda.db'), args.benchmark)
+            print(f"Base con {args.benchmark:,} clientes creada en {time.perf_counter() - t0:.1f} s")
+            consultas = ['perez', 'Gonzales Quispe', 'toyta corola', '98765', 'ABC-1',
+                         'jperez123@', 'Muñoz Sanchez', 'mazda cx5', 'huaman vargsa']
+            for consulta in consultas:
+                tiempos = []
+                for _ in range(5):
+                    t0 = time.perf_counter()
+                    resultados = buscar_clientes(conn, consulta, args.limite)
+                    tiempos.append(time.perf_counter() - t0)
+                print(f"  {consulta!r:<20} {len(resultados):>3} resultados  "
+                      f"mejor={min(tiempos) * 1000:7.1f} ms  mediana={sorted(tiempos)[2] * 1000:7.1f} ms")
+            conn.close()
+        return
+
+    import sqlite3
+    conn = sqlite3.connect(args.db)
+    for fila in buscar_clientes(conn, args.texto or '', args.limite):
+        print(fila)
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+# ========================================
+# CARGA DE RESULTADOS EN TABLAS ARROW
+# Taller Automotriz - Sistema de Gestión
+# ========================================
+
+"""
+Arma tablas pyarrow directamente desde el cursor (sqlite3 o pyodbc), sin pasar
+por un DataFrame. st.dataframe serializa la tabla Arrow tal cual, y la
+exportación escribe Parquet/CSV desde los mismos lotes, así que un listado
+grande se convierte una sola vez en lugar de filas -> pandas -> Arrow.
+
+Ni sqlite3 ni pyodbc entregan columnas: las filas se leen por bloques
+(fetchmany), cada bloque se transpone y cada columna pasa a un arreglo Arrow
+con el tipo del esquema de carga_tipada (diccionario para textos repetidos,
+enteros del tamaño justo, fechas como timestamp).
+
+Uso:
+    tabla = leer_arrow(conn, "SELECT * FROM Inventario", esquema='inventario')
+    st.dataframe(tabla, use_container_width=True)
+    for lote in lotes_arrow(conn, consulta, esquema='movimientos'):
+        ...
+    python carga_arrow.py --benchmark 100000
+"""
+
+import argparse
+import io
+import os
+import tempfile
+import time
+from decimal import Decimal
+
+import pyarrow as pa
+import pyarrow.compute as pc
+from pandas.api.types import CategoricalDtype
+
+from carga_tipada import TAMANO_BLOQUE, tipos_de_esquema
+
+_TIPOS_ENTEROS = {'int8': pa.int8(), 'int16': pa.int16(), 'int32': pa.int32(), 'int64': pa.int64()}
+_TIPOS_DECIMALES = {'decimal': pa.float64(), 'float32': pa.float32()}
+FECHA = pa.timestamp('us')
+
+
+def tipo_arrow(tipo):
+    """Tipo Arrow de un tipo de carga_tipada (None si se infiere de los valores)"""
+    if isinstance(tipo, CategoricalDtype):
+        return pa.dictionary(pa.int8(), pa.string())
+    if tipo == 'categoria':
+        return pa.dictionary(pa.int32(), pa.string())
+    if tipo in _TIPOS_ENTEROS:
+        return _TIPOS_ENTEROS[tipo]
+    if tipo in _TIPOS_DECIMALES:
+        return _TIPOS_DECIMALES[tipo]
+    if tipo == 'centimos':
+        return pa.int64()
+    if tipo == 'fecha':
+        return FECHA
+    if tipo == 'bool':
+        return pa.bool_()
+    if tipo == 'texto':
+        return pa.string()
+    return None
+
+
+def _inferido(valores):
+    try:
+        return pa.array(valores)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Tipos mezclados en la misma columna (SQLite no los impone)
+        return pa.array([None if v is None else str(v) for v in valores], type=pa.string())
+
+
+def columna_arrow(valores, tipo=None):
+    """Arreglo Arrow con los valores crudos de una columna convertidos al tipo pedido"""
+    if isinstance(tipo, CategoricalDtype):
+        # Categorías fijas: todos los lotes comparten el diccionario
+        categorias = pa.array(tipo.categories.tolist(), type=pa.string())
+        textos = pa.array(valores, type=pa.string())
+        indices = pc.index_in(textos, value_set=categorias)
+        if indices.null_count > textos.null_count:
+            # Un valor fuera de la lista no se pierde: diccionario propio del lote
+            return textos.dictionary_encode()
+        return pa.DictionaryArray.from_arrays(indices.cast(pa.int8()), categorias)
+    if tipo == 'categoria':
+        return _inferido(valores).cast(pa.string()).dictionary_encode()
+    if tipo == 'centimos':
+        # Punto fijo: importe en centavos como entero (exacto para sumar)
+        return pa.array([None if v is None else int(round(Decimal(str(v)) * 100)) for v in valores],
+                        type=pa.int64())
+    if tipo == 'fecha':
+        # SQLite devuelve texto ISO; SQL Server, datetime o date
+        return _inferido(valores).cast(FECHA)
+    if tipo == 'bool':
+        return pa.array([None if v is None else bool(v) for v in valores], type=pa.bool_())
+    destino = tipo_arrow(tipo)
+    if destino is None:
+        return _inferido(valores)
+    try:
+        return pa.array(valores, type=destino)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Decimal de pyodbc, números guardados como texto...: se infiere y se convierte
+        return _inferido(valores).cast(destino)
+
+
+def a_arrow(columnas, filas, esquema=None):
+    """RecordBatch tipado a partir de columnas y filas (tuplas o pyodbc.Row)"""
+    tipos = tipos_de_esquema(esquema)
+    datos_por_columna = list(zip(*filas)) if filas else [()] * len(columnas)
+    arreglos = [columna_arrow(valores, tipos.get(nombre))
+                for nombre, valores in zip(columnas, datos_por_columna)]
+    return pa.RecordBatch.from_arrays(arreglos, names=list(columnas))
+
+
+def lotes_de_cursor(cursor, esquema=None, tamano=TAMANO_BLOQUE):
+    """Genera RecordBatches de hasta `tamano` filas de un cursor ya ejecutado"""
+    columnas = [desc[0] for desc in cursor.description]
+    vacio = True
+    while True:
+        filas = cursor.fetchmany(tamano)
+        if not filas:
+            break
+        vacio = False
+        yield a_arrow(columnas, filas, esquema)
+    if vacio:
+        # Sin filas igual se devuelve el esquema (columnas de la consulta)
+        yield a_arrow(columnas, [], esquema)
+
+
+def lotes_arrow(conn, consulta, params=None, esquema=None, tamano=TAMANO_BLOQUE):
+    """Ejecuta la consulta y genera RecordBatches tipados"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(consulta, params or ())
+        yield from lotes_de_cursor(cursor, esquema, tamano)
+    finally:
+        cursor.close()
+
+
+def _indices_para(categorias):
+    if categorias <= 127:
+        return pa.int8()
+    if categorias <= 32767:
+        return pa.int16()
+    return pa.int32()
+
+
+def tabla_de_lotes(lotes):
+    """Une los lotes en una tabla con un solo diccionario por columna"""
+    tablas = [pa.Table.from_batches([lote]) for lote in lotes]
+    if not tablas:
+        return pa.table({})
+    # Las columnas inferidas pueden variar entre lotes (p. ej. todo NULL en uno)
+    tabla = pa.concat_tables(tablas, promote_options='permissive').unify_dictionaries()
+    # Índices del tamaño justo para el diccionario unificado
+    for i, campo in enumerate(tabla.schema):
+        if pa.types.is_dictionary(campo.type) and tabla.column(i).num_chunks:
+            tipo = pa.dictionary(_indices_para(len(tabla.column(i).chunk(0).dictionary)),
+                                 campo.type.value_type)
+            if tipo != campo.type:
+                tabla = tabla.set_column(i, campo.name, tabla.column(i).cast(tipo))
+    return tabla
+
+
+def tabla_de_cursor(cursor, esquema=None, tamano=TAMANO_BLOQUE):
+    """Tabla Arrow con el resultado de un cursor ya ejecutado (p. ej. un EXEC)"""
+    return tabla_de_lotes(lotes_de_cursor(cursor, esquema, tamano))
+
+
+def leer_arrow(conn, consulta, params=None, esquema=None, tamano=TAMANO_BLOQUE):
+    """Ejecuta la consulta y devuelve una tabla Arrow tipada"""
+    return tabla_de_lotes(lotes_arrow(conn, consulta, params, esquema, tamano))
+
+
+def memoria_mb(tabla):
+    return tabla.nbytes / 1024 / 1024
+
+
+# ========================================
+# BENCHMARK
+# ========================================
+
+_LISTADO_CITAS = """
+SELECT c.id, cl.nombre AS cliente, v.marca, v.modelo, v.placa, s.nombre AS servicio,
+       c.fecha_hora, c.estado, c.costo_total, s.precio AS precio_base
+FROM Citas c
+JOIN Clientes cl ON c.cliente_id = cl.id
+JOIN Vehiculos v ON c.vehiculo_id = v.id
+JOIN Servicios s ON c.servicio_id = s.id
+ORDER BY c.fecha_hora
+"""
+
+_LISTADO_MOVIMIENTOS = """
+SELECT m.id, i.nombre AS producto, i.categoria, m.tipo_movimiento, m.cantidad, m.motivo,
+       m.fecha, u.nombre AS usuario
+FROM MovimientosInventario m
+JOIN Inventario i ON m.inventario_id = i.id
+LEFT JOIN Usuarios u ON m.usuario_id = u.id
+ORDER BY m.fecha
+"""
+
+
+def _poblar_movimientos(conn, cantidad):
+    import random
+    from datetime import datetime, timedelta
+
+    items = [fila[0] for fila in conn.execute("SELECT id FROM Inventario")]
+    motivos = ['Compra a proveedor', 'Servicio completado', 'Ajuste de inventario', None]
+    inicio = datetime(2024, 1, 1)
+    # Solo el registro de movimientos: el stock no interviene en el listado
+    conn.executemany(
+        "INSERT INTO MovimientosInventario (inventario_id, tipo_movimiento, cantidad, motivo, fecha, usuario_id) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        [(random.choice(items), random.choice(('ENTRADA', 'SALIDA')), random.randint(1, 20),
+          random.choice(motivos),
+          (inicio + timedelta(seconds=i * 31_536_000 // cantidad)).strftime('%Y-%m-%d %H:%M:%S'),
+          random.choice((1, None)))
+         for i in range(cantidad)])
+    conn.commit()
+
+
+def _ipc(tabla):
+    """Bytes que st.dataframe envía al navegador (stream IPC de Arrow)"""
+    destino = io.BytesIO()
+    with pa.RecordBatchStreamWriter(destino, tabla.schema) as escritor:
+        escritor.write_table(tabla)
+    return destino.getvalue()
+
+
+def _medir(conn, consulta, esquema):
+    from carga_tipada import leer_tipado
+
+    # Solo leer las filas: lo que ningún camino se ahorra (la primera lectura calienta la caché)
+    conn.execute(consulta).fetchall()
+    t0 = time.perf_counter()
+    conn.execute(consulta).fetchall()
+    t_filas = time.perf_counter() - t0
+
+    # Camino anterior: filas -> DataFrame tipado -> Arrow (lo que hace st.dataframe con pandas)
+    t0 = time.perf_counter()
+    df = leer_tipado(conn, consulta, esquema=esquema)
+    t_df = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    bytes_pandas = _ipc(pa.Table.from_pandas(df, preserve_index=False))
+    t_pandas = t_df + time.perf_counter() - t0
+
+    # Camino Arrow: filas -> tabla Arrow -> bytes
+    t0 = time.perf_counter()
+    tabla = leer_arrow(conn, consulta, esquema=esquema)
+    t_tabla = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    bytes_arrow = _ipc(tabla)
+    t_arrow = t_tabla + time.perf_counter() - t0
+    return {
+        'filas': tabla.num_rows,
+        'lectura': t_filas,
+        'pandas': (t_df, t_pandas, df.memory_usage(deep=True).sum() / 1024 / 1024, len(bytes_pandas)),
+        'arrow': (t_tabla, t_arrow, memoria_mb(tabla), len(bytes_arrow)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga de resultados en tablas Arrow")
+    parser.add_argument('--benchmark', type=int, default=100000, metavar='N',
+                        help="Citas y movimientos a generar para comparar ambos caminos")
+    args = parser.parse_args()
+
+    from carga_tipada import _poblar
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        conn = _poblar(os.path.join(carpeta, 'arrow.db'), args.benchmark)
+        _poblar_movimientos(conn, args.benchmark)
+        resultados = {
+            'citas': _medir(conn, _LISTADO_CITAS, 'citas'),
+            'movimientos': _medir(conn, _LISTADO_MOVIMIENTOS, 'movimientos'),
+        }
+        conn.close()
+
+    for nombre, r in resultados.items():
+        print(f"Listado de {nombre} ({r['filas']:,} filas) hasta los bytes de st.dataframe")
+        print(f"  solo leer las filas del cursor: {r['lectura']:5.2f} s")
+        for camino, etiqueta in (('pandas', 'filas -> pandas -> Arrow'), ('arrow', 'filas -> Arrow          ')):
+            t_carga, t_total, mb, tamano = r[camino]
+            print(f"  {etiqueta}: carga {t_carga:5.2f} s  total {t_total:5.2f} s  "
+                  f"{mb:6.1f} MB en memoria  {tamano / 1024 / 1024:6.1f} MB enviados")
+        conversion_pandas = r['pandas'][1] - r['lectura']
+        conversion_arrow = r['arrow'][1] - r['lectura']
+        print(f"  Conversión: {conversion_pandas:.2f} s -> {conversion_arrow:.2f} s "
+              f"({conversion_pandas / max(conversion_arrow, 1e-9):.1f}x); "
+              f"total {r['pandas'][1] / r['arrow'][1]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+# ========================================
+# CARGA TIPADA DE RESULTADOS EN DATAFRAMES
+# Taller Automotriz - Sistema de Gestión
+# ========================================
+
+"""
+Convierte resultados de consultas (sqlite3 o pyodbc) en DataFrames compactos:
+categorías para textos repetidos (estado, categoria, marca...), enteros del
+tamaño justo, decimales como float o centavos enteros y fechas reales en lugar
+de columnas object.
+
+El tipo de cada columna sale del esquema de la consulta (ESQUEMAS, por nombre
+de consulta o procedimiento) y, si no figura ahí, de TIPOS_POR_COLUMNA.
+
+Uso:
+    df = leer_tipado(conn, "SELECT * FROM Inventario", esquema='inventario')
+    for bloque in leer_en_bloques(conn, consulta, esquema='citas', tamano=50000):
+        ...
+    python carga_tipada.py --benchmark 200000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import CategoricalDtype, union_categoricals
+
+TAMANO_BLOQUE = 50000
+
+# Categorías fijas: todos los bloques comparten el mismo dtype
+ESTADO_CITA = CategoricalDtype(['Pendiente', 'Confirmado', 'En Proceso', 'Completado', 'Cancelado'])
+TIPO_MOVIMIENTO = CategoricalDtype(['ENTRADA', 'SALIDA'])
+TIPO_USUARIO = CategoricalDtype(['admin', 'empleado'])
+
+_TIPOS_ENTEROS = {'int8': 'Int8', 'int16': 'Int16', 'int32': 'Int32', 'int64': 'Int64'}
+
+# Tipo por nombre de columna cuando la consulta no define uno
+TIPOS_POR_COLUMNA = {
+    'id': 'int32',
+    'cliente_id': 'int32',
+    'vehiculo_id': 'int32',
+    'servicio_id': 'int32',
+    'inventario_id': 'int32',
+    'usuario_id': 'int32',
+    'sede_id': 'int16',
+    'estado': 'categoria',
+    'tipo_movimiento': TIPO_MOVIMIENTO,
+    'tipo': 'categoria',
+    'categoria': 'categoria',
+    'marca': 'categoria',
+    'modelo': 'categoria',
+    'servicio': 'categoria',
+    'proveedor': 'categoria',
+    'color': 'categoria',
+    'año': 'int16',
+    'activo': 'bool',
+    'es_stock_bajo': 'bool',
+    'stock_actual': 'int32',
+    'stock_minimo': 'int32',
+    'cantidad': 'int32',
+    'kilometraje': 'int32',
+    'total_citas': 'int32',
+    'total_vehiculos': 'int16',
+    'precio': 'decimal',
+    'precio_base': 'decimal',
+    'precio_unitario': 'decimal',
+    'precio_promedio': 'decimal',
+    'costo_total': 'decimal',
+    'ingresos_totales': 'decimal',
+    'duracion_horas': 'float32',
+    'fecha': 'fecha',
+    'fecha_hora': 'fecha',
+    'fecha_registro': 'fecha',
+    'fecha_creacion': 'fecha',
+    'fecha_actualizacion': 'fecha',
+}
+
+# Esquemas por consulta / procedimiento (se combinan con TIPOS_POR_COLUMNA).
+# Las categorías fijas van aquí: 'estado' o 'tipo' significan otra cosa en otras tablas
+ESQUEMAS = {
+    'servicios': {'nombre': 'texto'},
+    'citas': {'cliente_nombre': 'texto', 'cliente': 'texto', 'estado': ESTADO_CITA},
+    'usuarios': {'tipo': TIPO_USUARIO},
+    'inventario': {'nombre': 'texto'},
+    'movimientos': {'producto': 'categoria', 'usuario': 'categoria'},
+    'vehiculos': {'placa': 'texto'},
+    'sedes': {'nombre': 'texto', 'direccion': 'texto', 'telefono': 'texto', 'email': 'texto'},
+    'sp_obtener_servicios': {'nombre': 'texto'},
+    'sp_obtener_citas': {'cliente_nombre': 'texto', 'estado': ESTADO_CITA},
+    'sp_obtener_inventario': {'nombre': 'texto'},
+    'sp_obtener_movimientos_inventario': {'producto': 'categoria', 'usuario': 'categoria'},
+    'sp_obtener_clientes': {'nombre': 'texto'},
+    'sp_obtener_vehiculos_cliente': {'placa': 'texto'},
+    'sp_reporte_servicios_populares': {'servicio': 'texto'},
+}
+
+
+def tipos_de_esquema(esquema=None):
+    """Tipo por columna de un esquema (nombre de ESQUEMAS o dict) sobre TIPOS_POR_COLUMNA"""
+    if esquema is None:
+        return TIPOS_POR_COLUMNA
+    if isinstance(esquema, str):
+        esquema = ESQUEMAS.get(esquema, {})
+    return {**TIPOS_POR_COLUMNA, **esquema}
+
+
+def convertir_columna(valores, tipo):
+    """Convierte una secuencia de valores crudos al tipo pedido"""
+    if isinstance(tipo, CategoricalDtype):
+        return pd.Categorical(valores, dtype=tipo)
+    if tipo == 'categoria':
+        return pd.Categorical(valores)
+    if tipo in _TIPOS_ENTEROS:
+        if any(v is None for v in valores):
+            return pd.array(valores, dtype=_TIPOS_ENTEROS[tipo])
+        return np.array(valores, dtype=tipo)
+    if tipo in ('decimal', 'float32'):
+        # pyodbc devuelve Decimal; None pasa a NaN
+        return np.array([np.nan if v is None else float(v) for v in valores],
+                        dtype='float64' if tipo == 'decimal' else 'float32')
+    if tipo == 'centimos':
+        # Punto fijo: importe en centavos como entero (exacto para sumar)
+        return pd.array([None if v is None else int(round(Decimal(str(v)) * 100)) for v in valores],
+                        dtype='Int64')
+    if tipo == 'fecha':
+        if valores and isinstance(next((v for v in valores if v is not None), None), datetime):
+            return pd.to_datetime(list(valores))
+        return pd.to_datetime(list(valores), format='ISO8601')
+    if tipo == 'bool':
+        if any(v is None for v in valores):
+            return pd.array([None if v is None else bool(v) for v in valores], dtype='boolean')
+        return np.array(valores, dtype=bool)
+    return list(valores)
+
+
+def a_dataframe(columnas, filas, esquema=None):
+    """DataFrame tipado a partir de columnas y filas (tuplas o pyodbc.Row)"""
+    tipos = tipos_de_esquema(esquema)
+    if filas:
+        datos_por_columna = list(zip(*filas))
+    else:
+        datos_por_columna = [()] * len(columnas)
+    datos = {}
+    for nombre, valores in zip(columnas, datos_por_columna):
+        tipo = tipos.get(nombre)
+        datos[nombre] = list(valores) if tipo is None else convertir_columna(valores, tipo)
+    return pd.DataFrame(datos, columns=columnas)
+
+
+def leer_tipado(conn, consulta, params=None, esquema=None):
+    """Ejecuta la consulta y devuelve un DataFrame tipado"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(consulta, params or ())
+        columnas = [desc[0] for desc in cursor.description]
+        return a_dataframe(columnas, cursor.fetchall(), esquema)
+    finally:
+        cursor.close()
+
+
+def leer_en_bloques(conn, consulta, params=None, esquema=None, tamano=TAMANO_BLOQUE):
+    """Genera DataFrames tipados de hasta `tamano` filas"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(consulta, params or ())
+        columnas = [desc[0] for desc in cursor.description]
+        while True:
+            filas = cursor.fetchmany(tamano)
+            if not filas:
+                break
+            yield a_dataframe(columnas, filas, esquema)
+    finally:
+        cursor.close()
+
+
+def concatenar(bloques):
+    """Une bloques conservando las categorías (unión de las de cada bloque)"""
+    bloques = list(bloques)
+    if not bloques:
+        return pd.DataFrame()
+    resultado = {}
+    for columna in bloques[0].columns:
+        partes = [b[columna] for b in bloques]
+        if isinstance(partes[0].dtype, CategoricalDtype):
+            resultado[columna] = union_categoricals([p.values for p in partes])
+        else:
+            resultado[columna] = pd.concat(partes, ignore_index=True)
+    return pd.DataFrame(resultado, columns=bloques[0].columns)
+
+
+def memoria_mb(df):
+    """Memoria real del DataFrame (incluye el contenido de los textos)"""
+    return df.memory_usage(deep=True).sum() / 1024 / 1024
+
+
+# ========================================
+# BENCHMARK
+# ========================================
+
+_CONSULTA_REPORTE = """
+SELECT c.id, cl.nombre AS cliente, v.marca, v.modelo, v.placa, s.nombre AS servicio,
+       c.fecha_hora, c.estado, c.costo_total, s.precio AS precio_base
+FROM Citas c
+JOIN Clientes cl ON c.cliente_id = cl.id
+JOIN Vehiculos v ON c.vehiculo_id = v.id
+JOIN Servicios s ON c.servicio_id = s.id
+"""
+
+
+def _poblar(ruta, cantidad):
+    import random
+    import sqlite3
+    from migraciones import migrar_sqlite
+    from busqueda import _VEHICULOS
+
+    migrar_sqlite(ruta)
+    conn = sqlite3.connect(ruta)
+    clientes = max(1, cantidad // 10)
+    conn.executemany("INSERT INTO Clientes (nombre, telefono) VALUES (?, ?)",
+                     [(f"Cliente {i}", f"9{i:08d}") for i in range(clientes)])
+    conn.executemany("INSERT INTO Vehiculos (cliente_id, marca, modelo, año, placa) VALUES (?, ?, ?, ?, ?)",
+                     [(i + 1, *random.choice(_VEHICULOS), 2015, f"ABC-{i:05d}") for i in range(clientes)])
+    estados = ESTADO_CITA.categories.tolist()
+    conn.executemany(
+        "INSERT INTO Citas (cliente_id, vehiculo_id, servicio_id, fecha_hora, estado, costo_total) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        # Un horario distinto por cita (HorariosReservados), repartidos en 2024
+        [((k := random.randint(1, clientes)), k, random.randint(1, 6),
+          (datetime(2024, 1, 1) + timedelta(seconds=i * 31_536_000 // cantidad)).strftime('%Y-%m-%d %H:%M:%S'),
+          random.choice(estados), round(random.uniform(50, 500), 2))
+         for i in range(cantidad)])
+    conn.commit()
+    return conn
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga tipada de DataFrames")
+    parser.add_argument('--benchmark', type=int, default=200000, metavar='N',
+                        help="Citas a generar para comparar memoria y tiempo")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        conn = _poblar(os.path.join(carpeta, 'tipos.db'), args.benchmark)
+
+        t0 = time.perf_counter()
+        generico = pd.read_sql_query(_CONSULTA_REPORTE, conn)
+        t_generico = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        tipado = leer_tipado(conn, _CONSULTA_REPORTE, esquema='citas')
+        t_tipado = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        por_bloques = concatenar(leer_en_bloques(conn, _CONSULTA_REPORTE, esquema='citas'))
+        t_bloques = time.perf_counter() - t0
+        conn.close()
+
+    print(f"{args.benchmark:,} citas (reporte de administración)")
+    print(f"  read_sql_query : {memoria_mb(generico):8.1f} MB  {t_generico:6.2f} s")
+    print(f"  leer_tipado    : {memoria_mb(tipado):8.1f} MB  {t_tipado:6.2f} s")
+    print(f"  leer_en_bloques: {memoria_mb(por_bloques):8.1f} MB  {t_bloques:6.2f} s")
+    print(f"  Reducción: {memoria_mb(generico) / memoria_mb(tipado):.1f}x")
+    print(tipado.dtypes.to_string())
+
+
+if __name__ == "__main__":
+    main()
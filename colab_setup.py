@@ -27,156 +27,19 @@ INSTRUCCIONES PARA EJECUTAR EN GOOGLE COLAB:
 
 # CELDA 3: Crear archivo de configuración de base de datos
 # ========================================
-# Si no tienes SQL Server local, puedes usar SQLite como alternativa
+# Si no tienes SQL Server local, puedes usar SQLite como alternativa.
+# El esquema y los datos de ejemplo viven en migraciones/sqlite/*.sql y se
+# aplican una sola vez; en arranques posteriores solo se verifica la versión.
 
-import sqlite3
-import pandas as pd
-import hashlib
-from datetime import datetime, date
+from migraciones import migrar_sqlite
 
 def crear_bd_sqlite():
-    """Crear base de datos SQLite como alternativa para desarrollo"""
-    conn = sqlite3.connect('taller_automotriz.db')
-    cursor = conn.cursor()
-    
-    # Crear tablas
-    tablas_sql = """
-    -- Tabla de Clientes
-    CREATE TABLE IF NOT EXISTS Clientes (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        nombre TEXT NOT NULL,
-        telefono TEXT NOT NULL,
-        email TEXT,
-        direccion TEXT,
-        fecha_registro DATETIME DEFAULT CURRENT_TIMESTAMP,
-        activo INTEGER DEFAULT 1
-    );
-    
-    -- Tabla de Vehículos
-    CREATE TABLE IF NOT EXISTS Vehiculos (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        cliente_id INTEGER,
-        marca TEXT NOT NULL,
-        modelo TEXT NOT NULL,
-        año INTEGER NOT NULL,
-        placa TEXT,
-        color TEXT,
-        kilometraje INTEGER,
-        fecha_registro DATETIME DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (cliente_id) REFERENCES Clientes(id)
-    );
-    
-    -- Tabla de Servicios
-    CREATE TABLE IF NOT EXISTS Servicios (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        nombre TEXT NOT NULL,
-        descripcion TEXT,
-        precio DECIMAL(10,2) NOT NULL,
-        duracion_horas DECIMAL(4,2) DEFAULT 1.0,
-        activo INTEGER DEFAULT 1
-    );
-    
-    -- Tabla de Citas
-    CREATE TABLE IF NOT EXISTS Citas (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        cliente_id INTEGER,
-        vehiculo_id INTEGER,
-        servicio_id INTEGER,
-        fecha_hora DATETIME NOT NULL,
-        descripcion_problema TEXT,
-        estado TEXT DEFAULT 'Pendiente',
-        observaciones TEXT,
-        costo_total DECIMAL(10,2),
-        fecha_creacion DATETIME DEFAULT CURRENT_TIMESTAMP,
-        fecha_actualizacion DATETIME DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (cliente_id) REFERENCES Clientes(id),
-        FOREIGN KEY (vehiculo_id) REFERENCES Vehiculos(id),
-        FOREIGN KEY (servicio_id) REFERENCES Servicios(id)
-    );
-    
-    -- Tabla de Inventario
-    CREATE TABLE IF NOT EXISTS Inventario (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        nombre TEXT NOT NULL,
-        categoria TEXT NOT NULL,
-        descripcion TEXT,
-        stock_actual INTEGER NOT NULL DEFAULT 0,
-        stock_minimo INTEGER NOT NULL DEFAULT 1,
-        precio_unitario DECIMAL(10,2) NOT NULL,
-        proveedor TEXT,
-        fecha_actualizacion DATETIME DEFAULT CURRENT_TIMESTAMP,
-        activo INTEGER DEFAULT 1
-    );
-    
-    -- Tabla de Usuarios
-    CREATE TABLE IF NOT EXISTS Usuarios (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE NOT NULL,
-        password_hash TEXT NOT NULL,
-        nombre TEXT NOT NULL,
-        email TEXT,
-        tipo TEXT DEFAULT 'admin',
-        activo INTEGER DEFAULT 1,
-        fecha_creacion DATETIME DEFAULT CURRENT_TIMESTAMP
-    );
-    """
-    
-    # Ejecutar creación de tablas
-    cursor.executescript(tablas_sql)
-    
-    # Insertar datos de ejemplo
-    servicios_data = [
-        ('Mantenimiento Preventivo', 'Cambio de aceite, filtros y revisión general del vehículo', 120.00, 2.0),
-        ('Cambio de Aceite', 'Cambio de aceite de motor y filtro', 80.00, 1.0),
-        ('Afinamiento de Motor', 'Cambio de bujías, cables y filtros', 150.00, 3.0),
-        ('Revisión de Frenos', 'Inspección y cambio de pastillas y discos de freno', 180.00, 2.5),
-        ('Sistema Eléctrico', 'Diagnóstico y reparación del sistema eléctrico', 100.00, 2.0),
-        ('Cambio de Batería', 'Suministro e instalación de batería nueva', 250.00, 0.5),
-        ('Reparación de Suspensión', 'Cambio de amortiguadores y componentes de suspensión', 300.00, 4.0),
-        ('Diagnóstico Computarizado', 'Escaneo y diagnóstico por computadora', 50.00, 1.0)
-    ]
-    
-    cursor.executemany('''
-        INSERT OR IGNORE INTO Servicios (nombre, descripcion, precio, duracion_horas)
-        VALUES (?, ?, ?, ?)
-    ''', servicios_data)
-    
-    # Insertar inventario de ejemplo
-    inventario_data = [
-        ('Aceite 5W30 4L', 'Lubricantes', 'Aceite sintético para motor', 20, 10, 45.00, 'Castrol'),
-        ('Filtro de Aceite', 'Filtros', 'Filtro de aceite universal', 15, 5, 25.00, 'Mann Filter'),
-        ('Filtro de Aire', 'Filtros', 'Filtro de aire del motor', 8, 5, 35.00, 'K&N'),
-        ('Pastillas de Freno', 'Frenos', 'Pastillas de freno cerámicas', 3, 5, 120.00, 'Brembo'),
-        ('Batería 12V', 'Eléctrico', 'Batería libre de mantenimiento', 12, 8, 280.00, 'Bosch')
-    ]
-    
-    cursor.executemany('''
-        INSERT OR IGNORE INTO Inventario (nombre, categoria, descripcion, stock_actual, stock_minimo, precio_unitario, proveedor)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', inventario_data)
-    
-    # Insertar usuario admin (password: admin123)
-    password_hash = hashlib.sha256("admin123".encode()).hexdigest()
-    cursor.execute('''
-        INSERT OR IGNORE INTO Usuarios (username, password_hash, nombre, email, tipo)
-        VALUES (?, ?, ?, ?, ?)
-    ''', ('admin', password_hash, 'Administrador', 'admin@tallersanisidro.com', 'admin'))
-    
-    # Insertar clientes de ejemplo
-    clientes_data = [
-        ('Juan Pérez García', '987654321', 'juan.perez@email.com', 'Av. Arequipa 1234, San Isidro'),
-        ('María González López', '987654322', 'maria.gonzalez@email.com', 'Jr. Lampa 567, Lima Centro'),
-        ('Carlos Rodríguez', '987654323', 'carlos.rodriguez@email.com', 'Av. Javier Prado 890, San Isidro')
-    ]
-    
-    cursor.executemany('''
-        INSERT OR IGNORE INTO Clientes (nombre, telefono, email, direccion)
-        VALUES (?, ?, ?, ?)
-    ''', clientes_data)
-    
-    conn.commit()
-    conn.close()
-    print("✅ Base de datos SQLite creada exitosamente con datos de ejemplo")
+    """Crear o actualizar la base de datos SQLite aplicando las migraciones pendientes"""
+    aplicadas = migrar_sqlite('taller_automotriz.db')
+    if aplicadas:
+        print(f"✅ Base de datos SQLite actualizada (migraciones {', '.join(map(str, aplicadas))})")
+    else:
+        print("✅ Base de datos SQLite al día")
 
 # Ejecutar creación de BD
 crear_bd_sqlite()
@@ -185,13 +48,38 @@ crear_bd_sqlite()
 # ========================================
 import streamlit as st
 import pandas as pd
-import sqlite3
+import pyarrow as pa
 import hashlib
+import os
+import time
 from datetime import datetime, date, timedelta
 import folium
 from streamlit_folium import folium_static
 import plotly.express as px
 import plotly.graph_objects as go
+from bd_sqlite import BaseDatosSQLite, conexion_lectura
+from busqueda import buscar_clientes, COLUMNAS_RESULTADO
+from adjuntos import TIPOS_ADJUNTO, AlmacenBlobs, ServidorAdjuntos, adjuntar, adjuntos_de_citas
+from archivado import obtener_citas, obtener_movimientos
+from carga_arrow import leer_arrow
+from carga_tipada import ESTADO_CITA, a_dataframe, leer_tipado
+from concurrencia import actualizar_estado_cita, horario_ocupado, insertar_cita
+from exportacion import EXPORTACIONES, ServidorExportaciones, conexion_sqlite_lectura, formatos_disponibles
+from facturacion import TIPO_HTML, TIPO_PDF, comprobantes_del_dia, facturar
+from idempotencia import clave_formulario, una_vez
+from ingresos import grafico_ingresos, ingresos_del_dia, serie_ingresos
+from mapa_clientes import NIVELES, actualizar_ubicaciones, agregado_clientes, mapa_clientes, nomenclator_desde
+from materiales import completar_dia, faltantes
+from metricas import (RESERVAS, ServidorMetricas, a_lo_sumo_cada, cache_referencia,
+                      contar_stock_bajo, medir_bd, registrar_pool, registrar_replica,
+                      registrar_rerun, registrar_respaldos, registrar_stock_bajo)
+from migraciones import migrar_sqlite
+from prediccion_servicio import actualizar_predicciones, proximos_servicios
+from replicas import CLAVE_SESION, Enrutador, ReplicadorSQLite
+from respaldos import Respaldos
+from reposicion import actualizar_puntos_reorden, pedido_sugerido
+from sedes import SEDE_PRINCIPAL, resumen_sede
+from tiempos_estado import actualizar_tiempos_estado, resumen_tiempos
 
 # Configuración de la página
 st.set_page_config(
@@ -204,49 +92,154 @@ st.set_page_config(
 # Funciones para SQLite (adaptación de la aplicación principal)
 @st.cache_resource
 def init_connection():
-    """Inicializa la conexión a SQLite"""
+    """Inicializa el backend SQLite compartido (WAL, pool de lectores y escritor único)"""
     try:
-        return sqlite3.connect('taller_automotriz.db', check_same_thread=False)
+        migrar_sqlite('taller_automotriz.db')
+        return BaseDatosSQLite('taller_automotriz.db')
     except Exception as e:
         st.error(f"Error de conexión: {e}")
         return None
 
-def ejecutar_consulta(query, params=None):
-    """Ejecuta una consulta SQL"""
-    conn = init_connection()
-    if conn:
+@st.cache_resource
+def init_enrutador():
+    """Lecturas a una réplica local (TALLER_REPLICA_DB, copiada cada segundo) si está configurada"""
+    db = init_connection()
+    if not db:
+        return None
+    ruta_replica = os.environ.get('TALLER_REPLICA_DB')
+    if not ruta_replica:
+        return Enrutador(db)
+    try:
+        replicador = ReplicadorSQLite('taller_automotriz.db', ruta_replica)
+        enrutador = Enrutador(db, BaseDatosSQLite(ruta_replica), latido=replicador)
+    except Exception as e:
+        st.warning(f"Réplica no disponible, todo va a la primaria: {e}")
+        return Enrutador(db)
+    registrar_replica(enrutador)
+    return enrutador
+
+@st.cache_resource
+def init_respaldos():
+    """Bases y archivo continuo del WAL en TALLER_RESPALDOS (una carpeta en Drive, por ejemplo)"""
+    db = init_connection()
+    carpeta = os.environ.get('TALLER_RESPALDOS')
+    if not db or not carpeta:
+        return None
+    try:
+        respaldos = Respaldos(db, carpeta)
+    except Exception as e:
+        st.warning(f"Respaldos desactivados: {e}")
+        return None
+    registrar_respaldos(respaldos)
+    return respaldos
+
+@st.cache_resource
+def init_exportaciones():
+    """Servidor de descargas en streaming (puerto 8502, conexiones propias de solo lectura)"""
+    try:
+        return ServidorExportaciones(conexion_sqlite_lectura('taller_automotriz.db'))
+    except Exception as e:
+        st.error(f"No se pudo iniciar el servidor de exportaciones: {e}")
+        return None
+
+@st.cache_resource
+def init_adjuntos():
+    """Almacén de fotos (carpeta TALLER_ADJUNTOS, por defecto adjuntos/) y su servidor (puerto 8503)"""
+    try:
+        return ServidorAdjuntos(AlmacenBlobs(os.environ.get('TALLER_ADJUNTOS', 'adjuntos')))
+    except Exception as e:
+        st.error(f"No se pudo iniciar el servidor de adjuntos: {e}")
+        return None
+
+@st.cache_resource
+def init_metricas():
+    """Endpoint /metrics para Prometheus (puerto 9108 o METRICAS_PUERTO)"""
+    try:
+        servidor = ServidorMetricas()
+    except Exception as e:
+        st.error(f"No se pudo iniciar el servidor de métricas: {e}")
+        return None
+    db = init_connection()
+    if db:
+        registrar_pool(db)
+        registrar_stock_bajo(lambda: _contar_stock_bajo(db))
+    return servidor
+
+def _contar_stock_bajo(db):
+    with db.lector() as conn:
+        return contar_stock_bajo(conn)
+
+def ejecutar_consulta(query, params=None, esquema=None):
+    """Ejecuta una consulta SQL con una conexión de lectura del pool (DataFrame tipado)
+
+    Va a la réplica si hay una al día y la sesión no escribió después de su último latido.
+    """
+    enrutador = init_enrutador()
+    if enrutador:
+        origen = enrutador.para_lectura(st.session_state)
         try:
-            if params:
-                result = pd.read_sql_query(query, conn, params=params)
-            else:
-                result = pd.read_sql_query(query, conn)
+            with medir_bd(esquema or 'consulta'), conexion_lectura(origen) as conn:
+                result = leer_tipado(conn, query, params, esquema)
             return result
         except Exception as e:
             st.error(f"Error ejecutando consulta: {e}")
             return pd.DataFrame()
-        finally:
-            conn.close()
     return pd.DataFrame()
 
+def ejecutar_listado(query, params=None, esquema=None):
+    """Como ejecutar_consulta, pero devuelve una tabla Arrow para pasar directo a st.dataframe
+
+    Para listados que solo se muestran: no se arma un DataFrame intermedio.
+    """
+    enrutador = init_enrutador()
+    if enrutador:
+        origen = enrutador.para_lectura(st.session_state)
+        try:
+            with medir_bd(esquema or 'listado'), conexion_lectura(origen) as conn:
+                return leer_arrow(conn, query, params, esquema)
+        except Exception as e:
+            st.error(f"Error ejecutando consulta: {e}")
+    return pa.table({})
+
 def ejecutar_comando(query, params=None):
-    """Ejecuta un comando SQL (INSERT, UPDATE, DELETE)"""
-    conn = init_connection()
-    if conn:
+    """Ejecuta un comando SQL (INSERT, UPDATE, DELETE) en el hilo escritor"""
+    db = init_connection()
+    if db:
         try:
-            cursor = conn.cursor()
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            conn.commit()
+            with medir_bd('comando'):
+                db.ejecutar(query, params)
+            init_enrutador().registrar_escritura(st.session_state)
             return True
         except Exception as e:
             st.error(f"Error ejecutando comando: {e}")
             return False
-        finally:
-            conn.close()
     return False
 
+def ejecutar_transaccion(funcion):
+    """Ejecuta funcion(conn) como una sola transacción del hilo escritor"""
+    db = init_connection()
+    if db:
+        try:
+            with medir_bd(funcion.__name__):
+                resultado = db.transaccion(funcion)
+            init_enrutador().registrar_escritura(st.session_state)
+            return resultado
+        except Exception as e:
+            st.error(f"Error ejecutando transacción: {e}")
+            return None
+    return None
+
+def buscar_clientes_df(texto, limite=10):
+    """Top-k clientes que coinciden con el texto (índice de búsqueda)"""
+    db = init_connection()
+    if db:
+        try:
+            with db.lector() as conn:
+                return pd.DataFrame(buscar_clientes(conn, texto, limite), columns=COLUMNAS_RESULTADO)
+        except Exception as e:
+            st.error(f"Error en la búsqueda: {e}")
+    return pd.DataFrame(columns=COLUMNAS_RESULTADO)
+
 def hash_password(password):
     """Hashea la contraseña"""
     return hashlib.sha256(str.encode(password)).hexdigest()
@@ -295,16 +288,45 @@ if 'authenticated' not in st.session_state:
     st.session_state.authenticated = False
 if 'user_type' not in st.session_state:
     st.session_state.user_type = None
+if 'sede_id' not in st.session_state:
+    st.session_state.sede_id = SEDE_PRINCIPAL
+if 'sede_fija' not in st.session_state:
+    st.session_state.sede_fija = False
+
+@cache_referencia('sedes', ttl=300)
+def obtener_sedes():
+    """Sedes activas (datos de referencia)"""
+    return ejecutar_consulta("SELECT * FROM Sedes WHERE activo = 1 ORDER BY id", esquema='sedes')
+
+def sede_actual():
+    """Datos de la sede elegida en la sesión (la principal si no se pueden leer)"""
+    sedes_df = obtener_sedes()
+    if not sedes_df.empty:
+        fila = sedes_df[sedes_df['id'] == st.session_state.sede_id]
+        if not fila.empty:
+            return fila.iloc[0].to_dict()
+    return {'id': SEDE_PRINCIPAL, 'nombre': 'San Isidro', 'direccion': 'Av. Petit Thouars 1234, San Isidro, Lima',
+            'telefono': '(01) 555-0123', 'latitud': -12.0986, 'longitud': -77.0428}
 
 # Sidebar de navegación
 def sidebar_navigation():
     st.sidebar.markdown("## 🔧 Taller Automotriz")
+    
+    # Los usuarios de una sede solo ven la suya
+    sedes_df = obtener_sedes()
+    if not st.session_state.sede_fija and len(sedes_df) > 1:
+        nombres = dict(zip(sedes_df['id'], sedes_df['nombre']))
+        ids = list(nombres)
+        st.session_state.sede_id = st.sidebar.selectbox(
+            "Sede:", ids, index=ids.index(st.session_state.sede_id) if st.session_state.sede_id in ids else 0,
+            format_func=nombres.get)
+    
     st.sidebar.markdown("### Navegación")
     
     pages = ['Inicio', 'Servicios', 'Agendar Cita']
     
     if st.session_state.authenticated and st.session_state.user_type == 'admin':
-        pages.extend(['Panel Admin', 'Clientes', 'Inventario'])
+        pages.extend(['Panel Admin', 'Clientes', 'Inventario', 'Mapa de Clientes'])
     
     selected_page = st.sidebar.selectbox("Ir a:", pages)
     
@@ -317,6 +339,7 @@ def sidebar_navigation():
         if st.sidebar.button("🚪 Cerrar Sesión"):
             st.session_state.authenticated = False
             st.session_state.user_type = None
+            st.session_state.sede_fija = False
             st.experimental_rerun()
     
     return selected_page
@@ -324,13 +347,14 @@ def sidebar_navigation():
 # Página de inicio
 def pagina_inicio():
     load_css()
+    sede = sede_actual()
     
-    st.markdown('<h1 class="main-header">🔧 Taller Automotriz San Isidro</h1>', unsafe_allow_html=True)
+    st.markdown(f'<h1 class="main-header">🔧 Taller Automotriz {sede["nombre"]}</h1>', unsafe_allow_html=True)
     
     col1, col2 = st.columns([2, 1])
     
     with col1:
-        st.markdown("""
+        st.markdown(f"""
         <div class="info-box">
         <h3>🚗 Bienvenido a nuestro taller</h3>
         <p>Somos especialistas en reparación y mantenimiento automotriz con más de 15 años de experiencia.</p>
@@ -343,8 +367,8 @@ def pagina_inicio():
         </ul>
         
         <h4>📍 Ubicación:</h4>
-        <p>Av. Petit Thouars 1234, San Isidro, Lima</p>
-        <p>📞 <strong>Teléfono:</strong> (01) 555-0123</p>
+        <p>{sede['direccion']}</p>
+        <p>📞 <strong>Teléfono:</strong> {sede['telefono']}</p>
         </div>
         """, unsafe_allow_html=True)
         
@@ -354,16 +378,20 @@ def pagina_inicio():
     
     with col2:
         st.markdown("### 📍 Nuestra Ubicación")
-        lat, lon = -12.0986, -77.0428
+        lat, lon = sede['latitud'], sede['longitud']
         m = folium.Map(location=[lat, lon], zoom_start=16)
-        folium.Marker([lat, lon], popup="Taller Automotriz San Isidro").add_to(m)
+        folium.Marker([lat, lon], popup=f"Taller Automotriz {sede['nombre']}").add_to(m)
         folium_static(m, width=400, height=300)
 
+@cache_referencia('servicios', ttl=300)
+def obtener_servicios():
+    """Servicios activos; se leen en cada rerun de Servicios y Agendar Cita"""
+    return ejecutar_consulta("SELECT * FROM Servicios WHERE activo = 1 ORDER BY nombre", esquema='servicios')
+
 def pagina_servicios():
     st.title("🛠️ Nuestros Servicios")
     
-    query = "SELECT * FROM Servicios WHERE activo = 1 ORDER BY nombre"
-    servicios_df = ejecutar_consulta(query)
+    servicios_df = obtener_servicios()
     
     if not servicios_df.empty:
         col1, col2 = st.columns(2)
@@ -377,6 +405,7 @@ def pagina_servicios():
 
 def pagina_agendar_cita():
     st.title("📅 Agendar Nueva Cita")
+    st.caption(f"📍 Sede {sede_actual()['nombre']}")
     
     with st.form("form_agendar_cita"):
         col1, col2 = st.columns(2)
@@ -396,7 +425,7 @@ def pagina_agendar_cita():
         with col2:
             st.subheader("Detalles de la Cita")
             
-            servicios_df = ejecutar_consulta("SELECT * FROM Servicios WHERE activo = 1")
+            servicios_df = obtener_servicios()
             if not servicios_df.empty:
                 servicio_options = dict(zip(servicios_df['nombre'], servicios_df['id']))
                 servicio_nombre = st.selectbox("Servicio solicitado *", options=list(servicio_options.keys()))
@@ -411,46 +440,45 @@ def pagina_agendar_cita():
         
         if submitted:
             if nombre and telefono and marca and modelo:
-                # Insertar cliente
-                cliente_query = """
-                INSERT INTO Clientes (nombre, telefono, email)
-                VALUES (?, ?, ?)
-                """
-                if ejecutar_comando(cliente_query, (nombre, telefono, email)):
-                    
-                    # Obtener ID del cliente
-                    cliente_id_query = "SELECT id FROM Clientes WHERE telefono = ? ORDER BY id DESC LIMIT 1"
-                    cliente_result = ejecutar_consulta(cliente_id_query, (telefono,))
-                    
-                    if not cliente_result.empty:
-                        cliente_id = cliente_result.iloc[0]['id']
-                        
-                        # Insertar vehículo
-                        vehiculo_query = """
-                        INSERT INTO Vehiculos (cliente_id, marca, modelo, año, placa)
-                        VALUES (?, ?, ?, ?, ?)
-                        """
-                        if ejecutar_comando(vehiculo_query, (cliente_id, marca, modelo, año, placa)):
-                            
-                            # Obtener ID del vehículo
-                            vehiculo_id_query = "SELECT id FROM Vehiculos WHERE cliente_id = ? ORDER BY id DESC LIMIT 1"
-                            vehiculo_result = ejecutar_consulta(vehiculo_id_query, (cliente_id,))
-                            
-                            if not vehiculo_result.empty:
-                                vehiculo_id = vehiculo_result.iloc[0]['id']
-                                
-                                # Crear cita
-                                datetime_cita = f"{fecha_cita} {hora_cita}:00"
-                                cita_query = """
-                                INSERT INTO Citas (cliente_id, vehiculo_id, servicio_id, fecha_hora, descripcion_problema)
-                                VALUES (?, ?, ?, ?, ?)
-                                """
-                                if ejecutar_comando(cita_query, (cliente_id, vehiculo_id, servicio_id, datetime_cita, descripcion)):
-                                    st.success("✅ Cita agendada exitosamente!")
-                                    st.balloons()
-                                else:
-                                    st.error("Error al crear la cita")
+                datetime_cita = f"{fecha_cita} {hora_cita}:00"
+                sede_id = int(st.session_state.sede_id)
+                
+                # Cliente, vehículo y cita en una sola transacción del escritor; si el
+                # horario ya está tomado (HorariosReservados) se deshace completa
+                def registrar_cita(conn):
+                    cliente_id = conn.execute(
+                        "INSERT INTO Clientes (nombre, telefono, email) VALUES (?, ?, ?)",
+                        (nombre, telefono, email)).lastrowid
+                    vehiculo_id = conn.execute(
+                        "INSERT INTO Vehiculos (cliente_id, marca, modelo, año, placa) VALUES (?, ?, ?, ?, ?)",
+                        (cliente_id, marca, modelo, año, placa)).lastrowid
+                    return insertar_cita(conn, cliente_id, vehiculo_id, servicio_id,
+                                         datetime_cita, descripcion, sede_id)
+                
+                # Un doble clic o un rerun con los mismos datos no crea otra cita
+                clave = clave_formulario(st.session_state, 'agendar_cita', nombre, telefono, email, marca,
+                                         modelo, año, placa, servicio_id, datetime_cita, descripcion, sede_id)
+                db = init_connection()
+                try:
+                    with medir_bd('registrar_cita'):
+                        _, repetido = una_vez(db, clave, registrar_cita)
+                    if repetido:
+                        RESERVAS.inc(resultado='repetida')
+                        st.info("ℹ️ Esta cita ya estaba registrada; no se creó otra.")
+                    else:
+                        init_enrutador().registrar_escritura(st.session_state)
+                        RESERVAS.inc(resultado='exito')
+                        st.success("✅ Cita agendada exitosamente!")
+                        st.balloons()
+                except Exception as e:
+                    if horario_ocupado(e):
+                        RESERVAS.inc(resultado='ocupado')
+                        st.warning(f"⏰ El horario {hora_cita} del {fecha_cita} ya está ocupado. Elija otro.")
+                    else:
+                        RESERVAS.inc(resultado='error')
+                        st.error(f"Error al crear la cita: {e}")
             else:
+                RESERVAS.inc(resultado='incompleta')
                 st.error("Complete todos los campos obligatorios (*)")
 
 def pagina_login():
@@ -469,41 +497,68 @@ def pagina_login():
             if submitted:
                 password_hash = hash_password(password)
                 query = "SELECT * FROM Usuarios WHERE username = ? AND password_hash = ? AND activo = 1"
-                user_result = ejecutar_consulta(query, (username, password_hash))
+                user_result = ejecutar_consulta(query, (username, password_hash), esquema='usuarios')
                 
                 if not user_result.empty:
                     st.session_state.authenticated = True
                     st.session_state.user_type = 'admin'
+                    # Usuario de una sede: queda fijo en ella; sin sede, elige en la barra lateral
+                    sede_usuario = user_result.iloc[0]['sede_id']
+                    st.session_state.sede_fija = not pd.isna(sede_usuario)
+                    if st.session_state.sede_fija:
+                        st.session_state.sede_id = int(sede_usuario)
                     st.success("✅ Inicio de sesión exitoso")
                     st.experimental_rerun()
                 else:
                     st.error("❌ Credenciales incorrectas")
 
+@cache_referencia('resumen_sede', ttl=30)
+def obtener_resumen_sede(sede_id):
+    """Indicadores del panel de una sede (caché propio por sede, 30 s; se lee de la réplica si hay)"""
+    enrutador = init_enrutador()
+    if not enrutador:
+        return None
+    # El caché es de todas las sesiones: después de invalidar la sede, el
+    # relleno (lo pida quien lo pida) lee como quien escribió, de la primaria
+    # hasta que la réplica tenga esa escritura
+    escritura = {CLAVE_SESION: obtener_resumen_sede.invalidado_en(sede_id)}
+    try:
+        with medir_bd('resumen_sede'):
+            return resumen_sede(enrutador.para_lectura(escritura), sede_id)
+    except Exception as e:
+        st.error(f"Error leyendo el resumen de la sede: {e}")
+        return None
+
+def obtener_ingresos_hoy(sede_id):
+    """Ingresos de las citas completadas hoy en la sede (una fila de IngresosPeriodo)"""
+    try:
+        with medir_bd('ingresos_del_dia'):
+            return ingresos_del_dia(init_enrutador().para_lectura(st.session_state), sede_id)[1]
+    except Exception as e:
+        st.error(f"Error leyendo los ingresos del día: {e}")
+        return 0.0
+
 def panel_admin():
+    sede = sede_actual()
+    sede_id = int(sede['id'])
     st.title("👨‍💼 Panel de Administración")
+    st.caption(f"📍 Sede {sede['nombre']}")
     
-    # Métricas
+    # Métricas (solo las filas de la sede)
     col1, col2, col3, col4 = st.columns(4)
-    
-    # Obtener métricas de la BD
-    citas_hoy = ejecutar_consulta("SELECT COUNT(*) as total FROM Citas WHERE DATE(fecha_hora) = DATE('now')")
-    clientes_activos = ejecutar_consulta("SELECT COUNT(*) as total FROM Clientes WHERE activo = 1")
-    items_bajo_stock = ejecutar_consulta("SELECT COUNT(*) as total FROM Inventario WHERE stock_actual <= stock_minimo")
+    resumen = obtener_resumen_sede(sede_id) or {}
     
     with col1:
-        total_citas = citas_hoy.iloc[0]['total'] if not citas_hoy.empty else 0
-        st.metric("📅 Citas Hoy", total_citas)
+        st.metric("📅 Citas Hoy", resumen.get('citas_dia', 0))
     
     with col2:
-        total_clientes = clientes_activos.iloc[0]['total'] if not clientes_activos.empty else 0
-        st.metric("👥 Clientes", total_clientes)
+        st.metric("👥 Clientes", resumen.get('clientes', 0))
     
     with col3:
-        st.metric("💰 Ingresos Hoy", "S/. 1,250")
+        st.metric("💰 Ingresos Hoy", f"S/. {obtener_ingresos_hoy(sede_id):,.2f}")
     
     with col4:
-        items_stock = items_bajo_stock.iloc[0]['total'] if not items_bajo_stock.empty else 0
-        st.metric("📦 Stock Bajo", items_stock)
+        st.metric("📦 Stock Bajo", resumen.get('stock_bajo', 0))
     
     st.markdown("---")
     
@@ -518,30 +573,298 @@ def panel_admin():
         v.modelo,
         s.nombre as servicio,
         c.fecha_hora,
-        c.estado
+        c.estado,
+        c.version
     FROM Citas c
     JOIN Clientes cl ON c.cliente_id = cl.id
     JOIN Vehiculos v ON c.vehiculo_id = v.id
     JOIN Servicios s ON c.servicio_id = s.id
-    WHERE DATE(c.fecha_hora) = DATE('now')
+    WHERE c.sede_id = ?
+    AND c.fecha_hora >= ? AND c.fecha_hora < ?
     ORDER BY c.fecha_hora
     """
     
-    citas_df = ejecutar_consulta(citas_query)
+    # Rango del día en lugar de DATE(c.fecha_hora): así usa IX_Citas_Sede_FechaHora
+    hoy = date.today()
+    citas_df = ejecutar_consulta(citas_query, (sede_id, hoy.strftime('%Y-%m-%d'),
+                                               (hoy + timedelta(days=1)).strftime('%Y-%m-%d')),
+                                 esquema='citas')
+    # Versiones que el usuario tenía en pantalla antes de este rerun (control optimista)
+    versiones_vistas = st.session_state.get('versiones_citas', {})
     if not citas_df.empty:
-        st.dataframe(citas_df, use_container_width=True)
+        st.session_state.versiones_citas = dict(zip(citas_df['id'].tolist(), citas_df['version'].tolist()))
+        st.dataframe(citas_df.drop(columns='version'), use_container_width=True)
+        
+        # Cada cambio queda en CitasHistorialEstado (trigger de la migración 0006)
+        with st.form("cambiar_estado_cita"):
+            col1, col2 = st.columns(2)
+            with col1:
+                cita_id = st.selectbox("Cita", citas_df['id'].tolist(),
+                                       format_func=lambda i: f"#{i} — " + citas_df.loc[citas_df['id'] == i, 'cliente'].iloc[0])
+            with col2:
+                nuevo_estado = st.selectbox("Nuevo estado", ESTADO_CITA.categories.tolist())
+            if st.form_submit_button("Actualizar estado"):
+                try:
+                    with medir_bd('actualizar_estado_cita'):
+                        version = actualizar_estado_cita(init_connection(), cita_id, nuevo_estado,
+                                                         versiones_vistas.get(int(cita_id)))
+                    init_enrutador().registrar_escritura(st.session_state)
+                    if version is not None:
+                        # citas_df se leyó antes del cambio: el siguiente parte de la versión nueva
+                        st.session_state.versiones_citas[int(cita_id)] = version
+                        obtener_resumen_sede.invalidar(sede_id)
+                        st.success("✅ Estado actualizado")
+                    else:
+                        st.warning("La cita cambió mientras la editaba; revise su estado actual y vuelva a intentarlo")
+                except Exception as e:
+                    st.error(f"Error actualizando el estado: {e}")
+        
+        seccion_adjuntar_fotos(citas_df)
+        
+        # Al completar, los triggers de la migración 0009 descuentan los repuestos del servicio
+        if (citas_df['estado'] == 'En Proceso').any():
+            if st.button("✅ Completar todas las citas en proceso de hoy"):
+                db = init_connection()
+                try:
+                    completadas = completar_dia(db, sede_id=sede_id)
+                    init_enrutador().registrar_escritura(st.session_state)
+                    obtener_resumen_sede.invalidar(sede_id)
+                    st.success(f"✅ {completadas} citas completadas y repuestos descontados")
+                except Exception as e:
+                    st.error(f"No se completó ninguna cita: {e}")
+                    columnas, filas = faltantes(db, sede_id=sede_id)
+                    if filas:
+                        st.dataframe(a_dataframe(columnas, filas), use_container_width=True)
     else:
         st.info("No hay citas programadas para hoy")
+    
+    st.markdown("---")
+    seccion_listado_citas(sede_id)
+    
+    st.markdown("---")
+    seccion_ingresos(sede_id)
+    
+    st.markdown("---")
+    seccion_comprobantes(sede_id)
+    
+    st.markdown("---")
+    seccion_tiempos_estado()
+    
+    st.markdown("---")
+    seccion_proximos_servicios()
+    
+    st.markdown("---")
+    seccion_exportar(sede_id)
+
+def seccion_ingresos(sede_id):
+    """Ingresos del rango al grano que entra en el gráfico (hora, día, semana o mes)"""
+    st.subheader("📈 Ingresos")
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        desde = st.date_input("Desde", value=date.today() - timedelta(days=90), key="ingresos_desde")
+    with col2:
+        hasta = st.date_input("Hasta", value=date.today(), key="ingresos_hasta")
+    with col3:
+        todas = st.checkbox("Todas las sedes", key="ingresos_todas")
+    try:
+        with medir_bd('serie_ingresos'):
+            grano, serie = serie_ingresos(init_enrutador().para_lectura(st.session_state), desde, hasta,
+                                          sede_id=None if todas else sede_id)
+    except Exception as e:
+        st.error(f"Error leyendo los ingresos: {e}")
+        return
+    st.plotly_chart(grafico_ingresos(grano, serie), use_container_width=True)
+    st.caption(f"{len(serie):,} puntos · {int(serie['citas'].sum()):,} citas completadas · "
+               f"S/. {serie['ingresos'].sum():,.2f}")
+
+def seccion_adjuntar_fotos(citas_df):
+    """Fotos de ingreso o inspección para una cita de hoy (van al almacén de adjuntos)"""
+    servidor = init_adjuntos()
+    if not servidor:
+        return
+    with st.form("adjuntar_fotos", clear_on_submit=True):
+        col1, col2 = st.columns(2)
+        with col1:
+            cita_id = st.selectbox("Cita", citas_df['id'].tolist(), key="foto_cita",
+                                   format_func=lambda i: f"#{i} — " + citas_df.loc[citas_df['id'] == i, 'cliente'].iloc[0])
+        with col2:
+            tipo = st.selectbox("Tipo de foto", TIPOS_ADJUNTO, format_func=str.capitalize)
+        archivos = st.file_uploader("Fotos", type=['jpg', 'jpeg', 'png', 'webp'], accept_multiple_files=True)
+        if st.form_submit_button("📷 Adjuntar fotos") and archivos:
+            try:
+                with medir_bd('adjuntar'):
+                    for archivo in archivos:
+                        adjuntar(init_connection(), servidor.almacen, archivo, archivo.name, archivo.type,
+                                 cita_id=int(cita_id), tipo=tipo)
+                init_enrutador().registrar_escritura(st.session_state)
+                st.success(f"✅ {len(archivos)} fotos adjuntadas a la cita #{cita_id}")
+            except Exception as e:
+                st.error(f"Error adjuntando fotos: {e}")
+
+def seccion_fotos_historial(cita_ids, por_pagina=5):
+    """Miniaturas de las citas de una página del historial (las demás no se piden)"""
+    servidor = init_adjuntos()
+    if not servidor or not cita_ids:
+        return
+    paginas = (len(cita_ids) + por_pagina - 1) // por_pagina
+    pagina = 1
+    if paginas > 1:
+        pagina = st.number_input(f"Página de fotos (de {paginas})", min_value=1, max_value=paginas, value=1)
+    visibles = cita_ids[(pagina - 1) * por_pagina:pagina * por_pagina]
+    try:
+        columnas, filas = adjuntos_de_citas(init_enrutador().para_lectura(st.session_state), visibles)
+    except Exception as e:
+        st.error(f"Error leyendo fotos: {e}")
+        return
+    if not filas:
+        st.caption("Las citas de esta página no tienen fotos")
+        return
+    # El navegador pide las miniaturas al servidor de adjuntos; se generan la primera vez
+    celdas = st.columns(4)
+    for i, fila in enumerate(filas):
+        adjunto = dict(zip(columnas, fila))
+        with celdas[i % 4]:
+            st.image(servidor.url_miniatura(adjunto['sha256']),
+                     caption=f"Cita #{adjunto['cita_id']} · {adjunto['tipo']}")
+            st.markdown(f"[Ver original]({servidor.url(adjunto['sha256'], adjunto['tipo_contenido'])})")
+
+def seccion_listado_citas(sede_id):
+    """Citas de la sede en un rango (incluye las archivadas si el rango las alcanza)"""
+    st.subheader("🗂️ Listado de Citas")
+    col1, col2 = st.columns(2)
+    with col1:
+        desde = st.date_input("Desde", value=date.today() - timedelta(days=30), key="listado_citas_desde")
+    with col2:
+        hasta = st.date_input("Hasta", value=date.today(), key="listado_citas_hasta")
+    try:
+        with medir_bd('sp_obtener_citas'):
+            # Tabla Arrow directo a st.dataframe (sin DataFrame intermedio)
+            citas = obtener_citas(init_enrutador().para_lectura(st.session_state),
+                                  fecha_inicio=desde, fecha_fin=hasta, sede_id=sede_id, arrow=True)
+    except Exception as e:
+        st.error(f"Error leyendo citas: {e}")
+        return
+    if citas.num_rows:
+        st.caption(f"{citas.num_rows:,} citas")
+        st.dataframe(citas, use_container_width=True)
+    else:
+        st.info("No hay citas en ese rango")
+
+def seccion_comprobantes(sede_id):
+    """Comprobantes (HTML y PDF) de las citas completadas del día, servidos desde el almacén de adjuntos"""
+    st.subheader("🧾 Comprobantes")
+    servidor = init_adjuntos()
+    db = init_connection()
+    if not servidor or not db:
+        return
+    dia = st.date_input("Día", value=date.today(), key="comprobantes_dia")
+    if st.button("Generar comprobantes del día"):
+        try:
+            # Solo se generan las citas nuevas o que cambiaron desde su último comprobante
+            with medir_bd('facturar'):
+                resumen = facturar(db, servidor.almacen, dia, sede_id)
+            st.success(f"✅ {resumen['generados']} generados, {resumen['sin_cambios']} sin cambios "
+                       f"({resumen['segundos']:.1f} s)")
+        except Exception as e:
+            st.error(f"Error generando los comprobantes: {e}")
+    try:
+        columnas, filas = comprobantes_del_dia(init_enrutador().para_lectura(st.session_state), dia, sede_id)
+    except Exception as e:
+        st.error(f"Error leyendo los comprobantes: {e}")
+        return
+    if not filas:
+        st.info("No hay comprobantes generados para ese día")
+        return
+    comprobantes = pd.DataFrame(filas, columns=columnas)
+    comprobantes['HTML'] = [servidor.url(sha256, TIPO_HTML) for sha256 in comprobantes['sha256_html']]
+    comprobantes['PDF'] = [servidor.url(sha256, TIPO_PDF) for sha256 in comprobantes['sha256_pdf']]
+    st.dataframe(comprobantes.drop(columns=['sha256_html', 'sha256_pdf']), use_container_width=True,
+                 column_config={'HTML': st.column_config.LinkColumn(display_text="Ver"),
+                                'PDF': st.column_config.LinkColumn(display_text="Descargar")})
+
+@a_lo_sumo_cada('tiempos_estado', 60)
+def refrescar_tiempos_estado(destino):
+    """Suma al agregado los cambios de estado nuevos, como mucho una vez por minuto (no en cada rerun)"""
+    return actualizar_tiempos_estado(destino)
+
+def seccion_tiempos_estado():
+    """Promedio y p90 del tiempo en cada estado por servicio (agregado incremental)"""
+    st.subheader("⏱️ Tiempo en Cada Estado (últimos 30 días)")
+    db = init_connection()
+    if not db:
+        return
+    try:
+        # Solo procesa los cambios de estado posteriores a la última actualización
+        refrescar_tiempos_estado(db)
+        resumen = resumen_tiempos(db, desde=date.today() - timedelta(days=30))
+    except Exception as e:
+        st.error(f"Error calculando tiempos por estado: {e}")
+        return
+    if resumen.empty:
+        st.info("Todavía no hay cambios de estado registrados")
+    else:
+        st.dataframe(resumen, use_container_width=True)
+        st.caption("Se actualiza como mucho una vez por minuto.")
+
+@a_lo_sumo_cada('predicciones', 300)
+def refrescar_predicciones(destino):
+    """Recalcula las predicciones de los vehículos con servicios nuevos, como mucho cada 5 minutos"""
+    return actualizar_predicciones(destino)
+
+def seccion_proximos_servicios():
+    """Vehículos cuyo próximo servicio preventivo vence en los próximos 30 días"""
+    st.subheader("🔮 Próximos Servicios Preventivos (30 días)")
+    db = init_connection()
+    if not db:
+        return
+    try:
+        # Solo recalcula los vehículos con citas completadas desde la última vez
+        refrescar_predicciones(db)
+        columnas, filas = proximos_servicios(db, dias=30)
+    except Exception as e:
+        st.error(f"Error calculando próximos servicios: {e}")
+        return
+    if filas:
+        st.dataframe(a_dataframe(columnas, filas), use_container_width=True)
+        st.caption("Se recalcula como mucho cada 5 minutos.")
+    else:
+        st.info("No hay servicios preventivos previstos para los próximos 30 días")
+
+def seccion_exportar(sede_id):
+    """Enlaces de descarga firmados (CSV/XLSX/Parquet) servidos en streaming, de la sede por defecto"""
+    st.subheader("📤 Exportar Datos")
+    servidor = init_exportaciones()
+    if not servidor:
+        return
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        exportacion = st.selectbox("Datos", sorted(EXPORTACIONES))
+    with col2:
+        formato = st.selectbox("Formato", formatos_disponibles())
+    with col3:
+        desde = st.date_input("Desde", value=None)
+    with col4:
+        hasta = st.date_input("Hasta", value=None)
+    toda_la_cadena = st.checkbox("Todas las sedes", key='exportar_cadena')
+    
+    st.link_button(f"⬇️ Descargar {exportacion}.{formato}",
+                   servidor.url(exportacion, formato, desde, hasta, None if toda_la_cadena else sede_id))
+    st.caption("El enlace vence en 10 minutos. La descarga empieza de inmediato aunque el rango sea grande.")
 
 def pagina_inventario():
+    sede = sede_actual()
+    sede_id = int(sede['id'])
     st.title("📦 Gestión de Inventario")
+    st.caption(f"📍 Stock de la sede {sede['nombre']}")
     
-    tab1, tab2, tab3 = st.tabs(["Ver Inventario", "Agregar Item", "Stock Bajo"])
+    tab1, tab2, tab3, tab4 = st.tabs(["Ver Inventario", "Agregar Item", "Stock Bajo", "Movimientos"])
     
     with tab1:
-        inventario_df = ejecutar_consulta("SELECT * FROM Inventario WHERE activo = 1 ORDER BY nombre")
-        if not inventario_df.empty:
-            st.dataframe(inventario_df, use_container_width=True)
+        inventario = ejecutar_listado("SELECT * FROM Inventario WHERE sede_id = ? AND activo = 1 ORDER BY nombre",
+                                      (sede_id,), esquema='inventario')
+        if inventario.num_rows:
+            st.dataframe(inventario, use_container_width=True)
     
     with tab2:
         with st.form("form_inventario"):
@@ -561,106 +884,203 @@ def pagina_inventario():
             if st.form_submit_button("Agregar Item"):
                 if nombre and categoria and precio > 0:
                     query = """
-                    INSERT INTO Inventario (nombre, categoria, stock_actual, stock_minimo, precio_unitario, proveedor)
-                    VALUES (?, ?, ?, ?, ?, ?)
+                    INSERT INTO Inventario (nombre, categoria, stock_actual, stock_minimo, precio_unitario, proveedor, sede_id)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
                     """
-                    if ejecutar_comando(query, (nombre, categoria, stock_inicial, stock_minimo, precio, proveedor)):
-                        st.success("✅ Item agregado exitosamente")
-                        st.experimental_rerun()
+                    params = (nombre, categoria, stock_inicial, stock_minimo, precio, proveedor, sede_id)
+                    clave = clave_formulario(st.session_state, 'agregar_item', *params)
+                    
+                    def agregar_item(conn):
+                        return conn.execute(query, params).lastrowid
+                    
+                    try:
+                        with medir_bd('agregar_item'):
+                            _, repetido = una_vez(init_connection(), clave, agregar_item)
+                    except Exception as e:
+                        st.error(f"Error ejecutando comando: {e}")
+                    else:
+                        if repetido:
+                            st.info(f"ℹ️ El item '{nombre}' ya estaba agregado; no se creó otro.")
+                        else:
+                            init_enrutador().registrar_escritura(st.session_state)
+                            obtener_resumen_sede.invalidar(sede_id)
+                            st.success("✅ Item agregado exitosamente")
+                            st.experimental_rerun()
     
     with tab3:
-        stock_bajo_df = ejecutar_consulta("SELECT * FROM Inventario WHERE stock_actual <= stock_minimo AND activo = 1")
-        if not stock_bajo_df.empty:
-            st.warning(f"⚠️ Hay {len(stock_bajo_df)} items con stock bajo:")
-            st.dataframe(stock_bajo_df, use_container_width=True)
+        stock_bajo = ejecutar_listado("SELECT * FROM Inventario WHERE sede_id = ? AND stock_actual <= stock_minimo AND activo = 1",
+                                      (sede_id,), esquema='inventario')
+        if stock_bajo.num_rows:
+            st.warning(f"⚠️ Hay {stock_bajo.num_rows} items con stock bajo:")
+            st.dataframe(stock_bajo, use_container_width=True)
         else:
             st.success("✅ Todos los items tienen stock suficiente")
+        
+        seccion_pedido_sugerido(sede_id)
+    
+    with tab4:
+        seccion_movimientos(sede_id)
+
+def seccion_movimientos(sede_id):
+    """Entradas y salidas de la sede (incluye el archivo si el rango lo alcanza)"""
+    col1, col2 = st.columns(2)
+    with col1:
+        desde = st.date_input("Desde", value=date.today() - timedelta(days=30), key="movimientos_desde")
+    with col2:
+        hasta = st.date_input("Hasta", value=date.today(), key="movimientos_hasta")
+    try:
+        with medir_bd('sp_obtener_movimientos_inventario'):
+            # Tabla Arrow directo a st.dataframe (sin DataFrame intermedio)
+            movimientos = obtener_movimientos(init_enrutador().para_lectura(st.session_state),
+                                              fecha_inicio=desde, fecha_fin=hasta, sede_id=sede_id, arrow=True)
+    except Exception as e:
+        st.error(f"Error leyendo movimientos: {e}")
+        return
+    if movimientos.num_rows:
+        st.caption(f"{movimientos.num_rows:,} movimientos")
+        st.dataframe(movimientos, use_container_width=True)
+    else:
+        st.info("No hay movimientos en ese rango")
+
+def seccion_pedido_sugerido(sede_id):
+    """Puntos de reorden calculados del historial y pedido sugerido por proveedor"""
+    st.markdown("---")
+    st.subheader("🛒 Pedido Sugerido")
+    db = init_connection()
+    if not db:
+        return
+    if st.button("🔄 Recalcular puntos de reorden"):
+        try:
+            # Copia el punto de reorden a stock_minimo de los items con historial
+            actualizar_puntos_reorden(db)
+            st.success("✅ Puntos de reorden actualizados")
+        except Exception as e:
+            st.error(f"Error calculando puntos de reorden: {e}")
+    try:
+        columnas, filas = pedido_sugerido(db, sede_id)
+    except Exception as e:
+        st.error(f"Error armando el pedido: {e}")
+        return
+    if filas:
+        pedido_df = a_dataframe(columnas, filas)
+        st.dataframe(pedido_df, use_container_width=True)
+        st.metric("Total del pedido", f"S/. {pedido_df['costo_total'].sum():,.2f}")
+    else:
+        st.info("No hace falta pedir nada por ahora")
 
 def pagina_clientes():
     st.title("👥 Gestión de Clientes")
     
-    clientes_query = """
-    SELECT 
-        c.id,
-        c.nombre,
-        c.telefono,
-        c.email,
-        c.fecha_registro,
-        COUNT(v.id) as total_vehiculos,
-        COUNT(ct.id) as total_citas
-    FROM Clientes c
-    LEFT JOIN Vehiculos v ON c.id = v.cliente_id
-    LEFT JOIN Citas ct ON c.id = ct.cliente_id
-    WHERE c.activo = 1
-    GROUP BY c.id, c.nombre, c.telefono, c.email, c.fecha_registro
-    ORDER BY c.nombre
-    """
+    # Sin listado completo: el detalle se abre buscando en el índice (top-k), no recorriendo Clientes
+    st.subheader("Detalle del Cliente")
+    texto_busqueda = st.text_input("Buscar cliente (nombre, teléfono, email, placa, marca o modelo):")
     
-    clientes_df = ejecutar_consulta(clientes_query)
-    if not clientes_df.empty:
-        st.dataframe(clientes_df, use_container_width=True)
+    resultados_df = buscar_clientes_df(texto_busqueda) if texto_busqueda else pd.DataFrame()
+    if texto_busqueda and resultados_df.empty:
+        st.info("No se encontraron clientes")
+    
+    cliente_id = None
+    if not resultados_df.empty:
+        opciones = {
+            f"#{fila['id']} {fila['nombre']} — {fila['telefono']}" + (f" — {fila['placa']}" if fila['placa'] else ""): int(fila['id'])
+            for _, fila in resultados_df.iterrows()
+        }
+        cliente_seleccionado = st.selectbox("Seleccionar cliente:", options=list(opciones.keys()))
+        cliente_id = opciones[cliente_seleccionado]
+    
+    if cliente_id:
+        # Vehículos del cliente
+        vehiculos_query = "SELECT * FROM Vehiculos WHERE cliente_id = ?"
+        vehiculos_df = ejecutar_consulta(vehiculos_query, (cliente_id,), esquema='vehiculos')
         
-        # Detalle del cliente seleccionado
-        st.subheader("Detalle del Cliente")
-        cliente_seleccionado = st.selectbox("Seleccionar cliente:", 
-                                          options=clientes_df['nombre'].tolist())
+        if not vehiculos_df.empty:
+            st.write("**Vehículos:**")
+            st.dataframe(vehiculos_df[['marca', 'modelo', 'año', 'placa']], use_container_width=True)
         
-        if cliente_seleccionado:
-            cliente_id = clientes_df[clientes_df['nombre'] == cliente_seleccionado]['id'].iloc[0]
-            
-            # Vehículos del cliente
-            vehiculos_query = "SELECT * FROM Vehiculos WHERE cliente_id = ?"
-            vehiculos_df = ejecutar_consulta(vehiculos_query, (cliente_id,))
-            
-            if not vehiculos_df.empty:
-                st.write("**Vehículos:**")
-                st.dataframe(vehiculos_df[['marca', 'modelo', 'año', 'placa']], use_container_width=True)
-            
-            # Historial de citas
-            citas_query = """
-            SELECT 
-                c.fecha_hora,
-                s.nombre as servicio,
-                c.estado,
-                c.costo_total
-            FROM Citas c
-            JOIN Servicios s ON c.servicio_id = s.id
-            WHERE c.cliente_id = ?
-            ORDER BY c.fecha_hora DESC
-            """
-            citas_cliente_df = ejecutar_consulta(citas_query, (cliente_id,))
-            
-            if not citas_cliente_df.empty:
-                st.write("**Historial de Citas:**")
-                st.dataframe(citas_cliente_df, use_container_width=True)
+        # Historial de citas (incluye las archivadas)
+        columnas, filas = obtener_citas(init_connection(), cliente_id=cliente_id)
+        citas_cliente_df = a_dataframe(columnas, filas, 'citas').sort_values('fecha_hora', ascending=False)
+        
+        if not citas_cliente_df.empty:
+            st.write("**Historial de Citas:**")
+            st.dataframe(citas_cliente_df[['fecha_hora', 'servicio', 'estado', 'costo_total']],
+                         use_container_width=True)
+            st.write("**Fotos:**")
+            seccion_fotos_historial(citas_cliente_df['id'].tolist())
+
+@cache_referencia('mapa_clientes', ttl=300)
+def obtener_mapa_clientes(nivel):
+    """Clientes agregados por distrito o celda (caché 5 min); antes ubica a los clientes nuevos o con dirección cambiada"""
+    db = init_connection()
+    if not db:
+        return None
+    try:
+        with medir_bd('mapa_clientes'):
+            # Con TALLER_NOMENCLATOR suma los lugares del CSV (se relee junto con la caché)
+            actualizar_ubicaciones(db, nomenclator_desde())
+            return agregado_clientes(db, nivel)
+    except Exception as e:
+        st.error(f"Error armando el mapa de clientes: {e}")
+        return None
+
+def pagina_mapa_clientes():
+    st.title("🗺️ Mapa de Clientes")
+    
+    etiquetas = {'distrito': 'Distrito', 'celda': 'Celda (~2 km)'}
+    nivel = st.radio("Agrupar por:", NIVELES, format_func=etiquetas.get, horizontal=True)
+    resultado = obtener_mapa_clientes(nivel)
+    if not resultado:
+        return
+    puntos, sin_ubicar = resultado
+    if not puntos:
+        st.info("No hay clientes con dirección reconocida")
+        return
+    
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Clientes ubicados", f"{sum(p['clientes'] for p in puntos):,}")
+    col2.metric("Sin ubicar", f"{sin_ubicar:,}")
+    col3.metric("Zonas", len(puntos))
+    
+    # Un marcador por zona: el navegador no recibe un punto por cliente
+    folium_static(mapa_clientes(puntos), width=900, height=550)
+    
+    st.dataframe(pd.DataFrame(puntos)[['nombre', 'clientes']], use_container_width=True)
 
 # Función principal
 def main():
+    init_metricas()
+    init_respaldos()
+    inicio = time.perf_counter()
     load_css()
     
     # Obtener página seleccionada
     selected_page = sidebar_navigation()
     
-    # Routing
-    if selected_page == 'Login':
-        pagina_login()
-    elif selected_page == 'Inicio':
-        pagina_inicio()
-    elif selected_page == 'Servicios':
-        pagina_servicios()
-    elif selected_page == 'Agendar Cita':
-        pagina_agendar_cita()
-    elif selected_page == 'Panel Admin' and st.session_state.authenticated:
-        panel_admin()
-    elif selected_page == 'Inventario' and st.session_state.authenticated:
-        pagina_inventario()
-    elif selected_page == 'Clientes' and st.session_state.authenticated:
-        pagina_clientes()
-    elif selected_page in ['Panel Admin', 'Clientes', 'Inventario'] and not st.session_state.authenticated:
-        st.warning("🔐 Debe iniciar sesión para acceder a esta sección")
-        pagina_login()
-    else:
-        pagina_inicio()
+    try:
+        # Routing
+        if selected_page == 'Login':
+            pagina_login()
+        elif selected_page == 'Inicio':
+            pagina_inicio()
+        elif selected_page == 'Servicios':
+            pagina_servicios()
+        elif selected_page == 'Agendar Cita':
+            pagina_agendar_cita()
+        elif selected_page == 'Panel Admin' and st.session_state.authenticated:
+            panel_admin()
+        elif selected_page == 'Inventario' and st.session_state.authenticated:
+            pagina_inventario()
+        elif selected_page == 'Clientes' and st.session_state.authenticated:
+            pagina_clientes()
+        elif selected_page == 'Mapa de Clientes' and st.session_state.authenticated:
+            pagina_mapa_clientes()
+        elif selected_page in ['Panel Admin', 'Clientes', 'Inventario', 'Mapa de Clientes'] and not st.session_state.authenticated:
+            st.warning("🔐 Debe iniciar sesión para acceder a esta sección")
+            pagina_login()
+        else:
+            pagina_inicio()
+    finally:
+        registrar_rerun(selected_page, time.perf_counter() - inicio)
 
 if __name__ == "__main__":
     main()
@@ -688,6 +1108,8 @@ def create_tunnel():
 print("🚀 Instrucciones finales:")
 print("1. Ejecuta: !streamlit run app.py --server.port 8501 &")
 print("2. En otra celda ejecuta: !lt --port 8501")
+print("   (exportaciones: !lt --port 8502 y definir EXPORTACIONES_URL_BASE con esa URL)")
+print("   (fotos: !lt --port 8503 y definir ADJUNTOS_URL_BASE con esa URL)")
 print("3. Usa la URL proporcionada por localtunnel para acceder a la aplicación")
 print()
 print("📋 Credenciales de prueba:")
@@ -731,7 +1153,8 @@ print("""
 
 6. LIMITACIONES EN COLAB:
    - Base de datos en memoria (se reinicia al cerrar)
-   - Sin persistencia entre sesiones
+   - Sin persistencia entre sesiones (salvo con TALLER_RESPALDOS en una
+     carpeta de Drive: python respaldos.py --restaurar recupera la base)
    - Requiere túnel para acceso externo
 
 7. PARA PRODUCCIÓN:
@@ -0,0 +1,358 @@
+# ========================================
+# RESERVAS Y STOCK CON ESCRITURAS SIMULTÁNEAS
+# Taller Automotriz - Sistema de Gestión
+# ========================================
+
+"""
+Reservar horarios, mover stock y cambiar el estado de una cita sin carreras
+cuando varias sesiones escriben a la vez (migración de concurrencia).
+
+- Reservas: la clave primaria de HorariosReservados (sede + fecha_hora) deja
+  entrar solo una de dos reservas simultáneas; no hay consulta previa que
+  pueda quedar vieja ni bloqueos SERIALIZABLE.
+- Stock: un único UPDATE condicional (stock_actual >= cantidad) descuenta y
+  comprueba a la vez; además el stock no puede bajar de 0.
+- Estado de cita: control optimista con Citas.version; si otro cambió la
+  cita desde que se leyó, la actualización no se aplica.
+
+Uso:
+    cita_id = reservar_cita(db, cliente_id, vehiculo_id, servicio_id, '2025-03-10 09:00:00')
+    mover_stock(db, inventario_id=3, tipo_movimiento='SALIDA', cantidad=2)
+    version = actualizar_estado_cita(db, cita_id, 'Confirmado', version)
+    python concurrencia.py --estres 16
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import warnings
+
+from bd_sqlite import en_transaccion
+from migraciones import motor_de
+from sedes import SEDE_PRINCIPAL
+
+HORARIO_OCUPADO = 'Ya existe una cita en esa fecha y hora'
+CITA_MODIFICADA = 'La cita fue modificada por otro usuario'
+STOCK_INSUFICIENTE = 'Stock insuficiente'
+TIPOS_MOVIMIENTO = ('ENTRADA', 'SALIDA')
+
+_INSERTAR_CITA = """
+INSERT INTO Citas (cliente_id, vehiculo_id, servicio_id, fecha_hora, descripcion_problema, sede_id)
+VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+# Lee y escribe en la misma sentencia: dos SALIDAs no venden las mismas unidades
+_MOVER_STOCK = """
+UPDATE Inventario
+SET stock_actual = stock_actual + ?, fecha_actualizacion = CURRENT_TIMESTAMP
+WHERE id = ? AND activo = 1 AND (? = 'ENTRADA' OR stock_actual >= ?)
+"""
+
+_ACTUALIZAR_ESTADO = """
+UPDATE Citas
+SET estado = ?, fecha_actualizacion = CURRENT_TIMESTAMP
+WHERE id = ? AND (? IS NULL OR version = ?)
+"""
+
+
+def horario_ocupado(error):
+    """True si el error de la base es el de un horario ya reservado"""
+    return 'HorariosReservados' in str(error)
+
+
+def insertar_cita(conn, cliente_id, vehiculo_id, servicio_id, fecha_hora, descripcion=None,
+                  sede_id=SEDE_PRINCIPAL):
+    """INSERT de la cita dentro de una transacción en curso (SQLite)
+
+    Lanza sqlite3.IntegrityError si el horario está ocupado (ver horario_ocupado).
+    """
+    return conn.execute(_INSERTAR_CITA, (int(cliente_id), int(vehiculo_id), int(servicio_id),
+                                         fecha_hora, descripcion, int(sede_id))).lastrowid
+
+
+def reservar_cita(destino, cliente_id, vehiculo_id, servicio_id, fecha_hora, descripcion=None,
+                  sede_id=SEDE_PRINCIPAL):
+    """Crea la cita y devuelve su id, o None si el horario ya está tomado"""
+    if motor_de(destino) == 'sqlserver':
+        cursor = destino.cursor()
+        try:
+            cursor.execute("EXEC sp_crear_cita @cliente_id = ?, @vehiculo_id = ?, @servicio_id = ?, "
+                           "@fecha_hora = ?, @descripcion_problema = ?, @sede_id = ?",
+                           (int(cliente_id), int(vehiculo_id), int(servicio_id), fecha_hora,
+                            descripcion, int(sede_id)))
+            cita_id, mensaje = cursor.fetchone()
+            destino.commit()
+        except Exception:
+            destino.rollback()
+            raise
+        if cita_id:
+            return int(cita_id)
+        if mensaje == HORARIO_OCUPADO:
+            return None
+        raise RuntimeError(mensaje)
+
+    try:
+        return en_transaccion(destino, lambda conn: insertar_cita(
+            conn, cliente_id, vehiculo_id, servicio_id, fecha_hora, descripcion, sede_id))
+    except sqlite3.IntegrityError as e:
+        if horario_ocupado(e):
+            return None
+        raise
+
+
+def mover_stock(destino, inventario_id, tipo_movimiento, cantidad, motivo=None, usuario_id=None):
+    """Registra una ENTRADA o SALIDA; devuelve False si una SALIDA no tiene stock suficiente"""
+    if tipo_movimiento not in TIPOS_MOVIMIENTO or int(cantidad) <= 0:
+        raise ValueError(f"Movimiento no válido: {tipo_movimiento} {cantidad}")
+
+    if motor_de(destino) == 'sqlserver':
+        cursor = destino.cursor()
+        try:
+            cursor.execute("EXEC sp_actualizar_stock @inventario_id = ?, @tipo_movimiento = ?, "
+                           "@cantidad = ?, @motivo = ?, @usuario_id = ?",
+                           (int(inventario_id), tipo_movimiento, int(cantidad), motivo, usuario_id))
+            mensaje = cursor.fetchone()[0]
+            destino.commit()
+        except Exception:
+            destino.rollback()
+            raise
+        if mensaje == 'Stock actualizado exitosamente':
+            return True
+        if mensaje == STOCK_INSUFICIENTE:
+            return False
+        raise RuntimeError(mensaje)
+
+    delta = int(cantidad) if tipo_movimiento == 'ENTRADA' else -int(cantidad)
+
+    def _mover(conn):
+        if not conn.execute(_MOVER_STOCK, (delta, int(inventario_id), tipo_movimiento, int(cantidad))).rowcount:
+            if conn.execute("SELECT 1 FROM Inventario WHERE id = ? AND activo = 1",
+                            (int(inventario_id),)).fetchone() is None:
+                raise RuntimeError('Item no encontrado')
+            return False
+        conn.execute("INSERT INTO MovimientosInventario (inventario_id, tipo_movimiento, cantidad, motivo, usuario_id) "
+                     "VALUES (?, ?, ?, ?, ?)",
+                     (int(inventario_id), tipo_movimiento, int(cantidad), motivo, usuario_id))
+        return True
+
+    return en_transaccion(destino, _mover)
+
+
+def actualizar_estado_cita(destino, cita_id, nuevo_estado, version=None):
+    """Cambia el estado si la cita sigue en `version` (None = sin comprobar)
+
+    Devuelve la versión nueva de la cita, leída en la misma transacción, para
+    el siguiente cambio; None si otro la modificó desde que se leyó `version`.
+    """
+    if motor_de(destino) == 'sqlserver':
+        cursor = destino.cursor()
+        try:
+            cursor.execute("EXEC sp_actualizar_estado_cita @cita_id = ?, @nuevo_estado = ?, @version = ?",
+                           (int(cita_id), nuevo_estado, version))
+            mensaje, nueva = cursor.fetchone()
+            destino.commit()
+        except Exception:
+            destino.rollback()
+            raise
+        if mensaje == 'Estado actualizado exitosamente':
+            return nueva
+        if mensaje == CITA_MODIFICADA:
+            return None
+        raise RuntimeError(mensaje)
+
+    version = None if version is None else int(version)
+
+    def _actualizar(conn):
+        if conn.execute(_ACTUALIZAR_ESTADO, (nuevo_estado, int(cita_id), version, version)).rowcount:
+            return conn.execute("SELECT version FROM Citas WHERE id = ?", (int(cita_id),)).fetchone()[0]
+        if conn.execute("SELECT 1 FROM Citas WHERE id = ?", (int(cita_id),)).fetchone() is None:
+            raise RuntimeError('Cita no encontrada')
+        return None
+
+    return en_transaccion(destino, _actualizar)
+
+# ========================================
+# PRUEBA DE ESTRÉS
+# ========================================
+
+def _conectar(ruta):
+    """Conexión propia de cada hilo: las carreras se dan entre transacciones de verdad"""
+    conn = sqlite3.connect(ruta, timeout=60, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode = WAL")
+    return conn
+
+
+def _en_paralelo(ruta, hilos, trabajo):
+    """Corre trabajo(indice, conn) en `hilos` hilos que arrancan juntos; devuelve sus resultados"""
+    resultados = [None] * hilos
+    errores = []
+    barrera = threading.Barrier(hilos)
+
+    def _correr(indice):
+        conn = _conectar(ruta)
+        try:
+            barrera.wait()
+            resultados[indice] = trabajo(indice, conn)
+        except Exception as e:
+            errores.append(e)
+        finally:
+            conn.close()
+
+    lista = [threading.Thread(target=_correr, args=(i,)) for i in range(hilos)]
+    for hilo in lista:
+        hilo.start()
+    for hilo in lista:
+        hilo.join()
+    if errores:
+        raise errores[0]
+    return resultados
+
+
+def _estres(hilos=16, intentos=100, horarios=40, stock_inicial=500):
+    """Muchos escritores a la vez: sin reservas dobles, sin stock negativo y un ganador por versión"""
+    from migraciones import migrar_sqlite
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, 'estres.db')
+        migrar_sqlite(ruta)
+        conn = _conectar(ruta)
+        conn.execute("INSERT INTO Clientes (nombre, telefono) VALUES ('Estrés', '900000000')")
+        conn.execute("INSERT INTO Vehiculos (cliente_id, marca, modelo, año) VALUES (1, 'Toyota', 'Yaris', 2020)")
+        inventario_id = conn.execute(
+            "INSERT INTO Inventario (nombre, categoria, stock_actual, stock_minimo, precio_unitario) "
+            "VALUES ('Repuesto estrés', 'Otros', ?, 0, 1)", (stock_inicial,)).lastrowid
+        conn.commit()
+        print(f"{hilos} hilos, {intentos} intentos cada uno")
+
+        # Reservas: todos compiten por pocos horarios
+        slots = [f"2030-01-{1 + i // 8:02d} {8 + i % 8:02d}:00:00" for i in range(horarios)]
+
+        def _reservar(indice, conn):
+            azar = random.Random(indice)
+            return sum(reservar_cita(conn, 1, 1, 1, azar.choice(slots)) is not None
+                       for _ in range(intentos))
+
+        t0 = time.perf_counter()
+        exitosas = sum(_en_paralelo(ruta, hilos, _reservar))
+        segundos = time.perf_counter() - t0
+        dobles = conn.execute("SELECT COUNT(*) FROM (SELECT 1 FROM Citas WHERE estado <> 'Cancelado' "
+                              "GROUP BY sede_id, fecha_hora HAVING COUNT(*) > 1)").fetchone()[0]
+        print(f"Reservas: {hilos * intentos:,} intentos, {exitosas} confirmadas para {horarios} horarios, "
+              f"{dobles} horarios con reserva doble ({segundos:.2f} s)")
+        assert exitosas == horarios and dobles == 0
+
+        # Stock: SALIDAs y alguna ENTRADA hasta agotar
+        def _mover(indice, conn):
+            azar = random.Random(indice)
+            salidas = entradas = 0
+            for _ in range(intentos):
+                cantidad = azar.randint(1, 5)
+                if azar.random() < 0.1:
+                    mover_stock(conn, inventario_id, 'ENTRADA', cantidad)
+                    entradas += cantidad
+                elif mover_stock(conn, inventario_id, 'SALIDA', cantidad):
+                    salidas += cantidad
+            return salidas, entradas
+
+        t0 = time.perf_counter()
+        movido = _en_paralelo(ruta, hilos, _mover)
+        segundos = time.perf_counter() - t0
+        salidas = sum(s for s, _ in movido)
+        entradas = sum(e for _, e in movido)
+        stock = conn.execute("SELECT stock_actual FROM Inventario WHERE id = ?", (inventario_id,)).fetchone()[0]
+        registrado = conn.execute(
+            "SELECT COALESCE(SUM(CASE tipo_movimiento WHEN 'ENTRADA' THEN cantidad ELSE -cantidad END), 0) "
+            "FROM MovimientosInventario WHERE inventario_id = ?", (inventario_id,)).fetchone()[0]
+        print(f"Stock: {stock_inicial} + {entradas} - {salidas} = {stock} "
+              f"(movimientos: {registrado:+}, {segundos:.2f} s)")
+        assert stock >= 0 and stock == stock_inicial + entradas - salidas == stock_inicial + registrado
+
+        # Estado: todos leen la misma versión y actualizan a la vez; gana uno por ronda
+        cita_id = conn.execute("SELECT MIN(id) FROM Citas").fetchone()[0]
+        rondas = 20
+        estados = ('Confirmado', 'En Proceso')
+        barrera = threading.Barrier(hilos)
+
+        def _cambiar(indice, conn):
+            ganadas = 0
+            for ronda in range(rondas):
+                version = conn.execute("SELECT version FROM Citas WHERE id = ?", (cita_id,)).fetchone()[0]
+                barrera.wait()
+                ganadas += actualizar_estado_cita(conn, cita_id, estados[ronda % 2], version) is not None
+                barrera.wait()
+            return ganadas
+
+        ganadas = sum(_en_paralelo(ruta, hilos, _cambiar))
+        print(f"Estado: {rondas} rondas de {hilos} cambios simultáneos, {ganadas} aplicados")
+        assert ganadas == rondas
+        conn.close()
+    print("OK: sin reservas dobles, sin stock negativo, un cambio de estado por versión")
+
+
+def _panel():
+    """Un admin cambia dos veces seguidas la misma cita en el Panel Admin (AppTest)
+
+    Nadie más la toca, así que ningún cambio debe verse como conflicto: la
+    sesión tiene que quedar con la versión que dejó su propio cambio.
+    """
+    from datetime import date
+
+    from streamlit.testing.v1 import AppTest
+
+    import prueba_carga as pc
+    from migraciones import migrar_sqlite
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, 'taller_automotriz.db')
+        migrar_sqlite(ruta)
+        conn = _conectar(ruta)
+        cliente_id = conn.execute("INSERT INTO Clientes (nombre, telefono) VALUES ('Panel', '900000001')").lastrowid
+        vehiculo_id = conn.execute("INSERT INTO Vehiculos (cliente_id, marca, modelo, año) "
+                                   "VALUES (?, 'Toyota', 'Yaris', 2020)", (cliente_id,)).lastrowid
+        cita_id = reservar_cita(conn, cliente_id, vehiculo_id, 1, f"{date.today()} 23:30:00")
+        conn.commit()
+        app = pc.extraer_app(pc.APP_COLAB, os.path.join(carpeta, 'app.py'))
+        os.environ.setdefault('METRICAS_PUERTO', '0')
+        directorio = os.getcwd()
+        # La app abre 'taller_automotriz.db' en el directorio actual
+        os.chdir(carpeta)
+        try:
+            # folium_static obsoleto avisa en cada rerun
+            warnings.simplefilter('ignore', DeprecationWarning)
+            at = AppTest.from_file(app, default_timeout=120)
+            pc._iniciar_sesion(at)
+            at.run()
+            pc._ir_a('Panel Admin')(at)
+            at.run()
+            for estado in ('Confirmado', 'En Proceso', 'Completado'):
+                pc._por_etiqueta(at.selectbox, "Cita").select(cita_id)
+                pc._por_etiqueta(at.selectbox, "Nuevo estado").select(estado)
+                pc._por_etiqueta(at.button, "Actualizar estado").click()
+                at.run()
+                actual, version = conn.execute("SELECT estado, version FROM Citas WHERE id = ?",
+                                               (cita_id,)).fetchone()
+                avisos = [w.value for w in at.warning]
+                print(f"Panel: {estado} -> {actual} (versión {version}){' ' + avisos[0] if avisos else ''}")
+                assert pc._error_de(at) is None and not avisos and actual == estado
+        finally:
+            os.chdir(directorio)
+            conn.close()
+    print("OK: cambios seguidos de una misma sesión sin conflictos falsos")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reservas y stock con escrituras simultáneas")
+    parser.add_argument('--estres', type=int, metavar='HILOS', default=16,
+                        help="Hilos escritores de la prueba de estrés")
+    parser.add_argument('--intentos', type=int, default=100, help="Operaciones por hilo")
+    args = parser.parse_args()
+    _estres(args.estres, args.intentos)
+    _panel()
+
+
+if __name__ == "__main__":
+    main()
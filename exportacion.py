@@ -0,0 +1,529 @@
+# ========================================
+# EXPORTACIÓN EN STREAMING (CSV / XLSX / PARQUET)
+# Taller Automotriz - Sistema de Gestión
+# ========================================
+
+"""
+Exporta citas, clientes y movimientos de inventario sin cargar la tabla en
+memoria: las filas se leen del cursor en bloques (fetchmany) y cada bloque se
+convierte en bytes y se entrega enseguida. La descarga empieza con el primer
+bloque y la memoria usada no depende del tamaño del rango.
+
+Streamlit solo sabe descargar bytes ya armados, así que las descargas se sirven
+desde un pequeño servidor HTTP en un puerto aparte (transfer-encoding chunked).
+Los enlaces llevan una firma HMAC con vencimiento, generada por la app; la
+sede va dentro de lo firmado, así que un enlace de una sede no sirve para otra.
+
+Uso:
+    python exportacion.py citas --formato csv --db taller_automotriz.db --salida citas.csv
+    python exportacion.py movimientos --formato parquet --desde 2022-01-01 --salida mov.parquet
+    python exportacion.py citas --sede 2 --desde 2024-01-01
+    python exportacion.py --servir --db taller_automotriz.db --puerto 8502
+"""
+
+import argparse
+import csv
+import hashlib
+import hmac
+import io
+import os
+import secrets
+import sqlite3
+import threading
+import time
+import zipfile
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+from xml.sax.saxutils import escape
+
+TAMANO_BLOQUE = 5000
+PUERTO_POR_DEFECTO = 8502
+VALIDEZ_ENLACE_SEGUNDOS = 600
+
+# ========================================
+# DEFINICIÓN DE LAS EXPORTACIONES
+# ========================================
+
+# Las consultas sirven para ambos motores. {tabla} se recorre en orden (archivo
+# primero) y cada parte sale ordenada por su índice, así no hay ordenamiento
+# previo que demore el primer byte. filtro_sede limita a una sede: las citas y
+# los movimientos por su sede_id, los clientes a los que tienen citas en ella.
+_CONSULTA_CITAS = """
+SELECT c.id, c.fecha_hora, cl.nombre AS cliente, cl.telefono, v.placa, v.marca, v.modelo,
+       s.nombre AS servicio, c.estado, c.costo_total
+FROM {tabla} c
+JOIN Clientes cl ON c.cliente_id = cl.id
+LEFT JOIN Vehiculos v ON c.vehiculo_id = v.id
+JOIN Servicios s ON c.servicio_id = s.id
+{filtro}
+ORDER BY c.fecha_hora
+"""
+
+_CONSULTA_CLIENTES = """
+SELECT c.id, c.nombre, c.telefono, c.email, c.direccion, c.fecha_registro, c.activo
+FROM {tabla} c
+{filtro}
+ORDER BY c.id
+"""
+
+_CONSULTA_MOVIMIENTOS = """
+SELECT m.id, m.fecha, i.nombre AS producto, i.categoria, m.tipo_movimiento, m.cantidad,
+       m.motivo, u.nombre AS usuario
+FROM {tabla} m
+JOIN Inventario i ON m.inventario_id = i.id
+LEFT JOIN Usuarios u ON m.usuario_id = u.id
+{filtro}
+ORDER BY m.fecha
+"""
+
+# Tipos: 'entero', 'decimal', 'texto', 'fecha'
+EXPORTACIONES = {
+    'citas': {
+        'consulta': _CONSULTA_CITAS,
+        'tablas': ('CitasHistorico', 'Citas'),
+        'columna_fecha': 'c.fecha_hora',
+        'filtro_sede': 'c.sede_id = ?',
+        'columnas': [('id', 'entero'), ('fecha_hora', 'fecha'), ('cliente', 'texto'),
+                     ('telefono', 'texto'), ('placa', 'texto'), ('marca', 'texto'),
+                     ('modelo', 'texto'), ('servicio', 'texto'), ('estado', 'texto'),
+                     ('costo_total', 'decimal')],
+    },
+    'clientes': {
+        'consulta': _CONSULTA_CLIENTES,
+        'tablas': ('Clientes',),
+        'columna_fecha': 'c.fecha_registro',
+        'filtro_sede': ('(EXISTS (SELECT 1 FROM Citas x WHERE x.sede_id = ? AND x.cliente_id = c.id)'
+                        ' OR EXISTS (SELECT 1 FROM CitasHistorico x WHERE x.sede_id = ? AND x.cliente_id = c.id))'),
+        'columnas': [('id', 'entero'), ('nombre', 'texto'), ('telefono', 'texto'),
+                     ('email', 'texto'), ('direccion', 'texto'), ('fecha_registro', 'fecha'),
+                     ('activo', 'entero')],
+    },
+    'movimientos': {
+        'consulta': _CONSULTA_MOVIMIENTOS,
+        'tablas': ('MovimientosInventarioHistorico', 'MovimientosInventario'),
+        'columna_fecha': 'm.fecha',
+        'filtro_sede': 'm.sede_id = ?',
+        'columnas': [('id', 'entero'), ('fecha', 'fecha'), ('producto', 'texto'),
+                     ('categoria', 'texto'), ('tipo_movimiento', 'texto'), ('cantidad', 'entero'),
+                     ('motivo', 'texto'), ('usuario', 'texto')],
+    },
+}
+
+TIPOS_CONTENIDO = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def formatos_disponibles():
+    """Formatos que se pueden generar con las librerías instaladas"""
+    formatos = ['csv', 'xlsx']
+    try:
+        import pyarrow  # noqa: F401
+        formatos.append('parquet')
+    except ImportError:
+        pass
+    return formatos
+
+
+def _texto_fecha(valor):
+    if isinstance(valor, datetime):
+        return valor.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(valor, date):
+        return valor.strftime('%Y-%m-%d')
+    return valor
+
+
+def _consultas(nombre, desde=None, hasta=None, sede_id=None):
+    """Lista de (sql, params) a ejecutar en orden; hasta es inclusivo, sede_id None = toda la cadena"""
+    definicion = EXPORTACIONES[nombre]
+    filtros, params = [], []
+    if sede_id is not None:
+        filtros.append(definicion['filtro_sede'])
+        params.extend([int(sede_id)] * definicion['filtro_sede'].count('?'))
+    if desde:
+        filtros.append(f"{definicion['columna_fecha']} >= ?")
+        params.append(_texto_fecha(desde))
+    if hasta:
+        if isinstance(hasta, str):
+            hasta = date.fromisoformat(hasta[:10])
+        filtros.append(f"{definicion['columna_fecha']} < ?")
+        params.append(_texto_fecha(hasta + timedelta(days=1)))
+    filtro = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+    return [(definicion['consulta'].format(tabla=tabla, filtro=filtro), params)
+            for tabla in definicion['tablas']]
+
+
+def bloques_de_filas(conn, nombre, desde=None, hasta=None, tamano=TAMANO_BLOQUE, sede_id=None):
+    """Genera listas de hasta `tamano` filas leyendo el cursor de a poco"""
+    for consulta, params in _consultas(nombre, desde, hasta, sede_id):
+        cursor = conn.cursor()
+        # Tanto sqlite3 como pyodbc (cursor forward-only de SQL Server) traen
+        # las filas a medida que se piden
+        cursor.execute(consulta, params)
+        try:
+            while True:
+                filas = cursor.fetchmany(tamano)
+                if not filas:
+                    break
+                yield filas
+        finally:
+            cursor.close()
+
+
+# ========================================
+# ESCRITORES POR FORMATO
+# ========================================
+
+class _Tubo:
+    """Destino de escritura que acumula bytes hasta que el generador los saca"""
+
+    def __init__(self):
+        self._partes = []
+        self._posicion = 0
+        self.closed = False
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def vaciar(self):
+        datos = b''.join(self._partes)
+        self._partes = []
+        return datos
+
+
+def _csv(columnas, bloques):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    # BOM para que Excel reconozca UTF-8 (tildes y ñ)
+    escritor.writerow([c for c, _ in columnas])
+    yield ('\ufeff' + buffer.getvalue()).encode('utf-8')
+    if 'parquet' in formatos_disponibles():
+        # Con pyarrow cada bloque se escribe por columnas, sin formatear celda por celda
+        yield from _csv_arrow(columnas, bloques)
+        return
+    for filas in bloques:
+        buffer.seek(0)
+        buffer.truncate()
+        escritor.writerows([_texto_fecha(v) for v in fila] for fila in filas)
+        yield buffer.getvalue().encode('utf-8')
+
+
+_XLSX_ARCHIVOS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'),
+}
+
+_XLSX_LIBRO = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{hoja}" sheetId="1" r:id="rId1"/></sheets></workbook>')
+
+
+def _celda_xlsx(valor, tipo):
+    if valor is None:
+        return '<c/>'
+    if tipo in ('entero', 'decimal') and not isinstance(valor, str):
+        return f'<c><v>{valor}</v></c>'
+    return f'<c t="inlineStr"><is><t>{escape(str(_texto_fecha(valor)))}</t></is></c>'
+
+
+def _xlsx(columnas, bloques, hoja='Datos'):
+    # Hoja con cadenas en línea (sin sharedStrings) escrita directamente dentro
+    # del zip: zipfile acepta destinos no posicionables y no necesita el total
+    tubo = _Tubo()
+    with zipfile.ZipFile(tubo, 'w', compression=zipfile.ZIP_DEFLATED) as libro:
+        for ruta, contenido in _XLSX_ARCHIVOS.items():
+            libro.writestr(ruta, contenido)
+        libro.writestr('xl/workbook.xml', _XLSX_LIBRO.format(hoja=escape(hoja)))
+        with libro.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as hoja_xml:
+            encabezado = ''.join(_celda_xlsx(c, 'texto') for c, _ in columnas)
+            hoja_xml.write(('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                            '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                            f'<sheetData><row>{encabezado}</row>').encode('utf-8'))
+            yield tubo.vaciar()
+            tipos = [t for _, t in columnas]
+            for filas in bloques:
+                partes = ['<row>' + ''.join(_celda_xlsx(v, t) for v, t in zip(fila, tipos)) + '</row>'
+                          for fila in filas]
+                hoja_xml.write(''.join(partes).encode('utf-8'))
+                yield tubo.vaciar()
+            hoja_xml.write(b'</sheetData></worksheet>')
+    yield tubo.vaciar()
+
+
+# Tipo de carga_arrow para cada tipo de exportación
+_TIPOS_CARGA = {'entero': 'int64', 'decimal': 'decimal', 'texto': 'texto', 'fecha': 'fecha'}
+
+
+def _esquema_arrow(columnas):
+    import pyarrow as pa
+    tipos = {'entero': pa.int64(), 'decimal': pa.float64(), 'texto': pa.string(),
+             'fecha': pa.timestamp('s')}
+    return pa.schema([(nombre, tipos[tipo]) for nombre, tipo in columnas])
+
+
+def _tablas_arrow(columnas, bloques):
+    """Cada bloque de filas como tabla Arrow con el esquema fijo de la exportación"""
+    import pyarrow as pa
+    from carga_arrow import a_arrow
+
+    esquema = _esquema_arrow(columnas)
+    nombres = [nombre for nombre, _ in columnas]
+    tipos = {nombre: _TIPOS_CARGA[tipo] for nombre, tipo in columnas}
+    for filas in bloques:
+        yield pa.Table.from_batches([a_arrow(nombres, filas, tipos)]).cast(esquema)
+
+
+def _csv_arrow(columnas, bloques):
+    import pyarrow.csv as pcsv
+
+    opciones = pcsv.WriteOptions(include_header=False, quoting_style='needed')
+    for tabla in _tablas_arrow(columnas, bloques):
+        destino = io.BytesIO()
+        pcsv.write_csv(tabla, destino, opciones)
+        yield destino.getvalue()
+
+
+def _parquet(columnas, bloques):
+    import pyarrow.parquet as pq
+
+    esquema = _esquema_arrow(columnas)
+    tubo = _Tubo()
+    # Un row group por bloque: el pie del archivo es lo único que se escribe al final
+    with pq.ParquetWriter(tubo, esquema, compression='snappy') as escritor:
+        for tabla in _tablas_arrow(columnas, bloques):
+            escritor.write_table(tabla)
+            yield tubo.vaciar()
+    yield tubo.vaciar()
+
+
+_ESCRITORES = {'csv': _csv, 'xlsx': _xlsx, 'parquet': _parquet}
+
+
+def exportar(conn, nombre, formato, desde=None, hasta=None, tamano=TAMANO_BLOQUE, sede_id=None):
+    """Generador de bytes con la exportación completa en el formato pedido"""
+    if nombre not in EXPORTACIONES:
+        raise ValueError(f"Exportación desconocida: {nombre}")
+    if formato not in _ESCRITORES:
+        raise ValueError(f"Formato no soportado: {formato}")
+    columnas = EXPORTACIONES[nombre]['columnas']
+    bloques = bloques_de_filas(conn, nombre, desde, hasta, tamano, sede_id)
+    for datos in _ESCRITORES[formato](columnas, bloques):
+        if datos:
+            yield datos
+
+
+def nombre_archivo(nombre, formato, desde=None, hasta=None, sede_id=None):
+    partes = [nombre]
+    if sede_id is not None:
+        partes.append(f"sede{int(sede_id)}")
+    if desde:
+        partes.append(str(desde)[:10])
+    if hasta:
+        partes.append(str(hasta)[:10])
+    return '_'.join(partes) + '.' + formato
+
+
+# ========================================
+# SERVIDOR DE DESCARGAS
+# ========================================
+
+def _firmar(secreto, ruta, params):
+    mensaje = ruta + '?' + urlencode(sorted(params.items()))
+    return hmac.new(secreto, mensaje.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+class ServidorExportaciones:
+    """Servidor HTTP en segundo plano que entrega exportaciones firmadas
+
+    abrir_conexion() debe devolver una conexión nueva (se cierra al terminar
+    cada descarga), para que una exportación larga no ocupe el pool de la app.
+    """
+
+    def __init__(self, abrir_conexion, puerto=PUERTO_POR_DEFECTO, host='0.0.0.0',
+                 url_base=None, secreto=None):
+        self.abrir_conexion = abrir_conexion
+        self.secreto = secreto or secrets.token_bytes(32)
+        self.url_base = (url_base or os.environ.get('EXPORTACIONES_URL_BASE')
+                         or f"http://localhost:{puerto}")
+        self._servidor = ThreadingHTTPServer((host, puerto), self._manejador())
+        self._servidor.daemon_threads = True
+        self._hilo = threading.Thread(target=self._servidor.serve_forever,
+                                      name='exportaciones', daemon=True)
+        self._hilo.start()
+
+    def url(self, nombre, formato, desde=None, hasta=None, sede_id=None, validez=VALIDEZ_ENLACE_SEGUNDOS):
+        """Enlace de descarga firmado que vence en `validez` segundos (sede_id None = toda la cadena)"""
+        ruta = f"/exportar/{nombre}.{formato}"
+        params = {'expira': str(int(time.time()) + validez)}
+        if sede_id is not None:
+            params['sede'] = str(int(sede_id))
+        if desde:
+            params['desde'] = str(desde)[:10]
+        if hasta:
+            params['hasta'] = str(hasta)[:10]
+        params['firma'] = _firmar(self.secreto, ruta, params)
+        return f"{self.url_base}{ruta}?{urlencode(params)}"
+
+    def _verificar(self, ruta, params):
+        firma = params.pop('firma', '')
+        if not hmac.compare_digest(firma, _firmar(self.secreto, ruta, params)):
+            return "Firma inválida"
+        if int(params.get('expira', 0)) < time.time():
+            return "El enlace venció"
+        return None
+
+    def _manejador(self):
+        servidor = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                archivo = url.path.rsplit('/', 1)[-1]
+                nombre, _, formato = archivo.partition('.')
+                if (not url.path.startswith('/exportar/') or nombre not in EXPORTACIONES
+                        or formato not in formatos_disponibles()):
+                    return self._error(404, "Exportación no encontrada")
+                problema = servidor._verificar(url.path, params)
+                if problema:
+                    return self._error(403, problema)
+
+                sede_id = int(params['sede']) if 'sede' in params else None
+                conn = servidor.abrir_conexion()
+                try:
+                    self.send_response(200)
+                    self.send_header('Content-Type', TIPOS_CONTENIDO[formato])
+                    self.send_header('Content-Disposition', 'attachment; filename="'
+                                     + nombre_archivo(nombre, formato, params.get('desde'),
+                                                      params.get('hasta'), sede_id) + '"')
+                    self.send_header('Transfer-Encoding', 'chunked')
+                    self.send_header('Cache-Control', 'no-store')
+                    self.end_headers()
+                    for datos in exportar(conn, nombre, formato, params.get('desde'),
+                                          params.get('hasta'), sede_id=sede_id):
+                        self.wfile.write(f"{len(datos):X}\r\n".encode('ascii') + datos + b"\r\n")
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # El navegador canceló la descarga
+                    pass
+                finally:
+                    conn.close()
+
+            def _error(self, codigo, mensaje):
+                cuerpo = mensaje.encode('utf-8')
+                self.send_response(codigo)
+                self.send_header('Content-Type', 'text/plain; charset=utf-8')
+                self.send_header('Content-Length', str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, formato, *args):
+                pass
+
+        return Manejador
+
+    def cerrar(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+
+def conexion_sqlite_lectura(ruta):
+    """Fábrica de conexiones de solo lectura para ServidorExportaciones"""
+    return lambda: sqlite3.connect(f"file:{ruta}?mode=ro", uri=True, check_same_thread=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exportación de citas, clientes y movimientos")
+    parser.add_argument('exportacion', nargs='?', choices=sorted(EXPORTACIONES))
+    parser.add_argument('--formato', choices=sorted(_ESCRITORES), default='csv')
+    parser.add_argument('--desde', help="Fecha inicial (AAAA-MM-DD)")
+    parser.add_argument('--hasta', help="Fecha final inclusiva (AAAA-MM-DD)")
+    parser.add_argument('--sede', type=int, help="Solo esta sede (por defecto, toda la cadena)")
+    parser.add_argument('--db', default='taller_automotriz.db', help="Archivo SQLite")
+    parser.add_argument('--dsn', help="Cadena de conexión ODBC (SQL Server)")
+    parser.add_argument('--salida', help="Archivo de salida (por defecto según la exportación)")
+    parser.add_argument('--servir', action='store_true', help="Levantar el servidor de descargas")
+    parser.add_argument('--puerto', type=int, default=PUERTO_POR_DEFECTO)
+    args = parser.parse_args()
+
+    if args.dsn:
+        import pyodbc
+        abrir = lambda: pyodbc.connect(args.dsn)  # noqa: E731
+    else:
+        abrir = conexion_sqlite_lectura(args.db)
+
+    if args.servir:
+        servidor = ServidorExportaciones(abrir, puerto=args.puerto)
+        print(f"Servidor de exportaciones en {servidor.url_base} (Ctrl+C para salir)")
+        for nombre in sorted(EXPORTACIONES):
+            print(f"  {servidor.url(nombre, 'csv', validez=3600)}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            servidor.cerrar()
+        return
+
+    if not args.exportacion:
+        parser.error("indica qué exportar o usa --servir")
+    salida = args.salida or nombre_archivo(args.exportacion, args.formato, args.desde, args.hasta, args.sede)
+    conn = abrir()
+    t0 = time.perf_counter()
+    total = 0
+    try:
+        with open(salida, 'wb') as f:
+            for datos in exportar(conn, args.exportacion, args.formato, args.desde, args.hasta,
+                                  sede_id=args.sede):
+                f.write(datos)
+                total += len(datos)
+    finally:
+        conn.close()
+    print(f"✅ {salida}: {total / 1024 / 1024:.1f} MB en {time.perf_counter() - t0:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
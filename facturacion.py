@@ -0,0 +1,594 @@
+# ========================================
+# COMPROBANTES DE PAGO (HTML Y PDF)
+# Taller Automotriz - Sistema de Gestión
+# ========================================
+
+"""
+Comprobantes de pago de las citas completadas, en HTML y en PDF.
+
+- Plantillas: Jinja2, compiladas una sola vez por proceso (_plantillas() en
+  caché) y no en cada comprobante. El PDF sale de una plantilla del flujo de
+  contenido de la página, armada aquí con las fuentes base (Helvetica,
+  Courier), sin librerías de PDF. Sin marcas de tiempo propias, el mismo
+  comprobante da siempre los mismos bytes.
+- Almacén por contenido: los archivos van al almacén de adjuntos
+  (AlmacenBlobs, nombre = SHA-256) y se sirven con sus enlaces firmados.
+  Comprobantes guarda el número (serie de la sede + correlativo) y los
+  hashes.
+- Sin repetir trabajo: huella resume los datos del comprobante (cita,
+  cliente, vehículo, servicio, sede) y la versión de las plantillas. Si la
+  huella guardada coincide y los archivos están, la cita no se vuelve a
+  generar.
+- Lote del día: facturar() lee las citas, reserva los números y calcula las
+  huellas en una transacción corta. Las citas pendientes se reparten en un
+  pool de procesos ('spawn': no hereda los hilos del servidor) y la base solo
+  se vuelve a tocar para anotar los hashes. Con pocas citas pendientes se
+  generan en el mismo proceso.
+
+Uso:
+    resumen = facturar(db, AlmacenBlobs('adjuntos'), dia=date.today(), sede_id=1)
+    columnas, filas = comprobantes_del_dia(db, date.today(), sede_id=1)
+    python facturacion.py --db taller_automotriz.db --dia 2025-03-10
+    python facturacion.py --benchmark 2000
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import textwrap
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from functools import lru_cache
+
+from jinja2 import DictLoader, Environment, StrictUndefined
+
+from adjuntos import AlmacenBlobs
+from bd_sqlite import conexion_lectura, en_transaccion
+from migraciones import motor_de
+from sedes import nombre_taller
+
+TASA_IGV = Decimal('0.18')
+# Por debajo de esto arrancar los procesos cuesta más que generar en serie
+MINIMO_PARA_PROCESOS = 32
+TIPO_HTML = 'text/html; charset=utf-8'
+TIPO_PDF = 'application/pdf'
+_CENTIMO = Decimal('0.01')
+_FORMATO = '%Y-%m-%d %H:%M:%S'
+
+COLUMNAS_COMPROBANTE = ['numero', 'cita_id', 'cliente', 'servicio', 'total', 'fecha_emision',
+                        'sha256_html', 'sha256_pdf']
+
+# ========================================
+# PLANTILLAS
+# ========================================
+
+_HTML = """<!DOCTYPE html>
+<html lang="es">
+<head>
+<meta charset="utf-8">
+<title>Comprobante {{ numero }}</title>
+<style>
+body { font-family: Helvetica, Arial, sans-serif; color: #222; max-width: 760px; margin: 32px auto; }
+header { display: flex; justify-content: space-between; border-bottom: 2px solid #1f4e79; padding-bottom: 12px; }
+h1 { color: #1f4e79; font-size: 22px; margin: 0 0 6px; }
+h2 { font-size: 13px; text-transform: uppercase; color: #1f4e79; margin: 0 0 4px; }
+.numero { border: 1px solid #1f4e79; padding: 8px 14px; text-align: center; }
+.partes { display: flex; gap: 48px; margin: 20px 0; }
+.partes p { margin: 2px 0; }
+table { width: 100%; border-collapse: collapse; }
+th { background: #1f4e79; color: #fff; text-align: left; padding: 6px; }
+td { padding: 6px; border-bottom: 1px solid #ddd; }
+.num { text-align: right; }
+tfoot td { border: none; }
+tfoot .total td { font-weight: bold; font-size: 16px; border-top: 2px solid #1f4e79; }
+.nota { color: #555; font-size: 13px; }
+</style>
+</head>
+<body>
+<header>
+  <div>
+    <h1>{{ taller.nombre }}</h1>
+    <p>Sede {{ taller.sede }} · {{ taller.direccion }}{% if taller.telefono %} · {{ taller.telefono }}{% endif %}</p>
+  </div>
+  <div class="numero"><strong>COMPROBANTE DE PAGO</strong><br>{{ numero }}<br>Emitido: {{ fecha_emision }}</div>
+</header>
+<section class="partes">
+  <div>
+    <h2>Cliente</h2>
+    <p>{{ cliente.nombre }}</p>
+    {% if cliente.direccion %}<p>{{ cliente.direccion }}</p>{% endif %}
+    {% if cliente.telefono %}<p>Tel. {{ cliente.telefono }}</p>{% endif %}
+    {% if cliente.email %}<p>{{ cliente.email }}</p>{% endif %}
+  </div>
+  <div>
+    <h2>Vehículo</h2>
+    <p>{{ vehiculo.marca }} {{ vehiculo.modelo }}{% if vehiculo.anio %} {{ vehiculo.anio }}{% endif %}</p>
+    {% if vehiculo.placa %}<p>Placa {{ vehiculo.placa }}</p>{% endif %}
+    <p>Cita #{{ cita.id }} del {{ cita.fecha_hora }}</p>
+  </div>
+</section>
+<table>
+  <thead><tr><th>Descripción</th><th class="num">Cant.</th><th class="num">Importe (S/.)</th></tr></thead>
+  <tbody>
+  {% for linea in lineas %}
+    <tr><td>{{ linea.descripcion }}</td><td class="num">{{ linea.cantidad }}</td><td class="num">{{ linea.importe }}</td></tr>
+  {% endfor %}
+  </tbody>
+  <tfoot>
+    <tr><td colspan="2" class="num">Op. gravada</td><td class="num">{{ gravada }}</td></tr>
+    <tr><td colspan="2" class="num">IGV ({{ tasa_igv }} %)</td><td class="num">{{ igv }}</td></tr>
+    <tr class="total"><td colspan="2" class="num">Total</td><td class="num">S/. {{ total }}</td></tr>
+  </tfoot>
+</table>
+{% if cita.descripcion %}<p class="nota">Trabajo solicitado: {{ cita.descripcion }}</p>{% endif %}
+{% if cita.observaciones %}<p class="nota">Observaciones: {{ cita.observaciones }}</p>{% endif %}
+</body>
+</html>
+"""
+
+# Flujo de contenido de una página A4 (595 x 842 puntos). F1 Helvetica,
+# F2 Helvetica-Bold, F3 Courier (importes alineados a la derecha).
+_PDF = """
+{% macro texto(x, y, valor, tam=10, fuente='F1') %}
+BT /{{ fuente }} {{ tam }} Tf {{ x }} {{ y }} Td ({{ valor|pdf }}) Tj ET
+{% endmacro %}
+0.12 0.31 0.47 RG 0.12 0.31 0.47 rg
+{{ texto(50, 790, taller.nombre, 18, 'F2') }}
+0 0 0 rg
+{{ texto(50, 772, 'Sede ' ~ taller.sede, 9) }}
+{{ texto(50, 760, taller.direccion, 9) }}
+{% if taller.telefono %}{{ texto(50, 748, 'Tel. ' ~ taller.telefono, 9) }}{% endif %}
+1 w 380 740 165 64 re S
+{{ texto(400, 785, 'COMPROBANTE DE PAGO', 10, 'F2') }}
+{{ texto(400, 768, numero, 12, 'F2') }}
+{{ texto(400, 752, 'Emitido: ' ~ fecha_emision, 8) }}
+2 w 50 728 m 545 728 l S
+{{ texto(50, 705, 'CLIENTE', 9, 'F2') }}
+{% set ns = namespace(y=690) %}
+{% for valor in [cliente.nombre, cliente.direccion, cliente.telefono and 'Tel. ' ~ cliente.telefono, cliente.email] if valor %}
+{{ texto(50, ns.y, valor, 10) }}
+{% set ns.y = ns.y - 13 %}
+{% endfor %}
+{{ texto(320, 705, 'VEHÍCULO', 9, 'F2') }}
+{{ texto(320, 690, vehiculo.marca ~ ' ' ~ vehiculo.modelo ~ (' ' ~ vehiculo.anio if vehiculo.anio else ''), 10) }}
+{% if vehiculo.placa %}{{ texto(320, 677, 'Placa ' ~ vehiculo.placa, 10) }}{% endif %}
+{{ texto(320, 664, 'Cita #' ~ cita.id ~ ' del ' ~ cita.fecha_hora, 10) }}
+0.12 0.31 0.47 rg 50 616 495 20 re f 1 1 1 rg
+{{ texto(56, 622, 'Descripción', 10, 'F2') }}
+{{ texto(400, 622, 'Cant.', 10, 'F2') }}
+{{ texto(460, 622, 'Importe (S/.)', 10, 'F2') }}
+0 0 0 rg 0.5 w
+{% set ns.y = 598 %}
+{% for linea in lineas %}
+{% for parte in linea.descripcion|partir(55) %}
+{{ texto(56, ns.y, parte, 10) }}
+{% if loop.first %}
+{{ texto(410, ns.y, linea.cantidad, 10, 'F3') }}
+{{ texto(457, ns.y, '%12s'|format(linea.importe), 10, 'F3') }}
+{% endif %}
+{% set ns.y = ns.y - 14 %}
+{% endfor %}
+50 {{ ns.y + 8 }} m 545 {{ ns.y + 8 }} l S
+{% set ns.y = ns.y - 10 %}
+{% endfor %}
+{{ texto(340, ns.y, 'Op. gravada', 10) }}{{ texto(457, ns.y, '%12s'|format(gravada), 10, 'F3') }}
+{{ texto(340, ns.y - 14, 'IGV (' ~ tasa_igv ~ ' %)', 10) }}{{ texto(457, ns.y - 14, '%12s'|format(igv), 10, 'F3') }}
+1.5 w 340 {{ ns.y - 22 }} m 545 {{ ns.y - 22 }} l S
+{{ texto(340, ns.y - 38, 'Total S/.', 12, 'F2') }}{{ texto(457, ns.y - 38, '%12s'|format(total), 10, 'F3') }}
+{% set ns.y = ns.y - 70 %}
+{% for titulo, valor in [('Trabajo solicitado: ', cita.descripcion), ('Observaciones: ', cita.observaciones)] if valor %}
+{% for parte in (titulo ~ valor)|partir(95) %}
+{{ texto(50, ns.y, parte, 9) }}
+{% set ns.y = ns.y - 12 %}
+{% endfor %}
+{% endfor %}
+"""
+
+_FUENTES = ('Helvetica', 'Helvetica-Bold', 'Courier')
+
+PLANTILLAS = {'comprobante.html': _HTML, 'comprobante.pdf': _PDF}
+# Cambia con cualquier cambio de las plantillas: los comprobantes se regeneran
+VERSION_PLANTILLAS = hashlib.sha1('\0'.join(PLANTILLAS[n] for n in sorted(PLANTILLAS)).encode('utf-8')).hexdigest()[:12]
+
+
+def _texto_pdf(valor):
+    """Cadena literal de PDF: sin saltos de línea y con \\, ( y ) escapados"""
+    texto = ' '.join(str(valor).split())
+    return texto.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def _partir(valor, ancho):
+    return textwrap.wrap(str(valor), ancho) or ['']
+
+
+@lru_cache(maxsize=None)
+def _plantillas():
+    """Plantillas compiladas, una vez por proceso"""
+    entorno = Environment(loader=DictLoader(PLANTILLAS), undefined=StrictUndefined,
+                          autoescape=lambda nombre: nombre.endswith('.html'),
+                          trim_blocks=True, lstrip_blocks=True)
+    entorno.filters['pdf'] = _texto_pdf
+    entorno.filters['partir'] = _partir
+    return {nombre: entorno.get_template(nombre) for nombre in PLANTILLAS}
+
+
+def render_html(datos):
+    return _plantillas()['comprobante.html'].render(**datos).encode('utf-8')
+
+
+def render_pdf(datos):
+    contenido = _plantillas()['comprobante.pdf'].render(**datos)
+    # Las fuentes base con WinAnsiEncoding cubren el español
+    return _documento_pdf(contenido.encode('cp1252', errors='replace'))
+
+
+def _documento_pdf(contenido):
+    """PDF de una página con el flujo de contenido dado (comprimido)"""
+    flujo = zlib.compress(contenido)
+    fuentes = ' '.join(f'/F{i} {4 + i - 1} 0 R' for i in range(1, len(_FUENTES) + 1))
+    objetos = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        (f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] '
+         f'/Resources << /Font << {fuentes} >> >> /Contents {4 + len(_FUENTES)} 0 R >>').encode('ascii'),
+    ]
+    objetos += [f'<< /Type /Font /Subtype /Type1 /BaseFont /{fuente} /Encoding /WinAnsiEncoding >>'.encode('ascii')
+                for fuente in _FUENTES]
+    objetos.append(b'<< /Length %d /Filter /FlateDecode >>\nstream\n' % len(flujo) + flujo + b'\nendstream')
+
+    salida = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    posiciones = []
+    for numero, objeto in enumerate(objetos, 1):
+        posiciones.append(len(salida))
+        salida += b'%d 0 obj\n' % numero + objeto + b'\nendobj\n'
+    inicio_xref = len(salida)
+    salida += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objetos) + 1)
+    for posicion in posiciones:
+        salida += b'%010d 00000 n \n' % posicion
+    salida += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objetos) + 1, inicio_xref)
+    return bytes(salida)
+
+# ========================================
+# DATOS Y HUELLA
+# ========================================
+
+# Citas activas y archivadas (mismo id): el comprobante de una cita archivada sigue
+# encontrándose. El filtro va en cada rama para que use el índice de su tabla;
+# los parámetros se pasan dos veces.
+_ORIGEN_CITAS = """(
+    SELECT c.id, c.cliente_id, c.vehiculo_id, c.servicio_id, c.sede_id, c.fecha_hora, c.estado,
+           c.costo_total, c.descripcion_problema, c.observaciones
+    FROM Citas c WHERE {filtro}
+    UNION ALL
+    SELECT c.id, c.cliente_id, c.vehiculo_id, c.servicio_id, c.sede_id, c.fecha_hora, c.estado,
+           c.costo_total, c.descripcion_problema, c.observaciones
+    FROM CitasHistorico c WHERE {filtro}
+)"""
+
+_CITAS = """
+SELECT c.id, c.fecha_hora, c.costo_total, c.descripcion_problema, c.observaciones, c.sede_id,
+       cl.nombre, cl.direccion, cl.telefono, cl.email,
+       v.marca, v.modelo, v.año, v.placa,
+       s.nombre, s.precio,
+       se.nombre, se.direccion, se.telefono,
+       co.serie, co.correlativo, co.fecha_emision, co.huella, co.sha256_html, co.sha256_pdf
+FROM {origen} c
+JOIN Clientes cl ON cl.id = c.cliente_id
+LEFT JOIN Vehiculos v ON v.id = c.vehiculo_id
+LEFT JOIN Servicios s ON s.id = c.servicio_id
+LEFT JOIN Sedes se ON se.id = c.sede_id
+LEFT JOIN Comprobantes co ON co.cita_id = c.id
+ORDER BY c.fecha_hora, c.id
+"""
+
+
+def _consulta_citas(filtro):
+    return _CITAS.format(origen=_ORIGEN_CITAS.format(filtro=f"c.estado = 'Completado' AND {filtro}"))
+
+# Correlativo siguiente de la serie en la misma sentencia (UQ_Comprobantes_Numero por si acaso)
+_RESERVAR = """
+INSERT INTO Comprobantes (cita_id, sede_id, serie, correlativo, fecha_emision)
+SELECT ?, ?, ?, COALESCE(MAX(correlativo), 0) + 1, ?
+FROM Comprobantes
+WHERE serie = ?
+"""
+
+_ANOTAR = """
+UPDATE Comprobantes
+SET total = ?, huella = ?, sha256_html = ?, sha256_pdf = ?, fecha_actualizacion = ?
+WHERE cita_id = ?
+"""
+
+
+def serie_de_sede(sede_id):
+    return f"F{int(sede_id):03d}"
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, datetime):
+        return valor.strftime(_FORMATO)
+    return str(valor)
+
+
+def _fecha_bd(momento, motor, formato=_FORMATO):
+    """Fecha como parámetro: en SQLite, texto como el que se guarda; en SQL Server,
+    datetime (un texto contra DATETIME depende del DATEFORMAT del login)"""
+    if motor == 'sqlserver':
+        return momento if isinstance(momento, datetime) else datetime.combine(momento, datetime.min.time())
+    return momento.strftime(formato)
+
+
+def _importe(valor):
+    return f"{valor:,.2f}"
+
+
+def datos_comprobante(fila):
+    """Todo lo que se imprime en el comprobante, a partir de una fila de _CITAS"""
+    (cita_id, fecha_hora, costo_total, descripcion, observaciones, sede_id,
+     cliente, direccion, telefono, email, marca, modelo, anio, placa,
+     servicio, precio, sede, sede_direccion, sede_telefono,
+     serie, correlativo, fecha_emision) = fila[:22]
+    # Como sp_reporte_servicios_populares: sin costo_total vale el precio del servicio
+    total = Decimal(str(costo_total if costo_total is not None else precio or 0)).quantize(_CENTIMO, ROUND_HALF_UP)
+    gravada = (total / (1 + TASA_IGV)).quantize(_CENTIMO, ROUND_HALF_UP)
+    return {
+        'numero': f"{serie}-{int(correlativo):08d}",
+        'fecha_emision': _texto(fecha_emision)[:19],
+        'taller': {'nombre': nombre_taller(sede), 'sede': _texto(sede), 'direccion': _texto(sede_direccion),
+                   'telefono': _texto(sede_telefono)},
+        'cliente': {'nombre': _texto(cliente), 'direccion': _texto(direccion), 'telefono': _texto(telefono),
+                    'email': _texto(email)},
+        'vehiculo': {'marca': _texto(marca), 'modelo': _texto(modelo), 'anio': _texto(anio),
+                     'placa': _texto(placa)},
+        'cita': {'id': int(cita_id), 'fecha_hora': _texto(fecha_hora)[:16], 'descripcion': _texto(descripcion),
+                 'observaciones': _texto(observaciones)},
+        'lineas': [{'descripcion': _texto(servicio) or 'Servicio', 'cantidad': 1, 'importe': _importe(total)}],
+        'gravada': _importe(gravada),
+        'igv': _importe(total - gravada),
+        'tasa_igv': int(TASA_IGV * 100),
+        'total': _importe(total),
+    }
+
+
+def huella(datos):
+    """Resumen de los datos y de la versión de las plantillas"""
+    texto = json.dumps(datos, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(f"{VERSION_PLANTILLAS}|{texto}".encode('utf-8')).hexdigest()
+
+# ========================================
+# LOTE
+# ========================================
+
+def _generar(tarea):
+    """Genera y guarda los dos archivos de un comprobante (corre en los procesos del pool)"""
+    cita_id, datos, carpeta = tarea
+    almacen = AlmacenBlobs(carpeta)
+    sha256_html = almacen.guardar(io.BytesIO(render_html(datos)))[0]
+    sha256_pdf = almacen.guardar(io.BytesIO(render_pdf(datos)))[0]
+    return cita_id, sha256_html, sha256_pdf
+
+
+def _en_procesos(tareas, procesos):
+    if procesos is None:
+        procesos = os.cpu_count() or 1
+    if procesos <= 1 or len(tareas) < MINIMO_PARA_PROCESOS:
+        return [_generar(tarea) for tarea in tareas]
+    # Cada proceso compila las plantillas al arrancar y después solo las usa
+    contexto = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=contexto, initializer=_plantillas) as pool:
+        return list(pool.map(_generar, tareas, chunksize=max(1, len(tareas) // (procesos * 4))))
+
+
+def _filtro(dia, sede_id, cita_ids, motor='sqlite'):
+    condiciones, params = [], []
+    if dia is not None:
+        condiciones.append("c.fecha_hora >= ? AND c.fecha_hora < ?")
+        params += [_fecha_bd(dia, motor, '%Y-%m-%d'), _fecha_bd(dia + timedelta(days=1), motor, '%Y-%m-%d')]
+    if sede_id is not None:
+        condiciones.append("c.sede_id = ?")
+        params.append(int(sede_id))
+    if cita_ids is not None:
+        condiciones.append(f"c.id IN ({','.join('?' * len(cita_ids))})")
+        params += [int(i) for i in cita_ids]
+    return ' AND '.join(condiciones), params
+
+
+def facturar(destino, almacen, dia=None, sede_id=None, cita_ids=None, procesos=None, forzar=False):
+    """Genera los comprobantes de las citas completadas del día (o de cita_ids) que cambiaron
+
+    Devuelve {'generados', 'sin_cambios', 'segundos'}. Las citas sin comprobante
+    reciben número en la primera pasada; forzar=True regenera todo.
+    """
+    if dia is None and cita_ids is None:
+        dia = date.today()
+    if cita_ids is not None and not cita_ids:
+        return {'generados': 0, 'sin_cambios': 0, 'segundos': 0.0}
+    motor = motor_de(destino)
+    filtro, params = _filtro(dia, sede_id, cita_ids, motor)
+    consulta = _consulta_citas(filtro)
+    params = params * 2
+    inicio = time.perf_counter()
+
+    def _preparar(conn):
+        cursor = conn.cursor()
+        cursor.execute(consulta, params)
+        filas = [tuple(fila) for fila in cursor.fetchall()]
+        emision = _fecha_bd(datetime.now().replace(microsecond=0), motor)
+        faltan = [fila for fila in filas if fila[19] is None]
+        for fila in faltan:
+            serie = serie_de_sede(fila[5])
+            cursor.execute(_RESERVAR, (fila[0], fila[5], serie, emision, serie))
+        if faltan:
+            cursor.execute(consulta, params)
+            filas = [tuple(fila) for fila in cursor.fetchall()]
+        return filas
+
+    filas = en_transaccion(destino, _preparar)
+
+    tareas, sin_cambios = [], 0
+    for fila in filas:
+        datos = datos_comprobante(fila)
+        actual = huella(datos)
+        guardados = fila[23:25]
+        if (not forzar and fila[22] == actual
+                and all(sha256 and almacen.existe(sha256) for sha256 in guardados)):
+            sin_cambios += 1
+            continue
+        tareas.append((fila[0], datos, almacen.carpeta, actual))
+
+    resultados = _en_procesos([tarea[:3] for tarea in tareas], procesos)
+
+    if resultados:
+        totales = {tarea[0]: (tarea[1]['total'].replace(',', ''), tarea[3]) for tarea in tareas}
+        ahora = _fecha_bd(datetime.now().replace(microsecond=0), motor)
+
+        def _anotar(conn):
+            cursor = conn.cursor()
+            cursor.executemany(_ANOTAR, [(totales[cita_id][0], totales[cita_id][1], sha256_html, sha256_pdf,
+                                          ahora, cita_id)
+                                         for cita_id, sha256_html, sha256_pdf in resultados])
+
+        en_transaccion(destino, _anotar)
+    return {'generados': len(resultados), 'sin_cambios': sin_cambios,
+            'segundos': time.perf_counter() - inicio}
+
+
+def comprobantes_del_dia(origen, dia, sede_id=None):
+    """Comprobantes de las citas del día; devuelve (columnas, filas)"""
+    filtro, params = _filtro(dia, sede_id, None, motor_de(origen))
+    with conexion_lectura(origen) as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT co.serie, co.correlativo, co.cita_id, cl.nombre, s.nombre, co.total, co.fecha_emision,
+                   co.sha256_html, co.sha256_pdf
+            FROM Comprobantes co
+            JOIN {_ORIGEN_CITAS.format(filtro=filtro)} c ON c.id = co.cita_id
+            JOIN Clientes cl ON cl.id = c.cliente_id
+            LEFT JOIN Servicios s ON s.id = c.servicio_id
+            WHERE co.sha256_pdf IS NOT NULL
+            ORDER BY co.serie, co.correlativo
+        """, params * 2)
+        filas = [(f"{serie}-{int(correlativo):08d}", *resto) for serie, correlativo, *resto in cursor.fetchall()]
+    return COLUMNAS_COMPROBANTE, filas
+
+# ========================================
+# BENCHMARK
+# ========================================
+
+def _benchmark(citas, procesos=None):
+    """Un día con `citas` completadas: plantillas en caché vs compiladas cada vez, serie vs pool,
+    segunda pasada sin cambios y cambios sueltos"""
+    from migraciones import migrar_sqlite
+
+    procesos = procesos or os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, 'facturacion.db')
+        migrar_sqlite(ruta)
+        conn = sqlite3.connect(ruta)
+        conn.executemany("INSERT INTO Clientes (nombre, telefono, email, direccion) VALUES (?, ?, ?, ?)",
+                         [(f"Cliente {i}", f"9{i:08d}", f"cliente{i}@correo.pe", f"Av. Arequipa {i}, Lince")
+                          for i in range(500)])
+        conn.executemany("INSERT INTO Vehiculos (cliente_id, marca, modelo, año, placa) VALUES (?, ?, ?, ?, ?)",
+                         [(i + 1, random.choice(('Toyota', 'Kia', 'Hyundai', 'Nissan')), 'Modelo', 2015 + i % 9,
+                           f"ABC-{i:03d}") for i in range(500)])
+        hoy = date.today()
+        inicio = datetime.combine(hoy, datetime.min.time()) + timedelta(hours=7)
+        conn.executemany(
+            "INSERT INTO Citas (cliente_id, vehiculo_id, servicio_id, fecha_hora, estado, costo_total, "
+            "descripcion_problema) VALUES (?, ?, ?, ?, 'Completado', ?, ?)",
+            [(i % 500 + 1, i % 500 + 1, random.randint(1, 8),
+              (inicio + timedelta(seconds=i * 12 * 3600 // citas)).strftime(_FORMATO),
+              random.choice((None, round(random.uniform(80, 1500), 2))), "Ruido al frenar (revisar pastillas)")
+             for i in range(citas)])
+        conn.commit()
+
+        fila = conn.execute(_consulta_citas("1 = 1") + " LIMIT 1").fetchone()
+        datos = datos_comprobante(fila[:19] + ('F001', 1, inicio) + (None,) * 3)
+        render_pdf(datos)
+        t0 = time.perf_counter()
+        for _ in range(100):
+            render_html(datos)
+            render_pdf(datos)
+        en_cache = (time.perf_counter() - t0) / 100 * 1000
+        t0 = time.perf_counter()
+        for _ in range(20):
+            _plantillas.cache_clear()
+            render_html(datos)
+            render_pdf(datos)
+        compilando = (time.perf_counter() - t0) / 20 * 1000
+        print(f"Un comprobante (HTML + PDF): {en_cache:.2f} ms con plantillas en caché, "
+              f"{compilando:.2f} ms compilándolas cada vez")
+
+        almacen = AlmacenBlobs(os.path.join(carpeta, 'adjuntos'))
+        serie = facturar(conn, almacen, hoy, procesos=1, forzar=True)
+        print(f"{citas:,} comprobantes en serie:          {serie['segundos']:6.2f} s")
+        if procesos > 1:
+            pool = facturar(conn, almacen, hoy, procesos=procesos, forzar=True)
+            print(f"{citas:,} comprobantes en {procesos} procesos:      {pool['segundos']:6.2f} s")
+        else:
+            print("(un solo CPU: el pool de procesos no tiene con qué repartir)")
+        otra = facturar(conn, almacen, hoy)
+        print(f"Segunda pasada: {otra['generados']} generados, {otra['sin_cambios']:,} sin cambios "
+              f"en {otra['segundos']:.2f} s")
+        assert otra['generados'] == 0
+
+        cambiadas = [f[0] for f in conn.execute("SELECT id FROM Citas ORDER BY random() LIMIT 10")]
+        conn.executemany("UPDATE Citas SET costo_total = 999.90 WHERE id = ?", [(i,) for i in cambiadas])
+        conn.execute("UPDATE Clientes SET nombre = 'Cliente renombrado' WHERE id = ?", (cambiadas[0] % 500 + 1,))
+        conn.commit()
+        tras_cambios = facturar(conn, almacen, hoy)
+        print(f"Tras cambiar 10 citas y un cliente: {tras_cambios['generados']} generados, "
+              f"{tras_cambios['sin_cambios']:,} sin cambios en {tras_cambios['segundos']:.2f} s")
+
+        columnas, filas = comprobantes_del_dia(conn, hoy)
+        numeros = [f[0] for f in filas]
+        archivos = sum(1 for _ in almacen.hashes())
+        print(f"{len(numeros):,} comprobantes numerados ({numeros[0]} a {numeros[-1]}), "
+              f"{archivos:,} archivos en el almacén")
+        assert len(set(numeros)) == len(numeros) == citas
+        with open(almacen.ruta(filas[0][-1]), 'rb') as f:
+            assert f.read(5) == b'%PDF-'
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Comprobantes de pago de las citas completadas")
+    parser.add_argument('--db', default='taller_automotriz.db', help="Archivo SQLite")
+    parser.add_argument('--carpeta', default='adjuntos', help="Almacén de adjuntos")
+    parser.add_argument('--dia', type=date.fromisoformat, default=date.today(), help="AAAA-MM-DD")
+    parser.add_argument('--sede', type=int, help="Solo esta sede")
+    parser.add_argument('--procesos', type=int, help="Procesos del pool (por defecto, uno por CPU)")
+    parser.add_argument('--forzar', action='store_true', help="Regenerar aunque no haya cambios")
+    parser.add_argument('--benchmark', type=int, metavar='N', help="Medir con N citas en un día")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        _benchmark(args.benchmark, args.procesos)
+        return
+
+    conn = sqlite3.connect(args.db)
+    try:
+        resumen = facturar(conn, AlmacenBlobs(args.carpeta), args.dia, args.sede, procesos=args.procesos,
+                           forzar=args.forzar)
+        print(f"{resumen['generados']} generados, {resumen['sin_cambios']} sin cambios "
+              f"({resumen['segundos']:.2f} s)")
+        columnas, filas = comprobantes_del_dia(conn, args.dia, args.sede)
+        for fila in filas:
+            print(dict(zip(columnas, fila)))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+# ========================================
+# ENVÍOS IDEMPOTENTES DE FORMULARIOS
+# Taller Automotriz - Sistema de Gestión
+# ========================================
+
+"""
+Un doble clic en "📅 Confirmar Cita" o "Agregar Item", o un rerun de
+Streamlit con el botón todavía presionado, vuelve a ejecutar la rama del
+envío y duplicaba clientes, citas e items.
+
+Cada envío lleva una clave: la instancia del formulario en la sesión (un
+uuid guardado en st.session_state) más una huella de los datos enviados.
+una_vez() busca la clave en Idempotencia dentro de la misma transacción de
+la escritura: si ya está (y no venció su TTL) devuelve el resultado del
+primer envío sin volver a insertar; si no, escribe y guarda la clave con
+el resultado. Si dos envíos iguales llegan a la vez, la clave primaria deja
+pasar uno y el otro se deshace y devuelve el resultado guardado.
+
+Solo se guardan los envíos que terminaron bien: si la escritura falla (por
+ejemplo, horario ocupado) la transacción se deshace con la clave y el
+usuario puede reintentar.
+
+En SQL Server la reserva completa va en sp_agendar_cita (migración 0018),
+que aplica la misma regla en una sola llamada.
+
+Uso:
+    clave = clave_formulario(st.session_state, 'agendar_cita', nombre, telefono, fecha_hora)
+    cita_id, repetido = una_vez(db, clave, registrar_cita)
+    python idempotencia.py --estres 16
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from bd_sqlite import BaseDatosSQLite, en_transaccion
+
+# Segundos que una clave sigue valiendo: cubre reintentos y conexiones lentas,
+# no la carga legítima del mismo dato un rato después
+TTL_IDEMPOTENCIA = 600
+_FORMATO = '%Y-%m-%d %H:%M:%S'
+
+
+def clave_formulario(sesion, formulario, *valores):
+    """Clave del envío: instancia del formulario en la sesión + huella de los datos
+
+    La instancia se crea la primera vez y dura lo que la sesión: dos clics con
+    los mismos datos dan la misma clave; si el usuario cambia algún dato, es
+    otro envío.
+    """
+    marca = f'_idempotencia_{formulario}'
+    if marca not in sesion:
+        sesion[marca] = uuid.uuid4().hex
+    datos = json.dumps(valores, default=str, ensure_ascii=False)
+    huella = hashlib.sha1(f'{sesion[marca]}|{datos}'.encode('utf-8')).hexdigest()
+    return f'{formulario}:{huella}'
+
+
+def clave_repetida(error):
+    """True si el error de la base es el de una clave de idempotencia ya guardada"""
+    return 'Idempotencia' in str(error)
+
+
+def _guardado(conn, clave):
+    fila = conn.execute("SELECT resultado FROM Idempotencia WHERE clave = ?", (clave,)).fetchone()
+    return None if fila is None else (json.loads(fila[0]),)
+
+
+def una_vez(destino, clave, funcion, ttl=TTL_IDEMPOTENCIA):
+    """Ejecuta funcion(conn) en una transacción si `clave` no se usó en los últimos ttl segundos
+
+    Devuelve (resultado, repetido). El resultado tiene que poder pasarse a
+    JSON (un id, una tupla de ids); funcion lanza una excepción para que la
+    escritura y la clave se deshagan juntas.
+    """
+    def _escribir(conn):
+        ahora = datetime.utcnow()
+        # El DELETE abre la transacción de escritura antes de buscar la clave
+        conn.execute("DELETE FROM Idempotencia WHERE creado_en < ?",
+                     ((ahora - timedelta(seconds=ttl)).strftime(_FORMATO),))
+        guardado = _guardado(conn, clave)
+        if guardado is not None:
+            return guardado[0], True
+        resultado = funcion(conn)
+        conn.execute("INSERT INTO Idempotencia (clave, resultado, creado_en) VALUES (?, ?, ?)",
+                     (clave, json.dumps(resultado), ahora.strftime(_FORMATO)))
+        return resultado, False
+
+    try:
+        return en_transaccion(destino, _escribir)
+    except Exception as e:
+        if not clave_repetida(e):
+            raise
+    # Otro envío con la misma clave ganó la carrera: su resultado es el nuestro
+    guardado = en_transaccion(destino, lambda conn: _guardado(conn, clave))
+    if guardado is None:
+        raise RuntimeError(f"Clave de idempotencia en conflicto sin resultado: {clave}")
+    return guardado[0], True
+
+# ========================================
+# PRUEBA DE ESTRÉS
+# ========================================
+
+def _estres(hilos=16, envios=50, ttl=TTL_IDEMPOTENCIA):
+    """Cada envío llega `hilos` veces a la vez (doble clic, reruns): se escribe una sola vez"""
+    from concurrencia import _en_paralelo, insertar_cita
+    from migraciones import migrar_sqlite
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, 'idempotencia.db')
+        migrar_sqlite(ruta)
+        conn = sqlite3.connect(ruta)
+        # Los datos iniciales ya traen algunos clientes
+        clientes_previos = conn.execute("SELECT COUNT(*) FROM Clientes").fetchone()[0]
+        sesion = {}
+
+        def _registrar(numero):
+            def _cita(conn):
+                cliente_id = conn.execute("INSERT INTO Clientes (nombre, telefono) VALUES (?, ?)",
+                                          (f'Cliente {numero}', f'9{numero:08d}')).lastrowid
+                vehiculo_id = conn.execute(
+                    "INSERT INTO Vehiculos (cliente_id, marca, modelo, año) VALUES (?, 'Toyota', 'Yaris', 2020)",
+                    (cliente_id,)).lastrowid
+                return insertar_cita(conn, cliente_id, vehiculo_id, 1,
+                                     f"2030-01-{1 + numero // 8:02d} {8 + numero % 8:02d}:00:00")
+            return _cita
+
+        claves = [clave_formulario(sesion, 'agendar_cita', f'Cliente {n}', n) for n in range(envios)]
+
+        # Conexiones propias por hilo: compiten transacciones de verdad
+        def _enviar(indice, conn):
+            return [una_vez(conn, claves[n], _registrar(n), ttl) for n in range(envios)]
+
+        t0 = time.perf_counter()
+        respuestas = _en_paralelo(ruta, hilos, _enviar)
+        segundos = time.perf_counter() - t0
+        clientes, citas = conn.execute("SELECT (SELECT COUNT(*) FROM Clientes) - ?, (SELECT COUNT(*) FROM Citas)",
+                                       (clientes_previos,)).fetchone()
+        primeros = sum(not repetido for lista in respuestas for _, repetido in lista)
+        distintos = {n: {cita for cita, _ in (lista[n] for lista in respuestas)} for n in range(envios)}
+        print(f"{envios} envíos x {hilos} clics simultáneos: {clientes} clientes, {citas} citas, "
+              f"{primeros} escrituras, {hilos * envios - primeros} repetidos ({segundos:.2f} s)")
+        assert clientes == citas == primeros == envios
+        assert all(len(ids) == 1 for ids in distintos.values())
+
+        # Mismo envío por el hilo escritor de la app
+        db = BaseDatosSQLite(ruta)
+        try:
+            assert una_vez(db, claves[0], _registrar(0))[1]
+            nueva = clave_formulario(sesion, 'agendar_cita', 'Cliente nuevo', envios)
+            cita_id, repetido = una_vez(db, nueva, _registrar(envios))
+            assert not repetido and una_vez(db, nueva, _registrar(envios)) == (cita_id, True)
+        finally:
+            db.cerrar()
+
+        # Vencido el TTL la clave se borra y el mismo envío vuelve a escribir
+        conn.execute("UPDATE Idempotencia SET creado_en = datetime(creado_en, ?)", (f'-{ttl + 1} seconds',))
+        conn.commit()
+        otra, repetido = una_vez(conn, claves[0], lambda c: c.execute(
+            "INSERT INTO Clientes (nombre, telefono) VALUES ('Vencido', '900000000')").lastrowid, ttl)
+        vigentes = conn.execute("SELECT COUNT(*) FROM Idempotencia").fetchone()[0]
+        print(f"Tras el TTL: nueva escritura ({otra}), {vigentes} claves vigentes")
+        assert not repetido and vigentes == 1
+        conn.close()
+    print("OK: una escritura por envío, los repetidos devuelven el primer resultado")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Envíos idempotentes de formularios")
+    parser.add_argument('--estres', type=int, metavar='HILOS', default=16,
+                        help="Envíos simultáneos de cada formulario")
+    parser.add_argument('--envios', type=int, default=50, help="Formularios distintos")
+    args = parser.parse_args()
+    _estres(args.estres, args.envios)
+
+
+if __name__ == "__main__":
+    main()
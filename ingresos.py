@@ -0,0 +1,333 @@
+# ========================================
+# INGRESOS POR PERÍODO
+# Taller Automotriz - Sistema de Gestión
+# ========================================
+
+"""
+Serie de ingresos de las citas completadas por hora, día, semana o mes, para
+la tarjeta "💰 Ingresos Hoy" y el gráfico de ingresos del panel.
+
+Los triggers de la migración mantienen IngresosPeriodo al completar, editar
+o reprogramar una cita: cada cita completada suma su costo_total (o el
+precio del servicio, como sp_reporte_servicios_populares) a sus cuatro
+períodos. Leer un rango cuesta una fila por período, no una por cita.
+
+elegir_grano() toma el grano más fino que no pase de MAX_PUNTOS en el rango:
+horas para unos días, días para unos meses, semanas o meses para varios
+años. El gráfico recibe como mucho unos cientos de puntos.
+
+Las citas archivadas siguen contando (no hay trigger de borrado). Si se
+borran citas a mano o cambia el precio de un servicio usado como respaldo,
+reconstruir_ingresos() recalcula todo desde Citas y CitasHistorico.
+
+Uso:
+    grano, serie = serie_ingresos(db, date(2023, 1, 1), date.today(), sede_id=1)
+    citas, ingresos = ingresos_del_dia(db, sede_id=1)
+    st.plotly_chart(grafico_ingresos(grano, serie))
+    python ingresos.py --db taller_automotriz.db --dias 90
+    python ingresos.py --benchmark 200000
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+import plotly.express as px
+
+from bd_sqlite import conexion_lectura, en_transaccion
+from migraciones import motor_de
+
+# Del más fino al más grueso
+GRANOS = ('hora', 'dia', 'semana', 'mes')
+MAX_PUNTOS = 400
+
+NOMBRES_GRANO = {'hora': 'hora', 'dia': 'día', 'semana': 'semana', 'mes': 'mes'}
+_PASOS = {'hora': pd.offsets.Hour(), 'dia': pd.offsets.Day(),
+          'semana': pd.offsets.Week(weekday=0), 'mes': pd.offsets.MonthBegin()}
+
+COLUMNAS_SERIE = ['periodo', 'citas', 'ingresos']
+
+_SERIE = """
+SELECT periodo, SUM(citas) AS citas, SUM(ingresos) AS ingresos
+FROM IngresosPeriodo
+WHERE grano = ? AND periodo >= ? AND periodo < ?{sede}
+GROUP BY periodo
+ORDER BY periodo
+"""
+
+_DIA = """
+SELECT SUM(citas), SUM(ingresos)
+FROM IngresosPeriodo
+WHERE grano = 'dia' AND periodo = ?{sede}
+"""
+
+# Igual que el llenado inicial de la migración
+_RECONSTRUIR = """
+INSERT INTO IngresosPeriodo (grano, periodo, sede_id, citas, ingresos)
+SELECT g.grano,
+       CASE g.grano
+           WHEN 'hora' THEN strftime('%Y-%m-%d %H:00:00', c.fecha_hora)
+           WHEN 'dia' THEN date(c.fecha_hora)
+           WHEN 'semana' THEN date(c.fecha_hora, 'weekday 0', '-6 days')
+           ELSE strftime('%Y-%m-01', c.fecha_hora)
+       END AS periodo,
+       c.sede_id, COUNT(*), SUM(c.monto)
+FROM (SELECT c.fecha_hora, c.sede_id, COALESCE(c.costo_total, s.precio, 0) AS monto
+      FROM Citas c LEFT JOIN Servicios s ON s.id = c.servicio_id
+      WHERE c.estado = 'Completado'
+      UNION ALL
+      SELECT h.fecha_hora, h.sede_id, COALESCE(h.costo_total, s.precio, 0)
+      FROM CitasHistorico h LEFT JOIN Servicios s ON s.id = h.servicio_id
+      WHERE h.estado = 'Completado') c
+CROSS JOIN (SELECT 'hora' AS grano UNION ALL SELECT 'dia' UNION ALL SELECT 'semana' UNION ALL SELECT 'mes') g
+WHERE c.fecha_hora IS NOT NULL
+GROUP BY g.grano, periodo, c.sede_id
+"""
+
+
+def _momento(valor):
+    if isinstance(valor, datetime):
+        return valor
+    return datetime.combine(valor, datetime.min.time())
+
+
+def inicio_periodo(momento, grano):
+    """Comienzo del período de `grano` que contiene a `momento` (la semana empieza el lunes)"""
+    momento = _momento(momento)
+    if grano == 'hora':
+        return momento.replace(minute=0, second=0, microsecond=0)
+    dia = momento.replace(hour=0, minute=0, second=0, microsecond=0)
+    if grano == 'dia':
+        return dia
+    if grano == 'semana':
+        return dia - timedelta(days=dia.weekday())
+    if grano == 'mes':
+        return dia.replace(day=1)
+    raise ValueError(f"Grano desconocido: {grano}")
+
+
+def _valor_periodo(momento, grano, motor):
+    """Límite de período como parámetro: en SQLite, el texto que guardan los triggers; en
+    SQL Server, datetime (un texto contra DATETIME depende del DATEFORMAT del login)"""
+    if motor == 'sqlserver':
+        if grano == 'hora':
+            return momento.replace(minute=0, second=0, microsecond=0)
+        return momento.replace(hour=0, minute=0, second=0, microsecond=0)
+    if grano == 'hora':
+        return momento.strftime('%Y-%m-%d %H:00:00')
+    return momento.strftime('%Y-%m-%d')
+
+
+def _rango(desde, hasta):
+    """[inicio, fin) en datetime; una fecha `hasta` incluye el día completo"""
+    fin = _momento(hasta)
+    if not isinstance(hasta, datetime):
+        fin += timedelta(days=1)
+    return _momento(desde), fin
+
+
+def _puntos(inicio, fin, grano):
+    return len(pd.date_range(inicio_periodo(inicio, grano), fin - timedelta(microseconds=1),
+                             freq=_PASOS[grano]))
+
+
+def elegir_grano(desde, hasta, max_puntos=MAX_PUNTOS):
+    """El grano más fino con el que el rango tiene a lo sumo max_puntos períodos"""
+    inicio, fin = _rango(desde, hasta)
+    for grano in GRANOS[:-1]:
+        if _puntos(inicio, fin, grano) <= max_puntos:
+            return grano
+    return GRANOS[-1]
+
+
+def serie_ingresos(origen, desde, hasta, sede_id=None, grano=None, max_puntos=MAX_PUNTOS):
+    """(grano, DataFrame periodo/citas/ingresos) del rango, con ceros en los períodos sin ventas
+
+    sede_id None suma todas las sedes; grano None lo elige según el rango.
+    """
+    inicio, fin = _rango(desde, hasta)
+    grano = grano or elegir_grano(inicio, fin, max_puntos)
+    if grano not in GRANOS:
+        raise ValueError(f"Grano desconocido: {grano}")
+    motor = motor_de(origen)
+    params = [grano, _valor_periodo(inicio_periodo(inicio, grano), grano, motor),
+              _valor_periodo(fin, grano, motor)]
+    if fin != inicio_periodo(fin, grano):
+        # El último período queda incluido aunque el rango termine a la mitad
+        params[2] = _valor_periodo(inicio_periodo(fin, grano) + _PASOS[grano], grano, motor)
+    filtro = ''
+    if sede_id is not None:
+        filtro = ' AND sede_id = ?'
+        params.append(int(sede_id))
+
+    with conexion_lectura(origen) as conn:
+        cursor = conn.cursor()
+        cursor.execute(_SERIE.format(sede=filtro), params)
+        filas = [tuple(fila) for fila in cursor.fetchall()]
+
+    periodos = pd.date_range(inicio_periodo(inicio, grano), fin - timedelta(microseconds=1),
+                             freq=_PASOS[grano], name='periodo')
+    datos = pd.DataFrame(filas, columns=COLUMNAS_SERIE)
+    datos['periodo'] = pd.to_datetime(datos['periodo'])
+    serie = (datos.set_index('periodo')
+             .reindex(periodos, fill_value=0)
+             .astype({'citas': 'int64', 'ingresos': 'float64'})
+             .reset_index())
+    return grano, serie
+
+
+def ingresos_del_dia(origen, sede_id=None, dia=None):
+    """(citas completadas, ingresos) del día (hoy por defecto) en una sede o en todas"""
+    params = [_valor_periodo(_momento(dia or date.today()), 'dia', motor_de(origen))]
+    filtro = ''
+    if sede_id is not None:
+        filtro = ' AND sede_id = ?'
+        params.append(int(sede_id))
+    with conexion_lectura(origen) as conn:
+        cursor = conn.cursor()
+        cursor.execute(_DIA.format(sede=filtro), params)
+        citas, ingresos = cursor.fetchone()
+    return int(citas or 0), float(ingresos or 0)
+
+
+def reconstruir_ingresos(destino):
+    """Recalcula IngresosPeriodo desde las citas activas y archivadas"""
+    if motor_de(destino) == 'sqlserver':
+        cursor = destino.cursor()
+        cursor.execute("EXEC sp_reconstruir_ingresos")
+        destino.commit()
+        return
+
+    def _reconstruir(conn):
+        conn.execute("DELETE FROM IngresosPeriodo")
+        conn.execute(_RECONSTRUIR)
+
+    en_transaccion(destino, _reconstruir)
+
+
+def grafico_ingresos(grano, serie, titulo="Ingresos"):
+    """Figura de Plotly de la serie (un punto por período)"""
+    fig = px.line(serie, x='periodo', y='ingresos', hover_data=['citas'],
+                  markers=len(serie) <= 60,
+                  labels={'periodo': NOMBRES_GRANO[grano].capitalize(), 'ingresos': 'Ingresos (S/.)',
+                          'citas': 'Citas'},
+                  title=f"{titulo} por {NOMBRES_GRANO[grano]}")
+    fig.update_layout(hovermode='x unified')
+    return fig
+
+# ========================================
+# BENCHMARK
+# ========================================
+
+_CRUDA = """
+SELECT {periodo} AS periodo, COUNT(*), SUM(COALESCE(c.costo_total, s.precio, 0))
+FROM Citas c LEFT JOIN Servicios s ON s.id = c.servicio_id
+WHERE c.estado = 'Completado' AND c.fecha_hora >= ? AND c.fecha_hora < ?
+GROUP BY 1
+ORDER BY 1
+"""
+_PERIODO_CRUDO = {
+    'hora': "strftime('%Y-%m-%d %H:00:00', c.fecha_hora)",
+    'dia': "date(c.fecha_hora)",
+    'semana': "date(c.fecha_hora, 'weekday 0', '-6 days')",
+    'mes': "strftime('%Y-%m-01', c.fecha_hora)",
+}
+
+
+def _benchmark(citas, años=3, repeticiones=5):
+    """Citas completadas repartidas en varios años: serie desde Citas vs desde IngresosPeriodo"""
+    from archivado import archivar_citas
+    from migraciones import migrar_sqlite
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, 'ingresos.db')
+        migrar_sqlite(ruta)
+        conn = sqlite3.connect(ruta)
+        hoy = datetime.combine(date.today(), datetime.min.time())
+        inicio = hoy - timedelta(days=365 * años)
+        paso = 365 * años * 86400 / citas
+        filas = [(random.randint(1, 3), random.randint(1, 8),
+                  # Segundos pares: las reprogramadas (+1 s) no chocan con otro horario
+                  (inicio + timedelta(seconds=int(i * paso) // 2 * 2)).strftime('%Y-%m-%d %H:%M:%S'),
+                  random.choice(('Completado', 'Completado', 'Completado', 'Cancelado')),
+                  random.choice((None, round(random.uniform(50, 900), 2))))
+                 for i in range(citas)]
+        t0 = time.perf_counter()
+        conn.executemany("INSERT INTO Citas (cliente_id, vehiculo_id, servicio_id, fecha_hora, estado, costo_total) "
+                         "VALUES (?, 1, ?, ?, ?, ?)", filas)
+        conn.commit()
+        print(f"{citas:,} citas en {años} años insertadas con los triggers en {time.perf_counter() - t0:.2f} s "
+              f"({conn.execute('SELECT COUNT(*) FROM IngresosPeriodo').fetchone()[0]:,} filas de IngresosPeriodo)")
+
+        print(f"{'rango':<10}{'grano':>8}{'puntos':>8}{'desde Citas ms':>16}{'agregado ms':>13}")
+        for dias in (2, 30, 365, 365 * años):
+            desde = hoy - timedelta(days=dias)
+            grano, serie = serie_ingresos(conn, desde, hoy)
+            t0 = time.perf_counter()
+            for _ in range(repeticiones):
+                cruda = conn.execute(_CRUDA.format(periodo=_PERIODO_CRUDO[grano]),
+                                     (inicio_periodo(desde, grano).strftime('%Y-%m-%d %H:%M:%S'),
+                                      hoy.strftime('%Y-%m-%d %H:%M:%S'))).fetchall()
+            ms_cruda = (time.perf_counter() - t0) / repeticiones * 1000
+            t0 = time.perf_counter()
+            for _ in range(repeticiones):
+                serie_ingresos(conn, desde, hoy, grano=grano)
+            ms_agregado = (time.perf_counter() - t0) / repeticiones * 1000
+            print(f"{f'{dias} días':<10}{grano:>8}{len(serie):>8}{ms_cruda:>16.1f}{ms_agregado:>13.1f}")
+            assert int(serie['citas'].sum()) == sum(fila[1] for fila in cruda)
+            assert abs(serie['ingresos'].sum() - sum(fila[2] for fila in cruda)) < 0.01 * len(cruda) + 0.01
+
+        # Cambios sobre citas ya completadas, archivado y reconstrucción: el agregado no se mueve de lo real
+        ids = [fila[0] for fila in conn.execute("SELECT id FROM Citas ORDER BY random() LIMIT 200")]
+        with conn:
+            conn.executemany("UPDATE Citas SET costo_total = 123.45 WHERE id = ?", [(i,) for i in ids[:50]])
+            conn.executemany("UPDATE Citas SET estado = 'Cancelado' WHERE id = ?", [(i,) for i in ids[50:100]])
+            conn.executemany("UPDATE Citas SET estado = 'Completado' WHERE id = ?", [(i,) for i in ids[100:150]])
+            conn.executemany("UPDATE Citas SET fecha_hora = datetime(fecha_hora, '+40 days', '+1 seconds') "
+                             "WHERE id = ?", [(i,) for i in ids[150:]])
+        antes = serie_ingresos(conn, inicio, hoy + timedelta(days=60), grano='mes')[1]
+        archivadas = archivar_citas(conn, meses=12)
+        despues = serie_ingresos(conn, inicio, hoy + timedelta(days=60), grano='mes')[1]
+        reconstruir_ingresos(conn)
+        reconstruida = serie_ingresos(conn, inicio, hoy + timedelta(days=60), grano='mes')[1]
+        iguales = (antes['citas'].equals(despues['citas']) and antes['citas'].equals(reconstruida['citas'])
+                   and (antes['ingresos'] - reconstruida['ingresos']).abs().max() < 0.01)
+        print(f"Tras 200 ediciones y {archivadas:,} citas archivadas: "
+              f"{'✅ igual' if iguales else '❌ distinto'} a recalcular desde cero")
+        assert iguales
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingresos por hora, día, semana y mes")
+    parser.add_argument('--db', default='taller_automotriz.db', help="Archivo SQLite")
+    parser.add_argument('--dias', type=int, default=30, help="Días hacia atrás")
+    parser.add_argument('--sede', type=int, help="Solo esta sede")
+    parser.add_argument('--grano', choices=GRANOS, help="Grano fijo (por defecto según el rango)")
+    parser.add_argument('--reconstruir', action='store_true', help="Recalcular el agregado desde las citas")
+    parser.add_argument('--benchmark', type=int, metavar='N', help="Comparar con N citas en 3 años")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        _benchmark(args.benchmark)
+        return
+
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.reconstruir:
+            reconstruir_ingresos(conn)
+        hoy = date.today()
+        grano, serie = serie_ingresos(conn, hoy - timedelta(days=args.dias), hoy, args.sede, args.grano)
+        print(f"{len(serie)} puntos por {NOMBRES_GRANO[grano]}")
+        print(serie.to_string(index=False))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,478 @@
+# ========================================
+# MAPA DE CLIENTES POR DISTRITO
+# Taller Automotriz - Sistema de Gestión
+# ========================================
+
+"""
+Ubica a los clientes a partir de Clientes.direccion con un nomenclátor local
+(distritos de Lima y Callao, sin servicios externos) y arma el mapa con los
+clientes ya agregados por distrito o por celda de la grilla.
+
+- Geocodificación: la dirección se normaliza (minúsculas, sin tildes) y se
+  busca el distrito en sus partes, de derecha a izquierda ("..., Surco,
+  Lima" -> Santiago de Surco). GeocodificacionCache guarda cada dirección
+  normalizada ya resuelta, y ClientesUbicacion la ubicación de cada cliente:
+  solo se procesan los clientes nuevos o con la dirección cambiada.
+- Lugares propios: un CSV (TALLER_NOMENCLATOR: nombre,distrito,lat,lon) con
+  urbanizaciones, avenidas o mercados da puntos más finos que el distrito.
+- Mapa: la base devuelve un conteo por punto del nomenclátor (decenas de
+  filas aunque haya decenas de miles de clientes) y el navegador recibe un
+  marcador por distrito o celda. MarkerCluster los agrupa al alejar el zoom
+  y cada grupo muestra la suma de clientes, no la cantidad de marcadores.
+
+Uso:
+    actualizar_ubicaciones(db, nomenclator_desde())   # + lugares de TALLER_NOMENCLATOR
+    puntos, sin_ubicar = agregado_clientes(db, nivel='distrito')
+    mapa = mapa_clientes(puntos)
+    python mapa_clientes.py --benchmark 50000
+"""
+
+import argparse
+import csv
+import hashlib
+import math
+import os
+import re
+import tempfile
+import time
+import unicodedata
+
+from bd_sqlite import conexion_lectura, en_transaccion
+
+LOTE_POR_DEFECTO = 5000
+# Grado de latitud/longitud por celda (0.02° ≈ 2.2 km en Lima)
+TAMANO_CELDA = 0.02
+NIVELES = ('distrito', 'celda')
+CENTRO_LIMA = (-12.0700, -77.0300)
+
+# Centro aproximado de cada distrito de Lima Metropolitana y el Callao
+DISTRITOS = {
+    'Ancón': (-11.7731, -77.1753),
+    'Ate': (-12.0264, -76.9186),
+    'Barranco': (-12.1494, -77.0211),
+    'Breña': (-12.0597, -77.0500),
+    'Carabayllo': (-11.8500, -77.0333),
+    'Chaclacayo': (-11.9833, -76.7667),
+    'Chorrillos': (-12.1689, -77.0150),
+    'Cieneguilla': (-12.0750, -76.7833),
+    'Comas': (-11.9333, -77.0500),
+    'El Agustino': (-12.0431, -76.9981),
+    'Independencia': (-11.9914, -77.0514),
+    'Jesús María': (-12.0761, -77.0450),
+    'La Molina': (-12.0867, -76.9344),
+    'La Victoria': (-12.0681, -77.0167),
+    'Lima': (-12.0464, -77.0428),
+    'Lince': (-12.0836, -77.0353),
+    'Los Olivos': (-11.9900, -77.0700),
+    'Lurigancho': (-11.9367, -76.6967),
+    'Lurín': (-12.2747, -76.8706),
+    'Magdalena del Mar': (-12.0908, -77.0700),
+    'Miraflores': (-12.1211, -77.0297),
+    'Pachacámac': (-12.2300, -76.8600),
+    'Pucusana': (-12.4811, -76.7964),
+    'Pueblo Libre': (-12.0750, -77.0633),
+    'Puente Piedra': (-11.8667, -77.0767),
+    'Punta Hermosa': (-12.3361, -76.8233),
+    'Punta Negra': (-12.3650, -76.7950),
+    'Rímac': (-12.0278, -77.0306),
+    'San Bartolo': (-12.3875, -76.7806),
+    'San Borja': (-12.1000, -76.9975),
+    'San Isidro': (-12.0977, -77.0365),
+    'San Juan de Lurigancho': (-11.9767, -77.0003),
+    'San Juan de Miraflores': (-12.1581, -76.9703),
+    'San Luis': (-12.0753, -76.9958),
+    'San Martín de Porres': (-12.0100, -77.0600),
+    'San Miguel': (-12.0772, -77.0828),
+    'Santa Anita': (-12.0433, -76.9708),
+    'Santa María del Mar': (-12.4047, -76.7750),
+    'Santa Rosa': (-11.8011, -77.1633),
+    'Santiago de Surco': (-12.1450, -76.9917),
+    'Surquillo': (-12.1131, -77.0197),
+    'Villa El Salvador': (-12.2133, -76.9361),
+    'Villa María del Triunfo': (-12.1611, -76.9417),
+    'Callao': (-12.0566, -77.1181),
+    'Bellavista': (-12.0622, -77.1283),
+    'Carmen de la Legua Reynoso': (-12.0425, -77.0917),
+    'La Perla': (-12.0678, -77.1167),
+    'La Punta': (-12.0725, -77.1631),
+    'Mi Perú': (-11.8567, -77.1256),
+    'Ventanilla': (-11.8772, -77.1275),
+}
+
+# Otras formas de escribir el distrito
+ALIAS = {
+    'surco': 'Santiago de Surco',
+    'sjl': 'San Juan de Lurigancho',
+    'sjm': 'San Juan de Miraflores',
+    'smp': 'San Martín de Porres',
+    'ves': 'Villa El Salvador',
+    'vmt': 'Villa María del Triunfo',
+    'magdalena': 'Magdalena del Mar',
+    'cercado': 'Lima',
+    'cercado de lima': 'Lima',
+    'lima centro': 'Lima',
+    'chosica': 'Lurigancho',
+    'vitarte': 'Ate',
+    'ate vitarte': 'Ate',
+    'carmen de la legua': 'Carmen de la Legua Reynoso',
+}
+
+
+def normalizar(texto):
+    """Minúsculas, sin tildes ni signos (salvo comas) y con espacios simples"""
+    if not texto:
+        return ''
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    texto = re.sub(r'[^a-z0-9,]+', ' ', texto)
+    partes = [' '.join(parte.split()) for parte in texto.split(',')]
+    return ', '.join(p for p in partes if p)[:300]
+
+
+class Nomenclator:
+    """Distritos (y lugares opcionales) con sus coordenadas"""
+
+    def __init__(self, distritos=DISTRITOS, alias=ALIAS, lugares=()):
+        self.distritos = dict(distritos)
+        # nombre normalizado -> distrito
+        self._nombres = {normalizar(nombre): nombre for nombre in self.distritos}
+        self._nombres.update({normalizar(a): d for a, d in alias.items()})
+        # Los más largos primero: "san juan de miraflores" antes que "miraflores"
+        self._por_largo = sorted(self._nombres, key=len, reverse=True)
+        # (nombre normalizado, nombre, distrito, lat, lon)
+        self.lugares = sorted(((normalizar(n), n, d, float(la), float(lo)) for n, d, la, lo in lugares),
+                              key=lambda lugar: len(lugar[0]), reverse=True)
+        contenido = repr((sorted(self.distritos.items()), sorted(self._nombres.items()), self.lugares))
+        # La caché de geocodificación se invalida cuando cambia el nomenclátor
+        self.version = hashlib.sha1(contenido.encode('utf-8')).hexdigest()[:12]
+
+    def _distrito(self, normalizada):
+        partes = [p.strip() for p in normalizada.split(',')]
+        # Lima al final suele ser la provincia: solo cuenta si no hay otro distrito
+        encontrado_lima = False
+        for parte in reversed(partes):
+            distrito = self._nombres.get(parte)
+            if distrito == 'Lima':
+                encontrado_lima = True
+            elif distrito:
+                return distrito
+        for nombre in self._por_largo:
+            if self._nombres[nombre] != 'Lima' and re.search(rf'\b{re.escape(nombre)}\b', normalizada):
+                return self._nombres[nombre]
+        return 'Lima' if encontrado_lima else None
+
+    def buscar(self, direccion):
+        """(distrito, lugar, lat, lon) de la dirección, o None si no se reconoce"""
+        normalizada = normalizar(direccion)
+        if not normalizada:
+            return None
+        distrito = self._distrito(normalizada)
+        for nombre, lugar, distrito_lugar, lat, lon in self.lugares:
+            if distrito_lugar in (distrito, None, '') and re.search(rf'\b{re.escape(nombre)}\b', normalizada):
+                return distrito_lugar or distrito, lugar, lat, lon
+        if distrito is None:
+            return None
+        lat, lon = self.distritos[distrito]
+        return distrito, None, lat, lon
+
+
+def nomenclator_desde(ruta=None):
+    """Nomenclátor de distritos más los lugares del CSV (ruta o TALLER_NOMENCLATOR), si hay"""
+    ruta = ruta or os.environ.get('TALLER_NOMENCLATOR')
+    if not ruta:
+        return Nomenclator()
+    with open(ruta, encoding='utf-8') as archivo:
+        lugares = [(fila['nombre'], fila.get('distrito'), fila['lat'], fila['lon'])
+                   for fila in csv.DictReader(archivo)]
+    return Nomenclator(lugares=lugares)
+
+
+# ========================================
+# UBICACIÓN DE LOS CLIENTES (INCREMENTAL)
+# ========================================
+
+# Nuevos, con la dirección cambiada o calculados con otro nomenclátor
+_PENDIENTES = """
+SELECT c.id, c.direccion
+FROM Clientes c
+LEFT JOIN ClientesUbicacion u ON u.cliente_id = c.id
+WHERE u.cliente_id IS NULL
+   OR u.nomenclator <> ?
+   OR u.direccion <> c.direccion
+   OR (u.direccion IS NULL AND c.direccion IS NOT NULL)
+   OR (u.direccion IS NOT NULL AND c.direccion IS NULL)
+"""
+
+_INSERTAR_CACHE = """
+INSERT INTO GeocodificacionCache (direccion, nomenclator, distrito, lugar, lat, lon)
+VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+_INSERTAR_UBICACION = """
+INSERT INTO ClientesUbicacion (cliente_id, direccion, nomenclator, distrito, lat, lon)
+VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+# SQL Server admite hasta 2100 parámetros por sentencia
+_PARAMETROS_POR_CONSULTA = 500
+
+
+def _en_trozos(valores, tamano):
+    for i in range(0, len(valores), tamano):
+        yield valores[i:i + tamano]
+
+
+def _leer_cache(conn, direcciones, version):
+    encontradas = {}
+    cursor = conn.cursor()
+    for trozo in _en_trozos(direcciones, _PARAMETROS_POR_CONSULTA):
+        cursor.execute("SELECT direccion, distrito, lugar, lat, lon FROM GeocodificacionCache "
+                       f"WHERE nomenclator = ? AND direccion IN ({', '.join('?' * len(trozo))})",
+                       [version] + trozo)
+        for direccion, distrito, lugar, lat, lon in cursor.fetchall():
+            encontradas[direccion] = (distrito, lugar, lat, lon)
+    return encontradas
+
+
+def actualizar_ubicaciones(destino, nomenclator=None, lote=LOTE_POR_DEFECTO):
+    """Ubica a los clientes pendientes; devuelve {'clientes', 'cache', 'buscadas', 'sin_ubicar'}
+
+    Cada lote se escribe en su propia transacción.
+    """
+    nomenclator = nomenclator or Nomenclator()
+    version = nomenclator.version
+    with conexion_lectura(destino) as conn:
+        cursor = conn.cursor()
+        cursor.execute(_PENDIENTES, (version,))
+        pendientes = cursor.fetchall()
+
+    totales = {'clientes': 0, 'cache': 0, 'buscadas': 0, 'sin_ubicar': 0}
+    for filas in _en_trozos(pendientes, lote):
+        normalizadas = {cliente_id: normalizar(direccion) for cliente_id, direccion in filas}
+        distintas = sorted(set(normalizadas.values()) - {''})
+        with conexion_lectura(destino) as conn:
+            resultados = _leer_cache(conn, distintas, version)
+        totales['cache'] += len(resultados)
+
+        nuevas = []
+        for direccion in distintas:
+            if direccion not in resultados:
+                # Las no encontradas también se guardan, para no buscarlas otra vez
+                resultados[direccion] = nomenclator.buscar(direccion) or (None, None, None, None)
+                nuevas.append((direccion, version) + tuple(resultados[direccion]))
+        totales['buscadas'] += len(nuevas)
+
+        ubicaciones = []
+        for cliente_id, direccion in filas:
+            distrito, _, lat, lon = resultados.get(normalizadas[cliente_id], (None, None, None, None))
+            totales['sin_ubicar'] += lat is None
+            ubicaciones.append((cliente_id, direccion, version, distrito, lat, lon))
+
+        def _escribir(conn, nuevas=nuevas, ubicaciones=ubicaciones):
+            cursor = conn.cursor()
+            # La versión anterior de cada dirección se reemplaza
+            for trozo in _en_trozos([n[0] for n in nuevas], _PARAMETROS_POR_CONSULTA):
+                cursor.execute("DELETE FROM GeocodificacionCache "
+                               f"WHERE direccion IN ({', '.join('?' * len(trozo))})", trozo)
+            if nuevas:
+                cursor.executemany(_INSERTAR_CACHE, nuevas)
+            for trozo in _en_trozos([u[0] for u in ubicaciones], _PARAMETROS_POR_CONSULTA):
+                cursor.execute("DELETE FROM ClientesUbicacion "
+                               f"WHERE cliente_id IN ({', '.join('?' * len(trozo))})", trozo)
+            cursor.executemany(_INSERTAR_UBICACION, ubicaciones)
+
+        en_transaccion(destino, _escribir)
+        totales['clientes'] += len(filas)
+    return totales
+
+
+# ========================================
+# AGREGADO Y MAPA
+# ========================================
+
+_CONTEO_POR_PUNTO = """
+SELECT u.distrito, u.lat, u.lon, COUNT(*) AS clientes
+FROM ClientesUbicacion u
+JOIN Clientes c ON c.id = u.cliente_id
+WHERE c.activo = 1 AND u.lat IS NOT NULL
+GROUP BY u.distrito, u.lat, u.lon
+"""
+
+_SIN_UBICAR = """
+SELECT COUNT(*)
+FROM Clientes c
+LEFT JOIN ClientesUbicacion u ON u.cliente_id = c.id
+WHERE c.activo = 1 AND u.lat IS NULL
+"""
+
+
+def agregado_clientes(origen, nivel='distrito', tamano_celda=TAMANO_CELDA):
+    """Clientes activos por distrito o por celda; devuelve (puntos, sin_ubicar)
+
+    Cada punto es {'nombre', 'lat', 'lon', 'clientes'} con el centro ponderado
+    por la cantidad de clientes.
+    """
+    if nivel not in NIVELES:
+        raise ValueError(f"Nivel no válido: {nivel}")
+    with conexion_lectura(origen) as conn:
+        cursor = conn.cursor()
+        cursor.execute(_CONTEO_POR_PUNTO)
+        filas = cursor.fetchall()
+        cursor.execute(_SIN_UBICAR)
+        sin_ubicar = cursor.fetchone()[0]
+
+    grupos = {}
+    for distrito, lat, lon, clientes in filas:
+        if nivel == 'distrito':
+            clave = distrito
+        else:
+            clave = (math.floor(lat / tamano_celda), math.floor(lon / tamano_celda))
+        grupo = grupos.setdefault(clave, {'distritos': set(), 'lat': 0.0, 'lon': 0.0, 'clientes': 0})
+        grupo['distritos'].add(distrito)
+        grupo['lat'] += lat * clientes
+        grupo['lon'] += lon * clientes
+        grupo['clientes'] += clientes
+
+    puntos = [{'nombre': ', '.join(sorted(g['distritos'])),
+               'lat': g['lat'] / g['clientes'],
+               'lon': g['lon'] / g['clientes'],
+               'clientes': g['clientes']}
+              for g in grupos.values()]
+    puntos.sort(key=lambda p: p['clientes'], reverse=True)
+    return puntos, sin_ubicar
+
+
+# Cada grupo muestra la suma de clientes de sus marcadores (options.clientes)
+_ICONO_GRUPO = """
+function(cluster) {
+    var total = 0;
+    cluster.getAllChildMarkers().forEach(function(m) { total += m.options.clientes || 0; });
+    var tamano = total < 100 ? 'small' : (total < 1000 ? 'medium' : 'large');
+    return new L.DivIcon({
+        html: '<div><span>' + total.toLocaleString() + '</span></div>',
+        className: 'marker-cluster marker-cluster-' + tamano,
+        iconSize: new L.Point(44, 44)
+    });
+}
+"""
+
+
+def mapa_clientes(puntos, centro=CENTRO_LIMA, zoom=11):
+    """Mapa folium con un marcador por punto agregado, agrupados con MarkerCluster"""
+    import folium
+    from folium.plugins import MarkerCluster
+
+    mapa = folium.Map(location=list(centro), zoom_start=zoom)
+    grupo = MarkerCluster(icon_create_function=_ICONO_GRUPO).add_to(mapa)
+    maximo = max([p['clientes'] for p in puntos] or [1])
+    for punto in puntos:
+        # Burbuja de 24 a 56 px según la cantidad (escala logarítmica)
+        lado = int(24 + 32 * math.log1p(punto['clientes']) / math.log1p(maximo))
+        folium.Marker(
+            [punto['lat'], punto['lon']],
+            tooltip=f"{punto['nombre']}: {punto['clientes']:,} clientes",
+            icon=folium.DivIcon(
+                icon_size=(lado, lado), icon_anchor=(lado // 2, lado // 2),
+                html=(f'<div style="width:{lado}px;height:{lado}px;line-height:{lado}px;border-radius:50%;'
+                      f'background:rgba(46,134,171,0.75);color:white;text-align:center;font-size:11px;'
+                      f'font-weight:bold">{punto["clientes"]:,}</div>')),
+            clientes=int(punto['clientes']),
+        ).add_to(grupo)
+    return mapa
+
+
+# ========================================
+# BENCHMARK
+# ========================================
+
+_VIAS = ['Av.', 'Jr.', 'Calle', 'Psje.', 'Av']
+_CALLES = ['Arequipa', 'Javier Prado', 'La Marina', 'Angamos', 'Benavides', 'Tacna', 'Brasil',
+           'Universitaria', 'Los Próceres', 'Primavera', 'Grau', 'Salaverry']
+
+
+def _direccion_de_prueba(aleatorio, distritos):
+    if aleatorio.random() < 0.05:
+        return aleatorio.choice([None, '', 'Sin dirección', 'Calle Falsa 123'])
+    distrito = aleatorio.choice(distritos)
+    # Variantes reales: sin tildes, mayúsculas, alias y provincia al final
+    forma = aleatorio.choice([distrito, normalizar(distrito), distrito.upper(),
+                              next((a for a, d in ALIAS.items() if d == distrito), distrito)])
+    # Edificios: varias personas con la misma dirección
+    numero = aleatorio.randint(100, 600) * 10
+    provincia = aleatorio.choice(['', ', Lima', ' - Lima'])
+    return f"{aleatorio.choice(_VIAS)} {aleatorio.choice(_CALLES)} {numero}, {forma}{provincia}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mapa de clientes por distrito")
+    parser.add_argument('--benchmark', type=int, default=50000, metavar='N',
+                        help="Clientes a generar para medir geocodificación y mapa")
+    args = parser.parse_args()
+
+    import random
+    import sqlite3
+    from migraciones import migrar_sqlite
+
+    aleatorio = random.Random(42)
+    distritos = list(DISTRITOS)
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, 'mapa.db')
+        migrar_sqlite(ruta)
+        conn = sqlite3.connect(ruta)
+        conn.executemany("INSERT INTO Clientes (nombre, telefono, direccion) VALUES (?, ?, ?)",
+                         [(f"Cliente {i}", f"9{i:08d}", _direccion_de_prueba(aleatorio, distritos))
+                          for i in range(args.benchmark)])
+        conn.commit()
+        total = conn.execute("SELECT COUNT(*) FROM Clientes").fetchone()[0]
+        nomenclator = Nomenclator()
+
+        t0 = time.perf_counter()
+        primera = actualizar_ubicaciones(conn, nomenclator)
+        t_primera = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        segunda = actualizar_ubicaciones(conn, nomenclator)
+        t_segunda = time.perf_counter() - t0
+        # Sin ubicaciones pero con la caché: solo lecturas de GeocodificacionCache
+        conn.execute("DELETE FROM ClientesUbicacion")
+        conn.commit()
+        t0 = time.perf_counter()
+        con_cache = actualizar_ubicaciones(conn, nomenclator)
+        t_cache = time.perf_counter() - t0
+
+        resultados = {}
+        for nivel in NIVELES:
+            t0 = time.perf_counter()
+            puntos, sin_ubicar = agregado_clientes(conn, nivel)
+            t_agregado = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            html = mapa_clientes(puntos).get_root().render()
+            resultados[nivel] = (len(puntos), t_agregado, time.perf_counter() - t0, len(html))
+
+        # Un marcador por cliente (lo que se quiere evitar)
+        import folium
+        from folium.plugins import MarkerCluster
+        filas = conn.execute("SELECT lat, lon FROM ClientesUbicacion WHERE lat IS NOT NULL").fetchall()
+        t0 = time.perf_counter()
+        mapa = folium.Map(location=list(CENTRO_LIMA), zoom_start=11)
+        grupo = MarkerCluster().add_to(mapa)
+        for lat, lon in filas:
+            folium.Marker([lat, lon]).add_to(grupo)
+        html_por_fila = mapa.get_root().render()
+        t_por_fila = time.perf_counter() - t0
+        conn.close()
+
+    print(f"{total:,} clientes")
+    print(f"  Geocodificación inicial : {t_primera:6.2f} s  ({primera['buscadas']:,} direcciones distintas "
+          f"buscadas, {primera['sin_ubicar']:,} sin ubicar)")
+    print(f"  Sin cambios             : {t_segunda:6.2f} s  ({segunda['clientes']:,} pendientes)")
+    print(f"  Desde la caché          : {t_cache:6.2f} s  ({con_cache['cache']:,} aciertos, "
+          f"{con_cache['buscadas']:,} búsquedas)")
+    for nivel, (cantidad, t_agregado, t_mapa, tamano) in resultados.items():
+        print(f"  Mapa por {nivel:8s}: {cantidad:5d} marcadores  agregado {t_agregado * 1000:5.0f} ms  "
+              f"render {t_mapa * 1000:5.0f} ms  {tamano / 1024:8.1f} KB de HTML (sin ubicar: {sin_ubicar:,})")
+    print(f"  Un marcador por cliente : {len(filas):5d} marcadores  render {t_por_fila * 1000:5.0f} ms  "
+          f"{len(html_por_fila) / 1024:8.1f} KB de HTML")
+
+
+if __name__ == "__main__":
+    main()
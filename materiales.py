@@ -0,0 +1,238 @@
+# ========================================
+# MATERIALES POR SERVICIO Y CONSUMO DE STOCK
+# Taller Automotriz - Sistema de Gestión
+# ========================================
+
+"""
+Lista de materiales de cada servicio (ServicioMateriales) y descuento del
+inventario al completar citas.
+
+El descuento lo hacen los triggers de la migración (tr_Citas_Materiales): todo
+UPDATE que pase citas a 'Completado' registra las SALIDAs de sus repuestos en
+MovimientosInventario y descuenta el stock dentro de la misma sentencia, o la
+aborta completa si algún repuesto no alcanza. completar_dia() pasa todas las
+citas 'En Proceso' de un día con un único UPDATE.
+
+Con varias sedes cada cita consume los repuestos de su propia sede (los de
+mismo nombre que el catálogo de ServicioMateriales, vía vw_MaterialesSede).
+
+Uso:
+    definir_materiales(db, servicio_id=2, materiales=[(1, 1), (2, 1)])
+    completar_cita(db, cita_id=15)
+    completar_dia(db)                       # citas 'En Proceso' de hoy
+    completar_dia(db, sede_id=2)            # solo las de una sede
+    python materiales.py --db taller_automotriz.db --faltantes
+    python materiales.py --benchmark 2000
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from bd_sqlite import conexion_lectura, en_transaccion
+from migraciones import motor_de
+
+_CONSULTA_MATERIALES = """
+SELECT m.servicio_id, s.nombre AS servicio, m.inventario_id, i.nombre AS repuesto,
+       m.cantidad, i.stock_actual
+FROM ServicioMateriales m
+JOIN Servicios s ON s.id = m.servicio_id
+JOIN Inventario i ON i.id = m.inventario_id
+{filtro}
+ORDER BY s.nombre, i.nombre
+"""
+
+# Demanda de las citas 'En Proceso' del día frente al stock de su sede, por repuesto
+_CONSULTA_FALTANTES = """
+SELECT i.id AS inventario_id, i.nombre AS repuesto, SUM(m.cantidad) AS cantidad,
+       i.stock_actual, SUM(m.cantidad) - i.stock_actual AS faltan
+FROM Citas c
+JOIN vw_MaterialesSede m ON m.servicio_id = c.servicio_id AND m.sede_id = c.sede_id
+JOIN Inventario i ON i.id = m.inventario_id
+WHERE c.fecha_hora >= ? AND c.fecha_hora < ?
+AND c.estado = 'En Proceso'
+{filtro}
+GROUP BY i.id, i.nombre, i.stock_actual
+HAVING SUM(m.cantidad) > i.stock_actual
+ORDER BY i.nombre
+"""
+
+
+def _rango_dia(dia):
+    desde = dia or date.today()
+    return (desde.strftime('%Y-%m-%d'), (desde + timedelta(days=1)).strftime('%Y-%m-%d'))
+
+
+def _consultar(origen, consulta, params=()):
+    with conexion_lectura(origen) as conn:
+        cursor = conn.cursor()
+        cursor.execute(consulta, params)
+        columnas = [desc[0] for desc in cursor.description]
+        return columnas, [tuple(fila) for fila in cursor.fetchall()]
+
+
+def materiales_de_servicio(origen, servicio_id=None):
+    """(columnas, filas) con los repuestos de un servicio (o de todos)"""
+    if servicio_id is None:
+        return _consultar(origen, _CONSULTA_MATERIALES.format(filtro=""))
+    return _consultar(origen, _CONSULTA_MATERIALES.format(filtro="WHERE m.servicio_id = ?"),
+                      (int(servicio_id),))
+
+
+def definir_materiales(destino, servicio_id, materiales):
+    """Reemplaza la lista de materiales del servicio por [(inventario_id, cantidad), ...]"""
+    filas = [(int(servicio_id), int(inventario_id), int(cantidad))
+             for inventario_id, cantidad in materiales if int(cantidad) > 0]
+
+    def _reemplazar(conn):
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM ServicioMateriales WHERE servicio_id = ?", (int(servicio_id),))
+        if filas:
+            cursor.executemany("INSERT INTO ServicioMateriales (servicio_id, inventario_id, cantidad) "
+                               "VALUES (?, ?, ?)", filas)
+        return len(filas)
+
+    if motor_de(destino) == 'sqlserver':
+        try:
+            total = _reemplazar(destino)
+            destino.commit()
+            return total
+        except Exception:
+            destino.rollback()
+            raise
+    return en_transaccion(destino, _reemplazar)
+
+
+def completar_cita(destino, cita_id):
+    """Pasa la cita a 'Completado'; el trigger descuenta sus repuestos
+
+    Lanza la excepción del motor ('Stock insuficiente...') si algún repuesto no
+    alcanza; en ese caso ni la cita ni el inventario cambian.
+    """
+    if motor_de(destino) == 'sqlserver':
+        cursor = destino.cursor()
+        try:
+            cursor.execute("EXEC sp_actualizar_estado_cita @cita_id = ?, @nuevo_estado = ?",
+                           (int(cita_id), 'Completado'))
+            mensaje = cursor.fetchone()[0]
+            if mensaje != 'Estado actualizado exitosamente':
+                raise RuntimeError(mensaje)
+            destino.commit()
+        except Exception:
+            destino.rollback()
+            raise
+        return None
+    return en_transaccion(destino, lambda conn: conn.execute(
+        "UPDATE Citas SET estado = 'Completado', fecha_actualizacion = CURRENT_TIMESTAMP WHERE id = ?",
+        (int(cita_id),)).rowcount)
+
+
+def completar_dia(destino, dia=None, sede_id=None):
+    """Completa en una sola sentencia las citas 'En Proceso' del día; devuelve cuántas
+
+    Es todo o nada: si la demanda total de algún repuesto supera el stock no se
+    completa ninguna (ver faltantes()). Con sede_id solo las citas de esa sede.
+    """
+    if motor_de(destino) == 'sqlserver':
+        cursor = destino.cursor()
+        try:
+            cursor.execute("EXEC sp_completar_dia @fecha = ?, @sede_id = ?", (dia or date.today(), sede_id))
+            total = cursor.fetchone()[0]
+            destino.commit()
+        except Exception:
+            destino.rollback()
+            raise
+        return total
+    filtro, params = "", _rango_dia(dia)
+    if sede_id is not None:
+        # sede_id primero: usa IX_Citas_Sede_FechaHora
+        filtro, params = "sede_id = ? AND ", (int(sede_id),) + params
+    return en_transaccion(destino, lambda conn: conn.execute(f"""
+        UPDATE Citas
+        SET estado = 'Completado', fecha_actualizacion = CURRENT_TIMESTAMP
+        WHERE {filtro}fecha_hora >= ? AND fecha_hora < ?
+        AND estado = 'En Proceso'
+    """, params).rowcount)
+
+
+def faltantes(origen, dia=None, sede_id=None):
+    """(columnas, filas) de los repuestos que no alcanzan para completar el día"""
+    if sede_id is None:
+        return _consultar(origen, _CONSULTA_FALTANTES.format(filtro=""), _rango_dia(dia))
+    return _consultar(origen, _CONSULTA_FALTANTES.format(filtro="AND c.sede_id = ?"),
+                      _rango_dia(dia) + (int(sede_id),))
+
+
+# ========================================
+# BENCHMARK
+# ========================================
+
+def _benchmark(cantidad):
+    import random
+    from migraciones import migrar_sqlite
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, 'materiales.db')
+        migrar_sqlite(ruta)
+        conn = sqlite3.connect(ruta)
+        conn.execute("UPDATE Inventario SET stock_actual = ?", (cantidad * 4,))
+        hoy = date.today()
+        # Un horario distinto por cita entre las 8:00 y las 18:00
+        apertura = datetime.combine(hoy, datetime.min.time()) + timedelta(hours=8)
+        conn.executemany(
+            "INSERT INTO Citas (cliente_id, vehiculo_id, servicio_id, fecha_hora, estado) "
+            "VALUES (1, 1, ?, ?, 'En Proceso')",
+            [(random.randint(1, 8), (apertura + timedelta(seconds=i * 36000 // cantidad)).strftime('%Y-%m-%d %H:%M:%S'))
+             for i in range(cantidad)])
+        conn.commit()
+        movimientos = conn.execute("SELECT COUNT(*) FROM MovimientosInventario").fetchone()[0]
+
+        t0 = time.perf_counter()
+        total = completar_dia(conn, hoy)
+        segundos = time.perf_counter() - t0
+        movimientos = conn.execute("SELECT COUNT(*) FROM MovimientosInventario").fetchone()[0] - movimientos
+        print(f"completar_dia: {total:,} citas, {movimientos:,} SALIDAs en {segundos:.2f} s")
+        print(f"Segunda ejecución: {completar_dia(conn, hoy)} citas (ya completadas)")
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Materiales por servicio y consumo de stock")
+    parser.add_argument('--db', default='taller_automotriz.db', help="Archivo SQLite")
+    parser.add_argument('--dia', type=lambda s: datetime.strptime(s, '%Y-%m-%d').date(),
+                        help="Día (AAAA-MM-DD, por defecto hoy)")
+    parser.add_argument('--completar-dia', action='store_true',
+                        help="Completar las citas 'En Proceso' del día")
+    parser.add_argument('--faltantes', action='store_true', help="Repuestos que no alcanzan para el día")
+    parser.add_argument('--benchmark', type=int, metavar='N', help="Medir con N citas en una base temporal")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        _benchmark(args.benchmark)
+        return
+
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.faltantes:
+            columnas, filas = faltantes(conn, args.dia)
+            print(columnas)
+            for fila in filas:
+                print(fila)
+            if not filas:
+                print("Hay stock suficiente para completar el día")
+        elif args.completar_dia:
+            print(f"Citas completadas: {completar_dia(conn, args.dia)}")
+        else:
+            columnas, filas = materiales_de_servicio(conn)
+            print(columnas)
+            for fila in filas:
+                print(fila)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,469 @@
+# ========================================
+# MÉTRICAS EN FORMATO PROMETHEUS
+# Taller Automotriz - Sistema de Gestión
+# ========================================
+
+"""
+Métricas de la aplicación en el formato de texto de Prometheus (0.0.4),
+servidas en /metrics desde un puerto aparte (9108 por defecto).
+
+- taller_reruns_total / taller_rerun_segundos: reruns y su duración por página
+- taller_bd_llamada_segundos / taller_bd_errores_total: llamadas a la capa de
+  datos por procedimiento almacenado (o consulta) y sus errores
+- taller_pool_*: lectores del pool y escrituras en cola (backend SQLite)
+- taller_cache_consultas_total: aciertos y fallos del caché de datos de
+  referencia (lista de servicios)
+- taller_reservas_total: citas agendadas por resultado
+- taller_items_stock_bajo: items con stock_actual <= stock_minimo, por sede
+- taller_respaldo_atraso_segundos: tiempo desde la última copia del WAL al
+  archivo de respaldos (si están activados)
+
+Los contadores viven en el proceso (se reinician con el servidor de
+Streamlit); los medidores con función se calculan en cada lectura de
+/metrics, así que el de stock bajo cuesta una consulta por scrape.
+
+Uso:
+    servidor = ServidorMetricas()               # http://localhost:9108/metrics
+    registrar_pool(db)                          # BaseDatosSQLite
+    registrar_stock_bajo(lambda: contar_stock_bajo(conn))
+    with LLAMADAS_BD.medir(operacion='sp_obtener_servicios'): ...
+    python metricas.py --db taller_automotriz.db --servir
+"""
+
+import argparse
+import bisect
+import math
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PUERTO_POR_DEFECTO = 9108
+TIPO_CONTENIDO = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Límites de los histogramas en segundos (los de los clientes de Prometheus)
+LIMITES_POR_DEFECTO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONSULTA_STOCK_BAJO = ("SELECT sede_id, COUNT(*) FROM Inventario "
+                       "WHERE stock_actual <= stock_minimo AND activo = 1 GROUP BY sede_id")
+
+# ========================================
+# TIPOS DE MÉTRICA
+# ========================================
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _formatear(valor):
+    if valor == math.inf:
+        return '+Inf'
+    if float(valor).is_integer():
+        return str(int(valor))
+    return repr(float(valor))
+
+
+def _etiquetas(nombres, valores, extra=()):
+    pares = list(zip(nombres, valores)) + list(extra)
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{n}="{_escapar(v)}"' for n, v in pares) + '}'
+
+
+class _Metrica:
+    tipo = None
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._candado = threading.Lock()
+
+    def _clave(self, etiquetas):
+        if set(etiquetas) != set(self.etiquetas):
+            raise ValueError(f"{self.nombre} espera las etiquetas {self.etiquetas}")
+        return tuple(str(etiquetas[n]) for n in self.etiquetas)
+
+    def muestras(self):
+        """[(sufijo, valores de etiqueta, etiquetas extra, valor), ...]"""
+        raise NotImplementedError
+
+    def exposicion(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+        for sufijo, valores, extra, valor in self.muestras():
+            lineas.append(f"{self.nombre}{sufijo}{_etiquetas(self.etiquetas, valores, extra)} "
+                          f"{_formatear(valor)}")
+        return '\n'.join(lineas)
+
+
+class Contador(_Metrica):
+    """Valor que solo sube (peticiones, errores, aciertos de caché)"""
+    tipo = 'counter'
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        super().__init__(nombre, ayuda, etiquetas)
+        self._valores = {}
+
+    def inc(self, cantidad=1, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._candado:
+            self._valores[clave] = self._valores.get(clave, 0) + cantidad
+
+    def valor(self, **etiquetas):
+        return self._valores.get(self._clave(etiquetas), 0)
+
+    def muestras(self):
+        with self._candado:
+            return [('', clave, (), valor) for clave, valor in sorted(self._valores.items())]
+
+
+class Medidor(_Metrica):
+    """Valor que sube y baja; con `funcion` se calcula en cada lectura
+
+    funcion() devuelve un número, o un dict {valores de etiqueta: número} si el
+    medidor tiene etiquetas. Si falla, el medidor no se publica en esa lectura.
+    """
+    tipo = 'gauge'
+
+    def __init__(self, nombre, ayuda, etiquetas=(), funcion=None):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.funcion = funcion
+        self._valores = {}
+
+    def set(self, valor, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._candado:
+            self._valores[clave] = valor
+
+    def muestras(self):
+        if self.funcion is None:
+            with self._candado:
+                return [('', clave, (), valor) for clave, valor in sorted(self._valores.items())]
+        try:
+            resultado = self.funcion()
+        except Exception:
+            return []
+        if isinstance(resultado, dict):
+            return [('', tuple(str(v) for v in clave), (), valor)
+                    for clave, valor in sorted(resultado.items())]
+        return [('', (), (), resultado)]
+
+
+class Histograma(_Metrica):
+    """Distribución de duraciones en cubetas acumuladas"""
+    tipo = 'histogram'
+
+    def __init__(self, nombre, ayuda, etiquetas=(), limites=LIMITES_POR_DEFECTO):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.limites = tuple(sorted(limites))
+        self._series = {}
+
+    def observar(self, valor, **etiquetas):
+        clave = self._clave(etiquetas)
+        posicion = bisect.bisect_left(self.limites, valor)
+        with self._candado:
+            serie = self._series.get(clave)
+            if serie is None:
+                # cubetas no acumuladas + [suma, cantidad]
+                serie = self._series[clave] = [0] * (len(self.limites) + 1) + [0.0, 0]
+            serie[posicion] += 1
+            serie[-2] += valor
+            serie[-1] += 1
+
+    @contextmanager
+    def medir(self, **etiquetas):
+        """Observa la duración del bloque (también si termina con excepción)"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **etiquetas)
+
+    def muestras(self):
+        with self._candado:
+            series = {clave: list(serie) for clave, serie in self._series.items()}
+        filas = []
+        for clave, serie in sorted(series.items()):
+            acumulado = 0
+            for limite, cantidad in zip(self.limites + (math.inf,), serie):
+                acumulado += cantidad
+                filas.append(('_bucket', clave, (('le', _formatear(limite)),), acumulado))
+            filas.append(('_sum', clave, (), serie[-2]))
+            filas.append(('_count', clave, (), serie[-1]))
+        return filas
+
+
+class Registro:
+    """Conjunto de métricas que se publican juntas"""
+
+    def __init__(self):
+        self._metricas = {}
+        self._candado = threading.Lock()
+
+    def registrar(self, metrica):
+        """Agrega la métrica (reemplaza a otra con el mismo nombre) y la devuelve"""
+        with self._candado:
+            self._metricas[metrica.nombre] = metrica
+        return metrica
+
+    def exposicion(self):
+        with self._candado:
+            metricas = list(self._metricas.values())
+        return '\n'.join(m.exposicion() for m in metricas) + '\n'
+
+
+REGISTRO = Registro()
+
+RERUNS = REGISTRO.registrar(Contador(
+    'taller_reruns_total', "Reruns de Streamlit por página", ('pagina',)))
+DURACION_RERUN = REGISTRO.registrar(Histograma(
+    'taller_rerun_segundos', "Duración de cada rerun por página", ('pagina',)))
+LLAMADAS_BD = REGISTRO.registrar(Histograma(
+    'taller_bd_llamada_segundos', "Duración de las llamadas a la base por operación", ('operacion',)))
+ERRORES_BD = REGISTRO.registrar(Contador(
+    'taller_bd_errores_total', "Llamadas a la base que terminaron en error", ('operacion',)))
+CACHE = REGISTRO.registrar(Contador(
+    'taller_cache_consultas_total', "Lecturas del caché de datos de referencia",
+    ('cache', 'resultado')))
+RESERVAS = REGISTRO.registrar(Contador(
+    'taller_reservas_total', "Citas agendadas desde la web por resultado", ('resultado',)))
+LECTURAS_ENRUTADAS = REGISTRO.registrar(Contador(
+    'taller_bd_lecturas_total', "Lecturas por base de destino y motivo (con réplica configurada)",
+    ('destino', 'motivo')))
+
+
+def registrar_rerun(pagina, segundos):
+    RERUNS.inc(pagina=pagina)
+    DURACION_RERUN.observar(segundos, pagina=pagina)
+
+
+@contextmanager
+def medir_bd(operacion):
+    """Mide una llamada a la capa de datos y cuenta el error si lo hay"""
+    try:
+        with LLAMADAS_BD.medir(operacion=operacion):
+            yield
+    except Exception:
+        ERRORES_BD.inc(operacion=operacion)
+        raise
+
+
+def registrar_pool(db, registro=REGISTRO):
+    """Medidores del pool de BaseDatosSQLite (se leen de db.estadisticas())"""
+    for clave, ayuda in (('lectores_total', "Conexiones de lectura del pool"),
+                         ('lectores_en_uso', "Conexiones de lectura prestadas en este momento"),
+                         ('escrituras_en_cola', "Escrituras esperando al hilo escritor")):
+        registro.registrar(Medidor(f'taller_pool_{clave}', ayuda,
+                                   funcion=lambda clave=clave: db.estadisticas()[clave]))
+
+
+def registrar_replica(enrutador, registro=REGISTRO):
+    """Medidor del retraso de la réplica (el último leído, sin consultar en el scrape)"""
+    return registro.registrar(Medidor(
+        'taller_replica_retraso_segundos', "Segundos de atraso de la réplica de lectura",
+        funcion=lambda: enrutador.retraso(releer=False)))
+
+
+def registrar_respaldos(respaldos, registro=REGISTRO):
+    """Medidor de los segundos desde la última copia del WAL archivada (inf si aún no copió)"""
+    return registro.registrar(Medidor(
+        'taller_respaldo_atraso_segundos', "Segundos desde la última copia del WAL a la carpeta de respaldos",
+        funcion=lambda: float('inf') if respaldos.ultima_copia is None
+        else max(time.time() - respaldos.ultima_copia, 0.0)))
+
+
+def registrar_stock_bajo(contar, registro=REGISTRO):
+    """Medidor de items con stock bajo por sede; contar() se llama en cada scrape"""
+    return registro.registrar(Medidor(
+        'taller_items_stock_bajo', "Items activos con stock_actual <= stock_minimo", ('sede',),
+        funcion=contar))
+
+
+def contar_stock_bajo(conn):
+    """{(sede_id,): items con stock bajo} para el medidor de registrar_stock_bajo"""
+    cursor = conn.cursor()
+    cursor.execute(CONSULTA_STOCK_BAJO)
+    return {(sede_id,): cantidad for sede_id, cantidad in cursor.fetchall()}
+
+# ========================================
+# CACHÉ DE DATOS DE REFERENCIA
+# ========================================
+
+_CACHES = {}
+_CANDADO_CACHES = threading.Lock()
+
+
+def cache_referencia(nombre, ttl=300):
+    """Decorador: guarda el resultado `ttl` segundos y cuenta aciertos y fallos
+
+    Para datos que cambian poco y se leen en cada rerun (la lista de
+    servicios). Los resultados vacíos no se guardan, para no fijar un error
+    de conexión durante todo el ttl. funcion.invalidar() descarta todo lo
+    guardado y funcion.invalidar(*args) solo la entrada de esos argumentos
+    (p. ej. la sede que se escribió). funcion.invalidado_en(*args) da la hora
+    (time.time()) de la última invalidación que la alcanzó: el relleno
+    siguiente tiene que leer datos al menos así de nuevos (con réplica, de la
+    primaria hasta que la réplica los tenga). Un relleno que empezó antes de
+    invalidar no se guarda.
+
+    Streamlit vuelve a ejecutar el script (y este decorador) en cada rerun,
+    así que lo guardado vive en el módulo, por nombre de caché.
+    """
+    def decorador(funcion):
+        with _CANDADO_CACHES:
+            guardado, candado, estado = _CACHES.setdefault(
+                nombre, ({}, threading.Lock(), {'invalidado_en': 0.0, 'por_clave': {}}))
+
+        def _invalidado_en(args):
+            return max(estado['invalidado_en'], estado['por_clave'].get(args, 0.0))
+
+        @wraps(funcion)
+        def envoltura(*args):
+            ahora = time.monotonic()
+            with candado:
+                entrada = guardado.get(args)
+            if entrada is not None and entrada[0] > ahora:
+                CACHE.inc(cache=nombre, resultado='acierto')
+                return entrada[1]
+            CACHE.inc(cache=nombre, resultado='fallo')
+            inicio = time.time()
+            resultado = funcion(*args)
+            if resultado is not None and len(resultado):
+                with candado:
+                    if inicio >= _invalidado_en(args):
+                        guardado[args] = (ahora + ttl, resultado)
+            return resultado
+
+        def invalidar(*args):
+            with candado:
+                if args:
+                    guardado.pop(args, None)
+                    estado['por_clave'][args] = time.time()
+                else:
+                    guardado.clear()
+                    estado['por_clave'].clear()
+                    estado['invalidado_en'] = time.time()
+
+        def invalidado_en(*args):
+            with candado:
+                return _invalidado_en(args)
+
+        envoltura.invalidar = invalidar
+        envoltura.invalidado_en = invalidado_en
+        return envoltura
+    return decorador
+
+_EJECUCIONES = {}
+
+
+def a_lo_sumo_cada(nombre, segundos):
+    """Decorador: ejecuta la función a lo sumo una vez cada `segundos` en el proceso
+
+    Para los agregados incrementales que el panel refresca al dibujarse: son
+    escrituras y, llamados en cada rerun, serían un viaje al escritor por
+    render. Dentro del plazo la llamada no hace nada y devuelve None; si la
+    función falla, la próxima llamada vuelve a intentarlo. Como en
+    cache_referencia, el plazo vive en el módulo, por nombre, y lo comparten
+    todas las sesiones.
+    """
+    def decorador(funcion):
+        with _CANDADO_CACHES:
+            estado = _EJECUCIONES.setdefault(nombre, {'proxima': 0.0, 'candado': threading.Lock()})
+
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            ahora = time.monotonic()
+            with estado['candado']:
+                if ahora < estado['proxima']:
+                    return None
+                estado['proxima'] = ahora + segundos
+            try:
+                return funcion(*args, **kwargs)
+            except Exception:
+                with estado['candado']:
+                    estado['proxima'] = 0.0
+                raise
+
+        return envoltura
+    return decorador
+
+# ========================================
+# SERVIDOR /metrics
+# ========================================
+
+class ServidorMetricas:
+    """Servidor HTTP en segundo plano que publica el registro en /metrics"""
+
+    def __init__(self, registro=REGISTRO, puerto=None, host='0.0.0.0'):
+        self.registro = registro
+        if puerto is None:
+            puerto = int(os.environ.get('METRICAS_PUERTO', PUERTO_POR_DEFECTO))
+        # Con puerto 0 el sistema elige uno libre
+        self._servidor = ThreadingHTTPServer((host, puerto), self._manejador())
+        self.puerto = self._servidor.server_address[1]
+        self._servidor.daemon_threads = True
+        self._hilo = threading.Thread(target=self._servidor.serve_forever,
+                                      name='metricas', daemon=True)
+        self._hilo.start()
+
+    def _manejador(self):
+        servidor = self
+
+        class Manejador(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    codigo, tipo, cuerpo = 404, 'text/plain; charset=utf-8', "No encontrado"
+                else:
+                    codigo, tipo, cuerpo = 200, TIPO_CONTENIDO, servidor.registro.exposicion()
+                datos = cuerpo.encode('utf-8')
+                self.send_response(codigo)
+                self.send_header('Content-Type', tipo)
+                self.send_header('Content-Length', str(len(datos)))
+                self.end_headers()
+                self.wfile.write(datos)
+
+            def log_message(self, formato, *args):
+                pass
+
+        return Manejador
+
+    def cerrar(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Métricas en formato Prometheus")
+    parser.add_argument('--db', default='taller_automotriz.db', help="Archivo SQLite")
+    parser.add_argument('--servir', action='store_true', help="Levantar /metrics hasta Ctrl+C")
+    parser.add_argument('--puerto', type=int, help=f"Puerto (por defecto {PUERTO_POR_DEFECTO})")
+    args = parser.parse_args()
+
+    ruta = args.db
+
+    def contar():
+        conn = sqlite3.connect(f"file:{ruta}?mode=ro", uri=True)
+        try:
+            return contar_stock_bajo(conn)
+        finally:
+            conn.close()
+
+    registrar_stock_bajo(contar)
+    if not args.servir:
+        print(REGISTRO.exposicion(), end='')
+        return
+    servidor = ServidorMetricas(puerto=args.puerto)
+    print(f"Métricas en http://localhost:{servidor.puerto}/metrics (Ctrl+C para salir)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        servidor.cerrar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+# ========================================
+# MIGRACIONES DE ESQUEMA VERSIONADAS
+# Taller Automotriz - Sistema de Gestión
+# ========================================
+
+"""
+Aplica en orden los archivos migraciones/<motor>/NNNN_descripcion.sql que
+todavía no figuran en la tabla schema_version. Cada migración corre en su
+propia transacción junto con el registro de su versión, de modo que los datos
+iniciales se insertan una sola vez. Si la base ya está al día, el arranque
+cuesta una única consulta (SELECT MAX(version) FROM schema_version).
+
+Uso:
+    python migraciones.py --motor sqlite --db taller_automotriz.db
+    python migraciones.py --motor sqlserver --dsn "Driver={ODBC Driver 17 for SQL Server};..."
+    python migraciones.py --motor sqlite --db taller_automotriz.db --estado
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+
+from bd_sqlite import BaseDatosSQLite
+
+CARPETA_MIGRACIONES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migraciones')
+MOTORES = ('sqlite', 'sqlserver')
+
+_PATRON_ARCHIVO = re.compile(r'^(\d{4})_(\w+)\.sql$')
+_PATRON_GO = re.compile(r'^\s*GO\s*;?\s*$', re.IGNORECASE | re.MULTILINE)
+
+_TABLA_VERSION = {
+    'sqlite': """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            nombre TEXT NOT NULL,
+            aplicada_en DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """,
+    'sqlserver': """
+        IF OBJECT_ID(N'dbo.schema_version', N'U') IS NULL
+        CREATE TABLE schema_version (
+            version INT PRIMARY KEY,
+            nombre NVARCHAR(200) NOT NULL,
+            aplicada_en DATETIME DEFAULT GETDATE()
+        )
+    """,
+}
+
+
+def motor_de(conn):
+    """Devuelve 'sqlite' o 'sqlserver' según el tipo de conexión"""
+    return 'sqlite' if isinstance(conn, (sqlite3.Connection, BaseDatosSQLite)) else 'sqlserver'
+
+
+def listar_migraciones(motor):
+    """Lista de (version, nombre, ruta) ordenada por versión"""
+    carpeta = os.path.join(CARPETA_MIGRACIONES, motor)
+    migraciones = []
+    for archivo in os.listdir(carpeta):
+        coincidencia = _PATRON_ARCHIVO.match(archivo)
+        if coincidencia:
+            migraciones.append((int(coincidencia.group(1)), coincidencia.group(2),
+                                os.path.join(carpeta, archivo)))
+    migraciones.sort()
+    versiones = [m[0] for m in migraciones]
+    if len(versiones) != len(set(versiones)):
+        raise ValueError(f"Hay versiones de migración repetidas en {carpeta}")
+    return migraciones
+
+
+def version_actual(conn):
+    """Versión aplicada más alta (0 si la base no tiene schema_version)"""
+    try:
+        fila = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    except Exception:
+        # La tabla no existe todavía: base nueva o creada con el script antiguo
+        conn.rollback()
+        return 0
+    return fila[0] or 0
+
+
+def _aplicar_sqlite(conn, version, nombre, script):
+    # executescript hace COMMIT de lo pendiente; el BEGIN explícito deja la
+    # migración y su registro en una sola transacción
+    try:
+        conn.executescript(
+            "BEGIN;\n" + script + "\n;\n"
+            f"INSERT INTO schema_version (version, nombre) VALUES ({version}, '{nombre}');\n"
+            "COMMIT;")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+
+
+def _aplicar_sqlserver(conn, version, nombre, script):
+    cursor = conn.cursor()
+    try:
+        for lote in _PATRON_GO.split(script):
+            if lote.strip():
+                cursor.execute(lote)
+        cursor.execute("INSERT INTO schema_version (version, nombre) VALUES (?, ?)",
+                       (version, nombre))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def aplicar_migraciones(conn, motor=None):
+    """Aplica las migraciones pendientes; devuelve la lista de versiones aplicadas"""
+    motor = motor or motor_de(conn)
+    migraciones = listar_migraciones(motor)
+    ultima = migraciones[-1][0] if migraciones else 0
+
+    actual = version_actual(conn)
+    if actual >= ultima:
+        return []
+
+    conn.execute(_TABLA_VERSION[motor])
+    conn.commit()
+
+    aplicadas = []
+    for version, nombre, ruta in migraciones:
+        if version <= actual:
+            continue
+        with open(ruta, encoding='utf-8') as f:
+            script = f.read()
+        try:
+            if motor == 'sqlite':
+                _aplicar_sqlite(conn, version, nombre, script)
+            else:
+                _aplicar_sqlserver(conn, version, nombre, script)
+        except Exception as e:
+            # Otro proceso pudo aplicarla en paralelo: solo es error si sigue pendiente
+            if version_actual(conn) >= version:
+                continue
+            raise RuntimeError(f"Falló la migración {version:04d}_{nombre}: {e}") from e
+        aplicadas.append(version)
+    return aplicadas
+
+
+def migrar_sqlite(ruta='taller_automotriz.db'):
+    """Abre el archivo SQLite, lo lleva a la última versión y lo cierra"""
+    conn = sqlite3.connect(ruta)
+    try:
+        return aplicar_migraciones(conn, 'sqlite')
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migraciones de esquema del Taller Automotriz")
+    parser.add_argument('--motor', choices=MOTORES, default='sqlite')
+    parser.add_argument('--db', default='taller_automotriz.db', help="Archivo SQLite")
+    parser.add_argument('--dsn', help="Cadena de conexión ODBC (SQL Server)")
+    parser.add_argument('--estado', action='store_true',
+                        help="Solo mostrar la versión actual y las pendientes")
+    args = parser.parse_args()
+
+    if args.motor == 'sqlite':
+        conn = sqlite3.connect(args.db)
+    else:
+        import pyodbc
+        if not args.dsn:
+            parser.error("--dsn es obligatorio para SQL Server")
+        conn = pyodbc.connect(args.dsn)
+
+    try:
+        if args.estado:
+            actual = version_actual(conn)
+            pendientes = [f"{v:04d}_{n}" for v, n, _ in listar_migraciones(args.motor) if v > actual]
+            print(f"Versión actual: {actual}")
+            print(f"Pendientes: {', '.join(pendientes) if pendientes else 'ninguna'}")
+        else:
+            aplicadas = aplicar_migraciones(conn, args.motor)
+            if aplicadas:
+                print(f"✅ Migraciones aplicadas: {', '.join(f'{v:04d}' for v in aplicadas)}")
+            else:
+                print("✅ La base de datos ya está al día")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+-- Migración 0001: tablas base del Taller Automotriz
+-- SQLite
+
+-- Tabla de Clientes
+CREATE TABLE IF NOT EXISTS Clientes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre TEXT NOT NULL,
+    telefono TEXT NOT NULL,
+    email TEXT,
+    direccion TEXT,
+    fecha_registro DATETIME DEFAULT CURRENT_TIMESTAMP,
+    activo INTEGER DEFAULT 1
+);
+
+-- Tabla de Vehículos
+CREATE TABLE IF NOT EXISTS Vehiculos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    cliente_id INTEGER,
+    marca TEXT NOT NULL,
+    modelo TEXT NOT NULL,
+    año INTEGER NOT NULL,
+    placa TEXT,
+    color TEXT,
+    kilometraje INTEGER,
+    fecha_registro DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (cliente_id) REFERENCES Clientes(id)
+);
+
+-- Tabla de Servicios
+CREATE TABLE IF NOT EXISTS Servicios (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre TEXT NOT NULL,
+    descripcion TEXT,
+    precio DECIMAL(10,2) NOT NULL,
+    duracion_horas DECIMAL(4,2) DEFAULT 1.0,
+    activo INTEGER DEFAULT 1
+);
+
+-- Tabla de Citas
+CREATE TABLE IF NOT EXISTS Citas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    cliente_id INTEGER,
+    vehiculo_id INTEGER,
+    servicio_id INTEGER,
+    fecha_hora DATETIME NOT NULL,
+    descripcion_problema TEXT,
+    estado TEXT DEFAULT 'Pendiente',
+    observaciones TEXT,
+    costo_total DECIMAL(10,2),
+    fecha_creacion DATETIME DEFAULT CURRENT_TIMESTAMP,
+    fecha_actualizacion DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (cliente_id) REFERENCES Clientes(id),
+    FOREIGN KEY (vehiculo_id) REFERENCES Vehiculos(id),
+    FOREIGN KEY (servicio_id) REFERENCES Servicios(id)
+);
+
+-- Tabla de Inventario
+CREATE TABLE IF NOT EXISTS Inventario (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre TEXT NOT NULL,
+    categoria TEXT NOT NULL,
+    descripcion TEXT,
+    stock_actual INTEGER NOT NULL DEFAULT 0,
+    stock_minimo INTEGER NOT NULL DEFAULT 1,
+    precio_unitario DECIMAL(10,2) NOT NULL,
+    proveedor TEXT,
+    fecha_actualizacion DATETIME DEFAULT CURRENT_TIMESTAMP,
+    activo INTEGER DEFAULT 1
+);
+
+-- Tabla de Usuarios
+CREATE TABLE IF NOT EXISTS Usuarios (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT UNIQUE NOT NULL,
+    password_hash TEXT NOT NULL,
+    nombre TEXT NOT NULL,
+    email TEXT,
+    tipo TEXT DEFAULT 'admin',
+    activo INTEGER DEFAULT 1,
+    fecha_creacion DATETIME DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,41 @@
+-- Migración 0002: datos de ejemplo (solo si las tablas están vacías)
+-- SQLite
+
+-- Insertar servicios base
+INSERT INTO Servicios (nombre, descripcion, precio, duracion_horas)
+SELECT * FROM (VALUES
+    ('Mantenimiento Preventivo', 'Cambio de aceite, filtros y revisión general del vehículo', 120.00, 2.0),
+    ('Cambio de Aceite', 'Cambio de aceite de motor y filtro', 80.00, 1.0),
+    ('Afinamiento de Motor', 'Cambio de bujías, cables y filtros', 150.00, 3.0),
+    ('Revisión de Frenos', 'Inspección y cambio de pastillas y discos de freno', 180.00, 2.5),
+    ('Sistema Eléctrico', 'Diagnóstico y reparación del sistema eléctrico', 100.00, 2.0),
+    ('Cambio de Batería', 'Suministro e instalación de batería nueva', 250.00, 0.5),
+    ('Reparación de Suspensión', 'Cambio de amortiguadores y componentes de suspensión', 300.00, 4.0),
+    ('Diagnóstico Computarizado', 'Escaneo y diagnóstico por computadora', 50.00, 1.0)
+)
+WHERE NOT EXISTS (SELECT 1 FROM Servicios);
+
+-- Insertar inventario de ejemplo
+INSERT INTO Inventario (nombre, categoria, descripcion, stock_actual, stock_minimo, precio_unitario, proveedor)
+SELECT * FROM (VALUES
+    ('Aceite 5W30 4L', 'Lubricantes', 'Aceite sintético para motor', 20, 10, 45.00, 'Castrol'),
+    ('Filtro de Aceite', 'Filtros', 'Filtro de aceite universal', 15, 5, 25.00, 'Mann Filter'),
+    ('Filtro de Aire', 'Filtros', 'Filtro de aire del motor', 8, 5, 35.00, 'K&N'),
+    ('Pastillas de Freno', 'Frenos', 'Pastillas de freno cerámicas', 3, 5, 120.00, 'Brembo'),
+    ('Batería 12V', 'Eléctrico', 'Batería libre de mantenimiento', 12, 8, 280.00, 'Bosch')
+)
+WHERE NOT EXISTS (SELECT 1 FROM Inventario);
+
+-- Insertar usuario admin (password: admin123)
+INSERT OR IGNORE INTO Usuarios (username, password_hash, nombre, email, tipo)
+VALUES ('admin', '240be518fabd2724ddb6f04eeb1da5967448d7e831c08c8fa822809f74c720a9',
+        'Administrador', 'admin@tallersanisidro.com', 'admin');
+
+-- Insertar clientes de ejemplo
+INSERT INTO Clientes (nombre, telefono, email, direccion)
+SELECT * FROM (VALUES
+    ('Juan Pérez García', '987654321', 'juan.perez@email.com', 'Av. Arequipa 1234, San Isidro'),
+    ('María González López', '987654322', 'maria.gonzalez@email.com', 'Jr. Lampa 567, Lima Centro'),
+    ('Carlos Rodríguez', '987654323', 'carlos.rodriguez@email.com', 'Av. Javier Prado 890, San Isidro')
+)
+WHERE NOT EXISTS (SELECT 1 FROM Clientes);
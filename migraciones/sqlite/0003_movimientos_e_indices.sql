@@ -0,0 +1,22 @@
+-- Migración 0003: movimientos de inventario e índices (paridad con SQL Server)
+-- SQLite
+
+-- Tabla de Movimientos de Inventario
+CREATE TABLE IF NOT EXISTS MovimientosInventario (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    inventario_id INTEGER,
+    tipo_movimiento TEXT NOT NULL, -- ENTRADA, SALIDA
+    cantidad INTEGER NOT NULL,
+    motivo TEXT,
+    fecha DATETIME DEFAULT CURRENT_TIMESTAMP,
+    usuario_id INTEGER,
+    FOREIGN KEY (inventario_id) REFERENCES Inventario(id)
+);
+
+-- Índices
+CREATE INDEX IF NOT EXISTS IX_Citas_FechaHora ON Citas(fecha_hora);
+CREATE INDEX IF NOT EXISTS IX_Citas_Estado ON Citas(estado);
+CREATE INDEX IF NOT EXISTS IX_Citas_ClienteId ON Citas(cliente_id);
+CREATE INDEX IF NOT EXISTS IX_Vehiculos_ClienteId ON Vehiculos(cliente_id);
+CREATE INDEX IF NOT EXISTS IX_Inventario_StockBajo ON Inventario(stock_actual, stock_minimo) WHERE activo = 1;
+CREATE INDEX IF NOT EXISTS IX_MovimientosInventario_Fecha ON MovimientosInventario(fecha);
@@ -0,0 +1,89 @@
+-- Migración 0004: índice de búsqueda de clientes (FTS5 con trigramas)
+-- SQLite
+--
+-- Una fila por cliente activo (rowid = Clientes.id) con sus datos y los de sus
+-- vehículos. El nombre se guarda sin tildes para que 'perez' encuentre 'Pérez'.
+-- Los triggers lo mantienen al día en cada INSERT/UPDATE/DELETE.
+
+CREATE VIRTUAL TABLE IF NOT EXISTS BusquedaClientes USING fts5(
+    nombre, telefono, email, placa, marca, modelo,
+    tokenize = 'trigram'
+);
+
+-- Carga inicial
+DELETE FROM BusquedaClientes;
+INSERT INTO BusquedaClientes (rowid, nombre, telefono, email, placa, marca, modelo)
+SELECT c.id, replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(c.nombre, 'á', 'a'), 'é', 'e'), 'í', 'i'), 'ó', 'o'), 'ú', 'u'), 'ü', 'u'), 'ñ', 'n'), 'Á', 'A'), 'É', 'E'), 'Í', 'I'), 'Ó', 'O'), 'Ú', 'U'), 'Ü', 'U'), 'Ñ', 'N'),
+       c.telefono, IFNULL(c.email, ''),
+       IFNULL((SELECT group_concat(placa, ' ') FROM Vehiculos v WHERE v.cliente_id = c.id), ''),
+       IFNULL((SELECT group_concat(marca, ' ') FROM Vehiculos v WHERE v.cliente_id = c.id), ''),
+       IFNULL((SELECT group_concat(modelo, ' ') FROM Vehiculos v WHERE v.cliente_id = c.id), '')
+FROM Clientes c
+WHERE c.activo = 1;
+
+-- Clientes
+CREATE TRIGGER IF NOT EXISTS tr_Clientes_Busqueda_Insert AFTER INSERT ON Clientes
+WHEN new.activo = 1
+BEGIN
+    INSERT INTO BusquedaClientes (rowid, nombre, telefono, email, placa, marca, modelo)
+    SELECT c.id, replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(c.nombre, 'á', 'a'), 'é', 'e'), 'í', 'i'), 'ó', 'o'), 'ú', 'u'), 'ü', 'u'), 'ñ', 'n'), 'Á', 'A'), 'É', 'E'), 'Í', 'I'), 'Ó', 'O'), 'Ú', 'U'), 'Ü', 'U'), 'Ñ', 'N'),
+           c.telefono, IFNULL(c.email, ''),
+           IFNULL((SELECT group_concat(placa, ' ') FROM Vehiculos v WHERE v.cliente_id = c.id), ''),
+           IFNULL((SELECT group_concat(marca, ' ') FROM Vehiculos v WHERE v.cliente_id = c.id), ''),
+           IFNULL((SELECT group_concat(modelo, ' ') FROM Vehiculos v WHERE v.cliente_id = c.id), '')
+    FROM Clientes c
+    WHERE c.id = new.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_Clientes_Busqueda_Update
+AFTER UPDATE OF nombre, telefono, email, activo ON Clientes
+BEGIN
+    DELETE FROM BusquedaClientes WHERE rowid = old.id;
+    INSERT INTO BusquedaClientes (rowid, nombre, telefono, email, placa, marca, modelo)
+    SELECT c.id, replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(c.nombre, 'á', 'a'), 'é', 'e'), 'í', 'i'), 'ó', 'o'), 'ú', 'u'), 'ü', 'u'), 'ñ', 'n'), 'Á', 'A'), 'É', 'E'), 'Í', 'I'), 'Ó', 'O'), 'Ú', 'U'), 'Ü', 'U'), 'Ñ', 'N'),
+           c.telefono, IFNULL(c.email, ''),
+           IFNULL((SELECT group_concat(placa, ' ') FROM Vehiculos v WHERE v.cliente_id = c.id), ''),
+           IFNULL((SELECT group_concat(marca, ' ') FROM Vehiculos v WHERE v.cliente_id = c.id), ''),
+           IFNULL((SELECT group_concat(modelo, ' ') FROM Vehiculos v WHERE v.cliente_id = c.id), '')
+    FROM Clientes c
+    WHERE c.id = new.id AND c.activo = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_Clientes_Busqueda_Delete AFTER DELETE ON Clientes
+BEGIN
+    DELETE FROM BusquedaClientes WHERE rowid = old.id;
+END;
+
+-- Vehículos: solo se recalculan las columnas de vehículos del cliente afectado
+CREATE TRIGGER IF NOT EXISTS tr_Vehiculos_Busqueda_Insert AFTER INSERT ON Vehiculos
+BEGIN
+    UPDATE BusquedaClientes SET
+        placa = IFNULL((SELECT group_concat(placa, ' ') FROM Vehiculos WHERE cliente_id = new.cliente_id), ''),
+        marca = IFNULL((SELECT group_concat(marca, ' ') FROM Vehiculos WHERE cliente_id = new.cliente_id), ''),
+        modelo = IFNULL((SELECT group_concat(modelo, ' ') FROM Vehiculos WHERE cliente_id = new.cliente_id), '')
+    WHERE rowid = new.cliente_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_Vehiculos_Busqueda_Update
+AFTER UPDATE OF cliente_id, placa, marca, modelo ON Vehiculos
+BEGIN
+    UPDATE BusquedaClientes SET
+        placa = IFNULL((SELECT group_concat(placa, ' ') FROM Vehiculos WHERE cliente_id = old.cliente_id), ''),
+        marca = IFNULL((SELECT group_concat(marca, ' ') FROM Vehiculos WHERE cliente_id = old.cliente_id), ''),
+        modelo = IFNULL((SELECT group_concat(modelo, ' ') FROM Vehiculos WHERE cliente_id = old.cliente_id), '')
+    WHERE rowid = old.cliente_id;
+    UPDATE BusquedaClientes SET
+        placa = IFNULL((SELECT group_concat(placa, ' ') FROM Vehiculos WHERE cliente_id = new.cliente_id), ''),
+        marca = IFNULL((SELECT group_concat(marca, ' ') FROM Vehiculos WHERE cliente_id = new.cliente_id), ''),
+        modelo = IFNULL((SELECT group_concat(modelo, ' ') FROM Vehiculos WHERE cliente_id = new.cliente_id), '')
+    WHERE rowid = new.cliente_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_Vehiculos_Busqueda_Delete AFTER DELETE ON Vehiculos
+BEGIN
+    UPDATE BusquedaClientes SET
+        placa = IFNULL((SELECT group_concat(placa, ' ') FROM Vehiculos WHERE cliente_id = old.cliente_id), ''),
+        marca = IFNULL((SELECT group_concat(marca, ' ') FROM Vehiculos WHERE cliente_id = old.cliente_id), ''),
+        modelo = IFNULL((SELECT group_concat(modelo, ' ') FROM Vehiculos WHERE cliente_id = old.cliente_id), '')
+    WHERE rowid = old.cliente_id;
+END;
@@ -0,0 +1,45 @@
+-- Migración 0005: tablas de archivo (datos fríos) para Citas y MovimientosInventario
+-- SQLite
+--
+-- archivado.py mueve a estas tablas las citas cerradas y los movimientos
+-- antiguos. ArchivoCorte guarda, por tabla, la fecha límite de lo archivado:
+-- las lecturas solo consultan el archivo si el rango pedido empieza antes.
+
+CREATE TABLE IF NOT EXISTS CitasHistorico (
+    id INTEGER PRIMARY KEY,
+    cliente_id INTEGER,
+    vehiculo_id INTEGER,
+    servicio_id INTEGER,
+    fecha_hora DATETIME NOT NULL,
+    descripcion_problema TEXT,
+    estado TEXT,
+    observaciones TEXT,
+    costo_total DECIMAL(10,2),
+    fecha_creacion DATETIME,
+    fecha_actualizacion DATETIME,
+    archivada_en DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS MovimientosInventarioHistorico (
+    id INTEGER PRIMARY KEY,
+    inventario_id INTEGER,
+    tipo_movimiento TEXT NOT NULL,
+    cantidad INTEGER NOT NULL,
+    motivo TEXT,
+    fecha DATETIME,
+    usuario_id INTEGER,
+    archivada_en DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS ArchivoCorte (
+    tabla TEXT PRIMARY KEY,
+    corte DATETIME NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS IX_CitasHistorico_FechaHora ON CitasHistorico(fecha_hora);
+CREATE INDEX IF NOT EXISTS IX_CitasHistorico_ClienteId ON CitasHistorico(cliente_id);
+CREATE INDEX IF NOT EXISTS IX_MovimientosInventarioHistorico_Fecha ON MovimientosInventarioHistorico(fecha);
+CREATE INDEX IF NOT EXISTS IX_MovimientosInventarioHistorico_InventarioId ON MovimientosInventarioHistorico(inventario_id);
+
+-- Índices que usa el archivado para encontrar cada lote sin recorrer la tabla
+CREATE INDEX IF NOT EXISTS IX_MovimientosInventario_InventarioId ON MovimientosInventario(inventario_id);
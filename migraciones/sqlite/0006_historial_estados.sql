@@ -0,0 +1,71 @@
+-- Migración 0006: historial de cambios de estado de las citas y tiempos por estado
+-- SQLite
+--
+-- CitasHistorialEstado es de solo inserción: los triggers de Citas agregan una
+-- fila al crear la cita y otra en cada cambio de estado, con los segundos que
+-- la cita pasó en el estado anterior. tiempos_estado.py acumula esas filas en
+-- TiemposEstadoCubetas (histograma logarítmico por servicio, día y estado) a
+-- partir de la última fila procesada (MarcasAgregacion), sin releer el historial.
+
+CREATE TABLE IF NOT EXISTS CitasHistorialEstado (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    cita_id INTEGER NOT NULL,
+    servicio_id INTEGER,
+    estado_anterior TEXT,
+    estado_nuevo TEXT NOT NULL,
+    fecha DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    segundos_en_estado_anterior INTEGER
+);
+
+CREATE INDEX IF NOT EXISTS IX_CitasHistorialEstado_CitaFecha ON CitasHistorialEstado(cita_id, fecha);
+
+CREATE TRIGGER IF NOT EXISTS tr_CitasHistorialEstado_SinActualizar
+BEFORE UPDATE ON CitasHistorialEstado
+BEGIN
+    SELECT RAISE(ABORT, 'CitasHistorialEstado es de solo inserción');
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_CitasHistorialEstado_SinBorrar
+BEFORE DELETE ON CitasHistorialEstado
+BEGIN
+    SELECT RAISE(ABORT, 'CitasHistorialEstado es de solo inserción');
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_Citas_Estado_Insert
+AFTER INSERT ON Citas
+BEGIN
+    INSERT INTO CitasHistorialEstado (cita_id, servicio_id, estado_anterior, estado_nuevo, fecha)
+    VALUES (NEW.id, NEW.servicio_id, NULL, COALESCE(NEW.estado, 'Pendiente'),
+            COALESCE(NEW.fecha_creacion, CURRENT_TIMESTAMP));
+END;
+
+-- El estado anterior empezó en el último cambio registrado (o al crear la cita,
+-- para las citas anteriores a esta migración)
+CREATE TRIGGER IF NOT EXISTS tr_Citas_Estado_Update
+AFTER UPDATE OF estado ON Citas
+WHEN OLD.estado IS NOT NEW.estado
+BEGIN
+    INSERT INTO CitasHistorialEstado (cita_id, servicio_id, estado_anterior, estado_nuevo, fecha,
+                                      segundos_en_estado_anterior)
+    SELECT NEW.id, NEW.servicio_id, OLD.estado, NEW.estado, CURRENT_TIMESTAMP,
+           MAX(0, CAST(ROUND((julianday(CURRENT_TIMESTAMP) - julianday(COALESCE(
+               (SELECT MAX(fecha) FROM CitasHistorialEstado WHERE cita_id = NEW.id),
+               OLD.fecha_creacion, CURRENT_TIMESTAMP))) * 86400) AS INTEGER));
+END;
+
+CREATE TABLE IF NOT EXISTS TiemposEstadoCubetas (
+    servicio_id INTEGER NOT NULL,
+    dia DATE NOT NULL,
+    estado TEXT NOT NULL,
+    cubeta INTEGER NOT NULL,
+    cantidad INTEGER NOT NULL,
+    segundos_total REAL NOT NULL,
+    PRIMARY KEY (servicio_id, dia, estado, cubeta)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS IX_TiemposEstadoCubetas_Dia ON TiemposEstadoCubetas(dia);
+
+CREATE TABLE IF NOT EXISTS MarcasAgregacion (
+    nombre TEXT PRIMARY KEY,
+    ultimo_id INTEGER NOT NULL
+);
@@ -0,0 +1,23 @@
+-- Migración 0007: bandeja de salida de recordatorios
+-- SQLite
+--
+-- recordatorios.py escribe aquí los mensajes ya armados. El índice único
+-- (cita_id, tipo) hace que volver a correr el proceso no duplique mensajes.
+
+CREATE TABLE IF NOT EXISTS BandejaSalida (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    cita_id INTEGER NOT NULL,
+    tipo TEXT NOT NULL,
+    canal TEXT NOT NULL CHECK (canal IN ('email', 'sms')),
+    destinatario TEXT NOT NULL,
+    asunto TEXT,
+    cuerpo TEXT NOT NULL,
+    estado TEXT NOT NULL DEFAULT 'pendiente' CHECK (estado IN ('pendiente', 'enviado', 'error')),
+    intentos INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    creado_en DATETIME DEFAULT CURRENT_TIMESTAMP,
+    enviado_en DATETIME
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS UX_BandejaSalida_CitaTipo ON BandejaSalida(cita_id, tipo);
+CREATE INDEX IF NOT EXISTS IX_BandejaSalida_Pendientes ON BandejaSalida(estado, canal, id);
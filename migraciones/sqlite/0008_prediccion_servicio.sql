@@ -0,0 +1,20 @@
+-- Migración 0008: próximo servicio preventivo estimado por vehículo
+-- SQLite
+--
+-- prediccion_servicio.py recalcula en lote las filas de los vehículos con citas
+-- completadas nuevas (marca 'PrediccionServicio' sobre CitasHistorialEstado).
+
+CREATE TABLE IF NOT EXISTS PrediccionServicio (
+    vehiculo_id INTEGER PRIMARY KEY,
+    ultimo_servicio DATE,
+    servicios_previos INTEGER NOT NULL,
+    intervalo_dias REAL NOT NULL,
+    km_diarios REAL,
+    proximo_servicio DATE NOT NULL,
+    metodo TEXT NOT NULL,
+    calculado_en DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS IX_PrediccionServicio_Proximo ON PrediccionServicio(proximo_servicio);
+CREATE INDEX IF NOT EXISTS IX_Citas_VehiculoId ON Citas(vehiculo_id);
+CREATE INDEX IF NOT EXISTS IX_CitasHistorico_VehiculoId ON CitasHistorico(vehiculo_id);
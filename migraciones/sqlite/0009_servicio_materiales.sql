@@ -0,0 +1,74 @@
+-- Migración 0009: materiales por servicio y descuento de stock al completar citas
+-- SQLite
+--
+-- ServicioMateriales indica qué repuestos (y cuántos) usa cada servicio. Al
+-- pasar una cita a 'Completado' los triggers registran las SALIDAs en
+-- MovimientosInventario y descuentan el stock en la misma sentencia: si algún
+-- repuesto no alcanza, la actualización se aborta completa. CitasConsumo evita
+-- descontar dos veces una cita que vuelve a completarse.
+
+CREATE TABLE IF NOT EXISTS ServicioMateriales (
+    servicio_id INTEGER NOT NULL,
+    inventario_id INTEGER NOT NULL,
+    cantidad INTEGER NOT NULL CHECK (cantidad > 0),
+    PRIMARY KEY (servicio_id, inventario_id),
+    FOREIGN KEY (servicio_id) REFERENCES Servicios(id),
+    FOREIGN KEY (inventario_id) REFERENCES Inventario(id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS CitasConsumo (
+    cita_id INTEGER PRIMARY KEY,
+    fecha DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TRIGGER IF NOT EXISTS tr_Citas_Materiales_Verificar
+BEFORE UPDATE OF estado ON Citas
+WHEN NEW.estado = 'Completado' AND OLD.estado IS NOT 'Completado'
+     AND NOT EXISTS (SELECT 1 FROM CitasConsumo WHERE cita_id = NEW.id)
+BEGIN
+    SELECT RAISE(ABORT, 'Stock insuficiente para completar la cita')
+    WHERE EXISTS (
+        SELECT 1
+        FROM ServicioMateriales m
+        JOIN Inventario i ON i.id = m.inventario_id
+        WHERE m.servicio_id = NEW.servicio_id
+        AND i.stock_actual < m.cantidad
+    );
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_Citas_Materiales
+AFTER UPDATE OF estado ON Citas
+WHEN NEW.estado = 'Completado' AND OLD.estado IS NOT 'Completado'
+     AND NOT EXISTS (SELECT 1 FROM CitasConsumo WHERE cita_id = NEW.id)
+BEGIN
+    INSERT INTO MovimientosInventario (inventario_id, tipo_movimiento, cantidad, motivo)
+    SELECT inventario_id, 'SALIDA', cantidad, 'Cita #' || NEW.id
+    FROM ServicioMateriales
+    WHERE servicio_id = NEW.servicio_id;
+
+    UPDATE Inventario
+    SET stock_actual = stock_actual - (SELECT m.cantidad FROM ServicioMateriales m
+                                       WHERE m.servicio_id = NEW.servicio_id
+                                       AND m.inventario_id = Inventario.id),
+        fecha_actualizacion = CURRENT_TIMESTAMP
+    WHERE id IN (SELECT inventario_id FROM ServicioMateriales WHERE servicio_id = NEW.servicio_id);
+
+    INSERT INTO CitasConsumo (cita_id) VALUES (NEW.id);
+END;
+
+-- Materiales de los servicios de ejemplo (solo si la tabla está vacía)
+INSERT INTO ServicioMateriales (servicio_id, inventario_id, cantidad)
+SELECT s.id, i.id, m.column3
+FROM (VALUES
+    ('Mantenimiento Preventivo', 'Aceite 5W30 4L', 1),
+    ('Mantenimiento Preventivo', 'Filtro de Aceite', 1),
+    ('Mantenimiento Preventivo', 'Filtro de Aire', 1),
+    ('Cambio de Aceite', 'Aceite 5W30 4L', 1),
+    ('Cambio de Aceite', 'Filtro de Aceite', 1),
+    ('Afinamiento de Motor', 'Filtro de Aire', 1),
+    ('Revisión de Frenos', 'Pastillas de Freno', 1),
+    ('Cambio de Batería', 'Batería 12V', 1)
+) AS m
+JOIN Servicios s ON s.nombre = m.column1
+JOIN Inventario i ON i.nombre = m.column2
+WHERE NOT EXISTS (SELECT 1 FROM ServicioMateriales);
@@ -0,0 +1,20 @@
+-- Migración 0010: puntos de reorden calculados a partir de los movimientos
+-- SQLite
+--
+-- reposicion.py llena PuntosReorden con la demanda diaria, su variabilidad y
+-- el tiempo de entrega estimados de MovimientosInventario, y copia el punto de
+-- reorden a Inventario.stock_minimo de los items con historial suficiente.
+
+CREATE TABLE IF NOT EXISTS PuntosReorden (
+    inventario_id INTEGER PRIMARY KEY,
+    dias_con_salidas INTEGER NOT NULL,
+    demanda_diaria REAL NOT NULL,
+    desviacion_diaria REAL NOT NULL,
+    dias_entrega REAL NOT NULL,
+    desviacion_entrega REAL NOT NULL,
+    stock_seguridad INTEGER NOT NULL,
+    punto_reorden INTEGER NOT NULL,
+    cantidad_pedido INTEGER NOT NULL,
+    calculado_en DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (inventario_id) REFERENCES Inventario(id)
+);
@@ -0,0 +1,110 @@
+-- Migración 0011: sedes del taller y datos separados por sede
+-- SQLite
+--
+-- Cada sede tiene sus citas, su inventario (con su propio stock y sus
+-- movimientos) y sus usuarios; los clientes, vehículos y servicios son de
+-- toda la cadena. Los datos existentes quedan en la sede 1 (San Isidro).
+-- Los índices empiezan por sede_id para que las consultas de una sede solo
+-- recorran sus propias filas.
+--
+-- ServicioMateriales sigue apuntando a los repuestos de la sede 1 (el
+-- catálogo); vw_MaterialesSede los traduce al repuesto del mismo nombre en
+-- cada sede, y los triggers de consumo descuentan el stock de la sede de la cita.
+
+CREATE TABLE IF NOT EXISTS Sedes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre TEXT UNIQUE NOT NULL,
+    direccion TEXT NOT NULL,
+    telefono TEXT,
+    email TEXT,
+    latitud REAL,
+    longitud REAL,
+    activo INTEGER DEFAULT 1,
+    fecha_creacion DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT OR IGNORE INTO Sedes (id, nombre, direccion, telefono, email, latitud, longitud)
+VALUES (1, 'San Isidro', 'Av. Petit Thouars 1234, San Isidro, Lima', '(01) 555-0123',
+        'info@tallersanisidro.com', -12.0986, -77.0428);
+
+-- SQLite no admite REFERENCES con DEFAULT distinto de NULL en ALTER TABLE
+ALTER TABLE Citas ADD COLUMN sede_id INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE CitasHistorico ADD COLUMN sede_id INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE Inventario ADD COLUMN sede_id INTEGER NOT NULL DEFAULT 1;
+-- NULL al insertar: tr_MovimientosInventario_Sede copia la sede del repuesto
+ALTER TABLE MovimientosInventario ADD COLUMN sede_id INTEGER;
+ALTER TABLE MovimientosInventarioHistorico ADD COLUMN sede_id INTEGER;
+-- NULL = usuario de toda la cadena
+ALTER TABLE Usuarios ADD COLUMN sede_id INTEGER;
+
+UPDATE MovimientosInventario SET sede_id = 1;
+UPDATE MovimientosInventarioHistorico SET sede_id = 1;
+
+CREATE TRIGGER IF NOT EXISTS tr_MovimientosInventario_Sede
+AFTER INSERT ON MovimientosInventario
+WHEN NEW.sede_id IS NULL
+BEGIN
+    UPDATE MovimientosInventario
+    SET sede_id = (SELECT sede_id FROM Inventario WHERE id = NEW.inventario_id)
+    WHERE id = NEW.id;
+END;
+
+-- Índices por sede
+CREATE INDEX IF NOT EXISTS IX_Citas_Sede_FechaHora ON Citas(sede_id, fecha_hora);
+CREATE INDEX IF NOT EXISTS IX_Citas_Sede_Estado ON Citas(sede_id, estado);
+CREATE INDEX IF NOT EXISTS IX_Citas_Sede_ClienteId ON Citas(sede_id, cliente_id);
+CREATE INDEX IF NOT EXISTS IX_CitasHistorico_Sede_FechaHora ON CitasHistorico(sede_id, fecha_hora);
+CREATE INDEX IF NOT EXISTS IX_Inventario_Sede_Nombre ON Inventario(sede_id, nombre);
+CREATE INDEX IF NOT EXISTS IX_Inventario_Sede_StockBajo ON Inventario(sede_id, stock_actual, stock_minimo) WHERE activo = 1;
+CREATE INDEX IF NOT EXISTS IX_MovimientosInventario_Sede_Fecha ON MovimientosInventario(sede_id, fecha);
+
+-- Repuestos de cada servicio en cada sede (inventario_id NULL si la sede no lo tiene)
+CREATE VIEW IF NOT EXISTS vw_MaterialesSede AS
+SELECT m.servicio_id, s.id AS sede_id, m.cantidad,
+       (SELECT MIN(i.id) FROM Inventario i
+        WHERE i.sede_id = s.id AND i.nombre = base.nombre AND i.activo = 1) AS inventario_id
+FROM ServicioMateriales m
+JOIN Inventario base ON base.id = m.inventario_id
+CROSS JOIN Sedes s;
+
+DROP TRIGGER IF EXISTS tr_Citas_Materiales_Verificar;
+DROP TRIGGER IF EXISTS tr_Citas_Materiales;
+
+CREATE TRIGGER tr_Citas_Materiales_Verificar
+BEFORE UPDATE OF estado ON Citas
+WHEN NEW.estado = 'Completado' AND OLD.estado IS NOT 'Completado'
+     AND NOT EXISTS (SELECT 1 FROM CitasConsumo WHERE cita_id = NEW.id)
+BEGIN
+    SELECT RAISE(ABORT, 'Stock insuficiente para completar la cita')
+    WHERE EXISTS (
+        SELECT 1
+        FROM vw_MaterialesSede m
+        LEFT JOIN Inventario i ON i.id = m.inventario_id
+        WHERE m.servicio_id = NEW.servicio_id
+        AND m.sede_id = NEW.sede_id
+        AND COALESCE(i.stock_actual, 0) < m.cantidad
+    );
+END;
+
+CREATE TRIGGER tr_Citas_Materiales
+AFTER UPDATE OF estado ON Citas
+WHEN NEW.estado = 'Completado' AND OLD.estado IS NOT 'Completado'
+     AND NOT EXISTS (SELECT 1 FROM CitasConsumo WHERE cita_id = NEW.id)
+BEGIN
+    INSERT INTO MovimientosInventario (inventario_id, tipo_movimiento, cantidad, motivo, sede_id)
+    SELECT inventario_id, 'SALIDA', cantidad, 'Cita #' || NEW.id, NEW.sede_id
+    FROM vw_MaterialesSede
+    WHERE servicio_id = NEW.servicio_id
+    AND sede_id = NEW.sede_id;
+
+    UPDATE Inventario
+    SET stock_actual = stock_actual - (SELECT m.cantidad FROM vw_MaterialesSede m
+                                       WHERE m.servicio_id = NEW.servicio_id
+                                       AND m.sede_id = NEW.sede_id
+                                       AND m.inventario_id = Inventario.id),
+        fecha_actualizacion = CURRENT_TIMESTAMP
+    WHERE id IN (SELECT inventario_id FROM vw_MaterialesSede
+                 WHERE servicio_id = NEW.servicio_id AND sede_id = NEW.sede_id);
+
+    INSERT INTO CitasConsumo (cita_id) VALUES (NEW.id);
+END;
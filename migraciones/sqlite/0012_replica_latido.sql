@@ -0,0 +1,13 @@
+-- Migración 0012: latido para medir el retraso de la réplica de lectura
+-- SQLite
+--
+-- La primaria escribe aquí la hora (segundos desde epoch) cada segundo; la
+-- réplica recibe el valor con el resto de los datos, así que la hora actual
+-- menos el latido de la réplica es su retraso (replicas.py).
+
+CREATE TABLE IF NOT EXISTS ReplicaLatido (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    marca REAL NOT NULL
+);
+
+INSERT OR IGNORE INTO ReplicaLatido (id, marca) VALUES (1, 0);
@@ -0,0 +1,75 @@
+-- Migración 0013: reservas y stock sin carreras entre escrituras simultáneas
+-- SQLite
+--
+-- HorariosReservados tiene una fila por horario ocupado (sede + fecha_hora);
+-- su clave primaria hace que de dos reservas simultáneas del mismo horario
+-- solo una se inserte, sin bloquear la tabla de citas. Los triggers la
+-- mantienen desde Citas: reservar, cancelar, reprogramar y archivar.
+-- Las citas activas repetidas que ya existían conservan sus filas; el
+-- horario queda reservado a nombre de la primera.
+--
+-- Citas.version sube en cada UPDATE (control optimista al cambiar el estado)
+-- y el stock no puede bajar de 0.
+
+CREATE TABLE IF NOT EXISTS HorariosReservados (
+    sede_id INTEGER NOT NULL,
+    fecha_hora DATETIME NOT NULL,
+    cita_id INTEGER NOT NULL UNIQUE,
+    PRIMARY KEY (sede_id, fecha_hora)
+);
+
+INSERT OR IGNORE INTO HorariosReservados (sede_id, fecha_hora, cita_id)
+SELECT sede_id, fecha_hora, MIN(id)
+FROM Citas
+WHERE estado <> 'Cancelado'
+GROUP BY sede_id, fecha_hora;
+
+CREATE TRIGGER IF NOT EXISTS tr_Citas_Horario_Insert
+AFTER INSERT ON Citas
+WHEN NEW.estado IS NOT 'Cancelado'
+BEGIN
+    INSERT INTO HorariosReservados (sede_id, fecha_hora, cita_id)
+    VALUES (NEW.sede_id, NEW.fecha_hora, NEW.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_Citas_Horario_Cancelar
+AFTER UPDATE OF estado ON Citas
+WHEN NEW.estado = 'Cancelado' AND OLD.estado IS NOT 'Cancelado'
+BEGIN
+    DELETE FROM HorariosReservados WHERE cita_id = NEW.id;
+END;
+
+-- Reactivar o reprogramar toma el horario nuevo (falla si ya está ocupado)
+CREATE TRIGGER IF NOT EXISTS tr_Citas_Horario_Mover
+AFTER UPDATE OF estado, fecha_hora, sede_id ON Citas
+WHEN NEW.estado IS NOT 'Cancelado'
+     AND (OLD.estado = 'Cancelado' OR OLD.fecha_hora IS NOT NEW.fecha_hora OR OLD.sede_id IS NOT NEW.sede_id)
+BEGIN
+    DELETE FROM HorariosReservados WHERE cita_id = NEW.id;
+    INSERT INTO HorariosReservados (sede_id, fecha_hora, cita_id)
+    VALUES (NEW.sede_id, NEW.fecha_hora, NEW.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_Citas_Horario_Delete
+AFTER DELETE ON Citas
+BEGIN
+    DELETE FROM HorariosReservados WHERE cita_id = OLD.id;
+END;
+
+-- Versión de la fila para el control optimista
+ALTER TABLE Citas ADD COLUMN version INTEGER NOT NULL DEFAULT 0;
+
+CREATE TRIGGER IF NOT EXISTS tr_Citas_Version
+AFTER UPDATE ON Citas
+WHEN NEW.version = OLD.version
+BEGIN
+    UPDATE Citas SET version = OLD.version + 1 WHERE id = NEW.id;
+END;
+
+-- Solo se bloquean las bajas: un item que ya estaba en negativo puede recibir entradas
+CREATE TRIGGER IF NOT EXISTS tr_Inventario_StockNoNegativo
+BEFORE UPDATE OF stock_actual ON Inventario
+WHEN NEW.stock_actual < 0 AND NEW.stock_actual < OLD.stock_actual
+BEGIN
+    SELECT RAISE(ABORT, 'Stock insuficiente');
+END;
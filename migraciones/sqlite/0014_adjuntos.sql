@@ -0,0 +1,29 @@
+-- Migración 0014: fotos de ingreso e inspección adjuntas a citas y vehículos
+-- SQLite
+--
+-- El archivo vive en el almacén de adjuntos (adjuntos.py), guardado por su
+-- SHA-256: la misma foto subida dos veces ocupa un solo archivo. Aquí queda
+-- solo la fila que la vincula a la cita y/o al vehículo.
+--
+-- cita_id no es clave foránea: las citas viejas pasan a CitasHistorico con el
+-- mismo id y sus fotos siguen encontrándose.
+
+CREATE TABLE IF NOT EXISTS Adjuntos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sha256 CHAR(64) NOT NULL,
+    cita_id INTEGER,
+    vehiculo_id INTEGER REFERENCES Vehiculos(id),
+    tipo VARCHAR(20) NOT NULL DEFAULT 'inspeccion' CHECK (tipo IN ('ingreso', 'inspeccion')),
+    nombre_archivo VARCHAR(255),
+    tipo_contenido VARCHAR(100),
+    tamano INTEGER NOT NULL,
+    descripcion TEXT,
+    usuario_id INTEGER REFERENCES Usuarios(id),
+    fecha_creacion DATETIME DEFAULT CURRENT_TIMESTAMP,
+    CHECK (cita_id IS NOT NULL OR vehiculo_id IS NOT NULL)
+);
+
+CREATE INDEX IF NOT EXISTS IX_Adjuntos_Cita ON Adjuntos(cita_id, fecha_creacion);
+CREATE INDEX IF NOT EXISTS IX_Adjuntos_Vehiculo ON Adjuntos(vehiculo_id, fecha_creacion);
+-- Limpieza del almacén: qué archivos siguen referenciados
+CREATE INDEX IF NOT EXISTS IX_Adjuntos_Sha256 ON Adjuntos(sha256);
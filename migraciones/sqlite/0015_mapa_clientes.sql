@@ -0,0 +1,32 @@
+-- Migración 0015: ubicación de los clientes para el mapa por distrito
+-- SQLite
+--
+-- GeocodificacionCache guarda el resultado de cada dirección normalizada
+-- (también las que no se encontraron), por versión del nomenclátor: una
+-- dirección repetida o ya vista no se vuelve a buscar.
+-- ClientesUbicacion tiene la ubicación vigente de cada cliente y la dirección
+-- y el nomenclátor con los que se calculó; si alguno cambia, el cliente se
+-- recalcula.
+
+CREATE TABLE IF NOT EXISTS GeocodificacionCache (
+    direccion VARCHAR(300) PRIMARY KEY,
+    nomenclator CHAR(12) NOT NULL,
+    distrito VARCHAR(60),
+    lugar VARCHAR(120),
+    lat REAL,
+    lon REAL,
+    fecha_creacion DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS ClientesUbicacion (
+    cliente_id INTEGER PRIMARY KEY REFERENCES Clientes(id),
+    direccion TEXT,
+    nomenclator CHAR(12) NOT NULL,
+    distrito VARCHAR(60),
+    lat REAL,
+    lon REAL,
+    fecha_actualizacion DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Agregado del mapa: clientes por punto del nomenclátor
+CREATE INDEX IF NOT EXISTS IX_ClientesUbicacion_Punto ON ClientesUbicacion(distrito, lat, lon);
@@ -0,0 +1,11 @@
+-- Migración 0016: índice parcial para los pendientes de la bandeja de salida
+-- SQLite
+--
+-- IX_BandejaSalida_Pendientes (estado, canal, id) deja de servir cuando la
+-- bandeja crece: con estadísticas, casi todo está 'enviado' y el planificador
+-- prefiere recorrer la tabla por id. Indexando solo los pendientes el índice
+-- queda chico y enviar_pendientes busca por (canal, id) con o sin ANALYZE.
+-- Detectado por planes_consulta.py.
+
+DROP INDEX IF EXISTS IX_BandejaSalida_Pendientes;
+CREATE INDEX IF NOT EXISTS IX_BandejaSalida_Pendientes ON BandejaSalida(canal, id) WHERE estado = 'pendiente';
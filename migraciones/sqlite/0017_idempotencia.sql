@@ -0,0 +1,16 @@
+-- Migración 0017: claves de idempotencia de los formularios
+-- SQLite
+--
+-- Cada envío de un formulario que escribe lleva una clave (instancia del
+-- formulario + datos enviados). idempotencia.py la busca y la guarda en la
+-- misma transacción que la escritura: un doble clic o un rerun de Streamlit
+-- devuelve el resultado del primer envío en lugar de volver a insertar.
+-- Las filas vencidas (TTL) se borran en la siguiente escritura.
+
+CREATE TABLE IF NOT EXISTS Idempotencia (
+    clave TEXT PRIMARY KEY,
+    resultado TEXT,
+    creado_en DATETIME NOT NULL
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS IX_Idempotencia_Creado ON Idempotencia(creado_en);
@@ -0,0 +1,92 @@
+-- Migración 0018: ingresos por hora, día, semana y mes
+-- SQLite
+--
+-- IngresosPeriodo suma las citas completadas y sus ingresos (costo_total, o
+-- el precio del servicio si no tiene, como sp_reporte_servicios_populares)
+-- por grano, inicio del período y sede. Los triggers de Citas la mantienen
+-- al día: al completar una cita se suma a sus cuatro períodos, y si una cita
+-- completada cambia de costo, fecha, servicio, sede o deja de estar
+-- completada, se resta lo que sumaba antes. No hay trigger de borrado: el
+-- archivado mueve las citas a CitasHistorico y sus ingresos siguen contando.
+--
+-- Períodos: 'hora' = 'AAAA-MM-DD HH:00:00', 'dia' = 'AAAA-MM-DD', 'semana' =
+-- el lunes, 'mes' = 'AAAA-MM-01'.
+
+CREATE TABLE IF NOT EXISTS IngresosPeriodo (
+    grano VARCHAR(10) NOT NULL CHECK (grano IN ('hora', 'dia', 'semana', 'mes')),
+    periodo DATETIME NOT NULL,
+    sede_id INTEGER NOT NULL,
+    citas INTEGER NOT NULL,
+    ingresos DECIMAL(14,2) NOT NULL,
+    PRIMARY KEY (grano, periodo, sede_id)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS tr_Citas_Ingresos_Insert
+AFTER INSERT ON Citas
+WHEN NEW.estado = 'Completado'
+BEGIN
+    INSERT INTO IngresosPeriodo (grano, periodo, sede_id, citas, ingresos)
+    SELECT p.grano, p.periodo, NEW.sede_id, 1,
+           COALESCE(NEW.costo_total, (SELECT precio FROM Servicios WHERE id = NEW.servicio_id), 0)
+    FROM (SELECT 'hora' AS grano, strftime('%Y-%m-%d %H:00:00', NEW.fecha_hora) AS periodo
+          UNION ALL SELECT 'dia', date(NEW.fecha_hora)
+          UNION ALL SELECT 'semana', date(NEW.fecha_hora, 'weekday 0', '-6 days')
+          UNION ALL SELECT 'mes', strftime('%Y-%m-01', NEW.fecha_hora)) p
+    WHERE p.periodo IS NOT NULL
+    ON CONFLICT (grano, periodo, sede_id) DO UPDATE SET
+        citas = citas + excluded.citas,
+        ingresos = ingresos + excluded.ingresos;
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_Citas_Ingresos_Update
+AFTER UPDATE OF estado, costo_total, fecha_hora, servicio_id, sede_id ON Citas
+WHEN OLD.estado = 'Completado' OR NEW.estado = 'Completado'
+BEGIN
+    INSERT INTO IngresosPeriodo (grano, periodo, sede_id, citas, ingresos)
+    SELECT p.grano, p.periodo, OLD.sede_id, -1,
+           -COALESCE(OLD.costo_total, (SELECT precio FROM Servicios WHERE id = OLD.servicio_id), 0)
+    FROM (SELECT 'hora' AS grano, strftime('%Y-%m-%d %H:00:00', OLD.fecha_hora) AS periodo
+          UNION ALL SELECT 'dia', date(OLD.fecha_hora)
+          UNION ALL SELECT 'semana', date(OLD.fecha_hora, 'weekday 0', '-6 days')
+          UNION ALL SELECT 'mes', strftime('%Y-%m-01', OLD.fecha_hora)) p
+    WHERE OLD.estado = 'Completado' AND p.periodo IS NOT NULL
+    ON CONFLICT (grano, periodo, sede_id) DO UPDATE SET
+        citas = citas + excluded.citas,
+        ingresos = ingresos + excluded.ingresos;
+
+    INSERT INTO IngresosPeriodo (grano, periodo, sede_id, citas, ingresos)
+    SELECT p.grano, p.periodo, NEW.sede_id, 1,
+           COALESCE(NEW.costo_total, (SELECT precio FROM Servicios WHERE id = NEW.servicio_id), 0)
+    FROM (SELECT 'hora' AS grano, strftime('%Y-%m-%d %H:00:00', NEW.fecha_hora) AS periodo
+          UNION ALL SELECT 'dia', date(NEW.fecha_hora)
+          UNION ALL SELECT 'semana', date(NEW.fecha_hora, 'weekday 0', '-6 days')
+          UNION ALL SELECT 'mes', strftime('%Y-%m-01', NEW.fecha_hora)) p
+    WHERE NEW.estado = 'Completado' AND p.periodo IS NOT NULL
+    ON CONFLICT (grano, periodo, sede_id) DO UPDATE SET
+        citas = citas + excluded.citas,
+        ingresos = ingresos + excluded.ingresos;
+END;
+
+-- Citas ya completadas (activas y archivadas)
+INSERT INTO IngresosPeriodo (grano, periodo, sede_id, citas, ingresos)
+SELECT g.grano,
+       CASE g.grano
+           WHEN 'hora' THEN strftime('%Y-%m-%d %H:00:00', c.fecha_hora)
+           WHEN 'dia' THEN date(c.fecha_hora)
+           WHEN 'semana' THEN date(c.fecha_hora, 'weekday 0', '-6 days')
+           ELSE strftime('%Y-%m-01', c.fecha_hora)
+       END AS periodo,
+       c.sede_id, COUNT(*), SUM(c.monto)
+FROM (SELECT c.fecha_hora, c.sede_id, COALESCE(c.costo_total, s.precio, 0) AS monto
+      FROM Citas c LEFT JOIN Servicios s ON s.id = c.servicio_id
+      WHERE c.estado = 'Completado'
+      UNION ALL
+      SELECT h.fecha_hora, h.sede_id, COALESCE(h.costo_total, s.precio, 0)
+      FROM CitasHistorico h LEFT JOIN Servicios s ON s.id = h.servicio_id
+      WHERE h.estado = 'Completado') c
+CROSS JOIN (SELECT 'hora' AS grano UNION ALL SELECT 'dia' UNION ALL SELECT 'semana' UNION ALL SELECT 'mes') g
+WHERE c.fecha_hora IS NOT NULL
+GROUP BY g.grano, periodo, c.sede_id
+ON CONFLICT (grano, periodo, sede_id) DO UPDATE SET
+    citas = citas + excluded.citas,
+    ingresos = ingresos + excluded.ingresos;
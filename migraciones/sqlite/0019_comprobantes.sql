@@ -0,0 +1,31 @@
+-- Migración 0019: comprobantes de pago de las citas completadas
+-- SQLite
+--
+-- Una fila por cita facturada. La serie es de la sede (F001, F002...) y el
+-- correlativo sigue dentro de la serie; UQ_Comprobantes_Numero impide que
+-- dos lotes simultáneos tomen el mismo número. El HTML y el PDF viven en el
+-- almacén de adjuntos, guardados por su SHA-256. huella resume los datos y
+-- la versión de las plantillas con que se generaron: si no cambió, el lote
+-- no vuelve a generar el comprobante.
+--
+-- cita_id no es clave foránea: las citas viejas pasan a CitasHistorico con el
+-- mismo id y su comprobante sigue encontrándose.
+
+CREATE TABLE IF NOT EXISTS Comprobantes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    cita_id INTEGER NOT NULL UNIQUE,
+    sede_id INTEGER NOT NULL,
+    serie VARCHAR(4) NOT NULL,
+    correlativo INTEGER NOT NULL,
+    fecha_emision DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    total DECIMAL(10,2),
+    huella CHAR(40),
+    sha256_html CHAR(64),
+    sha256_pdf CHAR(64),
+    fecha_actualizacion DATETIME,
+    CONSTRAINT UQ_Comprobantes_Numero UNIQUE (serie, correlativo)
+);
+
+-- Limpieza del almacén de adjuntos: qué archivos siguen referenciados
+CREATE INDEX IF NOT EXISTS IX_Comprobantes_Html ON Comprobantes(sha256_html);
+CREATE INDEX IF NOT EXISTS IX_Comprobantes_Pdf ON Comprobantes(sha256_pdf);
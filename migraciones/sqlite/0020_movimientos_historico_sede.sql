@@ -0,0 +1,8 @@
+-- Migración 0020: índice por sede del archivo de movimientos
+-- SQLite
+--
+-- La exportación de movimientos de una sede recorre también el archivo, en
+-- orden de fecha; como IX_MovimientosInventario_Sede_Fecha en la tabla activa.
+
+CREATE INDEX IF NOT EXISTS IX_MovimientosInventarioHistorico_Sede_Fecha
+    ON MovimientosInventarioHistorico(sede_id, fecha);
@@ -0,0 +1,70 @@
+-- Migración 0021: la fila del índice de búsqueda, definida una sola vez
+-- SQLite
+--
+-- La migración 0004 repetía en la carga y en cada trigger cómo se arma la
+-- fila de BusquedaClientes (el nombre sin tildes y los datos de los
+-- vehículos). vw_BusquedaClientes la define en un solo lugar y los triggers
+-- se vuelven a crear para copiarla de ahí. El texto indexado es el mismo, así
+-- que no hace falta reconstruir el índice.
+
+CREATE VIEW IF NOT EXISTS vw_BusquedaClientes AS
+SELECT c.id,
+       replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(c.nombre, 'á', 'a'), 'é', 'e'), 'í', 'i'), 'ó', 'o'), 'ú', 'u'), 'ü', 'u'), 'ñ', 'n'), 'Á', 'A'), 'É', 'E'), 'Í', 'I'), 'Ó', 'O'), 'Ú', 'U'), 'Ü', 'U'), 'Ñ', 'N') AS nombre,
+       c.telefono,
+       IFNULL(c.email, '') AS email,
+       IFNULL((SELECT group_concat(placa, ' ') FROM Vehiculos v WHERE v.cliente_id = c.id), '') AS placa,
+       IFNULL((SELECT group_concat(marca, ' ') FROM Vehiculos v WHERE v.cliente_id = c.id), '') AS marca,
+       IFNULL((SELECT group_concat(modelo, ' ') FROM Vehiculos v WHERE v.cliente_id = c.id), '') AS modelo,
+       c.activo
+FROM Clientes c;
+
+-- Clientes
+DROP TRIGGER IF EXISTS tr_Clientes_Busqueda_Insert;
+CREATE TRIGGER tr_Clientes_Busqueda_Insert AFTER INSERT ON Clientes
+WHEN new.activo = 1
+BEGIN
+    INSERT INTO BusquedaClientes (rowid, nombre, telefono, email, placa, marca, modelo)
+    SELECT id, nombre, telefono, email, placa, marca, modelo
+    FROM vw_BusquedaClientes
+    WHERE id = new.id;
+END;
+
+DROP TRIGGER IF EXISTS tr_Clientes_Busqueda_Update;
+CREATE TRIGGER tr_Clientes_Busqueda_Update
+AFTER UPDATE OF nombre, telefono, email, activo ON Clientes
+BEGIN
+    DELETE FROM BusquedaClientes WHERE rowid = old.id;
+    INSERT INTO BusquedaClientes (rowid, nombre, telefono, email, placa, marca, modelo)
+    SELECT id, nombre, telefono, email, placa, marca, modelo
+    FROM vw_BusquedaClientes
+    WHERE id = new.id AND activo = 1;
+END;
+
+-- Vehículos: solo se recalculan las columnas de vehículos del cliente afectado
+DROP TRIGGER IF EXISTS tr_Vehiculos_Busqueda_Insert;
+CREATE TRIGGER tr_Vehiculos_Busqueda_Insert AFTER INSERT ON Vehiculos
+BEGIN
+    UPDATE BusquedaClientes SET (placa, marca, modelo) =
+        (SELECT placa, marca, modelo FROM vw_BusquedaClientes WHERE id = new.cliente_id)
+    WHERE rowid = new.cliente_id;
+END;
+
+DROP TRIGGER IF EXISTS tr_Vehiculos_Busqueda_Update;
+CREATE TRIGGER tr_Vehiculos_Busqueda_Update
+AFTER UPDATE OF cliente_id, placa, marca, modelo ON Vehiculos
+BEGIN
+    UPDATE BusquedaClientes SET (placa, marca, modelo) =
+        (SELECT placa, marca, modelo FROM vw_BusquedaClientes WHERE id = old.cliente_id)
+    WHERE rowid = old.cliente_id;
+    UPDATE BusquedaClientes SET (placa, marca, modelo) =
+        (SELECT placa, marca, modelo FROM vw_BusquedaClientes WHERE id = new.cliente_id)
+    WHERE rowid = new.cliente_id;
+END;
+
+DROP TRIGGER IF EXISTS tr_Vehiculos_Busqueda_Delete;
+CREATE TRIGGER tr_Vehiculos_Busqueda_Delete AFTER DELETE ON Vehiculos
+BEGIN
+    UPDATE BusquedaClientes SET (placa, marca, modelo) =
+        (SELECT placa, marca, modelo FROM vw_BusquedaClientes WHERE id = old.cliente_id)
+    WHERE rowid = old.cliente_id;
+END;
@@ -0,0 +1,96 @@
+-- Migración 0001: tablas base del Taller Automotriz
+-- SQL Server
+
+-- Tabla de Clientes
+IF OBJECT_ID(N'dbo.Clientes', N'U') IS NULL
+CREATE TABLE Clientes (
+    id INT IDENTITY(1,1) PRIMARY KEY,
+    nombre NVARCHAR(100) NOT NULL,
+    telefono NVARCHAR(20) NOT NULL,
+    email NVARCHAR(100),
+    direccion NVARCHAR(200),
+    fecha_registro DATETIME DEFAULT GETDATE(),
+    activo BIT DEFAULT 1
+);
+
+-- Tabla de Vehículos
+IF OBJECT_ID(N'dbo.Vehiculos', N'U') IS NULL
+CREATE TABLE Vehiculos (
+    id INT IDENTITY(1,1) PRIMARY KEY,
+    cliente_id INT FOREIGN KEY REFERENCES Clientes(id),
+    marca NVARCHAR(50) NOT NULL,
+    modelo NVARCHAR(50) NOT NULL,
+    año INT NOT NULL,
+    placa NVARCHAR(10),
+    color NVARCHAR(30),
+    kilometraje INT,
+    fecha_registro DATETIME DEFAULT GETDATE()
+);
+
+-- Tabla de Servicios
+IF OBJECT_ID(N'dbo.Servicios', N'U') IS NULL
+CREATE TABLE Servicios (
+    id INT IDENTITY(1,1) PRIMARY KEY,
+    nombre NVARCHAR(100) NOT NULL,
+    descripcion NVARCHAR(500),
+    precio DECIMAL(10,2) NOT NULL,
+    duracion_horas DECIMAL(4,2) DEFAULT 1.0,
+    activo BIT DEFAULT 1
+);
+
+-- Tabla de Citas
+IF OBJECT_ID(N'dbo.Citas', N'U') IS NULL
+CREATE TABLE Citas (
+    id INT IDENTITY(1,1) PRIMARY KEY,
+    cliente_id INT FOREIGN KEY REFERENCES Clientes(id),
+    vehiculo_id INT FOREIGN KEY REFERENCES Vehiculos(id),
+    servicio_id INT FOREIGN KEY REFERENCES Servicios(id),
+    fecha_hora DATETIME NOT NULL,
+    descripcion_problema NVARCHAR(500),
+    estado NVARCHAR(20) DEFAULT 'Pendiente', -- Pendiente, Confirmado, En Proceso, Completado, Cancelado
+    observaciones NVARCHAR(500),
+    costo_total DECIMAL(10,2),
+    fecha_creacion DATETIME DEFAULT GETDATE(),
+    fecha_actualizacion DATETIME DEFAULT GETDATE()
+);
+
+-- Tabla de Inventario
+IF OBJECT_ID(N'dbo.Inventario', N'U') IS NULL
+CREATE TABLE Inventario (
+    id INT IDENTITY(1,1) PRIMARY KEY,
+    nombre NVARCHAR(100) NOT NULL,
+    categoria NVARCHAR(50) NOT NULL,
+    descripcion NVARCHAR(300),
+    stock_actual INT NOT NULL DEFAULT 0,
+    stock_minimo INT NOT NULL DEFAULT 1,
+    precio_unitario DECIMAL(10,2) NOT NULL,
+    proveedor NVARCHAR(100),
+    fecha_actualizacion DATETIME DEFAULT GETDATE(),
+    activo BIT DEFAULT 1
+);
+
+-- Tabla de Usuarios (para autenticación)
+IF OBJECT_ID(N'dbo.Usuarios', N'U') IS NULL
+CREATE TABLE Usuarios (
+    id INT IDENTITY(1,1) PRIMARY KEY,
+    username NVARCHAR(50) UNIQUE NOT NULL,
+    password_hash NVARCHAR(64) NOT NULL,
+    nombre NVARCHAR(100) NOT NULL,
+    email NVARCHAR(100),
+    tipo NVARCHAR(20) DEFAULT 'admin', -- admin, empleado
+    activo BIT DEFAULT 1,
+    fecha_creacion DATETIME DEFAULT GETDATE()
+);
+
+-- Tabla de Movimientos de Inventario
+IF OBJECT_ID(N'dbo.MovimientosInventario', N'U') IS NULL
+CREATE TABLE MovimientosInventario (
+    id INT IDENTITY(1,1) PRIMARY KEY,
+    inventario_id INT FOREIGN KEY REFERENCES Inventario(id),
+    tipo_movimiento NVARCHAR(10) NOT NULL, -- ENTRADA, SALIDA
+    cantidad INT NOT NULL,
+    motivo NVARCHAR(100),
+    fecha DATETIME DEFAULT GETDATE(),
+    usuario_id INT
+);
+GO
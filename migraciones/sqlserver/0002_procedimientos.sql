@@ -0,0 +1,423 @@
+-- Migración 0002: procedimientos almacenados
+-- SQL Server
+
+-- SP para crear un cliente
+CREATE OR ALTER PROCEDURE sp_crear_cliente
+    @nombre NVARCHAR(100),
+    @telefono NVARCHAR(20),
+    @email NVARCHAR(100) = NULL,
+    @direccion NVARCHAR(200) = NULL
+AS
+BEGIN
+    BEGIN TRY
+        INSERT INTO Clientes (nombre, telefono, email, direccion)
+        VALUES (@nombre, @telefono, @email, @direccion);
+        
+        SELECT SCOPE_IDENTITY() as cliente_id, 'Cliente creado exitosamente' as mensaje;
+    END TRY
+    BEGIN CATCH
+        SELECT 0 as cliente_id, ERROR_MESSAGE() as mensaje;
+    END CATCH
+END
+GO
+
+-- SP para crear un vehículo
+CREATE OR ALTER PROCEDURE sp_crear_vehiculo
+    @cliente_id INT,
+    @marca NVARCHAR(50),
+    @modelo NVARCHAR(50),
+    @año INT,
+    @placa NVARCHAR(10) = NULL,
+    @color NVARCHAR(30) = NULL
+AS
+BEGIN
+    BEGIN TRY
+        INSERT INTO Vehiculos (cliente_id, marca, modelo, año, placa, color)
+        VALUES (@cliente_id, @marca, @modelo, @año, @placa, @color);
+        
+        SELECT SCOPE_IDENTITY() as vehiculo_id, 'Vehículo registrado exitosamente' as mensaje;
+    END TRY
+    BEGIN CATCH
+        SELECT 0 as vehiculo_id, ERROR_MESSAGE() as mensaje;
+    END CATCH
+END
+GO
+
+-- SP para obtener servicios
+CREATE OR ALTER PROCEDURE sp_obtener_servicios
+AS
+BEGIN
+    SELECT id, nombre, descripcion, precio, duracion_horas
+    FROM Servicios
+    WHERE activo = 1
+    ORDER BY nombre;
+END
+GO
+
+-- SP para crear una cita
+CREATE OR ALTER PROCEDURE sp_crear_cita
+    @cliente_id INT,
+    @vehiculo_id INT,
+    @servicio_id INT,
+    @fecha_hora DATETIME,
+    @descripcion_problema NVARCHAR(500) = NULL
+AS
+BEGIN
+    BEGIN TRY
+        -- Verificar disponibilidad (opcional)
+        IF EXISTS (
+            SELECT 1 FROM Citas 
+            WHERE fecha_hora = @fecha_hora 
+            AND estado NOT IN ('Cancelado')
+        )
+        BEGIN
+            SELECT 0 as cita_id, 'Ya existe una cita en esa fecha y hora' as mensaje;
+            RETURN;
+        END
+        
+        INSERT INTO Citas (cliente_id, vehiculo_id, servicio_id, fecha_hora, descripcion_problema)
+        VALUES (@cliente_id, @vehiculo_id, @servicio_id, @fecha_hora, @descripcion_problema);
+        
+        SELECT SCOPE_IDENTITY() as cita_id, 'Cita creada exitosamente' as mensaje;
+    END TRY
+    BEGIN CATCH
+        SELECT 0 as cita_id, ERROR_MESSAGE() as mensaje;
+    END CATCH
+END
+GO
+
+-- SP para obtener citas
+CREATE OR ALTER PROCEDURE sp_obtener_citas
+    @fecha_inicio DATE = NULL,
+    @fecha_fin DATE = NULL,
+    @estado NVARCHAR(20) = NULL
+AS
+BEGIN
+    SELECT 
+        c.id,
+        cl.nombre as cliente_nombre,
+        cl.telefono,
+        v.marca,
+        v.modelo,
+        v.placa,
+        s.nombre as servicio,
+        c.fecha_hora,
+        c.estado,
+        c.descripcion_problema,
+        c.costo_total,
+        s.precio as precio_base
+    FROM Citas c
+    INNER JOIN Clientes cl ON c.cliente_id = cl.id
+    INNER JOIN Vehiculos v ON c.vehiculo_id = v.id
+    INNER JOIN Servicios s ON c.servicio_id = s.id
+    WHERE 
+        (@fecha_inicio IS NULL OR CAST(c.fecha_hora AS DATE) >= @fecha_inicio)
+        AND (@fecha_fin IS NULL OR CAST(c.fecha_hora AS DATE) <= @fecha_fin)
+        AND (@estado IS NULL OR c.estado = @estado)
+    ORDER BY c.fecha_hora;
+END
+GO
+
+-- SP para actualizar estado de cita
+CREATE OR ALTER PROCEDURE sp_actualizar_estado_cita
+    @cita_id INT,
+    @nuevo_estado NVARCHAR(20),
+    @observaciones NVARCHAR(500) = NULL,
+    @costo_total DECIMAL(10,2) = NULL
+AS
+BEGIN
+    BEGIN TRY
+        UPDATE Citas 
+        SET 
+            estado = @nuevo_estado,
+            observaciones = ISNULL(@observaciones, observaciones),
+            costo_total = ISNULL(@costo_total, costo_total),
+            fecha_actualizacion = GETDATE()
+        WHERE id = @cita_id;
+        
+        SELECT 'Estado actualizado exitosamente' as mensaje;
+    END TRY
+    BEGIN CATCH
+        SELECT ERROR_MESSAGE() as mensaje;
+    END CATCH
+END
+GO
+
+-- SP para obtener inventario
+CREATE OR ALTER PROCEDURE sp_obtener_inventario
+    @categoria NVARCHAR(50) = NULL,
+    @stock_bajo BIT = 0
+AS
+BEGIN
+    SELECT 
+        id,
+        nombre,
+        categoria,
+        descripcion,
+        stock_actual,
+        stock_minimo,
+        precio_unitario,
+        proveedor,
+        fecha_actualizacion,
+        CASE WHEN stock_actual <= stock_minimo THEN 1 ELSE 0 END as es_stock_bajo
+    FROM Inventario
+    WHERE 
+        activo = 1
+        AND (@categoria IS NULL OR categoria = @categoria)
+        AND (@stock_bajo = 0 OR stock_actual <= stock_minimo)
+    ORDER BY 
+        CASE WHEN stock_actual <= stock_minimo THEN 0 ELSE 1 END,
+        nombre;
+END
+GO
+
+-- SP para agregar item al inventario
+CREATE OR ALTER PROCEDURE sp_agregar_inventario
+    @nombre NVARCHAR(100),
+    @categoria NVARCHAR(50),
+    @descripcion NVARCHAR(300) = NULL,
+    @stock_inicial INT = 0,
+    @stock_minimo INT = 1,
+    @precio_unitario DECIMAL(10,2),
+    @proveedor NVARCHAR(100) = NULL
+AS
+BEGIN
+    BEGIN TRY
+        INSERT INTO Inventario (nombre, categoria, descripcion, stock_actual, stock_minimo, precio_unitario, proveedor)
+        VALUES (@nombre, @categoria, @descripcion, @stock_inicial, @stock_minimo, @precio_unitario, @proveedor);
+        
+        DECLARE @inventario_id INT = SCOPE_IDENTITY();
+        
+        -- Registrar movimiento inicial si hay stock
+        IF @stock_inicial > 0
+        BEGIN
+            INSERT INTO MovimientosInventario (inventario_id, tipo_movimiento, cantidad, motivo)
+            VALUES (@inventario_id, 'ENTRADA', @stock_inicial, 'Stock inicial');
+        END
+        
+        SELECT @inventario_id as inventario_id, 'Item agregado exitosamente' as mensaje;
+    END TRY
+    BEGIN CATCH
+        SELECT 0 as inventario_id, ERROR_MESSAGE() as mensaje;
+    END CATCH
+END
+GO
+
+-- SP para actualizar stock
+CREATE OR ALTER PROCEDURE sp_actualizar_stock
+    @inventario_id INT,
+    @tipo_movimiento NVARCHAR(10), -- ENTRADA o SALIDA
+    @cantidad INT,
+    @motivo NVARCHAR(100) = NULL,
+    @usuario_id INT = NULL
+AS
+BEGIN
+    BEGIN TRY
+        BEGIN TRANSACTION;
+        
+        -- Validar que el item existe
+        IF NOT EXISTS (SELECT 1 FROM Inventario WHERE id = @inventario_id AND activo = 1)
+        BEGIN
+            ROLLBACK TRANSACTION;
+            SELECT 'Item no encontrado' as mensaje;
+            RETURN;
+        END
+        
+        -- Para salidas, verificar stock suficiente
+        IF @tipo_movimiento = 'SALIDA'
+        BEGIN
+            DECLARE @stock_actual INT;
+            SELECT @stock_actual = stock_actual FROM Inventario WHERE id = @inventario_id;
+            
+            IF @stock_actual < @cantidad
+            BEGIN
+                ROLLBACK TRANSACTION;
+                SELECT 'Stock insuficiente' as mensaje;
+                RETURN;
+            END
+        END
+        
+        -- Actualizar stock
+        IF @tipo_movimiento = 'ENTRADA'
+        BEGIN
+            UPDATE Inventario 
+            SET stock_actual = stock_actual + @cantidad,
+                fecha_actualizacion = GETDATE()
+            WHERE id = @inventario_id;
+        END
+        ELSE IF @tipo_movimiento = 'SALIDA'
+        BEGIN
+            UPDATE Inventario 
+            SET stock_actual = stock_actual - @cantidad,
+                fecha_actualizacion = GETDATE()
+            WHERE id = @inventario_id;
+        END
+        
+        -- Registrar movimiento
+        INSERT INTO MovimientosInventario (inventario_id, tipo_movimiento, cantidad, motivo, usuario_id)
+        VALUES (@inventario_id, @tipo_movimiento, @cantidad, @motivo, @usuario_id);
+        
+        COMMIT TRANSACTION;
+        SELECT 'Stock actualizado exitosamente' as mensaje;
+    END TRY
+    BEGIN CATCH
+        ROLLBACK TRANSACTION;
+        SELECT ERROR_MESSAGE() as mensaje;
+    END CATCH
+END
+GO
+
+-- SP para obtener clientes
+CREATE OR ALTER PROCEDURE sp_obtener_clientes
+    @activos_solamente BIT = 1
+AS
+BEGIN
+    SELECT 
+        c.id,
+        c.nombre,
+        c.telefono,
+        c.email,
+        c.direccion,
+        c.fecha_registro,
+        COUNT(v.id) as total_vehiculos,
+        COUNT(ct.id) as total_citas
+    FROM Clientes c
+    LEFT JOIN Vehiculos v ON c.id = v.cliente_id
+    LEFT JOIN Citas ct ON c.id = ct.cliente_id
+    WHERE (@activos_solamente = 0 OR c.activo = 1)
+    GROUP BY c.id, c.nombre, c.telefono, c.email, c.direccion, c.fecha_registro
+    ORDER BY c.nombre;
+END
+GO
+
+-- SP para obtener vehículos de un cliente
+CREATE OR ALTER PROCEDURE sp_obtener_vehiculos_cliente
+    @cliente_id INT
+AS
+BEGIN
+    SELECT 
+        id,
+        marca,
+        modelo,
+        año,
+        placa,
+        color,
+        kilometraje,
+        fecha_registro
+    FROM Vehiculos
+    WHERE cliente_id = @cliente_id
+    ORDER BY fecha_registro DESC;
+END
+GO
+
+-- SP para dashboard - métricas principales
+CREATE OR ALTER PROCEDURE sp_dashboard_metricas
+    @fecha DATE = NULL
+AS
+BEGIN
+    IF @fecha IS NULL
+        SET @fecha = CAST(GETDATE() AS DATE);
+    
+    -- Citas del día
+    SELECT COUNT(*) as citas_hoy
+    FROM Citas
+    WHERE CAST(fecha_hora AS DATE) = @fecha
+    AND estado NOT IN ('Cancelado');
+    
+    -- Total de clientes activos
+    SELECT COUNT(*) as clientes_activos
+    FROM Clientes
+    WHERE activo = 1;
+    
+    -- Ingresos del día
+    SELECT ISNULL(SUM(costo_total), 0) as ingresos_hoy
+    FROM Citas
+    WHERE CAST(fecha_hora AS DATE) = @fecha
+    AND estado = 'Completado';
+    
+    -- Items con stock bajo
+    SELECT COUNT(*) as items_stock_bajo
+    FROM Inventario
+    WHERE stock_actual <= stock_minimo
+    AND activo = 1;
+    
+    -- Distribución de estados de citas del día
+    SELECT 
+        estado,
+        COUNT(*) as cantidad
+    FROM Citas
+    WHERE CAST(fecha_hora AS DATE) = @fecha
+    GROUP BY estado;
+END
+GO
+
+-- SP para reportes de servicios más solicitados
+CREATE OR ALTER PROCEDURE sp_reporte_servicios_populares
+    @fecha_inicio DATE = NULL,
+    @fecha_fin DATE = NULL,
+    @top INT = 10
+AS
+BEGIN
+    IF @fecha_inicio IS NULL
+        SET @fecha_inicio = DATEADD(MONTH, -1, GETDATE());
+    
+    IF @fecha_fin IS NULL
+        SET @fecha_fin = GETDATE();
+    
+    SELECT TOP (@top)
+        s.nombre as servicio,
+        COUNT(c.id) as total_citas,
+        AVG(s.precio) as precio_promedio,
+        SUM(ISNULL(c.costo_total, s.precio)) as ingresos_totales
+    FROM Servicios s
+    INNER JOIN Citas c ON s.id = c.servicio_id
+    WHERE CAST(c.fecha_hora AS DATE) BETWEEN @fecha_inicio AND @fecha_fin
+    GROUP BY s.id, s.nombre
+    ORDER BY total_citas DESC;
+END
+GO
+
+-- SP para validar usuario (login)
+CREATE OR ALTER PROCEDURE sp_validar_usuario
+    @username NVARCHAR(50),
+    @password_hash NVARCHAR(64)
+AS
+BEGIN
+    SELECT 
+        id,
+        username,
+        nombre,
+        email,
+        tipo
+    FROM Usuarios
+    WHERE username = @username 
+    AND password_hash = @password_hash 
+    AND activo = 1;
+END
+GO
+
+-- SP para obtener movimientos de inventario
+CREATE OR ALTER PROCEDURE sp_obtener_movimientos_inventario
+    @inventario_id INT = NULL,
+    @fecha_inicio DATE = NULL,
+    @fecha_fin DATE = NULL
+AS
+BEGIN
+    SELECT 
+        m.id,
+        i.nombre as producto,
+        m.tipo_movimiento,
+        m.cantidad,
+        m.motivo,
+        m.fecha,
+        u.nombre as usuario
+    FROM MovimientosInventario m
+    INNER JOIN Inventario i ON m.inventario_id = i.id
+    LEFT JOIN Usuarios u ON m.usuario_id = u.id
+    WHERE 
+        (@inventario_id IS NULL OR m.inventario_id = @inventario_id)
+        AND (@fecha_inicio IS NULL OR CAST(m.fecha AS DATE) >= @fecha_inicio)
+        AND (@fecha_fin IS NULL OR CAST(m.fecha AS DATE) <= @fecha_fin)
+    ORDER BY m.fecha DESC;
+END
+GO
@@ -0,0 +1,75 @@
+-- Migración 0003: datos iniciales (solo si las tablas están vacías)
+-- SQL Server
+
+-- Insertar servicios base
+IF NOT EXISTS (SELECT 1 FROM Servicios)
+BEGIN
+    INSERT INTO Servicios (nombre, descripcion, precio, duracion_horas) VALUES
+    ('Mantenimiento Preventivo', 'Cambio de aceite, filtros y revisión general del vehículo', 120.00, 2.0),
+    ('Cambio de Aceite', 'Cambio de aceite de motor y filtro', 80.00, 1.0),
+    ('Afinamiento de Motor', 'Cambio de bujías, cables y filtros', 150.00, 3.0),
+    ('Revisión de Frenos', 'Inspección y cambio de pastillas y discos de freno', 180.00, 2.5),
+    ('Sistema Eléctrico', 'Diagnóstico y reparación del sistema eléctrico', 100.00, 2.0),
+    ('Cambio de Batería', 'Suministro e instalación de batería nueva', 250.00, 0.5),
+    ('Reparación de Suspensión', 'Cambio de amortiguadores y componentes de suspensión', 300.00, 4.0),
+    ('Diagnóstico Computarizado', 'Escaneo y diagnóstico por computadora', 50.00, 1.0),
+    ('Cambio de Llantas', 'Montaje y balanceo de llantas nuevas', 200.00, 1.5),
+    ('Reparación de Transmisión', 'Diagnóstico y reparación de caja de cambios', 500.00, 6.0);
+END
+
+-- Insertar items de inventario base
+IF NOT EXISTS (SELECT 1 FROM Inventario)
+BEGIN
+    INSERT INTO Inventario (nombre, categoria, descripcion, stock_actual, stock_minimo, precio_unitario, proveedor) VALUES
+    ('Aceite 5W30 4L', 'Lubricantes', 'Aceite sintético para motor', 20, 10, 45.00, 'Castrol'),
+    ('Filtro de Aceite', 'Filtros', 'Filtro de aceite universal', 15, 5, 25.00, 'Mann Filter'),
+    ('Filtro de Aire', 'Filtros', 'Filtro de aire del motor', 8, 5, 35.00, 'K&N'),
+    ('Pastillas de Freno Delanteras', 'Frenos', 'Pastillas de freno cerámicas', 3, 5, 120.00, 'Brembo'),
+    ('Pastillas de Freno Traseras', 'Frenos', 'Pastillas de freno cerámicas', 4, 5, 100.00, 'Brembo'),
+    ('Batería 12V 60Ah', 'Eléctrico', 'Batería libre de mantenimiento', 12, 8, 280.00, 'Bosch'),
+    ('Bujías NGK', 'Encendido', 'Bujías de platino', 25, 20, 15.00, 'NGK'),
+    ('Amortiguador Delantero', 'Suspensión', 'Amortiguador gas-oil', 6, 4, 180.00, 'Monroe'),
+    ('Líquido de Frenos DOT4', 'Fluidos', 'Líquido de frenos sintético', 10, 5, 20.00, 'Castrol'),
+    ('Refrigerante', 'Fluidos', 'Refrigerante universal', 8, 6, 30.00, 'Prestone');
+END
+
+-- Insertar usuario administrador (password: admin123)
+IF NOT EXISTS (SELECT 1 FROM Usuarios WHERE username = 'admin')
+BEGIN
+    INSERT INTO Usuarios (username, password_hash, nombre, email, tipo) VALUES
+    ('admin', '240be518fabd2724ddb6f04eeb1da5967448d7e831c08c8fa822809f74c720a9', 'Administrador', 'admin@tallersanisidro.com', 'admin');
+END
+
+-- Insertar algunos clientes de ejemplo
+IF NOT EXISTS (SELECT 1 FROM Clientes)
+BEGIN
+    INSERT INTO Clientes (nombre, telefono, email, direccion) VALUES
+    ('Juan Pérez García', '987654321', 'juan.perez@email.com', 'Av. Arequipa 1234, San Isidro'),
+    ('María González López', '987654322', 'maria.gonzalez@email.com', 'Jr. Lampa 567, Lima Centro'),
+    ('Carlos Rodríguez', '987654323', 'carlos.rodriguez@email.com', 'Av. Javier Prado 890, San Isidro'),
+    ('Ana Martín Silva', '987654324', 'ana.martin@email.com', 'Calle Los Nogales 123, San Borja'),
+    ('Pedro Ruiz Castro', '987654325', 'pedro.ruiz@email.com', 'Av. El Sol 456, Surco');
+END
+
+-- Insertar vehículos de ejemplo
+IF NOT EXISTS (SELECT 1 FROM Vehiculos)
+BEGIN
+    INSERT INTO Vehiculos (cliente_id, marca, modelo, año, placa, color) VALUES
+    (1, 'Toyota', 'Corolla', 2018, 'ABC-123', 'Blanco'),
+    (2, 'Nissan', 'Sentra', 2019, 'DEF-456', 'Azul'),
+    (3, 'Hyundai', 'Accent', 2020, 'GHI-789', 'Rojo'),
+    (4, 'Chevrolet', 'Spark', 2017, 'JKL-012', 'Negro'),
+    (5, 'Kia', 'Rio', 2021, 'MNO-345', 'Gris');
+END
+
+-- Insertar algunas citas de ejemplo
+IF NOT EXISTS (SELECT 1 FROM Citas)
+BEGIN
+    INSERT INTO Citas (cliente_id, vehiculo_id, servicio_id, fecha_hora, descripcion_problema, estado) VALUES
+    (1, 1, 1, '2024-08-16 08:00:00', 'Mantenimiento programado', 'Confirmado'),
+    (2, 2, 4, '2024-08-16 09:30:00', 'Ruido en los frenos', 'Pendiente'),
+    (3, 3, 2, '2024-08-16 11:00:00', 'Cambio de aceite', 'En Proceso'),
+    (4, 4, 8, '2024-08-16 14:00:00', 'Check engine encendido', 'Completado'),
+    (5, 5, 6, '2024-08-16 16:00:00', 'Batería descargada', 'Confirmado');
+END
+GO
@@ -0,0 +1,29 @@
+-- Migración 0004: índices y vista del dashboard
+-- SQL Server
+
+-- ================================
+-- ÍNDICES PARA MEJORAR PERFORMANCE
+-- ================================
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Citas_FechaHora' AND object_id = OBJECT_ID(N'dbo.Citas'))
+    CREATE INDEX IX_Citas_FechaHora ON Citas(fecha_hora);
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Citas_Estado' AND object_id = OBJECT_ID(N'dbo.Citas'))
+    CREATE INDEX IX_Citas_Estado ON Citas(estado);
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Citas_ClienteId' AND object_id = OBJECT_ID(N'dbo.Citas'))
+    CREATE INDEX IX_Citas_ClienteId ON Citas(cliente_id);
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Vehiculos_ClienteId' AND object_id = OBJECT_ID(N'dbo.Vehiculos'))
+    CREATE INDEX IX_Vehiculos_ClienteId ON Vehiculos(cliente_id);
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Inventario_StockBajo' AND object_id = OBJECT_ID(N'dbo.Inventario'))
+    CREATE INDEX IX_Inventario_StockBajo ON Inventario(stock_actual, stock_minimo) WHERE activo = 1;
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_MovimientosInventario_Fecha' AND object_id = OBJECT_ID(N'dbo.MovimientosInventario'))
+    CREATE INDEX IX_MovimientosInventario_Fecha ON MovimientosInventario(fecha);
+GO
+
+-- Vista para dashboard
+CREATE OR ALTER VIEW vw_dashboard_resumen AS
+SELECT 
+    (SELECT COUNT(*) FROM Citas WHERE CAST(fecha_hora AS DATE) = CAST(GETDATE() AS DATE) AND estado NOT IN ('Cancelado')) as citas_hoy,
+    (SELECT COUNT(*) FROM Clientes WHERE activo = 1) as clientes_activos,
+    (SELECT ISNULL(SUM(costo_total), 0) FROM Citas WHERE CAST(fecha_hora AS DATE) = CAST(GETDATE() AS DATE) AND estado = 'Completado') as ingresos_hoy,
+    (SELECT COUNT(*) FROM Inventario WHERE stock_actual <= stock_minimo AND activo = 1) as items_stock_bajo;
+GO
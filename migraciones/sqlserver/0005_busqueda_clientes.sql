@@ -0,0 +1,149 @@
+-- Migración 0005: índice de búsqueda de clientes por trigramas (n-gramas)
+-- SQL Server
+--
+-- BusquedaTrigramas guarda los trigramas (sin tildes, en minúsculas) del nombre,
+-- teléfono, email y de placa/marca/modelo de los vehículos de cada cliente
+-- activo. Los triggers reindexan solo los clientes afectados.
+
+IF OBJECT_ID(N'dbo.BusquedaTrigramas', N'U') IS NULL
+CREATE TABLE BusquedaTrigramas (
+    trigrama NCHAR(3) NOT NULL,
+    cliente_id INT NOT NULL,
+    CONSTRAINT PK_BusquedaTrigramas PRIMARY KEY (trigrama, cliente_id)
+);
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_BusquedaTrigramas_ClienteId' AND object_id = OBJECT_ID(N'dbo.BusquedaTrigramas'))
+    CREATE INDEX IX_BusquedaTrigramas_ClienteId ON BusquedaTrigramas(cliente_id);
+GO
+
+-- Trigramas distintos de un texto (palabra por palabra, sin tildes)
+CREATE OR ALTER FUNCTION dbo.fn_trigramas (@texto NVARCHAR(MAX))
+RETURNS TABLE
+AS
+RETURN
+    WITH digitos AS (
+        SELECT n FROM (VALUES (0),(1),(2),(3),(4),(5),(6),(7),(8),(9)) d(n)
+    ),
+    numeros AS (
+        SELECT d1.n + d2.n * 10 + d3.n * 100 + 1 AS n
+        FROM digitos d1 CROSS JOIN digitos d2 CROSS JOIN digitos d3
+    ),
+    limpio AS (
+        SELECT TRANSLATE(LOWER(@texto), N'áéíóúüñ', N'aeiouun') AS texto
+    )
+    SELECT DISTINCT CAST(SUBSTRING(l.texto, num.n, 3) AS NCHAR(3)) AS trigrama
+    FROM limpio l
+    INNER JOIN numeros num ON num.n <= LEN(l.texto) - 2
+    WHERE SUBSTRING(l.texto, num.n, 3) NOT LIKE N'% %';
+GO
+
+-- Texto indexable de cada cliente activo
+CREATE OR ALTER VIEW vw_busqueda_texto_cliente AS
+SELECT
+    c.id AS cliente_id,
+    CONCAT(c.nombre, N' ', c.telefono, N' ', c.email, N' ',
+           (SELECT STRING_AGG(CONCAT(v.placa, N' ', v.marca, N' ', v.modelo), N' ')
+            FROM Vehiculos v
+            WHERE v.cliente_id = c.id)) AS texto
+FROM Clientes c
+WHERE c.activo = 1;
+GO
+
+-- Carga inicial
+DELETE FROM BusquedaTrigramas;
+INSERT INTO BusquedaTrigramas (trigrama, cliente_id)
+SELECT DISTINCT t.trigrama, b.cliente_id
+FROM vw_busqueda_texto_cliente b
+CROSS APPLY dbo.fn_trigramas(b.texto) t;
+GO
+
+-- Reindexar los clientes afectados por cambios en Clientes
+CREATE OR ALTER TRIGGER tr_Clientes_Busqueda
+ON Clientes
+AFTER INSERT, UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    DECLARE @afectados TABLE (cliente_id INT PRIMARY KEY);
+    INSERT INTO @afectados (cliente_id)
+    SELECT id FROM inserted UNION SELECT id FROM deleted;
+
+    DELETE b
+    FROM BusquedaTrigramas b
+    INNER JOIN @afectados a ON a.cliente_id = b.cliente_id;
+
+    INSERT INTO BusquedaTrigramas (trigrama, cliente_id)
+    SELECT DISTINCT t.trigrama, b.cliente_id
+    FROM vw_busqueda_texto_cliente b
+    INNER JOIN @afectados a ON a.cliente_id = b.cliente_id
+    CROSS APPLY dbo.fn_trigramas(b.texto) t;
+END
+GO
+
+-- Reindexar los dueños de los vehículos modificados
+CREATE OR ALTER TRIGGER tr_Vehiculos_Busqueda
+ON Vehiculos
+AFTER INSERT, UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    DECLARE @afectados TABLE (cliente_id INT PRIMARY KEY);
+    INSERT INTO @afectados (cliente_id)
+    SELECT cliente_id FROM inserted WHERE cliente_id IS NOT NULL
+    UNION
+    SELECT cliente_id FROM deleted WHERE cliente_id IS NOT NULL;
+
+    DELETE b
+    FROM BusquedaTrigramas b
+    INNER JOIN @afectados a ON a.cliente_id = b.cliente_id;
+
+    INSERT INTO BusquedaTrigramas (trigrama, cliente_id)
+    SELECT DISTINCT t.trigrama, b.cliente_id
+    FROM vw_busqueda_texto_cliente b
+    INNER JOIN @afectados a ON a.cliente_id = b.cliente_id
+    CROSS APPLY dbo.fn_trigramas(b.texto) t;
+END
+GO
+
+-- SP para buscar clientes (tolerante a errores de tipeo)
+CREATE OR ALTER PROCEDURE sp_buscar_clientes
+    @texto NVARCHAR(100),
+    @top INT = 10
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    DECLARE @consulta TABLE (trigrama NCHAR(3) PRIMARY KEY);
+    INSERT INTO @consulta (trigrama)
+    SELECT trigrama FROM dbo.fn_trigramas(@texto);
+
+    DECLARE @total INT = (SELECT COUNT(*) FROM @consulta);
+
+    -- Relevancia = proporción de trigramas de la búsqueda presentes en el cliente;
+    -- se exige al menos la mitad para descartar coincidencias casuales
+    WITH candidatos AS (
+        SELECT TOP (@top)
+            b.cliente_id,
+            COUNT(*) AS coincidencias
+        FROM BusquedaTrigramas b
+        INNER JOIN @consulta q ON q.trigrama = b.trigrama
+        GROUP BY b.cliente_id
+        HAVING COUNT(*) * 2 >= @total
+        ORDER BY COUNT(*) DESC, b.cliente_id
+    )
+    SELECT
+        c.id,
+        c.nombre,
+        c.telefono,
+        c.email,
+        (SELECT STRING_AGG(v.placa, N' ') FROM Vehiculos v WHERE v.cliente_id = c.id) AS placa,
+        (SELECT STRING_AGG(v.marca, N' ') FROM Vehiculos v WHERE v.cliente_id = c.id) AS marca,
+        (SELECT STRING_AGG(v.modelo, N' ') FROM Vehiculos v WHERE v.cliente_id = c.id) AS modelo,
+        CAST(ca.coincidencias AS FLOAT) / NULLIF(@total, 0) AS relevancia
+    FROM candidatos ca
+    INNER JOIN Clientes c ON c.id = ca.cliente_id
+    ORDER BY ca.coincidencias DESC, c.nombre;
+END
+GO
@@ -0,0 +1,189 @@
+-- Migración 0006: archivo de citas cerradas y movimientos antiguos
+-- SQL Server
+--
+-- sp_archivar_historico mueve las filas en lotes pequeños (una transacción por
+-- lote, reanudable). ArchivoCorte guarda la fecha límite de lo archivado: las
+-- lecturas solo consultan las tablas de archivo si el rango pedido empieza antes.
+
+IF OBJECT_ID(N'dbo.CitasHistorico', N'U') IS NULL
+CREATE TABLE CitasHistorico (
+    id INT PRIMARY KEY,
+    cliente_id INT,
+    vehiculo_id INT,
+    servicio_id INT,
+    fecha_hora DATETIME NOT NULL,
+    descripcion_problema NVARCHAR(500),
+    estado NVARCHAR(20),
+    observaciones NVARCHAR(500),
+    costo_total DECIMAL(10,2),
+    fecha_creacion DATETIME,
+    fecha_actualizacion DATETIME,
+    archivada_en DATETIME DEFAULT GETDATE()
+);
+
+IF OBJECT_ID(N'dbo.MovimientosInventarioHistorico', N'U') IS NULL
+CREATE TABLE MovimientosInventarioHistorico (
+    id INT PRIMARY KEY,
+    inventario_id INT,
+    tipo_movimiento NVARCHAR(10) NOT NULL,
+    cantidad INT NOT NULL,
+    motivo NVARCHAR(100),
+    fecha DATETIME,
+    usuario_id INT,
+    archivada_en DATETIME DEFAULT GETDATE()
+);
+
+IF OBJECT_ID(N'dbo.ArchivoCorte', N'U') IS NULL
+CREATE TABLE ArchivoCorte (
+    tabla NVARCHAR(50) PRIMARY KEY,
+    corte DATETIME NOT NULL
+);
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_CitasHistorico_FechaHora' AND object_id = OBJECT_ID(N'dbo.CitasHistorico'))
+    CREATE INDEX IX_CitasHistorico_FechaHora ON CitasHistorico(fecha_hora);
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_CitasHistorico_ClienteId' AND object_id = OBJECT_ID(N'dbo.CitasHistorico'))
+    CREATE INDEX IX_CitasHistorico_ClienteId ON CitasHistorico(cliente_id);
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_MovimientosInventarioHistorico_Fecha' AND object_id = OBJECT_ID(N'dbo.MovimientosInventarioHistorico'))
+    CREATE INDEX IX_MovimientosInventarioHistorico_Fecha ON MovimientosInventarioHistorico(fecha);
+GO
+
+-- SP para archivar citas cerradas y movimientos antiguos
+CREATE OR ALTER PROCEDURE sp_archivar_historico
+    @meses_citas INT = 12,
+    @meses_movimientos INT = 24,
+    @lote INT = 500
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    DECLARE @corte_citas DATETIME = DATEADD(MONTH, -@meses_citas, CAST(GETDATE() AS DATE));
+    DECLARE @corte_movimientos DATETIME = DATEADD(MONTH, -@meses_movimientos, CAST(GETDATE() AS DATE));
+    DECLARE @filas INT = 1;
+    DECLARE @total_citas INT = 0;
+    DECLARE @total_movimientos INT = 0;
+
+    -- El corte se publica antes de mover filas: si el proceso se interrumpe,
+    -- las lecturas ya incluyen el archivo para las fechas afectadas
+    MERGE ArchivoCorte AS destino
+    USING (VALUES (N'Citas', @corte_citas), (N'MovimientosInventario', @corte_movimientos)) AS origen (tabla, corte)
+    ON destino.tabla = origen.tabla
+    WHEN MATCHED AND origen.corte > destino.corte THEN UPDATE SET corte = origen.corte
+    WHEN NOT MATCHED THEN INSERT (tabla, corte) VALUES (origen.tabla, origen.corte);
+
+    WHILE @filas > 0
+    BEGIN
+        BEGIN TRANSACTION;
+        DELETE TOP (@lote) FROM Citas
+        OUTPUT deleted.id, deleted.cliente_id, deleted.vehiculo_id, deleted.servicio_id,
+               deleted.fecha_hora, deleted.descripcion_problema, deleted.estado,
+               deleted.observaciones, deleted.costo_total, deleted.fecha_creacion,
+               deleted.fecha_actualizacion
+        INTO CitasHistorico (id, cliente_id, vehiculo_id, servicio_id, fecha_hora,
+                             descripcion_problema, estado, observaciones, costo_total,
+                             fecha_creacion, fecha_actualizacion)
+        WHERE estado IN ('Completado', 'Cancelado')
+        AND fecha_hora < @corte_citas;
+        SET @filas = @@ROWCOUNT;
+        COMMIT TRANSACTION;
+        SET @total_citas = @total_citas + @filas;
+    END
+
+    SET @filas = 1;
+    WHILE @filas > 0
+    BEGIN
+        BEGIN TRANSACTION;
+        DELETE TOP (@lote) FROM MovimientosInventario
+        OUTPUT deleted.id, deleted.inventario_id, deleted.tipo_movimiento, deleted.cantidad,
+               deleted.motivo, deleted.fecha, deleted.usuario_id
+        INTO MovimientosInventarioHistorico (id, inventario_id, tipo_movimiento, cantidad,
+                                             motivo, fecha, usuario_id)
+        WHERE fecha < @corte_movimientos;
+        SET @filas = @@ROWCOUNT;
+        COMMIT TRANSACTION;
+        SET @total_movimientos = @total_movimientos + @filas;
+    END
+
+    SELECT @total_citas as citas_archivadas, @total_movimientos as movimientos_archivados;
+END
+GO
+
+-- SP para obtener citas (incluye el archivo solo si el rango lo necesita)
+CREATE OR ALTER PROCEDURE sp_obtener_citas
+    @fecha_inicio DATE = NULL,
+    @fecha_fin DATE = NULL,
+    @estado NVARCHAR(20) = NULL
+AS
+BEGIN
+    DECLARE @corte DATETIME = (SELECT corte FROM ArchivoCorte WHERE tabla = N'Citas');
+    DECLARE @incluir_archivo BIT =
+        CASE WHEN @corte IS NOT NULL AND (@fecha_inicio IS NULL OR @fecha_inicio < @corte) THEN 1 ELSE 0 END;
+
+    SELECT 
+        c.id,
+        cl.nombre as cliente_nombre,
+        cl.telefono,
+        v.marca,
+        v.modelo,
+        v.placa,
+        s.nombre as servicio,
+        c.fecha_hora,
+        c.estado,
+        c.descripcion_problema,
+        c.costo_total,
+        s.precio as precio_base
+    FROM (
+        SELECT id, cliente_id, vehiculo_id, servicio_id, fecha_hora, estado, descripcion_problema, costo_total
+        FROM Citas
+        UNION ALL
+        -- El filtro de arranque (@incluir_archivo = 1) evita tocar el archivo
+        SELECT id, cliente_id, vehiculo_id, servicio_id, fecha_hora, estado, descripcion_problema, costo_total
+        FROM CitasHistorico
+        WHERE @incluir_archivo = 1
+    ) c
+    INNER JOIN Clientes cl ON c.cliente_id = cl.id
+    INNER JOIN Vehiculos v ON c.vehiculo_id = v.id
+    INNER JOIN Servicios s ON c.servicio_id = s.id
+    WHERE 
+        (@fecha_inicio IS NULL OR CAST(c.fecha_hora AS DATE) >= @fecha_inicio)
+        AND (@fecha_fin IS NULL OR CAST(c.fecha_hora AS DATE) <= @fecha_fin)
+        AND (@estado IS NULL OR c.estado = @estado)
+    ORDER BY c.fecha_hora;
+END
+GO
+
+-- SP para obtener movimientos de inventario (incluye el archivo solo si hace falta)
+CREATE OR ALTER PROCEDURE sp_obtener_movimientos_inventario
+    @inventario_id INT = NULL,
+    @fecha_inicio DATE = NULL,
+    @fecha_fin DATE = NULL
+AS
+BEGIN
+    DECLARE @corte DATETIME = (SELECT corte FROM ArchivoCorte WHERE tabla = N'MovimientosInventario');
+    DECLARE @incluir_archivo BIT =
+        CASE WHEN @corte IS NOT NULL AND (@fecha_inicio IS NULL OR @fecha_inicio < @corte) THEN 1 ELSE 0 END;
+
+    SELECT 
+        m.id,
+        i.nombre as producto,
+        m.tipo_movimiento,
+        m.cantidad,
+        m.motivo,
+        m.fecha,
+        u.nombre as usuario
+    FROM (
+        SELECT id, inventario_id, tipo_movimiento, cantidad, motivo, fecha, usuario_id
+        FROM MovimientosInventario
+        UNION ALL
+        SELECT id, inventario_id, tipo_movimiento, cantidad, motivo, fecha, usuario_id
+        FROM MovimientosInventarioHistorico
+        WHERE @incluir_archivo = 1
+    ) m
+    INNER JOIN Inventario i ON m.inventario_id = i.id
+    LEFT JOIN Usuarios u ON m.usuario_id = u.id
+    WHERE 
+        (@inventario_id IS NULL OR m.inventario_id = @inventario_id)
+        AND (@fecha_inicio IS NULL OR CAST(m.fecha AS DATE) >= @fecha_inicio)
+        AND (@fecha_fin IS NULL OR CAST(m.fecha AS DATE) <= @fecha_fin)
+    ORDER BY m.fecha DESC;
+END
+GO
@@ -0,0 +1,144 @@
+-- Migración 0007: historial de cambios de estado de las citas y tiempos por estado
+-- SQL Server
+--
+-- CitasHistorialEstado es de solo inserción: los triggers de Citas agregan una
+-- fila al crear la cita y otra en cada cambio de estado (sp_actualizar_estado_cita
+-- o cualquier otro UPDATE), con los segundos que la cita pasó en el estado
+-- anterior. sp_actualizar_tiempos_estado acumula las filas nuevas en
+-- TiemposEstadoCubetas (histograma logarítmico por servicio, día y estado).
+
+IF OBJECT_ID(N'dbo.CitasHistorialEstado', N'U') IS NULL
+CREATE TABLE CitasHistorialEstado (
+    id BIGINT IDENTITY(1,1) PRIMARY KEY,
+    cita_id INT NOT NULL,
+    servicio_id INT,
+    estado_anterior NVARCHAR(20),
+    estado_nuevo NVARCHAR(20) NOT NULL,
+    fecha DATETIME NOT NULL DEFAULT GETDATE(),
+    segundos_en_estado_anterior INT
+);
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_CitasHistorialEstado_CitaFecha' AND object_id = OBJECT_ID(N'dbo.CitasHistorialEstado'))
+    CREATE INDEX IX_CitasHistorialEstado_CitaFecha ON CitasHistorialEstado(cita_id, fecha);
+
+IF OBJECT_ID(N'dbo.TiemposEstadoCubetas', N'U') IS NULL
+CREATE TABLE TiemposEstadoCubetas (
+    servicio_id INT NOT NULL,
+    dia DATE NOT NULL,
+    estado NVARCHAR(20) NOT NULL,
+    cubeta INT NOT NULL,
+    cantidad INT NOT NULL,
+    segundos_total FLOAT NOT NULL,
+    CONSTRAINT PK_TiemposEstadoCubetas PRIMARY KEY (servicio_id, dia, estado, cubeta)
+);
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_TiemposEstadoCubetas_Dia' AND object_id = OBJECT_ID(N'dbo.TiemposEstadoCubetas'))
+    CREATE INDEX IX_TiemposEstadoCubetas_Dia ON TiemposEstadoCubetas(dia);
+
+IF OBJECT_ID(N'dbo.MarcasAgregacion', N'U') IS NULL
+CREATE TABLE MarcasAgregacion (
+    nombre NVARCHAR(50) PRIMARY KEY,
+    ultimo_id BIGINT NOT NULL
+);
+GO
+
+CREATE OR ALTER TRIGGER tr_CitasHistorialEstado_SoloInsercion
+ON CitasHistorialEstado
+INSTEAD OF UPDATE, DELETE
+AS
+BEGIN
+    THROW 50001, N'CitasHistorialEstado es de solo inserción', 1;
+END
+GO
+
+CREATE OR ALTER TRIGGER tr_Citas_Estado
+ON Citas
+AFTER INSERT, UPDATE
+AS
+BEGIN
+    SET NOCOUNT ON;
+    IF NOT UPDATE(estado) AND EXISTS (SELECT 1 FROM deleted)
+        RETURN;
+
+    DECLARE @ahora DATETIME = GETDATE();
+
+    INSERT INTO CitasHistorialEstado (cita_id, servicio_id, estado_anterior, estado_nuevo, fecha,
+                                      segundos_en_estado_anterior)
+    SELECT
+        i.id,
+        i.servicio_id,
+        d.estado,
+        ISNULL(i.estado, N'Pendiente'),
+        CASE WHEN d.id IS NULL THEN ISNULL(i.fecha_creacion, @ahora) ELSE @ahora END,
+        CASE WHEN d.id IS NULL THEN NULL
+             ELSE CASE WHEN DATEDIFF(SECOND, ISNULL(ultimo.fecha, ISNULL(d.fecha_creacion, @ahora)), @ahora) < 0 THEN 0
+                       ELSE DATEDIFF(SECOND, ISNULL(ultimo.fecha, ISNULL(d.fecha_creacion, @ahora)), @ahora) END
+        END
+    FROM inserted i
+    LEFT JOIN deleted d ON d.id = i.id
+    OUTER APPLY (
+        SELECT MAX(h.fecha) AS fecha
+        FROM CitasHistorialEstado h
+        WHERE h.cita_id = i.id
+    ) ultimo
+    WHERE d.id IS NULL OR ISNULL(d.estado, N'') <> ISNULL(i.estado, N'');
+END
+GO
+
+-- SP para acumular los cambios de estado nuevos en TiemposEstadoCubetas
+-- (cubeta 0: menos de 1 s; cubeta k: [1.1^(k-1), 1.1^k) segundos)
+CREATE OR ALTER PROCEDURE sp_actualizar_tiempos_estado
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    BEGIN TRANSACTION;
+
+    -- UPDLOCK serializa ejecuciones simultáneas sobre la misma marca
+    DECLARE @desde BIGINT = ISNULL((SELECT ultimo_id FROM MarcasAgregacion WITH (UPDLOCK, HOLDLOCK)
+                                    WHERE nombre = N'TiemposEstado'), 0);
+    -- Solo filas de más de 30 s: una identidad menor confirmada tarde no queda atrás de la marca
+    DECLARE @hasta BIGINT = ISNULL((SELECT MAX(id) FROM CitasHistorialEstado
+                                    WHERE id > @desde AND fecha < DATEADD(SECOND, -30, GETDATE())), @desde);
+
+    IF @hasta > @desde
+    BEGIN
+        MERGE TiemposEstadoCubetas AS destino
+        USING (
+            SELECT
+                ISNULL(servicio_id, 0) AS servicio_id,
+                CAST(fecha AS DATE) AS dia,
+                estado_anterior AS estado,
+                CASE WHEN segundos_en_estado_anterior < 1 THEN 0
+                     ELSE CAST(FLOOR(LOG(segundos_en_estado_anterior) / LOG(1.1)) AS INT) + 1 END AS cubeta,
+                COUNT(*) AS cantidad,
+                SUM(CAST(segundos_en_estado_anterior AS FLOAT)) AS segundos_total
+            FROM CitasHistorialEstado
+            WHERE id > @desde AND id <= @hasta
+            AND segundos_en_estado_anterior IS NOT NULL
+            AND estado_anterior IS NOT NULL
+            GROUP BY ISNULL(servicio_id, 0), CAST(fecha AS DATE), estado_anterior,
+                     CASE WHEN segundos_en_estado_anterior < 1 THEN 0
+                          ELSE CAST(FLOOR(LOG(segundos_en_estado_anterior) / LOG(1.1)) AS INT) + 1 END
+        ) AS origen
+        ON destino.servicio_id = origen.servicio_id AND destino.dia = origen.dia
+           AND destino.estado = origen.estado AND destino.cubeta = origen.cubeta
+        WHEN MATCHED THEN UPDATE SET
+            cantidad = destino.cantidad + origen.cantidad,
+            segundos_total = destino.segundos_total + origen.segundos_total
+        WHEN NOT MATCHED THEN INSERT (servicio_id, dia, estado, cubeta, cantidad, segundos_total)
+            VALUES (origen.servicio_id, origen.dia, origen.estado, origen.cubeta, origen.cantidad, origen.segundos_total);
+
+        MERGE MarcasAgregacion AS destino
+        USING (VALUES (N'TiemposEstado', @hasta)) AS origen (nombre, ultimo_id)
+        ON destino.nombre = origen.nombre
+        WHEN MATCHED THEN UPDATE SET ultimo_id = origen.ultimo_id
+        WHEN NOT MATCHED THEN INSERT (nombre, ultimo_id) VALUES (origen.nombre, origen.ultimo_id);
+    END
+
+    COMMIT TRANSACTION;
+
+    SELECT @hasta AS ultimo_id;
+END
+GO
@@ -0,0 +1,28 @@
+-- Migración 0008: bandeja de salida de recordatorios
+-- SQL Server
+--
+-- recordatorios.py escribe aquí los mensajes ya armados. El índice único
+-- (cita_id, tipo) hace que volver a correr el proceso no duplique mensajes.
+
+IF OBJECT_ID(N'dbo.BandejaSalida', N'U') IS NULL
+CREATE TABLE BandejaSalida (
+    id INT IDENTITY(1,1) PRIMARY KEY,
+    cita_id INT NOT NULL,
+    tipo NVARCHAR(30) NOT NULL,
+    canal NVARCHAR(10) NOT NULL CHECK (canal IN ('email', 'sms')),
+    destinatario NVARCHAR(100) NOT NULL,
+    asunto NVARCHAR(200),
+    cuerpo NVARCHAR(MAX) NOT NULL,
+    estado NVARCHAR(10) NOT NULL DEFAULT 'pendiente' CHECK (estado IN ('pendiente', 'enviado', 'error')),
+    intentos INT NOT NULL DEFAULT 0,
+    error NVARCHAR(500),
+    creado_en DATETIME DEFAULT GETDATE(),
+    enviado_en DATETIME
+);
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'UX_BandejaSalida_CitaTipo' AND object_id = OBJECT_ID(N'dbo.BandejaSalida'))
+    CREATE UNIQUE INDEX UX_BandejaSalida_CitaTipo ON BandejaSalida(cita_id, tipo) WITH (IGNORE_DUP_KEY = ON);
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_BandejaSalida_Pendientes' AND object_id = OBJECT_ID(N'dbo.BandejaSalida'))
+    CREATE INDEX IX_BandejaSalida_Pendientes ON BandejaSalida(estado, canal, id);
+GO
@@ -0,0 +1,25 @@
+-- Migración 0009: próximo servicio preventivo estimado por vehículo
+-- SQL Server
+--
+-- prediccion_servicio.py recalcula en lote las filas de los vehículos con citas
+-- completadas nuevas (marca 'PrediccionServicio' sobre CitasHistorialEstado).
+
+IF OBJECT_ID(N'dbo.PrediccionServicio', N'U') IS NULL
+CREATE TABLE PrediccionServicio (
+    vehiculo_id INT PRIMARY KEY,
+    ultimo_servicio DATE,
+    servicios_previos INT NOT NULL,
+    intervalo_dias FLOAT NOT NULL,
+    km_diarios FLOAT,
+    proximo_servicio DATE NOT NULL,
+    metodo NVARCHAR(20) NOT NULL,
+    calculado_en DATETIME DEFAULT GETDATE()
+);
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_PrediccionServicio_Proximo' AND object_id = OBJECT_ID(N'dbo.PrediccionServicio'))
+    CREATE INDEX IX_PrediccionServicio_Proximo ON PrediccionServicio(proximo_servicio);
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Citas_VehiculoId' AND object_id = OBJECT_ID(N'dbo.Citas'))
+    CREATE INDEX IX_Citas_VehiculoId ON Citas(vehiculo_id);
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_CitasHistorico_VehiculoId' AND object_id = OBJECT_ID(N'dbo.CitasHistorico'))
+    CREATE INDEX IX_CitasHistorico_VehiculoId ON CitasHistorico(vehiculo_id);
+GO
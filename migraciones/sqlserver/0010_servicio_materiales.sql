@@ -0,0 +1,117 @@
+-- Migración 0010: materiales por servicio y descuento de stock al completar citas
+-- SQL Server
+--
+-- ServicioMateriales indica qué repuestos (y cuántos) usa cada servicio. Cuando
+-- un UPDATE de Citas (sp_actualizar_estado_cita, sp_completar_dia o cualquier
+-- otro) pasa citas a 'Completado', tr_Citas_Materiales suma la demanda de todas
+-- ellas por repuesto, descuenta el stock y registra las SALIDAs en una sola
+-- pasada. Si algún repuesto no alcanza se revierte la sentencia completa.
+-- CitasConsumo evita descontar dos veces una cita que vuelve a completarse.
+
+IF OBJECT_ID(N'dbo.ServicioMateriales', N'U') IS NULL
+CREATE TABLE ServicioMateriales (
+    servicio_id INT NOT NULL FOREIGN KEY REFERENCES Servicios(id),
+    inventario_id INT NOT NULL FOREIGN KEY REFERENCES Inventario(id),
+    cantidad INT NOT NULL CHECK (cantidad > 0),
+    CONSTRAINT PK_ServicioMateriales PRIMARY KEY (servicio_id, inventario_id)
+);
+
+IF OBJECT_ID(N'dbo.CitasConsumo', N'U') IS NULL
+CREATE TABLE CitasConsumo (
+    cita_id INT PRIMARY KEY,
+    fecha DATETIME NOT NULL DEFAULT GETDATE()
+);
+
+-- Materiales de los servicios de ejemplo (solo si la tabla está vacía)
+IF NOT EXISTS (SELECT 1 FROM ServicioMateriales)
+    INSERT INTO ServicioMateriales (servicio_id, inventario_id, cantidad)
+    SELECT s.id, i.id, m.cantidad
+    FROM (VALUES
+        (N'Mantenimiento Preventivo', N'Aceite 5W30 4L', 1),
+        (N'Mantenimiento Preventivo', N'Filtro de Aceite', 1),
+        (N'Mantenimiento Preventivo', N'Filtro de Aire', 1),
+        (N'Cambio de Aceite', N'Aceite 5W30 4L', 1),
+        (N'Cambio de Aceite', N'Filtro de Aceite', 1),
+        (N'Afinamiento de Motor', N'Bujías NGK', 4),
+        (N'Afinamiento de Motor', N'Filtro de Aire', 1),
+        (N'Revisión de Frenos', N'Pastillas de Freno Delanteras', 1),
+        (N'Revisión de Frenos', N'Líquido de Frenos DOT4', 1),
+        (N'Cambio de Batería', N'Batería 12V 60Ah', 1),
+        (N'Reparación de Suspensión', N'Amortiguador Delantero', 2)
+    ) AS m(servicio, repuesto, cantidad)
+    JOIN Servicios s ON s.nombre = m.servicio
+    JOIN Inventario i ON i.nombre = m.repuesto;
+GO
+
+CREATE OR ALTER TRIGGER tr_Citas_Materiales
+ON Citas
+AFTER UPDATE
+AS
+BEGIN
+    SET NOCOUNT ON;
+    IF NOT UPDATE(estado)
+        RETURN;
+
+    DECLARE @completadas TABLE (cita_id INT PRIMARY KEY, servicio_id INT);
+    INSERT INTO @completadas (cita_id, servicio_id)
+    SELECT i.id, i.servicio_id
+    FROM inserted i
+    JOIN deleted d ON d.id = i.id
+    WHERE i.estado = N'Completado'
+    AND ISNULL(d.estado, N'') <> N'Completado'
+    AND NOT EXISTS (SELECT 1 FROM CitasConsumo c WHERE c.cita_id = i.id);
+
+    IF @@ROWCOUNT = 0
+        RETURN;
+
+    DECLARE @demanda TABLE (inventario_id INT PRIMARY KEY, cantidad INT NOT NULL);
+    INSERT INTO @demanda (inventario_id, cantidad)
+    SELECT m.inventario_id, SUM(m.cantidad)
+    FROM @completadas c
+    JOIN ServicioMateriales m ON m.servicio_id = c.servicio_id
+    GROUP BY m.inventario_id;
+
+    DECLARE @repuestos INT = @@ROWCOUNT;
+
+    -- La condición sobre stock_actual en el mismo UPDATE evita leer y luego
+    -- descontar: o alcanzan todos los repuestos o se revierte todo
+    UPDATE inv
+    SET stock_actual = inv.stock_actual - d.cantidad,
+        fecha_actualizacion = GETDATE()
+    FROM Inventario inv
+    JOIN @demanda d ON d.inventario_id = inv.id
+    WHERE inv.stock_actual >= d.cantidad;
+
+    IF @@ROWCOUNT < @repuestos
+        THROW 50002, N'Stock insuficiente para completar la cita', 1;
+
+    INSERT INTO MovimientosInventario (inventario_id, tipo_movimiento, cantidad, motivo)
+    SELECT m.inventario_id, N'SALIDA', m.cantidad, CONCAT(N'Cita #', c.cita_id)
+    FROM @completadas c
+    JOIN ServicioMateriales m ON m.servicio_id = c.servicio_id;
+
+    INSERT INTO CitasConsumo (cita_id)
+    SELECT cita_id FROM @completadas;
+END
+GO
+
+-- SP para completar de una vez las citas del día que siguen 'En Proceso'
+CREATE OR ALTER PROCEDURE sp_completar_dia
+    @fecha DATE = NULL
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    DECLARE @desde DATETIME = CAST(ISNULL(@fecha, CAST(GETDATE() AS DATE)) AS DATETIME);
+
+    UPDATE Citas
+    SET estado = N'Completado',
+        fecha_actualizacion = GETDATE()
+    WHERE fecha_hora >= @desde
+    AND fecha_hora < DATEADD(DAY, 1, @desde)
+    AND estado = N'En Proceso';
+
+    SELECT @@ROWCOUNT AS citas_completadas;
+END
+GO
@@ -0,0 +1,21 @@
+-- Migración 0011: puntos de reorden calculados a partir de los movimientos
+-- SQL Server
+--
+-- reposicion.py llena PuntosReorden con la demanda diaria, su variabilidad y
+-- el tiempo de entrega estimados de MovimientosInventario, y copia el punto de
+-- reorden a Inventario.stock_minimo de los items con historial suficiente.
+
+IF OBJECT_ID(N'dbo.PuntosReorden', N'U') IS NULL
+CREATE TABLE PuntosReorden (
+    inventario_id INT PRIMARY KEY FOREIGN KEY REFERENCES Inventario(id),
+    dias_con_salidas INT NOT NULL,
+    demanda_diaria FLOAT NOT NULL,
+    desviacion_diaria FLOAT NOT NULL,
+    dias_entrega FLOAT NOT NULL,
+    desviacion_entrega FLOAT NOT NULL,
+    stock_seguridad INT NOT NULL,
+    punto_reorden INT NOT NULL,
+    cantidad_pedido INT NOT NULL,
+    calculado_en DATETIME DEFAULT GETDATE()
+);
+GO
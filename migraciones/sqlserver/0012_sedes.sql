@@ -0,0 +1,506 @@
+-- Migración 0012: sedes del taller y datos separados por sede
+-- SQL Server
+--
+-- Cada sede tiene sus citas, su inventario (con su propio stock y sus
+-- movimientos) y sus usuarios; los clientes, vehículos y servicios son de
+-- toda la cadena. Los datos existentes quedan en la sede 1 (San Isidro).
+-- Los índices empiezan por sede_id y los procedimientos reciben @sede_id
+-- (NULL = toda la cadena) con OPTION (RECOMPILE), para que la consulta de una
+-- sede solo recorra sus propias filas.
+--
+-- ServicioMateriales sigue apuntando a los repuestos de la sede 1 (el
+-- catálogo); vw_MaterialesSede los traduce al repuesto del mismo nombre en
+-- cada sede, y tr_Citas_Materiales descuenta el stock de la sede de la cita.
+
+IF OBJECT_ID(N'dbo.Sedes', N'U') IS NULL
+CREATE TABLE Sedes (
+    id INT IDENTITY(1,1) PRIMARY KEY,
+    nombre NVARCHAR(100) UNIQUE NOT NULL,
+    direccion NVARCHAR(200) NOT NULL,
+    telefono NVARCHAR(20),
+    email NVARCHAR(100),
+    latitud FLOAT,
+    longitud FLOAT,
+    activo BIT DEFAULT 1,
+    fecha_creacion DATETIME DEFAULT GETDATE()
+);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM Sedes WHERE id = 1)
+BEGIN
+    SET IDENTITY_INSERT Sedes ON;
+    INSERT INTO Sedes (id, nombre, direccion, telefono, email, latitud, longitud)
+    VALUES (1, N'San Isidro', N'Av. Petit Thouars 1234, San Isidro, Lima', N'(01) 555-0123',
+            N'info@tallersanisidro.com', -12.0986, -77.0428);
+    SET IDENTITY_INSERT Sedes OFF;
+END
+
+IF COL_LENGTH(N'dbo.Citas', N'sede_id') IS NULL
+    ALTER TABLE Citas ADD sede_id INT NOT NULL
+        CONSTRAINT DF_Citas_Sede DEFAULT 1 CONSTRAINT FK_Citas_Sede REFERENCES Sedes(id);
+IF COL_LENGTH(N'dbo.CitasHistorico', N'sede_id') IS NULL
+    ALTER TABLE CitasHistorico ADD sede_id INT NOT NULL CONSTRAINT DF_CitasHistorico_Sede DEFAULT 1;
+IF COL_LENGTH(N'dbo.Inventario', N'sede_id') IS NULL
+    ALTER TABLE Inventario ADD sede_id INT NOT NULL
+        CONSTRAINT DF_Inventario_Sede DEFAULT 1 CONSTRAINT FK_Inventario_Sede REFERENCES Sedes(id);
+-- NULL al insertar: tr_MovimientosInventario_Sede copia la sede del repuesto
+IF COL_LENGTH(N'dbo.MovimientosInventario', N'sede_id') IS NULL
+    ALTER TABLE MovimientosInventario ADD sede_id INT CONSTRAINT FK_MovimientosInventario_Sede REFERENCES Sedes(id);
+IF COL_LENGTH(N'dbo.MovimientosInventarioHistorico', N'sede_id') IS NULL
+    ALTER TABLE MovimientosInventarioHistorico ADD sede_id INT;
+-- NULL = usuario de toda la cadena
+IF COL_LENGTH(N'dbo.Usuarios', N'sede_id') IS NULL
+    ALTER TABLE Usuarios ADD sede_id INT CONSTRAINT FK_Usuarios_Sede REFERENCES Sedes(id);
+GO
+
+UPDATE MovimientosInventario SET sede_id = 1 WHERE sede_id IS NULL;
+UPDATE MovimientosInventarioHistorico SET sede_id = 1 WHERE sede_id IS NULL;
+GO
+
+CREATE OR ALTER TRIGGER tr_MovimientosInventario_Sede
+ON MovimientosInventario
+AFTER INSERT
+AS
+BEGIN
+    SET NOCOUNT ON;
+    UPDATE m
+    SET sede_id = i.sede_id
+    FROM MovimientosInventario m
+    JOIN inserted n ON n.id = m.id
+    JOIN Inventario i ON i.id = n.inventario_id
+    WHERE m.sede_id IS NULL;
+END
+GO
+
+-- Índices por sede
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Citas_Sede_FechaHora' AND object_id = OBJECT_ID(N'dbo.Citas'))
+    CREATE INDEX IX_Citas_Sede_FechaHora ON Citas(sede_id, fecha_hora) INCLUDE (estado, costo_total);
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Citas_Sede_Estado' AND object_id = OBJECT_ID(N'dbo.Citas'))
+    CREATE INDEX IX_Citas_Sede_Estado ON Citas(sede_id, estado);
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Citas_Sede_ClienteId' AND object_id = OBJECT_ID(N'dbo.Citas'))
+    CREATE INDEX IX_Citas_Sede_ClienteId ON Citas(sede_id, cliente_id);
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_CitasHistorico_Sede_FechaHora' AND object_id = OBJECT_ID(N'dbo.CitasHistorico'))
+    CREATE INDEX IX_CitasHistorico_Sede_FechaHora ON CitasHistorico(sede_id, fecha_hora);
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Inventario_Sede_Nombre' AND object_id = OBJECT_ID(N'dbo.Inventario'))
+    CREATE INDEX IX_Inventario_Sede_Nombre ON Inventario(sede_id, nombre) INCLUDE (stock_actual, activo);
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Inventario_Sede_StockBajo' AND object_id = OBJECT_ID(N'dbo.Inventario'))
+    CREATE INDEX IX_Inventario_Sede_StockBajo ON Inventario(sede_id, stock_actual, stock_minimo) WHERE activo = 1;
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_MovimientosInventario_Sede_Fecha' AND object_id = OBJECT_ID(N'dbo.MovimientosInventario'))
+    CREATE INDEX IX_MovimientosInventario_Sede_Fecha ON MovimientosInventario(sede_id, fecha);
+GO
+
+-- Repuestos de cada servicio en cada sede (inventario_id NULL si la sede no lo tiene)
+CREATE OR ALTER VIEW vw_MaterialesSede AS
+SELECT m.servicio_id, s.id AS sede_id, m.cantidad, i.inventario_id
+FROM ServicioMateriales m
+JOIN Inventario base ON base.id = m.inventario_id
+CROSS JOIN Sedes s
+OUTER APPLY (
+    SELECT MIN(x.id) AS inventario_id
+    FROM Inventario x
+    WHERE x.sede_id = s.id AND x.nombre = base.nombre AND x.activo = 1
+) i;
+GO
+
+CREATE OR ALTER TRIGGER tr_Citas_Materiales
+ON Citas
+AFTER UPDATE
+AS
+BEGIN
+    SET NOCOUNT ON;
+    IF NOT UPDATE(estado)
+        RETURN;
+
+    DECLARE @completadas TABLE (cita_id INT PRIMARY KEY, servicio_id INT, sede_id INT);
+    INSERT INTO @completadas (cita_id, servicio_id, sede_id)
+    SELECT i.id, i.servicio_id, i.sede_id
+    FROM inserted i
+    JOIN deleted d ON d.id = i.id
+    WHERE i.estado = N'Completado'
+    AND ISNULL(d.estado, N'') <> N'Completado'
+    AND NOT EXISTS (SELECT 1 FROM CitasConsumo c WHERE c.cita_id = i.id);
+
+    IF @@ROWCOUNT = 0
+        RETURN;
+
+    -- Un repuesto que la sede no tiene cuenta como stock insuficiente
+    IF EXISTS (SELECT 1
+               FROM @completadas c
+               JOIN vw_MaterialesSede m ON m.servicio_id = c.servicio_id AND m.sede_id = c.sede_id
+               WHERE m.inventario_id IS NULL)
+        THROW 50002, N'Stock insuficiente para completar la cita', 1;
+
+    DECLARE @demanda TABLE (inventario_id INT PRIMARY KEY, cantidad INT NOT NULL);
+    INSERT INTO @demanda (inventario_id, cantidad)
+    SELECT m.inventario_id, SUM(m.cantidad)
+    FROM @completadas c
+    JOIN vw_MaterialesSede m ON m.servicio_id = c.servicio_id AND m.sede_id = c.sede_id
+    GROUP BY m.inventario_id;
+
+    DECLARE @repuestos INT = @@ROWCOUNT;
+
+    -- La condición sobre stock_actual en el mismo UPDATE evita leer y luego
+    -- descontar: o alcanzan todos los repuestos o se revierte todo
+    UPDATE inv
+    SET stock_actual = inv.stock_actual - d.cantidad,
+        fecha_actualizacion = GETDATE()
+    FROM Inventario inv
+    JOIN @demanda d ON d.inventario_id = inv.id
+    WHERE inv.stock_actual >= d.cantidad;
+
+    IF @@ROWCOUNT < @repuestos
+        THROW 50002, N'Stock insuficiente para completar la cita', 1;
+
+    INSERT INTO MovimientosInventario (inventario_id, tipo_movimiento, cantidad, motivo, sede_id)
+    SELECT m.inventario_id, N'SALIDA', m.cantidad, CONCAT(N'Cita #', c.cita_id), c.sede_id
+    FROM @completadas c
+    JOIN vw_MaterialesSede m ON m.servicio_id = c.servicio_id AND m.sede_id = c.sede_id;
+
+    INSERT INTO CitasConsumo (cita_id)
+    SELECT cita_id FROM @completadas;
+END
+GO
+
+-- SP para completar de una vez las citas del día que siguen 'En Proceso'
+CREATE OR ALTER PROCEDURE sp_completar_dia
+    @fecha DATE = NULL,
+    @sede_id INT = NULL
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    DECLARE @desde DATETIME = CAST(ISNULL(@fecha, CAST(GETDATE() AS DATE)) AS DATETIME);
+
+    UPDATE Citas
+    SET estado = N'Completado',
+        fecha_actualizacion = GETDATE()
+    WHERE fecha_hora >= @desde
+    AND fecha_hora < DATEADD(DAY, 1, @desde)
+    AND estado = N'En Proceso'
+    AND (@sede_id IS NULL OR sede_id = @sede_id)
+    OPTION (RECOMPILE);
+
+    SELECT @@ROWCOUNT AS citas_completadas;
+END
+GO
+
+-- SP para crear una cita (el horario se valida dentro de la sede)
+CREATE OR ALTER PROCEDURE sp_crear_cita
+    @cliente_id INT,
+    @vehiculo_id INT,
+    @servicio_id INT,
+    @fecha_hora DATETIME,
+    @descripcion_problema NVARCHAR(500) = NULL,
+    @sede_id INT = 1
+AS
+BEGIN
+    BEGIN TRY
+        IF EXISTS (
+            SELECT 1 FROM Citas
+            WHERE sede_id = @sede_id
+            AND fecha_hora = @fecha_hora
+            AND estado NOT IN ('Cancelado')
+        )
+        BEGIN
+            SELECT 0 as cita_id, 'Ya existe una cita en esa fecha y hora' as mensaje;
+            RETURN;
+        END
+
+        INSERT INTO Citas (cliente_id, vehiculo_id, servicio_id, fecha_hora, descripcion_problema, sede_id)
+        VALUES (@cliente_id, @vehiculo_id, @servicio_id, @fecha_hora, @descripcion_problema, @sede_id);
+
+        SELECT SCOPE_IDENTITY() as cita_id, 'Cita creada exitosamente' as mensaje;
+    END TRY
+    BEGIN CATCH
+        SELECT 0 as cita_id, ERROR_MESSAGE() as mensaje;
+    END CATCH
+END
+GO
+
+-- SP para obtener citas (incluye el archivo solo si el rango lo necesita)
+CREATE OR ALTER PROCEDURE sp_obtener_citas
+    @fecha_inicio DATE = NULL,
+    @fecha_fin DATE = NULL,
+    @estado NVARCHAR(20) = NULL,
+    @sede_id INT = NULL
+AS
+BEGIN
+    DECLARE @corte DATETIME = (SELECT corte FROM ArchivoCorte WHERE tabla = N'Citas');
+    DECLARE @incluir_archivo BIT =
+        CASE WHEN @corte IS NOT NULL AND (@fecha_inicio IS NULL OR @fecha_inicio < @corte) THEN 1 ELSE 0 END;
+
+    SELECT
+        c.id,
+        cl.nombre as cliente_nombre,
+        cl.telefono,
+        v.marca,
+        v.modelo,
+        v.placa,
+        s.nombre as servicio,
+        c.fecha_hora,
+        c.estado,
+        c.descripcion_problema,
+        c.costo_total,
+        s.precio as precio_base
+    FROM (
+        SELECT id, cliente_id, vehiculo_id, servicio_id, fecha_hora, estado, descripcion_problema, costo_total, sede_id
+        FROM Citas
+        UNION ALL
+        -- El filtro de arranque (@incluir_archivo = 1) evita tocar el archivo
+        SELECT id, cliente_id, vehiculo_id, servicio_id, fecha_hora, estado, descripcion_problema, costo_total, sede_id
+        FROM CitasHistorico
+        WHERE @incluir_archivo = 1
+    ) c
+    INNER JOIN Clientes cl ON c.cliente_id = cl.id
+    INNER JOIN Vehiculos v ON c.vehiculo_id = v.id
+    INNER JOIN Servicios s ON c.servicio_id = s.id
+    WHERE
+        (@sede_id IS NULL OR c.sede_id = @sede_id)
+        AND (@fecha_inicio IS NULL OR CAST(c.fecha_hora AS DATE) >= @fecha_inicio)
+        AND (@fecha_fin IS NULL OR CAST(c.fecha_hora AS DATE) <= @fecha_fin)
+        AND (@estado IS NULL OR c.estado = @estado)
+    ORDER BY c.fecha_hora
+    OPTION (RECOMPILE);
+END
+GO
+
+-- SP para obtener inventario
+CREATE OR ALTER PROCEDURE sp_obtener_inventario
+    @categoria NVARCHAR(50) = NULL,
+    @stock_bajo BIT = 0,
+    @sede_id INT = NULL
+AS
+BEGIN
+    SELECT
+        id,
+        nombre,
+        categoria,
+        descripcion,
+        stock_actual,
+        stock_minimo,
+        precio_unitario,
+        proveedor,
+        fecha_actualizacion,
+        CASE WHEN stock_actual <= stock_minimo THEN 1 ELSE 0 END as es_stock_bajo,
+        sede_id
+    FROM Inventario
+    WHERE
+        activo = 1
+        AND (@sede_id IS NULL OR sede_id = @sede_id)
+        AND (@categoria IS NULL OR categoria = @categoria)
+        AND (@stock_bajo = 0 OR stock_actual <= stock_minimo)
+    ORDER BY
+        CASE WHEN stock_actual <= stock_minimo THEN 0 ELSE 1 END,
+        nombre
+    OPTION (RECOMPILE);
+END
+GO
+
+-- SP para agregar item al inventario de una sede
+CREATE OR ALTER PROCEDURE sp_agregar_inventario
+    @nombre NVARCHAR(100),
+    @categoria NVARCHAR(50),
+    @descripcion NVARCHAR(300) = NULL,
+    @stock_inicial INT = 0,
+    @stock_minimo INT = 1,
+    @precio_unitario DECIMAL(10,2),
+    @proveedor NVARCHAR(100) = NULL,
+    @sede_id INT = 1
+AS
+BEGIN
+    BEGIN TRY
+        INSERT INTO Inventario (nombre, categoria, descripcion, stock_actual, stock_minimo, precio_unitario, proveedor, sede_id)
+        VALUES (@nombre, @categoria, @descripcion, @stock_inicial, @stock_minimo, @precio_unitario, @proveedor, @sede_id);
+
+        DECLARE @inventario_id INT = SCOPE_IDENTITY();
+
+        -- Registrar movimiento inicial si hay stock
+        IF @stock_inicial > 0
+        BEGIN
+            INSERT INTO MovimientosInventario (inventario_id, tipo_movimiento, cantidad, motivo, sede_id)
+            VALUES (@inventario_id, 'ENTRADA', @stock_inicial, 'Stock inicial', @sede_id);
+        END
+
+        SELECT @inventario_id as inventario_id, 'Item agregado exitosamente' as mensaje;
+    END TRY
+    BEGIN CATCH
+        SELECT 0 as inventario_id, ERROR_MESSAGE() as mensaje;
+    END CATCH
+END
+GO
+
+-- SP para dashboard - métricas de una sede (o de la cadena con @sede_id NULL)
+CREATE OR ALTER PROCEDURE sp_dashboard_metricas
+    @fecha DATE = NULL,
+    @sede_id INT = NULL
+AS
+BEGIN
+    IF @fecha IS NULL
+        SET @fecha = CAST(GETDATE() AS DATE);
+
+    -- Citas del día
+    SELECT COUNT(*) as citas_hoy
+    FROM Citas
+    WHERE CAST(fecha_hora AS DATE) = @fecha
+    AND estado NOT IN ('Cancelado')
+    AND (@sede_id IS NULL OR sede_id = @sede_id)
+    OPTION (RECOMPILE);
+
+    -- Clientes activos (con citas en la sede si se indica una)
+    IF @sede_id IS NULL
+        SELECT COUNT(*) as clientes_activos
+        FROM Clientes
+        WHERE activo = 1;
+    ELSE
+        SELECT COUNT(DISTINCT cliente_id) as clientes_activos
+        FROM Citas
+        WHERE sede_id = @sede_id;
+
+    -- Ingresos del día
+    SELECT ISNULL(SUM(costo_total), 0) as ingresos_hoy
+    FROM Citas
+    WHERE CAST(fecha_hora AS DATE) = @fecha
+    AND estado = 'Completado'
+    AND (@sede_id IS NULL OR sede_id = @sede_id)
+    OPTION (RECOMPILE);
+
+    -- Items con stock bajo
+    SELECT COUNT(*) as items_stock_bajo
+    FROM Inventario
+    WHERE stock_actual <= stock_minimo
+    AND activo = 1
+    AND (@sede_id IS NULL OR sede_id = @sede_id)
+    OPTION (RECOMPILE);
+
+    -- Distribución de estados de citas del día
+    SELECT
+        estado,
+        COUNT(*) as cantidad
+    FROM Citas
+    WHERE CAST(fecha_hora AS DATE) = @fecha
+    AND (@sede_id IS NULL OR sede_id = @sede_id)
+    GROUP BY estado
+    OPTION (RECOMPILE);
+END
+GO
+
+-- SP para validar usuario (login); sede_id NULL = toda la cadena
+CREATE OR ALTER PROCEDURE sp_validar_usuario
+    @username NVARCHAR(50),
+    @password_hash NVARCHAR(64)
+AS
+BEGIN
+    SELECT
+        id,
+        username,
+        nombre,
+        email,
+        tipo,
+        sede_id
+    FROM Usuarios
+    WHERE username = @username
+    AND password_hash = @password_hash
+    AND activo = 1;
+END
+GO
+
+-- SP para obtener movimientos de inventario (incluye el archivo solo si hace falta)
+CREATE OR ALTER PROCEDURE sp_obtener_movimientos_inventario
+    @inventario_id INT = NULL,
+    @fecha_inicio DATE = NULL,
+    @fecha_fin DATE = NULL,
+    @sede_id INT = NULL
+AS
+BEGIN
+    DECLARE @corte DATETIME = (SELECT corte FROM ArchivoCorte WHERE tabla = N'MovimientosInventario');
+    DECLARE @incluir_archivo BIT =
+        CASE WHEN @corte IS NOT NULL AND (@fecha_inicio IS NULL OR @fecha_inicio < @corte) THEN 1 ELSE 0 END;
+
+    SELECT
+        m.id,
+        i.nombre as producto,
+        m.tipo_movimiento,
+        m.cantidad,
+        m.motivo,
+        m.fecha,
+        u.nombre as usuario
+    FROM (
+        SELECT id, inventario_id, tipo_movimiento, cantidad, motivo, fecha, usuario_id, sede_id
+        FROM MovimientosInventario
+        UNION ALL
+        SELECT id, inventario_id, tipo_movimiento, cantidad, motivo, fecha, usuario_id, sede_id
+        FROM MovimientosInventarioHistorico
+        WHERE @incluir_archivo = 1
+    ) m
+    INNER JOIN Inventario i ON m.inventario_id = i.id
+    LEFT JOIN Usuarios u ON m.usuario_id = u.id
+    WHERE
+        (@sede_id IS NULL OR m.sede_id = @sede_id)
+        AND (@inventario_id IS NULL OR m.inventario_id = @inventario_id)
+        AND (@fecha_inicio IS NULL OR CAST(m.fecha AS DATE) >= @fecha_inicio)
+        AND (@fecha_fin IS NULL OR CAST(m.fecha AS DATE) <= @fecha_fin)
+    ORDER BY m.fecha DESC
+    OPTION (RECOMPILE);
+END
+GO
+
+-- SP para archivar citas cerradas y movimientos antiguos (con su sede)
+CREATE OR ALTER PROCEDURE sp_archivar_historico
+    @meses_citas INT = 12,
+    @meses_movimientos INT = 24,
+    @lote INT = 500
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    DECLARE @corte_citas DATETIME = DATEADD(MONTH, -@meses_citas, CAST(GETDATE() AS DATE));
+    DECLARE @corte_movimientos DATETIME = DATEADD(MONTH, -@meses_movimientos, CAST(GETDATE() AS DATE));
+    DECLARE @filas INT = 1;
+    DECLARE @total_citas INT = 0;
+    DECLARE @total_movimientos INT = 0;
+
+    -- El corte se publica antes de mover filas: si el proceso se interrumpe,
+    -- las lecturas ya incluyen el archivo para las fechas afectadas
+    MERGE ArchivoCorte AS destino
+    USING (VALUES (N'Citas', @corte_citas), (N'MovimientosInventario', @corte_movimientos)) AS origen (tabla, corte)
+    ON destino.tabla = origen.tabla
+    WHEN MATCHED AND origen.corte > destino.corte THEN UPDATE SET corte = origen.corte
+    WHEN NOT MATCHED THEN INSERT (tabla, corte) VALUES (origen.tabla, origen.corte);
+
+    WHILE @filas > 0
+    BEGIN
+        BEGIN TRANSACTION;
+        DELETE TOP (@lote) FROM Citas
+        OUTPUT deleted.id, deleted.cliente_id, deleted.vehiculo_id, deleted.servicio_id,
+               deleted.fecha_hora, deleted.descripcion_problema, deleted.estado,
+               deleted.observaciones, deleted.costo_total, deleted.fecha_creacion,
+               deleted.fecha_actualizacion, deleted.sede_id
+        INTO CitasHistorico (id, cliente_id, vehiculo_id, servicio_id, fecha_hora,
+                             descripcion_problema, estado, observaciones, costo_total,
+                             fecha_creacion, fecha_actualizacion, sede_id)
+        WHERE estado IN ('Completado', 'Cancelado')
+        AND fecha_hora < @corte_citas;
+        SET @filas = @@ROWCOUNT;
+        COMMIT TRANSACTION;
+        SET @total_citas = @total_citas + @filas;
+    END
+
+    SET @filas = 1;
+    WHILE @filas > 0
+    BEGIN
+        BEGIN TRANSACTION;
+        DELETE TOP (@lote) FROM MovimientosInventario
+        OUTPUT deleted.id, deleted.inventario_id, deleted.tipo_movimiento, deleted.cantidad,
+               deleted.motivo, deleted.fecha, deleted.usuario_id, deleted.sede_id
+        INTO MovimientosInventarioHistorico (id, inventario_id, tipo_movimiento, cantidad,
+                                             motivo, fecha, usuario_id, sede_id)
+        WHERE fecha < @corte_movimientos;
+        SET @filas = @@ROWCOUNT;
+        COMMIT TRANSACTION;
+        SET @total_movimientos = @total_movimientos + @filas;
+    END
+
+    SELECT @total_citas as citas_archivadas, @total_movimientos as movimientos_archivados;
+END
+GO
@@ -0,0 +1,17 @@
+-- Migración 0013: latido para medir el retraso de la réplica de lectura
+-- SQL Server
+--
+-- La primaria escribe aquí la hora (segundos desde epoch) cada segundo; la
+-- réplica recibe el valor con el resto de los datos, así que la hora actual
+-- menos el latido de la réplica es su retraso (replicas.py).
+
+IF OBJECT_ID(N'dbo.ReplicaLatido', N'U') IS NULL
+CREATE TABLE ReplicaLatido (
+    id INT PRIMARY KEY CONSTRAINT CK_ReplicaLatido_Id CHECK (id = 1),
+    marca FLOAT NOT NULL
+);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM ReplicaLatido WHERE id = 1)
+INSERT INTO ReplicaLatido (id, marca) VALUES (1, 0);
+GO
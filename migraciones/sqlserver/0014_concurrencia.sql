@@ -0,0 +1,239 @@
+-- Migración 0014: reservas y stock sin carreras entre escrituras simultáneas
+-- SQL Server
+--
+-- HorariosReservados tiene una fila por horario ocupado (sede + fecha_hora);
+-- su clave primaria hace que de dos reservas simultáneas del mismo horario
+-- solo una se inserte, sin SERIALIZABLE ni bloqueos de rango sobre Citas.
+-- tr_Citas_Horario la mantiene desde Citas: reservar, cancelar, reprogramar
+-- y archivar. Las citas activas repetidas que ya existían conservan sus
+-- filas; el horario queda reservado a nombre de la primera.
+--
+-- sp_actualizar_stock descuenta con un UPDATE condicional (lee y escribe en
+-- la misma sentencia) y CK_Inventario_StockNoNegativo respalda a cualquier
+-- otro camino. Citas.version (rowversion) permite a sp_actualizar_estado_cita
+-- rechazar cambios hechos sobre una versión vieja de la cita.
+
+IF OBJECT_ID(N'dbo.HorariosReservados', N'U') IS NULL
+CREATE TABLE HorariosReservados (
+    sede_id INT NOT NULL,
+    fecha_hora DATETIME NOT NULL,
+    cita_id INT NOT NULL CONSTRAINT UQ_HorariosReservados_Cita UNIQUE,
+    CONSTRAINT PK_HorariosReservados PRIMARY KEY (sede_id, fecha_hora)
+);
+GO
+
+INSERT INTO HorariosReservados (sede_id, fecha_hora, cita_id)
+SELECT c.sede_id, c.fecha_hora, MIN(c.id)
+FROM Citas c
+WHERE c.estado <> 'Cancelado'
+AND NOT EXISTS (SELECT 1 FROM HorariosReservados h WHERE h.sede_id = c.sede_id AND h.fecha_hora = c.fecha_hora)
+GROUP BY c.sede_id, c.fecha_hora;
+GO
+
+CREATE OR ALTER TRIGGER tr_Citas_Horario
+ON Citas
+AFTER INSERT, UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    IF EXISTS (SELECT 1 FROM inserted)
+       AND NOT (UPDATE(estado) OR UPDATE(fecha_hora) OR UPDATE(sede_id))
+        RETURN;
+
+    -- Liberar: citas borradas, canceladas o reprogramadas
+    DELETE h
+    FROM HorariosReservados h
+    INNER JOIN deleted d ON d.id = h.cita_id
+    LEFT JOIN inserted i ON i.id = d.id
+    WHERE i.id IS NULL
+    OR i.estado = 'Cancelado'
+    OR i.fecha_hora <> d.fecha_hora
+    OR i.sede_id <> d.sede_id;
+
+    -- Tomar: citas nuevas, reactivadas o reprogramadas (PK_HorariosReservados
+    -- rechaza el horario ya ocupado y la sentencia de Citas se deshace)
+    INSERT INTO HorariosReservados (sede_id, fecha_hora, cita_id)
+    SELECT i.sede_id, i.fecha_hora, i.id
+    FROM inserted i
+    LEFT JOIN deleted d ON d.id = i.id
+    WHERE i.estado <> 'Cancelado'
+    AND (d.id IS NULL
+         OR d.estado = 'Cancelado'
+         OR i.fecha_hora <> d.fecha_hora
+         OR i.sede_id <> d.sede_id);
+END
+GO
+
+IF COL_LENGTH(N'dbo.Citas', N'version') IS NULL
+ALTER TABLE Citas ADD version ROWVERSION;
+GO
+
+-- WITH NOCHECK: un item que ya estaba en negativo no impide la migración
+IF OBJECT_ID(N'dbo.CK_Inventario_StockNoNegativo', N'C') IS NULL
+ALTER TABLE Inventario WITH NOCHECK
+ADD CONSTRAINT CK_Inventario_StockNoNegativo CHECK (stock_actual >= 0);
+GO
+
+CREATE OR ALTER PROCEDURE sp_crear_cita
+    @cliente_id INT,
+    @vehiculo_id INT,
+    @servicio_id INT,
+    @fecha_hora DATETIME,
+    @descripcion_problema NVARCHAR(500) = NULL,
+    @sede_id INT = 1
+AS
+BEGIN
+    SET NOCOUNT ON;
+    BEGIN TRY
+        -- Sin consulta previa: tr_Citas_Horario rechaza el horario ocupado
+        INSERT INTO Citas (cliente_id, vehiculo_id, servicio_id, fecha_hora, descripcion_problema, sede_id)
+        VALUES (@cliente_id, @vehiculo_id, @servicio_id, @fecha_hora, @descripcion_problema, @sede_id);
+
+        SELECT CAST(SCOPE_IDENTITY() AS INT) as cita_id, 'Cita creada exitosamente' as mensaje;
+    END TRY
+    BEGIN CATCH
+        IF XACT_STATE() = -1
+            ROLLBACK TRANSACTION;
+        IF ERROR_NUMBER() IN (2601, 2627)
+            SELECT 0 as cita_id, 'Ya existe una cita en esa fecha y hora' as mensaje;
+        ELSE
+            SELECT 0 as cita_id, ERROR_MESSAGE() as mensaje;
+    END CATCH
+END
+GO
+
+CREATE OR ALTER PROCEDURE sp_actualizar_estado_cita
+    @cita_id INT,
+    @nuevo_estado NVARCHAR(20),
+    @observaciones NVARCHAR(500) = NULL,
+    @costo_total DECIMAL(10,2) = NULL,
+    @version BINARY(8) = NULL
+AS
+BEGIN
+    SET NOCOUNT ON;
+    BEGIN TRY
+        -- Con @version solo se actualiza si nadie cambió la cita desde que se leyó
+        UPDATE Citas
+        SET
+            estado = @nuevo_estado,
+            observaciones = ISNULL(@observaciones, observaciones),
+            costo_total = ISNULL(@costo_total, costo_total),
+            fecha_actualizacion = GETDATE()
+        WHERE id = @cita_id
+        AND (@version IS NULL OR version = @version);
+
+        IF @@ROWCOUNT = 0
+            SELECT CASE WHEN EXISTS (SELECT 1 FROM Citas WHERE id = @cita_id)
+                        THEN 'La cita fue modificada por otro usuario'
+                        ELSE 'Cita no encontrada' END as mensaje,
+                   (SELECT version FROM Citas WHERE id = @cita_id) as version;
+        ELSE
+            SELECT 'Estado actualizado exitosamente' as mensaje,
+                   (SELECT version FROM Citas WHERE id = @cita_id) as version;
+    END TRY
+    BEGIN CATCH
+        SELECT ERROR_MESSAGE() as mensaje, CAST(NULL AS BINARY(8)) as version;
+    END CATCH
+END
+GO
+
+CREATE OR ALTER PROCEDURE sp_actualizar_stock
+    @inventario_id INT,
+    @tipo_movimiento NVARCHAR(10), -- ENTRADA o SALIDA
+    @cantidad INT,
+    @motivo NVARCHAR(100) = NULL,
+    @usuario_id INT = NULL
+AS
+BEGIN
+    SET NOCOUNT ON;
+    IF @tipo_movimiento NOT IN ('ENTRADA', 'SALIDA') OR @cantidad <= 0
+    BEGIN
+        SELECT 'Movimiento no válido' as mensaje;
+        RETURN;
+    END
+
+    BEGIN TRY
+        BEGIN TRANSACTION;
+
+        -- Lectura y escritura en la misma sentencia: dos SALIDAs simultáneas
+        -- no pueden vender las mismas unidades
+        UPDATE Inventario
+        SET stock_actual = stock_actual + CASE WHEN @tipo_movimiento = 'ENTRADA' THEN @cantidad ELSE -@cantidad END,
+            fecha_actualizacion = GETDATE()
+        WHERE id = @inventario_id
+        AND activo = 1
+        AND (@tipo_movimiento = 'ENTRADA' OR stock_actual >= @cantidad);
+
+        IF @@ROWCOUNT = 0
+        BEGIN
+            ROLLBACK TRANSACTION;
+            SELECT CASE WHEN EXISTS (SELECT 1 FROM Inventario WHERE id = @inventario_id AND activo = 1)
+                        THEN 'Stock insuficiente'
+                        ELSE 'Item no encontrado' END as mensaje;
+            RETURN;
+        END
+
+        INSERT INTO MovimientosInventario (inventario_id, tipo_movimiento, cantidad, motivo, usuario_id)
+        VALUES (@inventario_id, @tipo_movimiento, @cantidad, @motivo, @usuario_id);
+
+        COMMIT TRANSACTION;
+        SELECT 'Stock actualizado exitosamente' as mensaje;
+    END TRY
+    BEGIN CATCH
+        IF @@TRANCOUNT > 0
+            ROLLBACK TRANSACTION;
+        SELECT ERROR_MESSAGE() as mensaje;
+    END CATCH
+END
+GO
+
+-- Devuelve la versión de cada cita (NULL en las archivadas)
+CREATE OR ALTER PROCEDURE sp_obtener_citas
+    @fecha_inicio DATE = NULL,
+    @fecha_fin DATE = NULL,
+    @estado NVARCHAR(20) = NULL,
+    @sede_id INT = NULL
+AS
+BEGIN
+    DECLARE @corte DATETIME = (SELECT corte FROM ArchivoCorte WHERE tabla = N'Citas');
+    DECLARE @incluir_archivo BIT =
+        CASE WHEN @corte IS NOT NULL AND (@fecha_inicio IS NULL OR @fecha_inicio < @corte) THEN 1 ELSE 0 END;
+
+    SELECT
+        c.id,
+        cl.nombre as cliente_nombre,
+        cl.telefono,
+        v.marca,
+        v.modelo,
+        v.placa,
+        s.nombre as servicio,
+        c.fecha_hora,
+        c.estado,
+        c.descripcion_problema,
+        c.costo_total,
+        s.precio as precio_base,
+        c.version
+    FROM (
+        SELECT id, cliente_id, vehiculo_id, servicio_id, fecha_hora, estado, descripcion_problema, costo_total, sede_id,
+               CAST(version AS BINARY(8)) AS version
+        FROM Citas
+        UNION ALL
+        -- El filtro de arranque (@incluir_archivo = 1) evita tocar el archivo
+        SELECT id, cliente_id, vehiculo_id, servicio_id, fecha_hora, estado, descripcion_problema, costo_total, sede_id,
+               CAST(NULL AS BINARY(8))
+        FROM CitasHistorico
+        WHERE @incluir_archivo = 1
+    ) c
+    INNER JOIN Clientes cl ON c.cliente_id = cl.id
+    INNER JOIN Vehiculos v ON c.vehiculo_id = v.id
+    INNER JOIN Servicios s ON c.servicio_id = s.id
+    WHERE
+        (@sede_id IS NULL OR c.sede_id = @sede_id)
+        AND (@fecha_inicio IS NULL OR CAST(c.fecha_hora AS DATE) >= @fecha_inicio)
+        AND (@fecha_fin IS NULL OR CAST(c.fecha_hora AS DATE) <= @fecha_fin)
+        AND (@estado IS NULL OR c.estado = @estado)
+    ORDER BY c.fecha_hora
+    OPTION (RECOMPILE);
+END
+GO
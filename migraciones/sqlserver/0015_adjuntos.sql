@@ -0,0 +1,36 @@
+-- Migración 0015: fotos de ingreso e inspección adjuntas a citas y vehículos
+-- SQL Server
+--
+-- El archivo vive en el almacén de adjuntos (adjuntos.py), guardado por su
+-- SHA-256: la misma foto subida dos veces ocupa un solo archivo. Aquí queda
+-- solo la fila que la vincula a la cita y/o al vehículo.
+--
+-- cita_id no es clave foránea: las citas viejas pasan a CitasHistorico con el
+-- mismo id y sus fotos siguen encontrándose.
+
+IF OBJECT_ID(N'dbo.Adjuntos', N'U') IS NULL
+CREATE TABLE Adjuntos (
+    id INT IDENTITY(1,1) PRIMARY KEY,
+    sha256 CHAR(64) NOT NULL,
+    cita_id INT NULL,
+    vehiculo_id INT NULL FOREIGN KEY REFERENCES Vehiculos(id),
+    tipo NVARCHAR(20) NOT NULL CONSTRAINT DF_Adjuntos_Tipo DEFAULT 'inspeccion'
+        CONSTRAINT CK_Adjuntos_Tipo CHECK (tipo IN ('ingreso', 'inspeccion')),
+    nombre_archivo NVARCHAR(255) NULL,
+    tipo_contenido NVARCHAR(100) NULL,
+    tamano BIGINT NOT NULL,
+    descripcion NVARCHAR(500) NULL,
+    usuario_id INT NULL FOREIGN KEY REFERENCES Usuarios(id),
+    fecha_creacion DATETIME NOT NULL CONSTRAINT DF_Adjuntos_Fecha DEFAULT GETDATE(),
+    CONSTRAINT CK_Adjuntos_Destino CHECK (cita_id IS NOT NULL OR vehiculo_id IS NOT NULL)
+);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Adjuntos_Cita' AND object_id = OBJECT_ID(N'dbo.Adjuntos'))
+    CREATE INDEX IX_Adjuntos_Cita ON Adjuntos(cita_id, fecha_creacion);
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Adjuntos_Vehiculo' AND object_id = OBJECT_ID(N'dbo.Adjuntos'))
+    CREATE INDEX IX_Adjuntos_Vehiculo ON Adjuntos(vehiculo_id, fecha_creacion);
+-- Limpieza del almacén: qué archivos siguen referenciados
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Adjuntos_Sha256' AND object_id = OBJECT_ID(N'dbo.Adjuntos'))
+    CREATE INDEX IX_Adjuntos_Sha256 ON Adjuntos(sha256);
+GO
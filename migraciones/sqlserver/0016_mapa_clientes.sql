@@ -0,0 +1,38 @@
+-- Migración 0016: ubicación de los clientes para el mapa por distrito
+-- SQL Server
+--
+-- GeocodificacionCache guarda el resultado de cada dirección normalizada
+-- (también las que no se encontraron), por versión del nomenclátor: una
+-- dirección repetida o ya vista no se vuelve a buscar.
+-- ClientesUbicacion tiene la ubicación vigente de cada cliente y la dirección
+-- y el nomenclátor con los que se calculó; si alguno cambia, el cliente se
+-- recalcula.
+
+IF OBJECT_ID(N'dbo.GeocodificacionCache', N'U') IS NULL
+CREATE TABLE GeocodificacionCache (
+    direccion NVARCHAR(300) PRIMARY KEY,
+    nomenclator CHAR(12) NOT NULL,
+    distrito NVARCHAR(60) NULL,
+    lugar NVARCHAR(120) NULL,
+    lat FLOAT NULL,
+    lon FLOAT NULL,
+    fecha_creacion DATETIME NOT NULL CONSTRAINT DF_GeocodificacionCache_Fecha DEFAULT GETDATE()
+);
+GO
+
+IF OBJECT_ID(N'dbo.ClientesUbicacion', N'U') IS NULL
+CREATE TABLE ClientesUbicacion (
+    cliente_id INT PRIMARY KEY FOREIGN KEY REFERENCES Clientes(id),
+    direccion NVARCHAR(200) NULL,
+    nomenclator CHAR(12) NOT NULL,
+    distrito NVARCHAR(60) NULL,
+    lat FLOAT NULL,
+    lon FLOAT NULL,
+    fecha_actualizacion DATETIME NOT NULL CONSTRAINT DF_ClientesUbicacion_Fecha DEFAULT GETDATE()
+);
+GO
+
+-- Agregado del mapa: clientes por punto del nomenclátor
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_ClientesUbicacion_Punto' AND object_id = OBJECT_ID(N'dbo.ClientesUbicacion'))
+    CREATE INDEX IX_ClientesUbicacion_Punto ON ClientesUbicacion(distrito, lat, lon);
+GO
@@ -0,0 +1,15 @@
+-- Migración 0017: índice filtrado para los pendientes de la bandeja de salida
+-- SQL Server
+--
+-- Igual que en SQLite: IX_BandejaSalida_Pendientes pasa a indexar solo las
+-- filas con estado = 'pendiente'. recordatorios.py usa el literal en el WHERE,
+-- que es lo que necesita el optimizador para elegir un índice filtrado.
+
+IF EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_BandejaSalida_Pendientes'
+           AND object_id = OBJECT_ID(N'dbo.BandejaSalida') AND has_filter = 0)
+    DROP INDEX IX_BandejaSalida_Pendientes ON BandejaSalida;
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_BandejaSalida_Pendientes' AND object_id = OBJECT_ID(N'dbo.BandejaSalida'))
+    CREATE INDEX IX_BandejaSalida_Pendientes ON BandejaSalida(canal, id) WHERE estado = 'pendiente';
+GO
@@ -0,0 +1,87 @@
+-- Migración 0018: claves de idempotencia de los formularios
+-- SQL Server
+--
+-- Igual que en SQLite: idempotencia.py busca y guarda la clave de cada envío
+-- en la misma transacción que la escritura. Si dos envíos con la misma clave
+-- llegan a la vez, PK_Idempotencia deja pasar uno; el otro se deshace y
+-- devuelve el resultado guardado. sp_agendar_cita registra cliente, vehículo
+-- y cita con la misma regla en una sola llamada.
+
+IF OBJECT_ID(N'dbo.Idempotencia', N'U') IS NULL
+CREATE TABLE Idempotencia (
+    clave VARCHAR(100) NOT NULL CONSTRAINT PK_Idempotencia PRIMARY KEY,
+    resultado NVARCHAR(400) NULL,
+    creado_en DATETIME2(0) NOT NULL
+);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Idempotencia_Creado' AND object_id = OBJECT_ID(N'dbo.Idempotencia'))
+    CREATE INDEX IX_Idempotencia_Creado ON Idempotencia(creado_en);
+GO
+
+-- Cliente, vehículo y cita en una sola transacción, una vez por clave.
+-- UPDLOCK + HOLDLOCK: un segundo envío con la misma clave espera al primero
+-- y devuelve su cita en lugar de crear otra.
+CREATE OR ALTER PROCEDURE sp_agendar_cita
+    @clave VARCHAR(100),
+    @nombre NVARCHAR(100),
+    @telefono NVARCHAR(20),
+    @email NVARCHAR(100) = NULL,
+    @marca NVARCHAR(50),
+    @modelo NVARCHAR(50),
+    @año INT,
+    @placa NVARCHAR(10) = NULL,
+    @servicio_id INT,
+    @fecha_hora DATETIME,
+    @descripcion_problema NVARCHAR(500) = NULL,
+    @sede_id INT = 1,
+    @ttl_segundos INT = 600
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+    DECLARE @cliente_id INT, @vehiculo_id INT, @cita_id INT;
+    BEGIN TRY
+        BEGIN TRANSACTION;
+
+        DELETE FROM Idempotencia WHERE creado_en < DATEADD(SECOND, -@ttl_segundos, SYSUTCDATETIME());
+
+        SELECT @cita_id = CAST(resultado AS INT)
+        FROM Idempotencia WITH (UPDLOCK, HOLDLOCK)
+        WHERE clave = @clave;
+
+        IF @cita_id IS NOT NULL
+        BEGIN
+            COMMIT TRANSACTION;
+            SELECT @cita_id as cita_id, CAST(1 AS BIT) as repetido, 'Cita ya registrada' as mensaje;
+            RETURN;
+        END
+
+        INSERT INTO Clientes (nombre, telefono, email) VALUES (@nombre, @telefono, @email);
+        SET @cliente_id = SCOPE_IDENTITY();
+
+        INSERT INTO Vehiculos (cliente_id, marca, modelo, año, placa)
+        VALUES (@cliente_id, @marca, @modelo, @año, @placa);
+        SET @vehiculo_id = SCOPE_IDENTITY();
+
+        -- Sin consulta previa: tr_Citas_Horario rechaza el horario ocupado
+        INSERT INTO Citas (cliente_id, vehiculo_id, servicio_id, fecha_hora, descripcion_problema, sede_id)
+        VALUES (@cliente_id, @vehiculo_id, @servicio_id, @fecha_hora, @descripcion_problema, @sede_id);
+        SET @cita_id = SCOPE_IDENTITY();
+
+        INSERT INTO Idempotencia (clave, resultado, creado_en)
+        VALUES (@clave, CAST(@cita_id AS NVARCHAR(400)), SYSUTCDATETIME());
+
+        COMMIT TRANSACTION;
+        SELECT @cita_id as cita_id, CAST(0 AS BIT) as repetido, 'Cita creada exitosamente' as mensaje;
+    END TRY
+    BEGIN CATCH
+        IF XACT_STATE() <> 0
+            ROLLBACK TRANSACTION;
+        IF ERROR_NUMBER() IN (2601, 2627) AND ERROR_MESSAGE() LIKE '%HorariosReservados%'
+            SELECT 0 as cita_id, CAST(0 AS BIT) as repetido, 'Ya existe una cita en esa fecha y hora' as mensaje;
+        ELSE
+            SELECT 0 as cita_id, CAST(0 AS BIT) as repetido, ERROR_MESSAGE() as mensaje;
+    END CATCH
+END
+GO
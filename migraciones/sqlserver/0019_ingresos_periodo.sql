@@ -0,0 +1,102 @@
+-- Migración 0019: ingresos por hora, día, semana y mes
+-- SQL Server
+--
+-- IngresosPeriodo suma las citas completadas y sus ingresos (costo_total, o
+-- el precio del servicio si no tiene, como sp_reporte_servicios_populares)
+-- por grano, inicio del período y sede. tr_Citas_Ingresos la mantiene al día
+-- con una sola MERGE por sentencia: resta lo que sumaban las filas de
+-- deleted y suma las de inserted, solo para las citas completadas. El
+-- trigger no mira los DELETE: el archivado mueve las citas a CitasHistorico
+-- y sus ingresos siguen contando.
+--
+-- Períodos: la hora en punto, el día, el lunes de la semana (1900-01-01 fue
+-- lunes, no depende de DATEFIRST) y el primer día del mes.
+-- sp_reconstruir_ingresos recalcula todo desde Citas y CitasHistorico.
+
+IF OBJECT_ID(N'dbo.IngresosPeriodo', N'U') IS NULL
+CREATE TABLE IngresosPeriodo (
+    grano VARCHAR(10) NOT NULL CONSTRAINT CK_IngresosPeriodo_Grano CHECK (grano IN ('hora', 'dia', 'semana', 'mes')),
+    periodo DATETIME NOT NULL,
+    sede_id INT NOT NULL,
+    citas INT NOT NULL,
+    ingresos DECIMAL(14,2) NOT NULL,
+    CONSTRAINT PK_IngresosPeriodo PRIMARY KEY (grano, periodo, sede_id)
+);
+GO
+
+CREATE OR ALTER PROCEDURE sp_reconstruir_ingresos
+AS
+BEGIN
+    SET NOCOUNT ON;
+    BEGIN TRANSACTION;
+
+    DELETE FROM IngresosPeriodo WITH (TABLOCKX);
+
+    INSERT INTO IngresosPeriodo (grano, periodo, sede_id, citas, ingresos)
+    SELECT p.grano, p.periodo, c.sede_id, COUNT(*), SUM(c.monto)
+    FROM (
+        SELECT c.fecha_hora, c.sede_id, ISNULL(c.costo_total, ISNULL(s.precio, 0)) AS monto
+        FROM Citas c LEFT JOIN Servicios s ON s.id = c.servicio_id
+        WHERE c.estado = 'Completado'
+        UNION ALL
+        SELECT h.fecha_hora, h.sede_id, ISNULL(h.costo_total, ISNULL(s.precio, 0))
+        FROM CitasHistorico h LEFT JOIN Servicios s ON s.id = h.servicio_id
+        WHERE h.estado = 'Completado'
+    ) c
+    CROSS APPLY (VALUES
+        ('hora', DATEADD(HOUR, DATEDIFF(HOUR, 0, c.fecha_hora), 0)),
+        ('dia', CAST(CAST(c.fecha_hora AS DATE) AS DATETIME)),
+        ('semana', CAST(DATEADD(DAY, -(DATEDIFF(DAY, '19000101', c.fecha_hora) % 7), CAST(c.fecha_hora AS DATE)) AS DATETIME)),
+        ('mes', CAST(DATEFROMPARTS(YEAR(c.fecha_hora), MONTH(c.fecha_hora), 1) AS DATETIME))
+    ) p (grano, periodo)
+    WHERE c.fecha_hora IS NOT NULL
+    GROUP BY p.grano, p.periodo, c.sede_id;
+
+    COMMIT;
+END
+GO
+
+EXEC sp_reconstruir_ingresos;
+GO
+
+CREATE OR ALTER TRIGGER tr_Citas_Ingresos
+ON Citas
+AFTER INSERT, UPDATE
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    IF EXISTS (SELECT 1 FROM deleted)
+       AND NOT (UPDATE(estado) OR UPDATE(costo_total) OR UPDATE(fecha_hora)
+                OR UPDATE(servicio_id) OR UPDATE(sede_id))
+        RETURN;
+
+    MERGE IngresosPeriodo WITH (HOLDLOCK) AS t
+    USING (
+        SELECT p.grano, p.periodo, c.sede_id, SUM(c.signo) AS citas, SUM(c.signo * c.monto) AS ingresos
+        FROM (
+            SELECT d.fecha_hora, d.sede_id, -1 AS signo, ISNULL(d.costo_total, ISNULL(s.precio, 0)) AS monto
+            FROM deleted d LEFT JOIN Servicios s ON s.id = d.servicio_id
+            WHERE d.estado = 'Completado'
+            UNION ALL
+            SELECT i.fecha_hora, i.sede_id, 1, ISNULL(i.costo_total, ISNULL(s.precio, 0))
+            FROM inserted i LEFT JOIN Servicios s ON s.id = i.servicio_id
+            WHERE i.estado = 'Completado'
+        ) c
+        CROSS APPLY (VALUES
+            ('hora', DATEADD(HOUR, DATEDIFF(HOUR, 0, c.fecha_hora), 0)),
+            ('dia', CAST(CAST(c.fecha_hora AS DATE) AS DATETIME)),
+            ('semana', CAST(DATEADD(DAY, -(DATEDIFF(DAY, '19000101', c.fecha_hora) % 7), CAST(c.fecha_hora AS DATE)) AS DATETIME)),
+            ('mes', CAST(DATEFROMPARTS(YEAR(c.fecha_hora), MONTH(c.fecha_hora), 1) AS DATETIME))
+        ) p (grano, periodo)
+        WHERE c.fecha_hora IS NOT NULL
+        GROUP BY p.grano, p.periodo, c.sede_id
+    ) AS d
+    ON t.grano = d.grano AND t.periodo = d.periodo AND t.sede_id = d.sede_id
+    WHEN MATCHED THEN
+        UPDATE SET citas = t.citas + d.citas, ingresos = t.ingresos + d.ingresos
+    WHEN NOT MATCHED THEN
+        INSERT (grano, periodo, sede_id, citas, ingresos)
+        VALUES (d.grano, d.periodo, d.sede_id, d.citas, d.ingresos);
+END
+GO
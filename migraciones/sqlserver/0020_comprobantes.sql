@@ -0,0 +1,37 @@
+-- Migración 0020: comprobantes de pago de las citas completadas
+-- SQL Server
+--
+-- Una fila por cita facturada. La serie es de la sede (F001, F002...) y el
+-- correlativo sigue dentro de la serie; UQ_Comprobantes_Numero impide que
+-- dos lotes simultáneos tomen el mismo número. El HTML y el PDF viven en el
+-- almacén de adjuntos, guardados por su SHA-256. huella resume los datos y
+-- la versión de las plantillas con que se generaron: si no cambió, el lote
+-- no vuelve a generar el comprobante.
+--
+-- cita_id no es clave foránea: las citas viejas pasan a CitasHistorico con el
+-- mismo id y su comprobante sigue encontrándose.
+
+IF OBJECT_ID(N'dbo.Comprobantes', N'U') IS NULL
+CREATE TABLE Comprobantes (
+    id INT IDENTITY(1,1) PRIMARY KEY,
+    cita_id INT NOT NULL CONSTRAINT UQ_Comprobantes_Cita UNIQUE,
+    sede_id INT NOT NULL,
+    serie VARCHAR(4) NOT NULL,
+    correlativo INT NOT NULL,
+    fecha_emision DATETIME NOT NULL CONSTRAINT DF_Comprobantes_Emision DEFAULT GETDATE(),
+    total DECIMAL(10,2) NULL,
+    huella CHAR(40) NULL,
+    sha256_html CHAR(64) NULL,
+    sha256_pdf CHAR(64) NULL,
+    fecha_actualizacion DATETIME NULL,
+    CONSTRAINT UQ_Comprobantes_Numero UNIQUE (serie, correlativo)
+);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Comprobantes_Html' AND object_id = OBJECT_ID(N'dbo.Comprobantes'))
+    CREATE INDEX IX_Comprobantes_Html ON Comprobantes(sha256_html);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Comprobantes_Pdf' AND object_id = OBJECT_ID(N'dbo.Comprobantes'))
+    CREATE INDEX IX_Comprobantes_Pdf ON Comprobantes(sha256_pdf);
+GO
@@ -0,0 +1,10 @@
+-- Migración 0021: índice por sede del archivo de movimientos
+-- SQL Server
+--
+-- La exportación de movimientos de una sede recorre también el archivo, en
+-- orden de fecha; como IX_MovimientosInventario_Sede_Fecha en la tabla activa.
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_MovimientosInventarioHistorico_Sede_Fecha'
+               AND object_id = OBJECT_ID(N'dbo.MovimientosInventarioHistorico'))
+    CREATE INDEX IX_MovimientosInventarioHistorico_Sede_Fecha ON MovimientosInventarioHistorico(sede_id, fecha);
+GO
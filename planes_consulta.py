@@ -0,0 +1,683 @@
+# ========================================
+# REGRESIÓN DE PLANES DE CONSULTA
+# Taller Automotriz - Sistema de Gestión
+# ========================================
+
+"""
+Comprueba que las consultas de la aplicación sigan usando sus índices.
+
+SQLite: siembra una base grande, recorre las páginas de la CELDA 4 de
+colab_setup.py (AppTest) y los procesos por lotes, y captura cada sentencia
+que llega a SQLite (trace_callback). Después revisa el EXPLAIN QUERY PLAN
+de cada sentencia distinta:
+
+- Falla si una tabla grande (UMBRAL_FILAS o más) se recorre entera (SCAN) y
+  la consulta no figura en RECORRIDOS_PERMITIDOS con su motivo.
+- Falla si una consulta de ESPERADOS no usa su índice, o si ninguna consulta
+  capturada la cumple: la página dejó de emitirla o cambió su texto, y hay
+  que revisar la expectativa.
+
+SQL Server (--dsn): pide el plan estimado (SET SHOWPLAN_XML ON) de cada
+llamada de PROCEDIMIENTOS y aplica las mismas reglas a Table Scan, Index
+Scan y Clustered Index Scan sobre tablas grandes.
+
+Sale con código 1 si hay regresiones, para usarlo antes de publicar.
+
+Uso:
+    python planes_consulta.py
+    python planes_consulta.py --citas 200000 --mostrar --guardar planes/
+    python planes_consulta.py --dsn "Driver={ODBC Driver 17 for SQL Server};Server=...;Database=TallerAutomotriz;..."
+"""
+
+import argparse
+import os
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+import warnings
+import xml.etree.ElementTree as ET
+from datetime import date, datetime, timedelta
+
+CARPETA = os.path.dirname(os.path.abspath(__file__))
+CITAS_POR_DEFECTO = 100000
+SEDES = 3
+# Desde cuántas filas una tabla cuenta como grande
+UMBRAL_FILAS = 5000
+
+# Índice que debe aparecer en el plan: (origen, patrón de la consulta, índice, columnas)
+# - origen: módulo.función (o solo módulo) de quien ejecuta la consulta, entre
+#   las llamadas de su mismo módulo ('app' = CELDA 4). Las funciones enviadas
+#   al hilo escritor solo conservan su módulo.
+# - patrón: expresión regular sobre la plantilla de la sentencia.
+# - columnas: las que el índice debe acotar (SEARCH ... (sede_id=? AND fecha_hora>?)).
+_SIN_WHERE = r'^(?!.*\bWHERE\b)'
+ESPERADOS = [
+    ('app.panel_admin', r'FROM Citas c JOIN', 'IX_Citas_Sede_FechaHora', ('sede_id', 'fecha_hora')),
+    ('app.pagina_inventario', r'ORDER BY nombre', 'IX_Inventario_Sede_Nombre', ('sede_id',)),
+    ('app.pagina_inventario', r'stock_actual <= stock_minimo', 'IX_Inventario_Sede_StockBajo', ('sede_id',)),
+    ('app.pagina_clientes', r'FROM Vehiculos WHERE cliente_id', 'IX_Vehiculos_ClienteId', ('cliente_id',)),
+    ('sedes.resumen_sede', r'fecha_hora >= \?', 'IX_Citas_Sede_FechaHora', ('sede_id', 'fecha_hora')),
+    ('sedes.resumen_sede', r'COUNT\(DISTINCT cliente_id\)', 'IX_Citas_Sede_ClienteId', ('sede_id',)),
+    ('sedes.resumen_sede', r'FROM Inventario', 'IX_Inventario_Sede_StockBajo', ('sede_id',)),
+    ('archivado.obtener_citas', r'FROM Citas WHERE sede_id', 'IX_Citas_Sede_FechaHora', ('sede_id', 'fecha_hora')),
+    ('archivado.obtener_citas', r'FROM CitasHistorico WHERE sede_id', 'IX_CitasHistorico_Sede_FechaHora',
+     ('sede_id', 'fecha_hora')),
+    ('archivado.obtener_citas', r'FROM Citas WHERE cliente_id', 'IX_Citas_ClienteId', ('cliente_id',)),
+    ('archivado.obtener_citas', r'FROM CitasHistorico WHERE cliente_id', 'IX_CitasHistorico_ClienteId',
+     ('cliente_id',)),
+    ('archivado.obtener_movimientos', r'FROM MovimientosInventario WHERE sede_id',
+     'IX_MovimientosInventario_Sede_Fecha', ('sede_id', 'fecha')),
+    ('archivado', r'^SELECT id FROM MovimientosInventario WHERE', 'IX_MovimientosInventario_Fecha', ('fecha',)),
+    ('exportacion.bloques_de_filas', r'FROM Citas c .*WHERE c\.fecha_hora', 'IX_Citas_FechaHora', ('fecha_hora',)),
+    ('exportacion.bloques_de_filas', r'FROM MovimientosInventario m .*WHERE m\.fecha',
+     'IX_MovimientosInventario_Fecha', ('fecha',)),
+    ('exportacion.bloques_de_filas', r'FROM Citas c .*WHERE c\.sede_id', 'IX_Citas_Sede_FechaHora', ('sede_id',)),
+    ('exportacion.bloques_de_filas', r'FROM CitasHistorico c .*WHERE c\.sede_id', 'IX_CitasHistorico_Sede_FechaHora',
+     ('sede_id',)),
+    ('exportacion.bloques_de_filas', r'FROM MovimientosInventario m .*WHERE m\.sede_id',
+     'IX_MovimientosInventario_Sede_Fecha', ('sede_id',)),
+    ('exportacion.bloques_de_filas', r'FROM MovimientosInventarioHistorico m .*WHERE m\.sede_id',
+     'IX_MovimientosInventarioHistorico_Sede_Fecha', ('sede_id',)),
+    ('adjuntos.adjuntos_de_citas', r'FROM Adjuntos WHERE cita_id IN', 'IX_Adjuntos_Cita', ('cita_id',)),
+    ('metricas.contar_stock_bajo', r'FROM Inventario', 'IX_Inventario_Sede_StockBajo', ()),
+    ('recordatorios', r'FROM Citas c', 'IX_Citas_FechaHora', ('fecha_hora',)),
+    ('recordatorios.enviar_pendientes', r'FROM BandejaSalida', 'IX_BandejaSalida_Pendientes', ('canal',)),
+    ('prediccion_servicio.proximos_servicios', r'FROM PrediccionServicio', 'IX_PrediccionServicio_Proximo',
+     ('proximo_servicio',)),
+    ('tiempos_estado.resumen_tiempos', r'FROM TiemposEstadoCubetas', 'IX_TiemposEstadoCubetas_Dia', ('dia',)),
+    ('facturacion._preparar', r'LEFT JOIN Comprobantes co', 'IX_Citas_Sede_FechaHora', ('sede_id', 'fecha_hora')),
+    ('facturacion._preparar', r'LEFT JOIN Comprobantes co', 'IX_CitasHistorico_Sede_FechaHora',
+     ('sede_id', 'fecha_hora')),
+    ('facturacion.comprobantes_del_dia', r'FROM Comprobantes co', 'IX_Citas_Sede_FechaHora',
+     ('sede_id', 'fecha_hora')),
+    ('facturacion.comprobantes_del_dia', r'FROM Comprobantes co', 'IX_CitasHistorico_Sede_FechaHora',
+     ('sede_id', 'fecha_hora')),
+    ('ingresos.serie_ingresos', r'FROM IngresosPeriodo', 'PRIMARY KEY', ('grano', 'periodo')),
+    ('ingresos.ingresos_del_dia', r'FROM IngresosPeriodo', 'PRIMARY KEY', ('grano', 'periodo')),
+    ('materiales', r'^UPDATE Citas SET estado', 'IX_Citas_Sede_FechaHora', ('sede_id', 'fecha_hora')),
+]
+
+# Recorridos completos a propósito: (origen, patrón, tabla, motivo)
+RECORRIDOS_PERMITIDOS = [
+    ('exportacion.bloques_de_filas', r'FROM Clientes c', 'Clientes', "la exportación incluye a todos los clientes"),
+    ('exportacion.bloques_de_filas', _SIN_WHERE + r'.*FROM Citas(Historico)? c', 'Citas',
+     "exportación sin rango de fechas"),
+    ('exportacion.bloques_de_filas', _SIN_WHERE + r'.*FROM Citas(Historico)? c', 'CitasHistorico',
+     "exportación sin rango de fechas"),
+    ('exportacion.bloques_de_filas', _SIN_WHERE + r'.*FROM MovimientosInventario(Historico)? m',
+     'MovimientosInventario', "exportación sin rango de fechas"),
+    ('exportacion.bloques_de_filas', _SIN_WHERE + r'.*FROM MovimientosInventario(Historico)? m',
+     'MovimientosInventarioHistorico', "exportación sin rango de fechas"),
+    ('exportacion.bloques_de_filas', _SIN_WHERE + r'.*FROM MovimientosInventario(Historico)? m', 'Inventario',
+     "exportación sin rango de fechas: se leen todos los productos para el join"),
+    ('metricas.contar_stock_bajo', r'FROM Inventario', 'Inventario',
+     "cuenta de todas las sedes sobre el índice parcial de stock bajo"),
+    ('mapa_clientes.actualizar_ubicaciones', r'LEFT JOIN ClientesUbicacion', 'Clientes',
+     "busca los clientes sin ubicación; lo leído se descarta enseguida"),
+    ('mapa_clientes.agregado_clientes', r'FROM ClientesUbicacion', 'ClientesUbicacion',
+     "cuenta todos los clientes ubicados (resultado en caché 5 min)"),
+    ('mapa_clientes.agregado_clientes', r'LEFT JOIN ClientesUbicacion', 'Clientes',
+     "cuenta los clientes sin ubicar (resultado en caché 5 min)"),
+    ('reposicion.actualizar_puntos_reorden', r'FROM Inventario', 'Inventario',
+     "recalcula el punto de reorden de todos los items"),
+    ('prediccion_servicio.actualizar_predicciones', r'FROM Vehiculos', 'Vehiculos',
+     "recálculo completo de la flota"),
+    ('prediccion_servicio.actualizar_predicciones', r"c\.estado = \?", 'Citas', "recálculo completo de la flota"),
+    ('prediccion_servicio.actualizar_predicciones', r"c\.estado = \?", 'CitasHistorico',
+     "recálculo completo de la flota"),
+    ('prediccion_servicio.actualizar_predicciones', r'^SELECT intervalo_dias FROM PrediccionServicio',
+     'PrediccionServicio', "mediana de la flota: lee casi todas las predicciones"),
+]
+
+# Llamadas de la app SQL Server cuyo plan estimado se revisa: (procedimiento, parámetros, índice esperado)
+_HOY = date.today()
+PROCEDIMIENTOS = [
+    ('sp_obtener_servicios', (), None),
+    ('sp_obtener_citas', (_HOY - timedelta(days=30), _HOY, None, 1), 'IX_Citas_Sede_FechaHora'),
+    ('sp_obtener_movimientos_inventario', (None, _HOY - timedelta(days=30), _HOY, 1),
+     'IX_MovimientosInventario_Sede_Fecha'),
+    ('sp_obtener_inventario', (None, 0, 1), 'IX_Inventario_Sede_Nombre'),
+    ('sp_obtener_inventario', (None, 1, 1), 'IX_Inventario_Sede_StockBajo'),
+    ('sp_dashboard_metricas', (_HOY, 1), 'IX_Citas_Sede_FechaHora'),
+    ('sp_obtener_vehiculos_cliente', (1,), 'IX_Vehiculos_ClienteId'),
+    ('sp_buscar_clientes', ('toyota corolla', 10), None),
+    ('sp_validar_usuario', ('admin', '0' * 64), None),
+    ('sp_reporte_servicios_populares', (_HOY - timedelta(days=30), _HOY, 10), None),
+]
+
+# ========================================
+# CAPTURA DE SENTENCIAS
+# ========================================
+
+_SENTENCIA = re.compile(r'^\s*(SELECT|WITH|INSERT|UPDATE|DELETE|REPLACE)\b', re.IGNORECASE)
+_TEXTO = re.compile(r"'(?:[^']|'')*'")
+_NUMERO = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])')
+_LISTA = re.compile(r'\?(?:\s*,\s*\?)+')
+# Módulos que ejecutan por encargo de otro: el origen es quien los llamó
+_INTERMEDIARIOS = {'bd_sqlite', 'carga_arrow', 'carga_tipada', 'planes_consulta'}
+
+
+def plantilla(sql):
+    """Sentencia con los valores reemplazados por ?, para agrupar las que solo cambian en eso"""
+    sql = _TEXTO.sub('?', ' '.join(sql.split()))
+    sql = _NUMERO.sub('?', sql)
+    return _LISTA.sub('?, ...', sql)
+
+
+class CapturaSQL:
+    """Registra las sentencias de todas las conexiones sqlite3 que se abren mientras está activa
+
+    sqlite3 entrega cada sentencia con los parámetros ya reemplazados; se
+    guarda la primera de cada plantilla y quién la ejecutó.
+    """
+
+    def __init__(self, app=None):
+        self.app = os.path.abspath(app) if app else None
+        self.sentencias = {}
+        self._original = None
+
+    def _cadena(self):
+        """módulo.función de las llamadas del módulo que ejecuta la sentencia, de adentro hacia afuera"""
+        cadena = []
+        marco = sys._getframe(2)
+        while marco is not None:
+            ruta = os.path.abspath(marco.f_code.co_filename)
+            modulo = os.path.splitext(os.path.basename(ruta))[0]
+            if ruta == self.app:
+                modulo = 'app'
+            elif os.path.dirname(ruta) != CARPETA or modulo in _INTERMEDIARIOS:
+                modulo = None
+            if modulo:
+                # Solo las del primer módulo: archivado._leer <- archivado.obtener_citas
+                if cadena and not cadena[0].startswith(f"{modulo}."):
+                    break
+                cadena.append(f"{modulo}.{marco.f_code.co_name}")
+            marco = marco.f_back
+        return tuple(cadena) or ('(hilo escritor)',)
+
+    def _registrar(self, sql):
+        # Las sentencias de los triggers llegan como comentarios "-- TRIGGER ..."
+        if not _SENTENCIA.match(sql):
+            return
+        clave = plantilla(sql)
+        if clave not in self.sentencias:
+            self.sentencias[clave] = (self._cadena(), sql)
+
+    def __enter__(self):
+        self._original = original = sqlite3.connect
+
+        def conectar(*args, **kwargs):
+            conn = original(*args, **kwargs)
+            conn.set_trace_callback(self._registrar)
+            return conn
+
+        sqlite3.connect = conectar
+        return self
+
+    def __exit__(self, *_):
+        sqlite3.connect = self._original
+
+
+# ========================================
+# ANÁLISIS DE PLANES SQLITE
+# ========================================
+
+_PASO = re.compile(r'^(SCAN|SEARCH) (?:TABLE )?(\S+)(?: AS (\S+))?(.*)$')
+_ALIAS = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+_NO_ALIAS = {'ON', 'WHERE', 'JOIN', 'LEFT', 'INNER', 'GROUP', 'ORDER', 'LIMIT', 'UNION', 'USING', 'SET'}
+
+
+def _tablas_por_alias(sql):
+    alias = {}
+    for tabla, nombre in _ALIAS.findall(sql):
+        alias.setdefault(tabla, set()).add(tabla)
+        if nombre and nombre.upper() not in _NO_ALIAS:
+            alias.setdefault(nombre, set()).add(tabla)
+    return alias
+
+
+def plan_sqlite(conn, sql):
+    """Líneas del EXPLAIN QUERY PLAN de la sentencia"""
+    return [fila[3] for fila in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+def recorridos(plan, sql, grandes):
+    """[(tabla, paso)] de los SCAN sobre tablas grandes"""
+    alias = _tablas_por_alias(sql)
+    encontrados = []
+    for paso in plan:
+        coincidencia = _PASO.match(paso)
+        if not coincidencia or coincidencia.group(1) != 'SCAN' or 'VIRTUAL TABLE' in paso:
+            continue
+        nombre = coincidencia.group(3) or coincidencia.group(2)
+        tablas = {coincidencia.group(2)} if coincidencia.group(3) else alias.get(nombre, {nombre})
+        encontrados.extend((tabla, paso) for tabla in sorted(tablas) if tabla in grandes)
+    return encontrados
+
+
+def _origen(cadena):
+    """Llamada más representativa de la cadena: la más externa que no sea main ni el módulo"""
+    return next((c for c in reversed(cadena) if c.split('.', 1)[-1] not in ('main', '<module>')), cadena[0])
+
+
+# Las tablas WITHOUT ROWID se recorren por su clave: 'PRIMARY KEY' en ESPERADOS
+_INDICE = re.compile(r'USING (?:COVERING )?(?:INDEX (\w+)|PRIMARY KEY)(?: \((.*)\))?')
+_COLUMNA_ACOTADA = re.compile(r'(\w+)(?:=|>|<| IN\b)')
+
+
+def usa_indice(plan, indice, columnas=()):
+    """True si algún paso del plan usa el índice acotando todas las columnas pedidas"""
+    for paso in plan:
+        coincidencia = _INDICE.search(paso)
+        if coincidencia and (coincidencia.group(1) or 'PRIMARY KEY') == indice:
+            if set(columnas) <= set(_COLUMNA_ACOTADA.findall(coincidencia.group(2) or '')):
+                return True
+    return False
+
+
+def _coincide(regla, cadena, clave):
+    origen = regla[0]
+    return (any(llamada == origen or llamada.split('.')[0] == origen for llamada in cadena)
+            and re.search(regla[1], clave) is not None)
+
+
+def revisar_sqlite(ruta, sentencias, grandes):
+    """(resultados, fallas); resultados: [(origen, plantilla, plan, problemas)]"""
+    conn = sqlite3.connect(f"file:{ruta}?mode=ro", uri=True)
+    resultados, fallas = [], []
+    vistas = set()
+    try:
+        for clave, (cadena, sql) in sorted(sentencias.items(), key=lambda s: _origen(s[1][0])):
+            origen = _origen(cadena)
+            try:
+                plan = plan_sqlite(conn, sql)
+            except sqlite3.Error as e:
+                # Tablas temporales de otra conexión, sentencias con efectos de esquema...
+                resultados.append((origen, clave, [f"(sin plan: {e})"], []))
+                continue
+            problemas = []
+            for tabla, paso in recorridos(plan, clave, grandes):
+                if not any(_coincide(r, cadena, clave) and r[2] == tabla for r in RECORRIDOS_PERMITIDOS):
+                    problemas.append(f"recorrido completo de {tabla}: {paso}")
+            for i, (_, _, indice, columnas) in enumerate(ESPERADOS):
+                if _coincide(ESPERADOS[i], cadena, clave):
+                    vistas.add(i)
+                    if not usa_indice(plan, indice, columnas):
+                        problemas.append(f"no usa {indice}" + (f" sobre {', '.join(columnas)}" if columnas else ""))
+            resultados.append((origen, clave, plan, problemas))
+            fallas.extend(f"{origen}: {p}\n      {clave[:160]}" for p in problemas)
+    finally:
+        conn.close()
+    for i, (origen, patron, indice, _) in enumerate(ESPERADOS):
+        if i not in vistas:
+            fallas.append(f"{origen}: ninguna consulta capturada coincide con {patron!r} (esperaba {indice})")
+    return resultados, fallas
+
+
+def tablas_grandes(ruta, umbral=UMBRAL_FILAS):
+    """Tablas con al menos `umbral` filas (sin las tablas internas de los índices de texto)"""
+    conn = sqlite3.connect(ruta)
+    try:
+        filas = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'table' "
+                             "AND name NOT LIKE 'sqlite_%'").fetchall()
+        virtuales = [nombre for nombre, sql in filas if sql.upper().startswith('CREATE VIRTUAL')]
+        tablas = [nombre for nombre, _ in filas
+                  if nombre not in virtuales and not any(nombre.startswith(f"{v}_") for v in virtuales)]
+        return {t for t in tablas if conn.execute(f'SELECT COUNT(*) FROM "{t}"').fetchone()[0] >= umbral}
+    finally:
+        conn.close()
+
+
+# ========================================
+# BASE SEMBRADA Y RECORRIDO DE LA APP
+# ========================================
+
+def sembrar(ruta, citas=CITAS_POR_DEFECTO, sedes=SEDES, analizar=False):
+    """Base con el volumen de un taller grande: citas de 3 años, archivo, movimientos y derivados
+
+    La app no corre ANALYZE, así que por defecto SQLite planifica sin
+    estadísticas, como en producción; analizar=True revisa los planes que
+    saldrían con sqlite_stat1.
+    """
+    from archivado import archivar_citas, archivar_movimientos
+    from busqueda import _VEHICULOS
+    from mapa_clientes import DISTRITOS, _direccion_de_prueba, actualizar_ubicaciones
+    from migraciones import migrar_sqlite
+    from prediccion_servicio import actualizar_predicciones
+    from recordatorios import generar_recordatorios
+    from sedes import crear_sede
+    from tiempos_estado import actualizar_tiempos_estado
+
+    aleatorio = random.Random(7)
+    migrar_sqlite(ruta)
+    conn = sqlite3.connect(ruta)
+    for numero in range(2, sedes + 1):
+        crear_sede(conn, f"Sede {numero}", f"Av. Prueba {numero}00, Lima")
+    conn.executemany(
+        "INSERT INTO Inventario (nombre, categoria, stock_actual, stock_minimo, precio_unitario, proveedor, sede_id) "
+        "VALUES (?, 'Repuestos', ?, 10, 25.0, ?, ?)",
+        [(f"Repuesto {i}", aleatorio.randint(0, 200), f"Proveedor {i % 20}", sede)
+         for sede in range(1, sedes + 1) for i in range(2000)])
+    # Stock de sobra para los repuestos que consumen las citas completadas
+    conn.execute("UPDATE Inventario SET stock_actual = 1000000 WHERE nombre NOT LIKE 'Repuesto %'")
+
+    clientes = max(citas // 5, 100)
+    distritos = list(DISTRITOS)
+    conn.executemany("INSERT INTO Clientes (nombre, telefono, email, direccion) VALUES (?, ?, ?, ?)",
+                     [(f"Cliente {i}", f"9{i:08d}", f"cliente{i}@correo.pe",
+                       _direccion_de_prueba(aleatorio, distritos)) for i in range(clientes)])
+    minimo = conn.execute("SELECT MIN(id) FROM Clientes WHERE nombre LIKE 'Cliente %'").fetchone()[0]
+    conn.executemany("INSERT INTO Vehiculos (cliente_id, marca, modelo, año, placa, kilometraje) VALUES (?, ?, ?, ?, ?, ?)",
+                     [(minimo + i, *aleatorio.choice(_VEHICULOS), aleatorio.randint(2005, 2024),
+                       f"P{i:05d}", aleatorio.randint(0, 200000)) for i in range(clientes)])
+    vehiculo_minimo = conn.execute("SELECT MIN(id) FROM Vehiculos WHERE placa LIKE 'P%'").fetchone()[0]
+    servicios = [fila[0] for fila in conn.execute("SELECT id FROM Servicios")]
+
+    # Tres años hasta hoy más un mes por delante; un horario distinto por cita y sede
+    inicio = datetime.combine(date.today() - timedelta(days=3 * 365), datetime.min.time())
+    paso = (3 * 365 + 30) * 86400 // citas
+    filas = []
+    for i in range(citas):
+        cliente = aleatorio.randrange(clientes)
+        fecha = inicio + timedelta(seconds=i * paso)
+        # El cliente i tiene el vehículo i
+        filas.append((minimo + cliente, vehiculo_minimo + cliente, aleatorio.choice(servicios),
+                      fecha.strftime('%Y-%m-%d %H:%M:%S'), i % sedes + 1))
+    conn.executemany("INSERT INTO Citas (cliente_id, vehiculo_id, servicio_id, fecha_hora, sede_id) "
+                     "VALUES (?, ?, ?, ?, ?)", filas)
+    # Las pasadas se cierran: los triggers registran el cambio de estado y descuentan repuestos
+    hoy = date.today().strftime('%Y-%m-%d')
+    conn.execute("UPDATE Citas SET estado = 'Cancelado' WHERE fecha_hora < ? AND id % 7 = 0", (hoy,))
+    conn.execute("UPDATE Citas SET estado = 'Completado', costo_total = 150 "
+                 "WHERE fecha_hora < ? AND estado = 'Pendiente'", (hoy,))
+    conn.commit()
+
+    archivar_citas(conn)
+    archivar_movimientos(conn)
+    # Dos meses de recordatorios ya enviados y los de mañana pendientes
+    for dias in range(60, 0, -1):
+        generar_recordatorios(conn, dia=date.today() - timedelta(days=dias))
+    conn.execute("UPDATE BandejaSalida SET estado = 'enviado'")
+    generar_recordatorios(conn, dia=date.today() + timedelta(days=1))
+    conn.executemany("INSERT INTO Adjuntos (sha256, cita_id, vehiculo_id, tipo, nombre_archivo, tipo_contenido, tamano) "
+                     "SELECT ?, id, vehiculo_id, 'ingreso', 'foto.jpg', 'image/jpeg', 1000 FROM Citas WHERE id = ?",
+                     [(f"{i:064x}", i) for i in range(1, citas, 10)])
+    conn.commit()
+    actualizar_tiempos_estado(conn)
+    actualizar_predicciones(conn)
+    actualizar_ubicaciones(conn)
+    if analizar:
+        conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+
+
+def _recorrer_app(app):
+    """Visita cada página de la app como visitante y como administrador"""
+    import prueba_carga as pc
+    from streamlit.testing.v1 import AppTest
+
+    errores = []
+
+    def correr(at, etiqueta):
+        at.run()
+        error = pc._error_de(at)
+        if error:
+            errores.append(f"{etiqueta}: {error}")
+
+    at = AppTest.from_file(app, default_timeout=120)
+    for pagina, accion in pc.RECORRIDOS['visitante']:
+        if accion:
+            accion(at)
+        correr(at, pagina)
+
+    at = AppTest.from_file(app, default_timeout=120)
+    at.run()
+    pc._por_etiqueta(at.sidebar.button, "🔐 Login Admin").click()
+    correr(at, 'Login')
+    pc._por_etiqueta(at.text_input, "Usuario").input('admin')
+    pc._por_etiqueta(at.text_input, "Contraseña").input('admin123')
+    pc._por_etiqueta(at.button, "Iniciar Sesión").click()
+    correr(at, 'Login (envío)')
+
+    at = AppTest.from_file(app, default_timeout=120)
+    pc._iniciar_sesion(at)
+    correr(at, 'Inicio')
+    pc._ir_a('Panel Admin')(at)
+    correr(at, 'Panel Admin')
+    pc._por_etiqueta(at.button, "Actualizar estado").click()
+    correr(at, 'Panel Admin (estado)')
+    # Un rango que llega al archivo
+    pc._por_etiqueta(at.date_input, "Desde").set_value(date.today() - timedelta(days=3 * 365))
+    correr(at, 'Panel Admin (listado con archivo)')
+    pc._ir_a('Inventario')(at)
+    correr(at, 'Inventario')
+    pc._ir_a('Clientes')(at)
+    correr(at, 'Clientes')
+    pc._por_etiqueta(at.text_input, "Buscar cliente (nombre, teléfono, email, placa, marca o modelo):").input("Cliente 12")
+    correr(at, 'Clientes (búsqueda)')
+    pc._ir_a('Mapa de Clientes')(at)
+    correr(at, 'Mapa de Clientes')
+    at.radio[0].set_value('celda')
+    correr(at, 'Mapa de Clientes (celdas)')
+    return errores
+
+
+def _procesos(ruta, carpeta):
+    """Procesos que no dependen de una página: exportaciones, recordatorios, archivado, reposición..."""
+    from adjuntos import AlmacenBlobs, limpiar_huerfanos
+    from archivado import archivar_citas, archivar_movimientos
+    from bd_sqlite import BaseDatosSQLite
+    from concurrencia import mover_stock
+    from exportacion import EXPORTACIONES, bloques_de_filas
+    from facturacion import facturar
+    from materiales import completar_dia, faltantes
+    from metricas import contar_stock_bajo
+    from recordatorios import TransporteCarpeta, enviar_pendientes, generar_recordatorios
+    from reposicion import actualizar_puntos_reorden
+
+    db = BaseDatosSQLite(ruta)
+    try:
+        hoy = date.today()
+        with db.lector() as conn:
+            for nombre in EXPORTACIONES:
+                for _ in bloques_de_filas(conn, nombre, hoy - timedelta(days=90), hoy):
+                    pass
+                for _ in bloques_de_filas(conn, nombre):
+                    pass
+                for _ in bloques_de_filas(conn, nombre, hoy - timedelta(days=90), hoy, sede_id=1):
+                    pass
+                for _ in bloques_de_filas(conn, nombre, sede_id=1):
+                    pass
+            contar_stock_bajo(conn)
+        generar_recordatorios(db, dia=hoy + timedelta(days=2))
+        enviar_pendientes(db, TransporteCarpeta(os.path.join(carpeta, 'salida')))
+        archivar_citas(db)
+        archivar_movimientos(db)
+        actualizar_puntos_reorden(db)
+        mover_stock(db, 1, 'ENTRADA', 5, 'Compra')
+        faltantes(db, sede_id=1)
+        completar_dia(db, sede_id=1)
+        almacen = AlmacenBlobs(os.path.join(carpeta, 'adjuntos'))
+        facturar(db, almacen, hoy - timedelta(days=1), sede_id=1, procesos=1)
+        limpiar_huerfanos(db, almacen, gracia=0)
+    finally:
+        db.cerrar()
+
+
+def capturar(carpeta, citas=CITAS_POR_DEFECTO, analizar=False):
+    """Siembra la base en carpeta, recorre app y procesos; devuelve (ruta, sentencias, errores)"""
+    import prueba_carga as pc
+
+    ruta = os.path.join(carpeta, 'taller_automotriz.db')
+    sembrar(ruta, citas, analizar=analizar)
+    app = pc.extraer_app(pc.APP_COLAB, os.path.join(carpeta, 'app.py'))
+    os.environ.setdefault('METRICAS_PUERTO', '0')
+    directorio = os.getcwd()
+    # La app abre 'taller_automotriz.db' y 'adjuntos/' en el directorio actual
+    os.chdir(carpeta)
+    try:
+        with warnings.catch_warnings(), CapturaSQL(app) as captura:
+            warnings.simplefilter('ignore')
+            errores = _recorrer_app(app)
+            _procesos(ruta, carpeta)
+    finally:
+        os.chdir(directorio)
+    return ruta, captura.sentencias, errores
+
+
+# ========================================
+# SQL SERVER (SHOWPLAN_XML)
+# ========================================
+
+_SHOWPLAN = '{http://schemas.microsoft.com/sqlserver/2004/07/showplan}'
+_RECORRIDOS_SQLSERVER = ('Table Scan', 'Index Scan', 'Clustered Index Scan')
+
+
+def _literal(valor):
+    if valor is None:
+        return 'NULL'
+    if isinstance(valor, (bool, int)):
+        return str(int(valor))
+    if isinstance(valor, date):
+        return f"'{valor:%Y-%m-%d}'"
+    return "N'" + str(valor).replace("'", "''") + "'"
+
+
+def planes_sqlserver(conn, procedimiento, params):
+    """XML del plan estimado de cada sentencia que ejecutaría la llamada"""
+    cursor = conn.cursor()
+    planes = []
+    cursor.execute("SET SHOWPLAN_XML ON")
+    try:
+        # Con SHOWPLAN no se ejecuta nada; los valores van como literales
+        cursor.execute(f"EXEC {procedimiento} {', '.join(_literal(v) for v in params)}")
+        while True:
+            if cursor.description:
+                planes.extend(fila[0] for fila in cursor.fetchall())
+            if not cursor.nextset():
+                break
+    finally:
+        cursor.execute("SET SHOWPLAN_XML OFF")
+        cursor.close()
+    return planes
+
+
+def operaciones(plan_xml):
+    """[(operación física, tabla, índice)] de los accesos a tablas del plan"""
+    raiz = ET.fromstring(plan_xml)
+    accesos = []
+    for nodo in raiz.iter(f'{_SHOWPLAN}RelOp'):
+        objeto = nodo.find(f'./*/{_SHOWPLAN}Object')
+        if objeto is None:
+            continue
+        accesos.append((nodo.get('PhysicalOp'), objeto.get('Table', '').strip('[]'),
+                        objeto.get('Index', '').strip('[]')))
+    return accesos
+
+
+def revisar_sqlserver(conn, umbral=UMBRAL_FILAS, guardar=None):
+    """(resultados, fallas) de los planes estimados de PROCEDIMIENTOS"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT t.name, SUM(p.rows) FROM sys.tables t
+        JOIN sys.partitions p ON p.object_id = t.object_id AND p.index_id IN (0, 1)
+        GROUP BY t.name
+    """)
+    grandes = {nombre for nombre, filas in cursor.fetchall() if filas >= umbral}
+    cursor.close()
+
+    resultados, fallas = [], []
+    for numero, (procedimiento, params, esperado) in enumerate(PROCEDIMIENTOS, 1):
+        llamada = f"{procedimiento} {', '.join(_literal(v) for v in params)}"
+        try:
+            planes = planes_sqlserver(conn, procedimiento, params)
+        except Exception as e:
+            fallas.append(f"{llamada}: no se pudo obtener el plan ({e})")
+            continue
+        accesos = [acceso for plan in planes for acceso in operaciones(plan)]
+        problemas = [f"{op} de {tabla} ({indice})" for op, tabla, indice in accesos
+                     if op in _RECORRIDOS_SQLSERVER and tabla in grandes]
+        if esperado and not any(indice == esperado for _, _, indice in accesos):
+            problemas.append(f"no usa {esperado}")
+        if guardar:
+            for k, plan in enumerate(planes, 1):
+                with open(os.path.join(guardar, f"{numero:02d}_{procedimiento}_{k}.sqlplan"), 'w',
+                          encoding='utf-8') as archivo:
+                    archivo.write(plan)
+        resultados.append((procedimiento, llamada, [f"{op}: {tabla}.{indice}" for op, tabla, indice in accesos],
+                           problemas))
+        fallas.extend(f"{llamada}: {p}" for p in problemas)
+    return resultados, fallas
+
+
+# ========================================
+# INFORME
+# ========================================
+
+def imprimir(resultados, mostrar=False):
+    for origen, clave, plan, problemas in resultados:
+        print(f"  {'❌' if problemas else '✅'} {origen:45s} {clave[:90]}")
+        for problema in problemas:
+            print(f"       ↳ {problema}")
+        if mostrar:
+            for paso in plan:
+                print(f"         {paso}")
+
+
+def _guardar_planes(carpeta, resultados):
+    os.makedirs(carpeta, exist_ok=True)
+    with open(os.path.join(carpeta, 'planes_sqlite.txt'), 'w', encoding='utf-8') as archivo:
+        for origen, clave, plan, _ in resultados:
+            archivo.write(f"-- {origen}\n{clave}\n")
+            archivo.writelines(f"    {paso}\n" for paso in plan)
+            archivo.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regresión de planes de consulta")
+    parser.add_argument('--citas', type=int, default=CITAS_POR_DEFECTO, help="Citas de la base sembrada (SQLite)")
+    parser.add_argument('--analizar', action='store_true',
+                        help="Correr ANALYZE antes de revisar (planes con estadísticas)")
+    parser.add_argument('--dsn', help="Cadena de conexión ODBC: revisa los procedimientos en SQL Server")
+    parser.add_argument('--umbral', type=int, default=UMBRAL_FILAS,
+                        help="Filas desde las que una tabla cuenta como grande")
+    parser.add_argument('--mostrar', action='store_true', help="Imprimir el plan de cada consulta")
+    parser.add_argument('--guardar', metavar='CARPETA', help="Guardar los planes para compararlos entre versiones")
+    args = parser.parse_args()
+
+    if args.guardar:
+        os.makedirs(args.guardar, exist_ok=True)
+
+    if args.dsn:
+        import pyodbc
+        conn = pyodbc.connect(args.dsn, autocommit=True)
+        try:
+            resultados, fallas = revisar_sqlserver(conn, args.umbral, args.guardar)
+        finally:
+            conn.close()
+        print(f"{len(resultados)} llamadas a procedimientos")
+        imprimir(resultados, args.mostrar)
+    else:
+        with tempfile.TemporaryDirectory() as carpeta:
+            ruta, sentencias, errores = capturar(carpeta, args.citas, args.analizar)
+            grandes = tablas_grandes(ruta, args.umbral)
+            resultados, fallas = revisar_sqlite(ruta, sentencias, grandes)
+        fallas = [f"página con error: {e}" for e in errores] + fallas
+        print(f"{len(sentencias)} consultas distintas; tablas grandes: {', '.join(sorted(grandes))}")
+        imprimir(resultados, args.mostrar)
+        if args.guardar:
+            _guardar_planes(args.guardar, resultados)
+
+    if fallas:
+        print(f"\n❌ {len(fallas)} regresiones:")
+        for falla in fallas:
+            print(f"  - {falla}")
+        sys.exit(1)
+    print("\n✅ Todas las consultas usan sus índices")
+
+
+if __name__ == "__main__":
+    main()
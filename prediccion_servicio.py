@@ -0,0 +1,305 @@
+# ========================================
+# PREDICCIÓN DEL PRÓXIMO SERVICIO PREVENTIVO
+# Taller Automotriz - Sistema de Gestión
+# ========================================
+
+"""
+Estima cuándo le toca a cada vehículo su próximo servicio preventivo a partir
+de los intervalos entre sus servicios anteriores y de su kilometraje.
+
+El cálculo es un lote vectorizado (pandas/NumPy) sobre toda la flota: dos
+consultas traen los vehículos y el historial de servicios preventivos
+completados (incluido el archivo) y el resultado se guarda en
+PrediccionServicio. La actualización incremental solo recalcula los vehículos
+con citas completadas desde la última corrida (marca sobre CitasHistorialEstado).
+
+Regla:
+- intervalo propio = mediana de días entre servicios (con 2 o más servicios);
+  si no hay, la mediana de la flota (o INTERVALO_POR_DEFECTO_DIAS)
+- intervalo por uso = KM_ENTRE_SERVICIOS / km diarios estimados
+  (kilometraje actual / edad del vehículo)
+- próximo = último servicio + el menor de los dos intervalos
+
+Uso:
+    actualizar_predicciones(db)               # incremental
+    actualizar_predicciones(db, completo=True)
+    python prediccion_servicio.py --db taller_automotriz.db --completo
+    python prediccion_servicio.py --benchmark 100000
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from bd_sqlite import conexion_lectura, en_transaccion
+from migraciones import motor_de
+
+SERVICIOS_PREVENTIVOS = ('Mantenimiento Preventivo', 'Cambio de Aceite', 'Afinamiento de Motor')
+KM_ENTRE_SERVICIOS = 5000
+INTERVALO_POR_DEFECTO_DIAS = 180
+INTERVALO_MINIMO_DIAS = 30
+INTERVALO_MAXIMO_DIAS = 730
+MINIMO_FLOTA = 20
+MARCA = 'PrediccionServicio'
+
+COLUMNAS_RESULTADO = ['vehiculo_id', 'ultimo_servicio', 'servicios_previos', 'intervalo_dias',
+                      'km_diarios', 'proximo_servicio', 'metodo']
+
+# Vehículos con citas completadas entre dos ids de CitasHistorialEstado
+_AFECTADOS = """
+SELECT c.vehiculo_id
+FROM CitasHistorialEstado h
+JOIN Citas c ON c.id = h.cita_id
+WHERE h.id > ? AND h.id <= ? AND h.estado_nuevo = 'Completado'
+"""
+
+_HISTORIAL = """
+SELECT c.vehiculo_id, c.fecha_hora
+FROM {tabla} c
+JOIN Servicios s ON s.id = c.servicio_id
+WHERE c.estado = 'Completado'
+AND c.vehiculo_id IS NOT NULL
+AND s.nombre IN ({servicios})
+{filtro}
+"""
+
+_VEHICULOS = "SELECT v.id, v.año, v.kilometraje, v.fecha_registro FROM Vehiculos v {filtro}"
+
+
+def _filas(conn, consulta, params=()):
+    cursor = conn.cursor()
+    cursor.execute(consulta, params)
+    filas = [tuple(fila) for fila in cursor.fetchall()]
+    cursor.close()
+    return filas
+
+
+def _marca(conn):
+    filas = _filas(conn, "SELECT ultimo_id FROM MarcasAgregacion WHERE nombre = ?", (MARCA,))
+    return filas[0][0] if filas else 0
+
+
+def _leer_lote(conn, desde, hasta):
+    """Vehículos e historial preventivo (solo los afectados si desde no es None)"""
+    servicios = ','.join('?' * len(SERVICIOS_PREVENTIVOS))
+    if desde is None:
+        filtro_historial, filtro_vehiculos, extra = "", "", ()
+    else:
+        filtro_historial = f"AND c.vehiculo_id IN ({_AFECTADOS})"
+        filtro_vehiculos = f"WHERE v.id IN ({_AFECTADOS})"
+        extra = (desde, hasta)
+
+    historial = []
+    for tabla in ('CitasHistorico', 'Citas'):
+        historial += _filas(conn, _HISTORIAL.format(tabla=tabla, servicios=servicios, filtro=filtro_historial),
+                            (*SERVICIOS_PREVENTIVOS, *extra))
+    vehiculos = _filas(conn, _VEHICULOS.format(filtro=filtro_vehiculos), extra)
+    return (pd.DataFrame(vehiculos, columns=['vehiculo_id', 'año', 'kilometraje', 'fecha_registro']),
+            pd.DataFrame(historial, columns=['vehiculo_id', 'fecha_hora']))
+
+
+def predecir(vehiculos, historial, hoy=None, intervalo_flota=None):
+    """Cálculo vectorizado; devuelve un DataFrame con COLUMNAS_RESULTADO"""
+    hoy = pd.Timestamp(hoy or date.today())
+    if vehiculos.empty:
+        return pd.DataFrame(columns=COLUMNAS_RESULTADO)
+
+    historial = historial.assign(fecha=pd.to_datetime(historial['fecha_hora'], format='mixed').dt.normalize())
+    historial = historial.sort_values(['vehiculo_id', 'fecha'])
+    historial['intervalo'] = historial.groupby('vehiculo_id')['fecha'].diff().dt.days
+    por_vehiculo = historial.groupby('vehiculo_id').agg(
+        ultimo=('fecha', 'max'), servicios=('fecha', 'size'), intervalo_mediano=('intervalo', 'median'))
+
+    df = vehiculos.join(por_vehiculo, on='vehiculo_id')
+    servicios = df['servicios'].fillna(0).astype(np.int64).to_numpy()
+    propio = np.where(servicios >= 2, df['intervalo_mediano'].to_numpy(dtype=float), np.nan)
+
+    if intervalo_flota is None:
+        validos = propio[~np.isnan(propio)]
+        intervalo_flota = float(np.median(validos)) if len(validos) >= MINIMO_FLOTA else INTERVALO_POR_DEFECTO_DIAS
+
+    # Edad del vehículo desde mitad de su año de fabricación (mínimo 180 días)
+    anio = pd.to_numeric(df['año'], errors='coerce').fillna(hoy.year).astype(int)
+    fabricacion = pd.to_datetime(anio.astype(str) + '-07-01')
+    edad_dias = np.maximum((hoy - fabricacion).dt.days.to_numpy(dtype=float), 180.0)
+    km = pd.to_numeric(df['kilometraje'], errors='coerce').to_numpy(dtype=float)
+    km_diarios = np.where(km > 0, km / edad_dias, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        por_uso = KM_ENTRE_SERVICIOS / km_diarios
+
+    base = np.where(np.isnan(propio), intervalo_flota, propio)
+    intervalo = np.clip(np.fmin(base, por_uso), INTERVALO_MINIMO_DIAS, INTERVALO_MAXIMO_DIAS)
+    metodo = np.where(por_uso < base, 'kilometraje', np.where(servicios >= 2, 'historial', 'flota'))
+
+    registro = pd.to_datetime(df['fecha_registro'], errors='coerce', format='mixed').dt.normalize()
+    ultimo = df['ultimo'].fillna(registro).fillna(hoy)
+    proximo = ultimo + pd.to_timedelta(np.round(intervalo), unit='D')
+
+    return pd.DataFrame({
+        'vehiculo_id': df['vehiculo_id'].astype(np.int64),
+        'ultimo_servicio': df['ultimo'].dt.strftime('%Y-%m-%d'),
+        'servicios_previos': servicios,
+        'intervalo_dias': np.round(intervalo, 1),
+        'km_diarios': np.round(km_diarios, 1),
+        'proximo_servicio': proximo.dt.strftime('%Y-%m-%d'),
+        'metodo': metodo,
+    })
+
+
+def _registros(resultado):
+    # Tipos de Python: sqlite3 y pyodbc no aceptan escalares de NumPy
+    registros = []
+    for fila in resultado.itertuples(index=False):
+        registros.append((int(fila.vehiculo_id),
+                          fila.ultimo_servicio if isinstance(fila.ultimo_servicio, str) else None,
+                          int(fila.servicios_previos), float(fila.intervalo_dias),
+                          None if np.isnan(fila.km_diarios) else float(fila.km_diarios),
+                          fila.proximo_servicio, str(fila.metodo)))
+    return registros
+
+
+def _guardar(conn, registros, desde, hasta):
+    cursor = conn.cursor()
+    if desde is None:
+        cursor.execute("DELETE FROM PrediccionServicio")
+    elif registros:
+        cursor.execute(f"DELETE FROM PrediccionServicio WHERE vehiculo_id IN ({_AFECTADOS})", (desde, hasta))
+    if registros:
+        cursor.executemany("""
+            INSERT INTO PrediccionServicio (vehiculo_id, ultimo_servicio, servicios_previos, intervalo_dias,
+                                            km_diarios, proximo_servicio, metodo)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, registros)
+    cursor.execute("UPDATE MarcasAgregacion SET ultimo_id = ? WHERE nombre = ?", (hasta, MARCA))
+    if cursor.rowcount == 0:
+        cursor.execute("INSERT INTO MarcasAgregacion (nombre, ultimo_id) VALUES (?, ?)", (MARCA, hasta))
+
+
+def actualizar_predicciones(destino, completo=False, hoy=None):
+    """Recalcula las predicciones (solo vehículos con citas completadas nuevas,
+    o toda la flota con completo=True); devuelve cuántos vehículos se calcularon"""
+    with conexion_lectura(destino) as conn:
+        desde = None if completo else _marca(conn)
+        hasta = _filas(conn, "SELECT COALESCE(MAX(id), 0) FROM CitasHistorialEstado")[0][0]
+        if desde is not None and hasta <= desde:
+            return 0
+        vehiculos, historial = _leer_lote(conn, desde, hasta)
+        intervalo_flota = None
+        if desde is not None:
+            # En un lote parcial la mediana de la flota sale de las predicciones guardadas
+            guardados = _filas(conn, "SELECT intervalo_dias FROM PrediccionServicio WHERE metodo = 'historial'")
+            if len(guardados) >= MINIMO_FLOTA:
+                intervalo_flota = float(np.median([fila[0] for fila in guardados]))
+
+    # El cálculo se hace fuera de la transacción de escritura
+    registros = _registros(predecir(vehiculos, historial, hoy, intervalo_flota))
+
+    if motor_de(destino) == 'sqlserver':
+        try:
+            _guardar(destino, registros, desde, hasta)
+            destino.commit()
+        except Exception:
+            destino.rollback()
+            raise
+    else:
+        en_transaccion(destino, lambda conn: _guardar(conn, registros, desde, hasta))
+    return len(registros)
+
+
+def proximos_servicios(origen, dias=30, hoy=None):
+    """(columnas, filas) de los vehículos con servicio previsto en los próximos `dias`"""
+    hasta = (hoy or date.today()) + timedelta(days=dias)
+    with conexion_lectura(origen) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT p.proximo_servicio, cl.nombre AS cliente, cl.telefono, v.marca, v.modelo, v.placa,
+                   p.ultimo_servicio, p.intervalo_dias, p.metodo
+            FROM PrediccionServicio p
+            JOIN Vehiculos v ON v.id = p.vehiculo_id
+            JOIN Clientes cl ON cl.id = v.cliente_id
+            WHERE p.proximo_servicio <= ?
+            ORDER BY p.proximo_servicio
+        """, (hasta.strftime('%Y-%m-%d'),))
+        columnas = [desc[0] for desc in cursor.description]
+        return columnas, [tuple(fila) for fila in cursor.fetchall()]
+
+
+# ========================================
+# BENCHMARK
+# ========================================
+
+def _benchmark(cantidad):
+    import random
+    from migraciones import migrar_sqlite
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, 'prediccion.db')
+        migrar_sqlite(ruta)
+        conn = sqlite3.connect(ruta)
+        # Sin materiales: completar citas aquí no debe depender del stock de ejemplo
+        conn.execute("DELETE FROM ServicioMateriales")
+        conn.executemany("INSERT INTO Clientes (nombre, telefono) VALUES (?, ?)",
+                         [(f"Cliente {i}", f"9{i:08d}") for i in range(cantidad)])
+        conn.executemany("INSERT INTO Vehiculos (cliente_id, marca, modelo, año, placa, kilometraje) "
+                         "VALUES (?, 'Toyota', 'Yaris', ?, ?, ?)",
+                         [(i + 1, random.randint(2005, 2024), f"P-{i:06d}",
+                           random.choice([None, random.randint(5000, 250000)])) for i in range(cantidad)])
+        citas = []
+        for vehiculo in range(1, cantidad + 1):
+            fecha = date(2021, 1, 1) + timedelta(days=random.randint(0, 120))
+            for _ in range(random.randint(0, 6)):
+                # El segundo lo da el vehículo: dos vehículos el mismo día no comparten horario
+                hora = datetime.combine(fecha, datetime.min.time()) + timedelta(hours=8, seconds=vehiculo)
+                citas.append((vehiculo, vehiculo, random.randint(1, 3), hora.strftime('%Y-%m-%d %H:%M:%S'),
+                              'Completado'))
+                fecha += timedelta(days=random.randint(90, 240))
+        conn.executemany("INSERT INTO Citas (cliente_id, vehiculo_id, servicio_id, fecha_hora, estado) "
+                         "VALUES (?, ?, ?, ?, ?)", citas)
+        conn.commit()
+
+        t0 = time.perf_counter()
+        total = actualizar_predicciones(conn, completo=True)
+        print(f"Flota completa: {total:,} vehículos, {len(citas):,} citas en {time.perf_counter() - t0:.2f} s")
+
+        completar = random.sample(range(1, len(citas) + 1), min(500, len(citas)))
+        conn.executemany("UPDATE Citas SET estado = 'Pendiente' WHERE id = ?", [(i,) for i in completar])
+        conn.commit()
+        actualizar_predicciones(conn)
+        conn.executemany("UPDATE Citas SET estado = 'Completado' WHERE id = ?", [(i,) for i in completar])
+        conn.commit()
+        t0 = time.perf_counter()
+        total = actualizar_predicciones(conn)
+        print(f"Incremental: {total:,} vehículos con citas nuevas en {time.perf_counter() - t0:.2f} s")
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Predicción del próximo servicio preventivo")
+    parser.add_argument('--db', default='taller_automotriz.db', help="Archivo SQLite")
+    parser.add_argument('--completo', action='store_true', help="Recalcular toda la flota")
+    parser.add_argument('--dias', type=int, default=30, help="Mostrar los servicios de los próximos N días")
+    parser.add_argument('--benchmark', type=int, metavar='N', help="Medir con N vehículos en una base temporal")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        _benchmark(args.benchmark)
+        return
+
+    conn = sqlite3.connect(args.db)
+    try:
+        total = actualizar_predicciones(conn, completo=args.completo)
+        print(f"✅ Vehículos recalculados: {total}")
+        columnas, filas = proximos_servicios(conn, args.dias)
+        print(pd.DataFrame(filas, columns=columnas).to_string(index=False) if filas else "Sin servicios próximos")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+# ========================================
+# PRUEBA DE CARGA DE LAS PÁGINAS STREAMLIT
+# Taller Automotriz - Sistema de Gestión
+# ========================================
+
+"""
+Recorre la aplicación con N sesiones simultáneas sin navegador
+(streamlit.testing AppTest) sobre una base SQLite de prueba y mide cada
+rerun: rendimiento total, latencia p50/p95/p99 y tasa de errores por página.
+
+Todas las sesiones corren en hilos del mismo proceso, como en el servidor de
+Streamlit, así que comparten los @st.cache_resource (init_connection, el
+backend SQLite). Probar varios valores de --sesiones muestra desde cuántos
+usuarios la latencia se dispara.
+
+Recorridos:
+- visitante: Inicio → Servicios → Agendar Cita → enviar el formulario
+- admin: sesión iniciada → Panel Admin → Inventario
+
+Por defecto la aplicación es la CELDA 4 de colab_setup.py (versión SQLite).
+
+Uso:
+    python prueba_carga.py --sesiones 1,8,32 --segundos 30
+    python prueba_carga.py --sesiones 16 --admins 0.25 --citas 50000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+import warnings
+from collections import defaultdict
+from datetime import date, timedelta
+
+from benchmark_concurrencia import percentil, preparar_base
+
+CARPETA = os.path.dirname(os.path.abspath(__file__))
+APP_COLAB = os.path.join(CARPETA, 'colab_setup.py')
+
+
+def extraer_app(ruta_colab, destino):
+    """Escribe en destino el código de la CELDA 4 de colab_setup.py"""
+    with open(ruta_colab, encoding='utf-8') as archivo:
+        lineas = archivo.read().splitlines()
+    inicio = next(i for i, linea in enumerate(lineas) if linea.startswith('# CELDA 4'))
+    fin = next(i for i, linea in enumerate(lineas) if linea.startswith('# CELDA 5'))
+    with open(destino, 'w', encoding='utf-8') as archivo:
+        archivo.write('\n'.join(lineas[inicio:fin]) + '\n')
+    return destino
+
+
+# ========================================
+# RECORRIDOS
+# ========================================
+
+def _por_etiqueta(elementos, etiqueta):
+    return next(e for e in elementos if e.label == etiqueta)
+
+
+def _ir_a(pagina):
+    def paso(at):
+        _por_etiqueta(at.sidebar.selectbox, "Ir a:").select(pagina)
+    return paso
+
+
+def _enviar_cita(at):
+    numero = random.randint(0, 10 ** 8)
+    _por_etiqueta(at.text_input, "Nombre completo *").input(f"Cliente carga {numero}")
+    _por_etiqueta(at.text_input, "Teléfono *").input(f"9{numero:08d}")
+    _por_etiqueta(at.text_input, "Marca *").input("Toyota")
+    _por_etiqueta(at.text_input, "Modelo *").input("Corolla")
+    # Horario al azar: las reservas repetidas de un mismo horario se rechazan
+    _por_etiqueta(at.date_input, "Fecha de la cita *").set_value(date.today() + timedelta(days=random.randint(0, 365)))
+    hora = _por_etiqueta(at.selectbox, "Hora *")
+    hora.select(random.choice(hora.options))
+    _por_etiqueta(at.button, "📅 Confirmar Cita").click()
+
+
+def _iniciar_sesion(at):
+    # El formulario de login solo se dibuja en el rerun del botón de la barra
+    # lateral; la prueba entra directo con el estado de sesión de un admin
+    at.session_state['authenticated'] = True
+    at.session_state['user_type'] = 'admin'
+
+
+# (página, acción antes del rerun)
+RECORRIDOS = {
+    'visitante': [
+        ('Inicio', None),
+        ('Servicios', _ir_a('Servicios')),
+        ('Agendar Cita', _ir_a('Agendar Cita')),
+        ('Agendar Cita (envío)', _enviar_cita),
+    ],
+    'admin': [
+        ('Inicio', _iniciar_sesion),
+        ('Panel Admin', _ir_a('Panel Admin')),
+        ('Inventario', _ir_a('Inventario')),
+    ],
+}
+
+
+def _error_de(at):
+    """Mensaje del primer error visible del rerun (None si no hubo)"""
+    if len(at.exception):
+        return at.exception[0].message
+    if len(at.error):
+        return at.error[0].value
+    return None
+
+
+def preparar_streamlit():
+    """Runtime simulado, configuración y caché de bytecode únicos para el proceso
+
+    AppTest instala su propio Runtime simulado (y la opción global.appTest) al
+    empezar cada run() y los quita al terminar; con varias sesiones a la vez un
+    hilo se los quita a otro a mitad de su rerun. Aquí se fijan una sola vez y
+    AppTest queda con una clase aparte y un parche vacío para sus asignaciones.
+    Además cada AppTest compila el script con su propia ScriptCache, y compile()
+    en varios hilos a la vez falla; el servidor real comparte una sola.
+    """
+    import contextlib
+    from unittest.mock import MagicMock
+
+    from streamlit import config
+    from streamlit.logger import set_log_level
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime._instance = runtime
+    app_test.Runtime = type('RuntimeAppTest', (), {'_instance': None})
+    config.set_option('global.appTest', True)
+    app_test.patch_config_options = lambda opciones: contextlib.nullcontext()
+    cache_compartida = ScriptCache()
+    local_script_runner.ScriptCache = lambda: cache_compartida
+
+    # Avisos por rerun (folium_static obsoleto, hilos sin contexto) que taparían el reporte
+    warnings.filterwarnings('ignore', category=DeprecationWarning)
+    set_log_level('error')
+
+
+class Resultados:
+    """Latencias y errores por página, compartidos entre hilos"""
+
+    def __init__(self):
+        self.latencias = defaultdict(list)
+        self.errores = defaultdict(int)
+        self.mensajes = defaultdict(set)
+        self._candado = threading.Lock()
+
+    def sumar(self, latencias, errores, mensajes):
+        with self._candado:
+            for pagina, valores in latencias.items():
+                self.latencias[pagina].extend(valores)
+            for pagina, cantidad in errores.items():
+                self.errores[pagina] += cantidad
+            for pagina, textos in mensajes.items():
+                self.mensajes[pagina] |= textos
+
+
+def _sesion(app, recorrido, fin, timeout, pausa, resultados, barrera):
+    from streamlit.testing.v1 import AppTest
+
+    latencias, errores, mensajes = defaultdict(list), defaultdict(int), defaultdict(set)
+    barrera.wait()
+    while time.perf_counter() < fin:
+        # Cada vuelta es una sesión nueva del navegador
+        at = AppTest.from_file(app, default_timeout=timeout)
+        for pagina, accion in RECORRIDOS[recorrido]:
+            if time.perf_counter() >= fin:
+                break
+            t0 = time.perf_counter()
+            try:
+                if accion is not None:
+                    accion(at)
+                at.run()
+                mensaje = _error_de(at)
+            except Exception as e:
+                mensaje = f"{type(e).__name__}: {e}"
+            latencias[pagina].append(time.perf_counter() - t0)
+            if mensaje:
+                errores[pagina] += 1
+                mensajes[pagina].add(str(mensaje)[:120])
+                break
+            if pausa:
+                time.sleep(random.uniform(0, 2 * pausa))
+    resultados.sumar(latencias, errores, mensajes)
+
+
+def correr(app, sesiones, segundos, proporcion_admins, timeout=30, pausa=0.0):
+    """Ejecuta `sesiones` hilos durante `segundos`; devuelve (Resultados, segundos reales)"""
+    resultados = Resultados()
+    barrera = threading.Barrier(sesiones)
+    admins = round(sesiones * proporcion_admins)
+    t0 = time.perf_counter()
+    fin = t0 + segundos
+    hilos = [threading.Thread(target=_sesion,
+                              args=(app, 'admin' if i < admins else 'visitante', fin, timeout, pausa,
+                                    resultados, barrera))
+             for i in range(sesiones)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return resultados, time.perf_counter() - t0
+
+
+def imprimir(sesiones, resultados, segundos):
+    total = sum(len(v) for v in resultados.latencias.values())
+    errores = sum(resultados.errores.values())
+    print(f"\n=== {sesiones} sesiones: {total / segundos:,.1f} reruns/s, "
+          f"errores {errores}/{total} ({100 * errores / max(total, 1):.1f} %) ===")
+    print(f"  {'página':<22}{'n':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'error %':>9}")
+    for pagina in sorted(resultados.latencias):
+        valores = resultados.latencias[pagina]
+        fallos = resultados.errores[pagina]
+        print(f"  {pagina:<22}{len(valores):>7}"
+              f"{statistics.median(valores) * 1000:>10.0f}"
+              f"{percentil(valores, 95) * 1000:>10.0f}"
+              f"{percentil(valores, 99) * 1000:>10.0f}"
+              f"{100 * fallos / len(valores):>9.1f}")
+    for pagina, textos in sorted(resultados.mensajes.items()):
+        for texto in sorted(textos)[:3]:
+            print(f"  ! {pagina}: {texto}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de las páginas Streamlit")
+    parser.add_argument('--app', help="Script de Streamlit (por defecto la CELDA 4 de colab_setup.py)")
+    parser.add_argument('--sesiones', default='1,8,32',
+                        help="Sesiones simultáneas; varios valores separados por coma")
+    parser.add_argument('--segundos', type=float, default=20, help="Duración de cada ronda")
+    parser.add_argument('--admins', type=float, default=0.2,
+                        help="Proporción de sesiones que hacen el recorrido de admin (0-1)")
+    parser.add_argument('--pausa', type=float, default=0.0,
+                        help="Pausa media entre páginas en segundos (tiempo de lectura del usuario)")
+    parser.add_argument('--citas', type=int, default=20000, help="Citas en la base de prueba")
+    parser.add_argument('--timeout', type=float, default=30, help="Límite de cada rerun en segundos")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        app = os.path.abspath(args.app) if args.app else extraer_app(APP_COLAB, os.path.join(carpeta, 'app.py'))
+        # La aplicación abre 'taller_automotriz.db' en el directorio actual
+        preparar_base(os.path.join(carpeta, 'taller_automotriz.db'), args.citas)
+        preparar_streamlit()
+        # /metrics en un puerto libre para no chocar con una app en marcha
+        os.environ.setdefault('METRICAS_PUERTO', '0')
+        directorio = os.getcwd()
+        os.chdir(carpeta)
+        try:
+            for sesiones in [int(s) for s in args.sesiones.split(',')]:
+                resultados, segundos = correr(app, sesiones, args.segundos, args.admins,
+                                              args.timeout, args.pausa)
+                imprimir(sesiones, resultados, segundos)
+        finally:
+            os.chdir(directorio)
+
+
+if __name__ == "__main__":
+    main()
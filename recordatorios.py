@@ -0,0 +1,357 @@
+# ========================================
+# RECORDATORIOS DE CITAS (PROCESO POR LOTES)
+# Taller Automotriz - Sistema de Gestión
+# ========================================
+
+"""
+Genera los recordatorios de las citas de mañana y los deja en la tabla
+BandejaSalida; un segundo paso los entrega por SMTP (o a una carpeta local que
+hace de servidor de correo de prueba).
+
+- Una sola consulta por rango de fecha (índice de fecha_hora) unida a Clientes,
+  Vehiculos, Servicios y Sedes; las citas que ya tienen recordatorio se
+  excluyen en la misma consulta. Cada mensaje lleva el nombre, la dirección y
+  el teléfono de la sede de su cita.
+- Las plantillas se compilan una vez (lru_cache) y las filas se insertan con
+  executemany en una sola transacción.
+- El índice único (cita_id, tipo) hace que correrlo dos veces no duplique nada.
+
+Programar (cron, todos los días a las 18:00):
+    0 18 * * * cd /app && python recordatorios.py --enviar --smtp localhost:25
+
+Uso:
+    python recordatorios.py --db taller_automotriz.db
+    python recordatorios.py --fecha 2024-06-02 --enviar --carpeta bandeja/
+    python recordatorios.py --benchmark 50000
+"""
+
+import argparse
+import os
+import smtplib
+import sqlite3
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from email.message import EmailMessage
+from functools import lru_cache
+from string import Template
+
+from bd_sqlite import conexion_lectura, en_transaccion
+from migraciones import motor_de
+from sedes import nombre_taller
+
+TIPO_DIA_ANTERIOR = 'dia_anterior'
+TAMANO_LOTE = 5000
+REMITENTE = 'citas@tallersanisidro.pe'
+
+# Central de la cadena: se usa si la sede de la cita no tiene teléfono
+TELEFONO_CENTRAL = '(01) 555-0123'
+
+PLANTILLAS = {
+    (TIPO_DIA_ANTERIOR, 'email'): (
+        "Recordatorio: su cita de mañana a las $hora",
+        "Hola $nombre,\n\n"
+        "Le recordamos su cita de $servicio para su $vehiculo ($placa) "
+        "mañana $fecha a las $hora.\n\n"
+        "$taller\n$direccion\n"
+        "Si no puede asistir, llámenos al $telefono_taller para reprogramarla.\n"),
+    (TIPO_DIA_ANTERIOR, 'sms'): (
+        None,
+        "$taller: recordatorio de su cita de $servicio mañana $fecha a las $hora "
+        "($placa). Para reprogramar: $telefono_taller"),
+}
+
+_CONSULTA_CITAS_DIA = """
+SELECT c.id, cl.nombre, cl.email, cl.telefono, c.fecha_hora, s.nombre, v.marca, v.modelo, v.placa,
+       sd.nombre, sd.direccion, sd.telefono
+FROM Citas c
+JOIN Clientes cl ON c.cliente_id = cl.id
+JOIN Servicios s ON c.servicio_id = s.id
+JOIN Sedes sd ON c.sede_id = sd.id
+LEFT JOIN Vehiculos v ON c.vehiculo_id = v.id
+LEFT JOIN BandejaSalida b ON b.cita_id = c.id AND b.tipo = ?
+WHERE c.fecha_hora >= ? AND c.fecha_hora < ?
+AND c.estado <> 'Cancelado'
+AND b.id IS NULL
+"""
+
+_INSERTAR = {
+    'sqlite': """
+        INSERT OR IGNORE INTO BandejaSalida (cita_id, tipo, canal, destinatario, asunto, cuerpo)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """,
+    # IGNORE_DUP_KEY en UX_BandejaSalida_CitaTipo descarta los repetidos
+    'sqlserver': """
+        INSERT INTO BandejaSalida (cita_id, tipo, canal, destinatario, asunto, cuerpo)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """,
+}
+
+
+@lru_cache(maxsize=None)
+def plantilla(tipo, canal):
+    """(asunto, cuerpo) compilados como string.Template"""
+    asunto, cuerpo = PLANTILLAS[(tipo, canal)]
+    return (Template(asunto) if asunto else None), Template(cuerpo)
+
+
+def _como_datetime(valor):
+    if isinstance(valor, datetime):
+        return valor
+    return datetime.fromisoformat(str(valor))
+
+
+def _mensaje(fila, tipo):
+    (cita_id, nombre, email, telefono, fecha_hora, servicio, marca, modelo, placa,
+     sede, sede_direccion, sede_telefono) = fila
+    canal, destinatario = ('email', email) if email else ('sms', telefono)
+    if not destinatario:
+        return None
+    momento = _como_datetime(fecha_hora)
+    datos = {
+        'taller': nombre_taller(sede),
+        'direccion': sede_direccion,
+        'telefono_taller': sede_telefono or TELEFONO_CENTRAL,
+        'nombre': nombre.split()[0] if nombre else '',
+        'servicio': servicio,
+        'vehiculo': f"{marca or ''} {modelo or ''}".strip() or 'vehículo',
+        'placa': placa or 'sin placa',
+        'fecha': momento.strftime('%d/%m/%Y'),
+        'hora': momento.strftime('%H:%M'),
+    }
+    asunto, cuerpo = plantilla(tipo, canal)
+    return (cita_id, tipo, canal, destinatario,
+            asunto.safe_substitute(datos) if asunto else None, cuerpo.safe_substitute(datos))
+
+
+def generar_recordatorios(destino, dia=None, tipo=TIPO_DIA_ANTERIOR, tamano=TAMANO_LOTE):
+    """Encola los recordatorios de las citas de `dia` (mañana por defecto)
+
+    Devuelve cuántos mensajes nuevos se escribieron en BandejaSalida.
+    """
+    dia = dia or date.today() + timedelta(days=1)
+    params = (tipo, dia.strftime('%Y-%m-%d'), (dia + timedelta(days=1)).strftime('%Y-%m-%d'))
+    motor = motor_de(destino)
+    insertar = _INSERTAR[motor]
+
+    def _generar(conn):
+        lector = conn.cursor()
+        escritor = conn.cursor()
+        if motor == 'sqlserver':
+            escritor.fast_executemany = True
+        lector.execute(_CONSULTA_CITAS_DIA, params)
+        total = 0
+        while True:
+            filas = lector.fetchmany(tamano)
+            if not filas:
+                break
+            mensajes = [m for m in (_mensaje(fila, tipo) for fila in filas) if m]
+            if mensajes:
+                escritor.executemany(insertar, mensajes)
+                total += len(mensajes)
+        return total
+
+    if motor == 'sqlserver':
+        try:
+            total = _generar(destino)
+            destino.commit()
+            return total
+        except Exception:
+            destino.rollback()
+            raise
+    return en_transaccion(destino, _generar)
+
+
+# ========================================
+# ENTREGA
+# ========================================
+
+class TransporteSMTP:
+    """Envía correos reutilizando una sola conexión SMTP por lote"""
+
+    canales = ('email',)
+
+    def __init__(self, host='localhost', puerto=25, usuario=None, clave=None, remitente=REMITENTE):
+        self.host, self.puerto = host, puerto
+        self.usuario, self.clave = usuario, clave
+        self.remitente = remitente
+
+    def enviar(self, mensajes):
+        """Envía [(id, canal, destinatario, asunto, cuerpo)]; devuelve {id: error o None}"""
+        resultado = {}
+        with smtplib.SMTP(self.host, self.puerto, timeout=30) as smtp:
+            if self.usuario:
+                smtp.starttls()
+                smtp.login(self.usuario, self.clave)
+            for id_, _, destinatario, asunto, cuerpo in mensajes:
+                correo = EmailMessage()
+                correo['From'] = self.remitente
+                correo['To'] = destinatario
+                correo['Subject'] = asunto
+                correo.set_content(cuerpo)
+                try:
+                    smtp.send_message(correo)
+                    resultado[id_] = None
+                except smtplib.SMTPException as e:
+                    resultado[id_] = str(e)[:500]
+        return resultado
+
+
+class TransporteCarpeta:
+    """Servidor de correo de prueba: un archivo .eml / .txt por mensaje"""
+
+    canales = ('email', 'sms')
+
+    def __init__(self, carpeta='bandeja_salida'):
+        self.carpeta = carpeta
+        os.makedirs(carpeta, exist_ok=True)
+
+    def enviar(self, mensajes):
+        for id_, canal, destinatario, asunto, cuerpo in mensajes:
+            extension = 'eml' if canal == 'email' else 'txt'
+            with open(os.path.join(self.carpeta, f"{id_:08d}.{extension}"), 'w', encoding='utf-8') as f:
+                if canal == 'email':
+                    f.write(f"From: {REMITENTE}\nTo: {destinatario}\nSubject: {asunto}\n\n")
+                else:
+                    f.write(f"Para: {destinatario}\n\n")
+                f.write(cuerpo)
+        return {mensaje[0]: None for mensaje in mensajes}
+
+
+_PENDIENTES = {
+    'sqlite': """
+        SELECT id, canal, destinatario, asunto, cuerpo
+        FROM BandejaSalida
+        WHERE estado = 'pendiente' AND canal IN ({canales}) AND id > ?
+        ORDER BY id
+        LIMIT ?
+    """,
+    'sqlserver': """
+        SELECT TOP (?) id, canal, destinatario, asunto, cuerpo
+        FROM BandejaSalida
+        WHERE estado = 'pendiente' AND canal IN ({canales}) AND id > ?
+        ORDER BY id
+    """,
+}
+
+
+def _marcar_resultado(conn, resultado):
+    ok = [(id_,) for id_, error in resultado.items() if error is None]
+    fallidos = [(error, id_) for id_, error in resultado.items() if error is not None]
+    cursor = conn.cursor()
+    if ok:
+        cursor.executemany("UPDATE BandejaSalida SET estado = 'enviado', intentos = intentos + 1, "
+                           "enviado_en = CURRENT_TIMESTAMP WHERE id = ?", ok)
+    if fallidos:
+        # Tres intentos fallidos dejan el mensaje en estado 'error'
+        cursor.executemany("UPDATE BandejaSalida SET intentos = intentos + 1, error = ?, "
+                           "estado = CASE WHEN intentos + 1 >= 3 THEN 'error' ELSE 'pendiente' END "
+                           "WHERE id = ?", fallidos)
+    return len(ok), len(fallidos)
+
+
+def enviar_pendientes(destino, transporte, lote=500):
+    """Entrega los mensajes pendientes de los canales del transporte; devuelve (enviados, errores)"""
+    motor = motor_de(destino)
+    consulta = _PENDIENTES[motor].format(canales=','.join('?' * len(transporte.canales)))
+    enviados = errores = 0
+    ultimo = 0
+    while True:
+        params = ((*transporte.canales, ultimo, lote) if motor == 'sqlite'
+                  else (lote, *transporte.canales, ultimo))
+        with conexion_lectura(destino) as conn:
+            cursor = conn.cursor()
+            cursor.execute(consulta, params)
+            mensajes = [tuple(fila) for fila in cursor.fetchall()]
+            cursor.close()
+        if not mensajes:
+            return enviados, errores
+        # Los que fallan quedan pendientes para la próxima corrida, no para esta
+        ultimo = mensajes[-1][0]
+        resultado = transporte.enviar(mensajes)
+        if motor == 'sqlserver':
+            ok, fallidos = _marcar_resultado(destino, resultado)
+            destino.commit()
+        else:
+            ok, fallidos = en_transaccion(destino, lambda conn: _marcar_resultado(conn, resultado))
+        enviados += ok
+        errores += fallidos
+
+
+# ========================================
+# BENCHMARK
+# ========================================
+
+def _benchmark(cantidad):
+    from migraciones import migrar_sqlite
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, 'recordatorios.db')
+        migrar_sqlite(ruta)
+        conn = sqlite3.connect(ruta)
+        manana = date.today() + timedelta(days=1)
+        # Un horario distinto por cita entre las 8:00 y las 18:00
+        apertura = datetime.combine(manana, datetime.min.time()) + timedelta(hours=8)
+        conn.executemany("INSERT INTO Clientes (nombre, telefono, email) VALUES (?, ?, ?)",
+                         [(f"Cliente {i}", f"9{i:08d}", f"cliente{i}@email.com" if i % 4 else None)
+                          for i in range(cantidad)])
+        primer_id = conn.execute("SELECT MAX(id) FROM Clientes").fetchone()[0] - cantidad + 1
+        conn.executemany("INSERT INTO Citas (cliente_id, servicio_id, fecha_hora) VALUES (?, ?, ?)",
+                         [(primer_id + i, 1 + i % 8,
+                           (apertura + timedelta(seconds=i * 36000 // cantidad)).strftime('%Y-%m-%d %H:%M:%S'))
+                          for i in range(cantidad)])
+        conn.commit()
+
+        t0 = time.perf_counter()
+        creados = generar_recordatorios(conn, manana)
+        duracion = time.perf_counter() - t0
+        print(f"{creados:,} recordatorios en {duracion:.2f} s ({creados / duracion * 60:,.0f}/min)")
+
+        t0 = time.perf_counter()
+        repetidos = generar_recordatorios(conn, manana)
+        print(f"Segunda corrida: {repetidos} nuevos en {time.perf_counter() - t0:.3f} s")
+
+        t0 = time.perf_counter()
+        enviados, errores = enviar_pendientes(conn, TransporteCarpeta(os.path.join(carpeta, 'bandeja')), lote=2000)
+        print(f"Entregados a la carpeta: {enviados:,} ({errores} errores) en {time.perf_counter() - t0:.2f} s")
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recordatorios de citas")
+    parser.add_argument('--db', default='taller_automotriz.db', help="Archivo SQLite")
+    parser.add_argument('--dsn', help="Cadena de conexión ODBC (SQL Server)")
+    parser.add_argument('--fecha', type=date.fromisoformat, help="Día de las citas (por defecto mañana)")
+    parser.add_argument('--enviar', action='store_true', help="Entregar también los pendientes")
+    parser.add_argument('--smtp', help="host:puerto del servidor SMTP")
+    parser.add_argument('--carpeta', default='bandeja_salida',
+                        help="Carpeta donde dejar los mensajes si no se usa --smtp")
+    parser.add_argument('--benchmark', type=int, metavar='N', help="Medir con N citas en una base temporal")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        _benchmark(args.benchmark)
+        return
+
+    if args.dsn:
+        import pyodbc
+        conn = pyodbc.connect(args.dsn)
+    else:
+        conn = sqlite3.connect(args.db)
+    try:
+        creados = generar_recordatorios(conn, args.fecha)
+        print(f"✅ Recordatorios nuevos en la bandeja de salida: {creados}")
+        if args.enviar:
+            if args.smtp:
+                host, _, puerto = args.smtp.partition(':')
+                transporte = TransporteSMTP(host, int(puerto or 25))
+            else:
+                transporte = TransporteCarpeta(args.carpeta)
+            enviados, errores = enviar_pendientes(conn, transporte)
+            print(f"✅ Enviados: {enviados} | Con error: {errores}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
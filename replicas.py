@@ -0,0 +1,296 @@
+# ========================================
+# RÉPLICA DE LECTURA
+# Taller Automotriz - Sistema de Gestión
+# ========================================
+
+"""
+Envía las lecturas (reportes, dashboard, listados) a una réplica y las
+escrituras a la primaria, para que no compitan con las reservas.
+
+- Latido: la primaria guarda la hora en ReplicaLatido cada segundo (Latido,
+  o ReplicadorSQLite en local). La réplica recibe ese valor con el resto de
+  los datos: su retraso es la hora actual menos el latido que ya le llegó.
+- Si la réplica se atrasa más de retraso_maximo o no responde, las lecturas
+  vuelven a la primaria hasta que se ponga al día.
+- Leer lo propio: después de una escritura la sesión lee de la primaria hasta
+  que la réplica tiene un latido posterior a esa escritura.
+
+En local, ReplicadorSQLite copia un archivo SQLite a otro con la API de
+backup, así que se puede probar con dos archivos.
+
+Uso:
+    enrutador = Enrutador(primaria, replica, latido=Latido(conectar_primaria))
+    origen = enrutador.para('sp_obtener_citas', st.session_state)
+    enrutador.registrar_escritura(st.session_state)   # después del commit
+    python replicas.py --demo
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from bd_sqlite import conexion_lectura, en_transaccion
+from metricas import LECTURAS_ENRUTADAS
+
+# Procedimientos de solo lectura que pueden ir a la réplica
+PROCEDIMIENTOS_LECTURA = ('sp_dashboard_metricas', 'sp_reporte_servicios_populares')
+PREFIJOS_LECTURA = ('sp_obtener_',)
+
+RETRASO_MAXIMO = 5.0
+LATIDO_SEGUNDOS = 1.0
+# Cada cuánto se vuelve a leer el latido de la réplica
+VIGENCIA_LATIDO = 0.5
+
+# Clave en el estado de la sesión con la hora de su última escritura
+CLAVE_SESION = 'replica_ultima_escritura'
+
+_LATIR = "UPDATE ReplicaLatido SET marca = ? WHERE id = 1"
+_LEER_LATIDO = "SELECT marca FROM ReplicaLatido WHERE id = 1"
+
+
+def es_lectura(procedimiento):
+    """True si el procedimiento solo lee y puede ir a la réplica"""
+    return procedimiento in PROCEDIMIENTOS_LECTURA or procedimiento.startswith(PREFIJOS_LECTURA)
+
+
+def latir(destino, marca=None):
+    """Escribe el latido en la primaria y devuelve la marca escrita"""
+    marca = time.time() if marca is None else marca
+    en_transaccion(destino, lambda conn: conn.execute(_LATIR, (marca,)))
+    return marca
+
+
+def leer_latido(origen):
+    """Último latido presente en origen (0 si nunca latió)"""
+    with conexion_lectura(origen) as conn:
+        cursor = conn.cursor()
+        cursor.execute(_LEER_LATIDO)
+        fila = cursor.fetchone()
+        return float(fila[0]) if fila else 0.0
+
+
+class Latido:
+    """Hilo que escribe el latido en la primaria cada `cada` segundos
+
+    conectar() devuelve la conexión del hilo; si falla, se reconecta en la
+    vuelta siguiente (mientras tanto la réplica parece atrasada y las
+    lecturas van a la primaria).
+    """
+
+    def __init__(self, conectar, cada=LATIDO_SEGUNDOS):
+        self._conectar = conectar
+        self.cada = cada
+        self._parar = threading.Event()
+        self._hilo = threading.Thread(target=self._bucle, name='latido-replica', daemon=True)
+        self._hilo.start()
+
+    def _bucle(self):
+        conn = None
+        while not self._parar.is_set():
+            try:
+                if conn is None:
+                    conn = self._conectar()
+                latir(conn)
+            except Exception:
+                conn = None
+            self._parar.wait(self.cada)
+
+    def cerrar(self):
+        self._parar.set()
+        self._hilo.join()
+
+
+class ReplicadorSQLite:
+    """Réplica local: late en la primaria y la copia entera al archivo réplica
+
+    Pensado para probar en local; cada copia lee toda la base.
+    """
+
+    def __init__(self, ruta_primaria, ruta_replica, cada=LATIDO_SEGUNDOS):
+        # Rutas absolutas: el hilo sigue copiando aunque el proceso cambie de carpeta
+        self.ruta_primaria = os.path.abspath(ruta_primaria)
+        self.ruta_replica = os.path.abspath(ruta_replica)
+        self.cada = cada
+        self.copias = 0
+        self._parar = threading.Event()
+        # Primera copia antes de que alguien abra la réplica
+        self.copiar()
+        self._hilo = threading.Thread(target=self._bucle, name='replicador-sqlite', daemon=True)
+        self._hilo.start()
+
+    def copiar(self):
+        origen = sqlite3.connect(self.ruta_primaria, timeout=30)
+        # Sin checkpoints propios: con respaldos en marcha vaciaría el WAL antes
+        # de que el archivador lo copie (el checkpoint lo hace quien escribe)
+        origen.execute("PRAGMA wal_autocheckpoint = 0")
+        destino = sqlite3.connect(self.ruta_replica, timeout=30)
+        try:
+            # El latido va antes de la copia: la réplica tiene todo lo confirmado hasta esa marca
+            latir(origen)
+            origen.backup(destino)
+            self.copias += 1
+        finally:
+            destino.close()
+            origen.close()
+
+    def _bucle(self):
+        while not self._parar.wait(self.cada):
+            try:
+                self.copiar()
+            except sqlite3.Error:
+                pass
+
+    def cerrar(self):
+        self._parar.set()
+        self._hilo.join()
+
+
+class Enrutador:
+    """Elige la base de cada llamada: réplica para lecturas, primaria para el resto
+
+    Sin réplica todo va a la primaria. `sesion` es cualquier dict (en la app,
+    st.session_state); guarda la hora de la última escritura de la sesión.
+    """
+
+    def __init__(self, primaria, replica=None, latido=None, retraso_maximo=RETRASO_MAXIMO):
+        self.primaria = primaria
+        self.replica = replica
+        self.latido = latido
+        self.retraso_maximo = retraso_maximo
+        self._candado = threading.Lock()
+        # (leído_en, marca); marca None si la réplica no respondió
+        self._ultimo_latido = None
+
+    def latido_replica(self, releer=True):
+        """Latido de la réplica, releído como mucho cada VIGENCIA_LATIDO segundos"""
+        ahora = time.monotonic()
+        with self._candado:
+            ultimo = self._ultimo_latido
+        if ultimo is not None and (not releer or ahora - ultimo[0] < VIGENCIA_LATIDO):
+            return ultimo[1]
+        if not releer:
+            return None
+        try:
+            marca = leer_latido(self.replica)
+        except Exception:
+            marca = None
+        with self._candado:
+            self._ultimo_latido = (ahora, marca)
+        return marca
+
+    def retraso(self, releer=True):
+        """Segundos de atraso de la réplica (inf si no responde)"""
+        if self.replica is None:
+            return 0.0
+        marca = self.latido_replica(releer)
+        return float('inf') if marca is None else max(time.time() - marca, 0.0)
+
+    def para_lectura(self, sesion=None):
+        """Base para una lectura de la sesión"""
+        if self.replica is None:
+            return self.primaria
+        marca = self.latido_replica()
+        if marca is None or time.time() - marca > self.retraso_maximo:
+            motivo = 'retraso'
+        elif sesion is not None and marca < sesion.get(CLAVE_SESION, 0):
+            motivo = 'leer_lo_propio'
+        else:
+            LECTURAS_ENRUTADAS.inc(destino='replica', motivo='lectura')
+            return self.replica
+        LECTURAS_ENRUTADAS.inc(destino='primaria', motivo=motivo)
+        return self.primaria
+
+    def para(self, procedimiento, sesion=None):
+        """Base para ejecutar el procedimiento"""
+        return self.para_lectura(sesion) if es_lectura(procedimiento) else self.primaria
+
+    def registrar_escritura(self, sesion):
+        """Llamar después del commit: la sesión lee de la primaria hasta que la réplica la alcance"""
+        if sesion is not None and self.replica is not None:
+            sesion[CLAVE_SESION] = time.time()
+
+    def cerrar(self):
+        if self.latido is not None:
+            self.latido.cerrar()
+
+# ========================================
+# DEMO LOCAL (dos archivos SQLite)
+# ========================================
+
+def _esperar(condicion, limite=10.0):
+    inicio = time.perf_counter()
+    while not condicion():
+        if time.perf_counter() - inicio > limite:
+            raise TimeoutError("La réplica no respondió a tiempo")
+        time.sleep(0.02)
+    return time.perf_counter() - inicio
+
+
+def _demo(cada=0.5, retraso_maximo=2.0):
+    """Lectura a la réplica, leer lo propio tras escribir y vuelta a la primaria si la réplica se atrasa"""
+    from bd_sqlite import BaseDatosSQLite
+    from migraciones import migrar_sqlite
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta_primaria = os.path.join(carpeta, 'primaria.db')
+        ruta_replica = os.path.join(carpeta, 'replica.db')
+        migrar_sqlite(ruta_primaria)
+        primaria = BaseDatosSQLite(ruta_primaria)
+        replicador = ReplicadorSQLite(ruta_primaria, ruta_replica, cada=cada)
+        replica = BaseDatosSQLite(ruta_replica)
+        enrutador = Enrutador(primaria, replica, latido=replicador, retraso_maximo=retraso_maximo)
+
+        def nombre(origen):
+            return 'réplica' if origen is replica else 'primaria'
+
+        sesion = {}
+        print(f"Lectura sin escrituras previas:    {nombre(enrutador.para('sp_obtener_citas', sesion))}")
+        print(f"sp_crear_cita:                     {nombre(enrutador.para('sp_crear_cita', sesion))}")
+
+        primaria.ejecutar("INSERT INTO Clientes (nombre, telefono) VALUES ('Demo', '999000111')")
+        enrutador.registrar_escritura(sesion)
+        print(f"Lectura justo después de escribir: {nombre(enrutador.para_lectura(sesion))}")
+        print(f"Lectura de otra sesión:            {nombre(enrutador.para_lectura({}))}")
+        espera = _esperar(lambda: enrutador.para_lectura(sesion) is replica)
+        with replica.lector() as conn:
+            visible = conn.execute("SELECT COUNT(*) FROM Clientes WHERE nombre = 'Demo'").fetchone()[0]
+        print(f"La sesión vuelve a la réplica en {espera:.2f} s (cliente visible: {bool(visible)})")
+
+        replicador.cerrar()
+        espera = _esperar(lambda: enrutador.para_lectura() is primaria)
+        print(f"Replicación detenida: lecturas a la primaria tras {espera:.2f} s "
+              f"(retraso {enrutador.retraso():.2f} s > {retraso_maximo} s)")
+
+        replica.cerrar()
+        primaria.cerrar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enrutamiento de lecturas a una réplica")
+    parser.add_argument('--demo', action='store_true',
+                        help="Probar el enrutamiento con dos archivos SQLite temporales")
+    parser.add_argument('--db', default='taller_automotriz.db', help="Archivo SQLite primario")
+    parser.add_argument('--replica', help="Archivo SQLite réplica a mantener copiado")
+    parser.add_argument('--cada', type=float, default=LATIDO_SEGUNDOS, help="Segundos entre copias")
+    args = parser.parse_args()
+
+    if args.demo:
+        _demo()
+        return
+    if not args.replica:
+        parser.error("indicar --replica o --demo")
+
+    replicador = ReplicadorSQLite(args.db, args.replica, cada=args.cada)
+    print(f"Copiando {args.db} -> {args.replica} cada {args.cada} s (Ctrl+C para terminar)")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        replicador.cerrar()
+
+
+if __name__ == "__main__":
+    main()
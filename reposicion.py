@@ -0,0 +1,321 @@
+# ========================================
+# PUNTOS DE REORDEN Y PEDIDO SUGERIDO
+# Taller Automotriz - Sistema de Gestión
+# ========================================
+
+"""
+Calcula el punto de reorden de cada item a partir de su historial en
+MovimientosInventario en lugar del stock_minimo tecleado a mano.
+
+Todo el cálculo es vectorizado (pandas/NumPy) sobre los movimientos de los
+últimos HISTORIA_DIAS (incluido el archivo):
+- demanda diaria y su desviación: media y desviación estándar de las SALIDAs
+  por día en los últimos VENTANA_DEMANDA_DIAS (los días sin salidas cuentan 0)
+- tiempo de entrega: se reconstruye el stock después de cada movimiento
+  (stock actual menos los movimientos posteriores) y se mide cuánto tardó la
+  primera ENTRADA después de cada vez que el stock cruzó el mínimo
+- punto de reorden = d·L + z·√(L·σd² + d²·σL²), con nivel de servicio
+  NIVEL_SERVICIO_Z
+- cantidad de pedido = demanda de DIAS_COBERTURA días
+
+El resultado queda en PuntosReorden y, para los items con al menos
+MINIMO_DIAS_CON_SALIDAS días de salidas, en Inventario.stock_minimo, de modo
+que "Stock Bajo" y sp_obtener_inventario usan el valor calculado.
+
+Uso:
+    actualizar_puntos_reorden(db)
+    columnas, filas = pedido_sugerido(db)
+    python reposicion.py --db taller_automotriz.db
+    python reposicion.py --benchmark 300
+"""
+
+import argparse
+import math
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from archivado import corte_archivo, necesita_archivo
+from bd_sqlite import conexion_lectura, en_transaccion
+from migraciones import motor_de
+
+HISTORIA_DIAS = 730
+VENTANA_DEMANDA_DIAS = 90
+DIAS_ENTREGA_POR_DEFECTO = 7
+DIAS_ENTREGA_MAXIMO = 60
+DIAS_COBERTURA = 30
+NIVEL_SERVICIO_Z = 1.65  # ~95 % de ciclos sin quiebre de stock
+MINIMO_DIAS_CON_SALIDAS = 5
+MINIMO_ENTREGAS = 2
+
+COLUMNAS_RESULTADO = ['inventario_id', 'dias_con_salidas', 'demanda_diaria', 'desviacion_diaria',
+                      'dias_entrega', 'desviacion_entrega', 'stock_seguridad', 'punto_reorden',
+                      'cantidad_pedido']
+
+_ITEMS = "SELECT id, stock_actual, stock_minimo FROM Inventario WHERE activo = 1 ORDER BY id"
+
+_MOVIMIENTOS = """
+SELECT id, inventario_id, tipo_movimiento, cantidad, fecha
+FROM {tabla}
+WHERE fecha >= ?
+"""
+
+# Sin historial suficiente se pide el stock_minimo tecleado a mano
+_PEDIDO_SUGERIDO = """
+SELECT proveedor, inventario_id, nombre, stock_actual, stock_minimo, cantidad, precio_unitario,
+       cantidad * precio_unitario AS costo_total, demanda_diaria, dias_entrega
+FROM (
+    SELECT
+        i.proveedor,
+        i.id AS inventario_id,
+        i.nombre,
+        i.stock_actual,
+        i.stock_minimo,
+        CASE WHEN p.dias_con_salidas >= ? THEN p.cantidad_pedido ELSE i.stock_minimo END
+            + i.stock_minimo - i.stock_actual AS cantidad,
+        i.precio_unitario,
+        p.demanda_diaria,
+        p.dias_entrega
+    FROM Inventario i
+    LEFT JOIN PuntosReorden p ON p.inventario_id = i.id
+    WHERE i.activo = 1
+    AND i.stock_actual <= i.stock_minimo
+    {filtro}
+) pedido
+ORDER BY proveedor, nombre
+"""
+
+
+def _filas(conn, consulta, params=()):
+    cursor = conn.cursor()
+    cursor.execute(consulta, params)
+    filas = [tuple(fila) for fila in cursor.fetchall()]
+    cursor.close()
+    return filas
+
+
+def _leer(conn, desde):
+    texto_desde = desde.strftime('%Y-%m-%d')
+    tablas = ['MovimientosInventario']
+    if necesita_archivo(corte_archivo(conn, 'MovimientosInventario'), texto_desde):
+        tablas.insert(0, 'MovimientosInventarioHistorico')
+    movimientos = []
+    for tabla in tablas:
+        movimientos += _filas(conn, _MOVIMIENTOS.format(tabla=tabla), (texto_desde,))
+    return (pd.DataFrame(_filas(conn, _ITEMS), columns=['inventario_id', 'stock_actual', 'stock_minimo']),
+            pd.DataFrame(movimientos, columns=['id', 'inventario_id', 'tipo_movimiento', 'cantidad', 'fecha']))
+
+
+def _demanda(salidas, items, hoy):
+    """Media y desviación de la demanda diaria (matriz items × días)"""
+    inicio = hoy - pd.Timedelta(days=VENTANA_DEMANDA_DIAS - 1)
+    salidas = salidas[salidas['dia'] >= inicio]
+    fila = items.get_indexer(salidas['inventario_id'])
+    columna = (salidas['dia'] - inicio).dt.days.to_numpy()
+    validas = (fila >= 0) & (columna < VENTANA_DEMANDA_DIAS)
+    matriz = np.zeros((len(items), VENTANA_DEMANDA_DIAS))
+    np.add.at(matriz, (fila[validas], columna[validas]), salidas['cantidad'].to_numpy(dtype=float)[validas])
+    return matriz.mean(axis=1), matriz.std(axis=1, ddof=1), (matriz > 0).sum(axis=1)
+
+
+def _tiempos_entrega(movimientos, items):
+    """Mediana y desviación de días entre el cruce del mínimo y la ENTRADA siguiente"""
+    mov = movimientos.merge(items.reset_index(), on='inventario_id', how='inner')
+    mov = mov.sort_values(['inventario_id', 'fecha', 'id'])
+    neto = np.where(mov['tipo_movimiento'] == 'ENTRADA', 1, -1) * mov['cantidad'].to_numpy()
+    mov = mov.assign(neto=neto)
+    # Stock después de cada movimiento = stock actual - movimientos posteriores
+    por_item = mov.groupby('inventario_id')['neto']
+    posteriores = por_item.transform('sum') - por_item.cumsum()
+    despues = mov['stock_actual'] - posteriores
+    antes = despues - mov['neto']
+    cruce = (mov['neto'] < 0) & (antes > mov['stock_minimo']) & (despues <= mov['stock_minimo'])
+
+    cruces = mov.loc[cruce, ['inventario_id', 'fecha']].sort_values('fecha')
+    entradas = (mov.loc[mov['neto'] > 0, ['inventario_id', 'fecha']]
+                .rename(columns={'fecha': 'fecha_entrada'}).sort_values('fecha_entrada'))
+    if cruces.empty or entradas.empty:
+        return pd.DataFrame(columns=['mediana', 'desviacion', 'entregas'])
+    pares = pd.merge_asof(cruces, entradas, left_on='fecha', right_on='fecha_entrada',
+                          by='inventario_id', direction='forward').dropna(subset=['fecha_entrada'])
+    dias = (pares['fecha_entrada'] - pares['fecha']).dt.total_seconds() / 86400
+    pares = pares.assign(dias=dias)[dias <= DIAS_ENTREGA_MAXIMO]
+    return pares.groupby('inventario_id')['dias'].agg(mediana='median', desviacion='std', entregas='size')
+
+
+def calcular(items, movimientos, hoy=None):
+    """Cálculo vectorizado; devuelve un DataFrame con COLUMNAS_RESULTADO"""
+    hoy = pd.Timestamp(hoy or date.today()).normalize()
+    if items.empty:
+        return pd.DataFrame(columns=COLUMNAS_RESULTADO)
+    items = items.set_index('inventario_id')
+
+    movimientos = movimientos.assign(
+        fecha=pd.to_datetime(movimientos['fecha'], format='mixed'),
+        cantidad=pd.to_numeric(movimientos['cantidad']))
+    movimientos = movimientos[movimientos['fecha'] < hoy + pd.Timedelta(days=1)]
+    salidas = movimientos[movimientos['tipo_movimiento'] == 'SALIDA']
+    d, sd, dias_con_salidas = _demanda(salidas.assign(dia=salidas['fecha'].dt.normalize()),
+                                       items.index, hoy)
+
+    entregas = _tiempos_entrega(movimientos, items).reindex(items.index)
+    suficientes = entregas['entregas'].fillna(0).to_numpy() >= MINIMO_ENTREGAS
+    L = np.where(suficientes, entregas['mediana'].to_numpy(dtype=float), DIAS_ENTREGA_POR_DEFECTO)
+    sl = np.where(suficientes, np.nan_to_num(entregas['desviacion'].to_numpy(dtype=float)), 0.0)
+
+    seguridad = NIVEL_SERVICIO_Z * np.sqrt(L * sd ** 2 + d ** 2 * sl ** 2)
+    punto = np.ceil(d * L + seguridad)
+    return pd.DataFrame({
+        'inventario_id': items.index.to_numpy(dtype=np.int64),
+        'dias_con_salidas': dias_con_salidas,
+        'demanda_diaria': np.round(d, 3),
+        'desviacion_diaria': np.round(sd, 3),
+        'dias_entrega': np.round(L, 1),
+        'desviacion_entrega': np.round(sl, 1),
+        'stock_seguridad': np.ceil(seguridad).astype(np.int64),
+        'punto_reorden': punto.astype(np.int64),
+        'cantidad_pedido': np.maximum(np.ceil(d * DIAS_COBERTURA), 1).astype(np.int64),
+    })
+
+
+def _guardar(conn, registros, aplicar):
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM PuntosReorden")
+    if registros:
+        cursor.executemany(f"""
+            INSERT INTO PuntosReorden ({', '.join(COLUMNAS_RESULTADO)})
+            VALUES ({', '.join('?' * len(COLUMNAS_RESULTADO))})
+        """, registros)
+    if aplicar:
+        cursor.executemany("UPDATE Inventario SET stock_minimo = ? WHERE id = ?",
+                           [(r[7], r[0]) for r in registros if r[1] >= MINIMO_DIAS_CON_SALIDAS])
+
+
+def actualizar_puntos_reorden(destino, aplicar=True, hoy=None):
+    """Recalcula PuntosReorden (y stock_minimo si aplicar); devuelve el DataFrame calculado"""
+    hoy = hoy or date.today()
+    with conexion_lectura(destino) as conn:
+        items, movimientos = _leer(conn, hoy - timedelta(days=HISTORIA_DIAS))
+
+    # El cálculo se hace fuera de la transacción de escritura
+    resultado = calcular(items, movimientos, hoy)
+    # Tipos de Python: sqlite3 y pyodbc no aceptan escalares de NumPy
+    registros = [(int(r[0]), int(r[1]), float(r[2]), float(r[3]), float(r[4]), float(r[5]),
+                  int(r[6]), int(r[7]), int(r[8])) for r in resultado.itertuples(index=False)]
+
+    if motor_de(destino) == 'sqlserver':
+        try:
+            _guardar(destino, registros, aplicar)
+            destino.commit()
+        except Exception:
+            destino.rollback()
+            raise
+    else:
+        en_transaccion(destino, lambda conn: _guardar(conn, registros, aplicar))
+    return resultado
+
+
+def pedido_sugerido(origen, sede_id=None):
+    """(columnas, filas) de lo que hay que pedir, agrupado por proveedor (de una sede o de todas)"""
+    if sede_id is None:
+        consulta, params = _PEDIDO_SUGERIDO.format(filtro=""), (MINIMO_DIAS_CON_SALIDAS,)
+    else:
+        consulta = _PEDIDO_SUGERIDO.format(filtro="AND i.sede_id = ?")
+        params = (MINIMO_DIAS_CON_SALIDAS, int(sede_id))
+    with conexion_lectura(origen) as conn:
+        cursor = conn.cursor()
+        cursor.execute(consulta, params)
+        columnas = [desc[0] for desc in cursor.description]
+        return columnas, [tuple(fila) for fila in cursor.fetchall()]
+
+
+# ========================================
+# BENCHMARK
+# ========================================
+
+def _simular(items, dias, rng):
+    """Movimientos de `dias` días: demanda Poisson y pedidos al cruzar el mínimo"""
+    inicio = date.today() - timedelta(days=dias)
+    tasas = rng.uniform(0.2, 6.0, items)
+    entregas = rng.integers(2, 15, items)
+    minimos = np.ceil(tasas * entregas * 1.3).astype(int)
+    demanda = rng.poisson(tasas[:, None], (items, dias))
+
+    movimientos, stock_final = [], []
+    for item in range(items):
+        stock, llegada, pedido = int(minimos[item] * 3), -1, 0
+        for dia in range(dias):
+            fecha = inicio + timedelta(days=dia)
+            if dia == llegada:
+                stock += pedido
+                movimientos.append((item + 1, 'ENTRADA', pedido, f"{fecha} 08:00:00"))
+            for unidad in range(demanda[item, dia]):
+                movimientos.append((item + 1, 'SALIDA', 1, f"{fecha} {9 + unidad % 9:02d}:00:00"))
+            stock -= demanda[item, dia]
+            if stock <= minimos[item] and llegada < dia:
+                pedido = int(math.ceil(tasas[item] * DIAS_COBERTURA)) + int(minimos[item])
+                llegada = dia + int(entregas[item] + rng.integers(-1, 2))
+        stock_final.append(stock)
+    return movimientos, stock_final, minimos, entregas
+
+
+def _benchmark(items):
+    from migraciones import migrar_sqlite
+
+    rng = np.random.default_rng(7)
+    movimientos, stock_final, minimos, entregas = _simular(items, 3 * 365, rng)
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, 'reposicion.db')
+        migrar_sqlite(ruta)
+        conn = sqlite3.connect(ruta)
+        conn.execute("DELETE FROM ServicioMateriales")
+        conn.execute("DELETE FROM Inventario")
+        conn.executemany("INSERT INTO Inventario (id, nombre, categoria, stock_actual, stock_minimo, "
+                         "precio_unitario, proveedor) VALUES (?, ?, 'Repuestos', ?, ?, 10, ?)",
+                         [(i + 1, f"Repuesto {i + 1}", int(stock_final[i]), int(minimos[i]),
+                           f"Proveedor {i % 7}") for i in range(items)])
+        conn.executemany("INSERT INTO MovimientosInventario (inventario_id, tipo_movimiento, cantidad, fecha) "
+                         "VALUES (?, ?, ?, ?)", movimientos)
+        conn.commit()
+
+        t0 = time.perf_counter()
+        resultado = actualizar_puntos_reorden(conn)
+        segundos = time.perf_counter() - t0
+        error = np.abs(resultado['dias_entrega'].to_numpy() - entregas[resultado['inventario_id'] - 1]).mean()
+        print(f"{items} items, {len(movimientos):,} movimientos (3 años) en {segundos:.2f} s")
+        print(f"Error medio del tiempo de entrega estimado: {error:.1f} días")
+        columnas, filas = pedido_sugerido(conn)
+        print(f"Líneas en el pedido sugerido: {len(filas)}")
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Puntos de reorden y pedido sugerido")
+    parser.add_argument('--db', default='taller_automotriz.db', help="Archivo SQLite")
+    parser.add_argument('--sin-aplicar', action='store_true',
+                        help="No copiar el punto de reorden a Inventario.stock_minimo")
+    parser.add_argument('--benchmark', type=int, metavar='N', help="Medir con N items en una base temporal")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        _benchmark(args.benchmark)
+        return
+
+    conn = sqlite3.connect(args.db)
+    try:
+        resultado = actualizar_puntos_reorden(conn, aplicar=not args.sin_aplicar)
+        print(resultado.to_string(index=False) if not resultado.empty else "No hay items activos")
+        columnas, filas = pedido_sugerido(conn)
+        print()
+        print(pd.DataFrame(filas, columns=columnas).to_string(index=False) if filas else "No hace falta pedir nada")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,662 @@
+# ========================================
+# RESPALDOS EN LÍNEA Y RESTAURACIÓN A UN MOMENTO
+# Taller Automotriz - Sistema de Gestión
+# ========================================
+
+"""
+Respaldos de taller_automotriz.db sin detener la aplicación.
+
+- Bases: copia completa con la API de backup de SQLite, de a PAGINAS_POR_PASO
+  páginas y con una pausa entre pasos. La copia se hace desde una conexión
+  con una transacción de lectura abierta: en WAL no bloquea al escritor y la
+  base queda en un estado consistente aunque la app siga escribiendo.
+- Archivo del WAL: cada CADA_WAL segundos se copian a la carpeta los frames
+  confirmados del -wal que todavía no se copiaron. El bloqueo de escritura
+  se toma solo para leerlos (nadie agrega frames mientras tanto); el
+  checkpoint, cuando el WAL pasó de FRAMES_CHECKPOINT, se hace después y no
+  detiene a la app. La conexión de escritura de la app deja de hacer
+  checkpoints propios: uno ajeno podría vaciar el WAL antes de que se copie.
+- Restauración: la última base anterior al momento pedido más los frames
+  archivados hasta ese momento, generación por generación (cada vez que el
+  WAL vuelve a empezar). La precisión es la de CADA_WAL.
+- Retención: se conservan las últimas CONSERVAR_BASES bases y el WAL
+  necesario para llevarlas hasta hoy.
+
+Si el WAL vuelve a empezar sin que el archivador lo haya copiado entero
+(otro proceso hizo un checkpoint, o la app se reinició), la cadena se corta:
+se anota el corte y se toma una base nueva. Una restauración no cruza un
+corte.
+
+Uso:
+    respaldos = Respaldos(db, 'respaldos')          # db: BaseDatosSQLite de la app
+    python respaldos.py --base                        # una base ahora (cron)
+    python respaldos.py --listar
+    python respaldos.py --restaurar restaurada.db --hasta "2025-03-10 14:30:00"
+    python respaldos.py --verificar
+    python respaldos.py --benchmark
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import struct
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from bd_sqlite import BaseDatosSQLite
+
+CARPETA_POR_DEFECTO = 'respaldos'
+# 256 páginas de 4 KiB: 1 MiB por paso
+PAGINAS_POR_PASO = 256
+PAUSA_ENTRE_PASOS = 0.005
+CADA_WAL = 2.0
+CADA_BASE = 6 * 3600
+CONSERVAR_BASES = 8
+# Mismo umbral que el autocheckpoint por defecto de SQLite
+FRAMES_CHECKPOINT = 1000
+TIMEOUT_SEGUNDOS = 30
+
+_CATALOGO = 'catalogo.jsonl'
+_CABECERA_WAL = 32
+_CABECERA_FRAME = 24
+_MAGICOS_WAL = (0x377f0682, 0x377f0683)
+_FORMATO_HORA = '%Y-%m-%d %H:%M:%S'
+
+
+def _cabecera_wal(ruta_wal):
+    """(tamaño de página, secuencia de checkpoint, sal1, sal2) del -wal, o None si está vacío"""
+    try:
+        with open(ruta_wal, 'rb') as f:
+            datos = f.read(_CABECERA_WAL)
+    except FileNotFoundError:
+        return None
+    if len(datos) < _CABECERA_WAL:
+        return None
+    magico, _, pagina, secuencia, sal1, sal2 = struct.unpack('>IIIIII', datos[:24])
+    if magico not in _MAGICOS_WAL:
+        return None
+    return pagina, secuencia, sal1, sal2
+
+
+def _confirmados(ruta_wal, cabecera, desde):
+    """Bytes del WAL desde `desde` hasta el final del último frame de commit de esta generación
+
+    Los frames de una generación anterior (o de una transacción a medias) no
+    llevan las sales de la cabecera, o no terminan en commit.
+    """
+    pagina, _, sal1, sal2 = cabecera
+    tamano = _CABECERA_FRAME + pagina
+    with open(ruta_wal, 'rb') as f:
+        f.seek(desde)
+        datos = f.read()
+    posicion = max(_CABECERA_WAL - desde, 0)
+    fin = 0
+    while posicion + tamano <= len(datos):
+        _, commit, s1, s2 = struct.unpack_from('>IIII', datos, posicion)
+        if (s1, s2) != (sal1, sal2):
+            break
+        posicion += tamano
+        if commit:
+            fin = posicion
+    return datos[:fin]
+
+
+def _escribir(ruta, datos):
+    """Escribe el archivo completo y lo lleva al disco antes de anotarlo en el catálogo"""
+    temporal = ruta + '.tmp'
+    with open(temporal, 'wb') as f:
+        f.write(datos)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta)
+
+
+def leer_catalogo(carpeta):
+    """Entradas del catálogo en orden (una línea cortada por un apagón se ignora)"""
+    entradas = []
+    try:
+        with open(os.path.join(carpeta, _CATALOGO), encoding='utf-8') as f:
+            for linea in f:
+                try:
+                    entradas.append(json.loads(linea))
+                except ValueError:
+                    pass
+    except FileNotFoundError:
+        pass
+    return entradas
+
+
+class Respaldos:
+    """Bases periódicas y archivo continuo del WAL de un archivo SQLite
+
+    `origen` es el BaseDatosSQLite de la app (se le apaga el autocheckpoint
+    del escritor) o la ruta del archivo. Al crearse toma una base y arranca
+    el hilo que archiva el WAL y toma las bases siguientes.
+    """
+
+    def __init__(self, origen, carpeta=CARPETA_POR_DEFECTO, cada_wal=CADA_WAL, cada_base=CADA_BASE,
+                 conservar=CONSERVAR_BASES, paginas=PAGINAS_POR_PASO, pausa=PAUSA_ENTRE_PASOS,
+                 frames_checkpoint=FRAMES_CHECKPOINT, continuo=True):
+        if isinstance(origen, BaseDatosSQLite):
+            origen.transaccion(lambda conn: conn.execute("PRAGMA wal_autocheckpoint = 0"))
+            ruta = origen.ruta
+        else:
+            ruta = origen
+        # Rutas absolutas: el hilo sigue aunque el proceso cambie de carpeta
+        self.ruta_db = os.path.abspath(ruta)
+        self.ruta_wal = self.ruta_db + '-wal'
+        self.carpeta = os.path.abspath(carpeta)
+        os.makedirs(os.path.join(self.carpeta, 'wal'), exist_ok=True)
+        self.cada_wal = cada_wal
+        self.cada_base = cada_base
+        self.conservar = conservar
+        self.paginas = paginas
+        self.pausa = pausa
+        self.frames_checkpoint = frames_checkpoint
+
+        # _conn toma el bloqueo de escritura, _fijo lee en el punto copiado y
+        # _checkpoint vacía el WAL hasta ese punto
+        self._conn = self._conectar()
+        self._fijo = self._conectar()
+        self._checkpoint = self._conectar()
+        self._candado = threading.Lock()
+        self._catalogo = leer_catalogo(self.carpeta)
+        self._generacion = max((e['generacion'] for e in self._catalogo), default=0)
+        # Generación del -wal que se está copiando: (secuencia, sal1, sal2)
+        self._wal = None
+        self._copiado = 0
+        # True si todo lo copiado ya está en el archivo principal: el próximo
+        # reinicio del WAL continúa la cadena
+        self._vaciado = False
+        self.ultima_copia = None
+        self.ultima_base = None
+        self.errores = 0
+
+        self.base()
+        self._parar = threading.Event()
+        self._hilo = None
+        if continuo:
+            self._hilo = threading.Thread(target=self._bucle, name='respaldos-sqlite', daemon=True)
+            self._hilo.start()
+
+    def _conectar(self):
+        conn = sqlite3.connect(self.ruta_db, timeout=TIMEOUT_SEGUNDOS, isolation_level=None,
+                               check_same_thread=False)
+        conn.execute("PRAGMA wal_autocheckpoint = 0")
+        return conn
+
+    # ---------------------------------------- archivo del WAL
+
+    def _anotar(self, entrada):
+        with open(os.path.join(self.carpeta, _CATALOGO), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entrada) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self._catalogo.append(entrada)
+
+    def _leer(self, nueva_cadena):
+        """Frames confirmados que faltan copiar; llamar con el bloqueo de escritura tomado
+
+        Devuelve None si el WAL volvió a empezar sin que se copiara entero y no
+        se pidió nueva_cadena (hace falta una base nueva).
+        """
+        cabecera = _cabecera_wal(self.ruta_wal)
+        if cabecera is None:
+            # Sin WAL no hay nada que copiar; si lo vació un checkpoint ajeno
+            # antes de copiarlo, la próxima cabecera lo delata. Una base nueva
+            # ya lo tiene todo: la cadena sigue con el primer WAL que aparezca
+            if nueva_cadena:
+                self._wal, self._copiado, self._vaciado = None, 0, True
+            return b'', None
+
+        clave = cabecera[1:]
+        if clave != self._wal:
+            # Cada reinicio del WAL suma uno a sal1, lo haga quien lo haga (la
+            # secuencia de checkpoint, en cambio, la lleva cada conexión): si
+            # saltó más de uno, hubo un reinicio con frames que no vimos
+            continua = self._vaciado and (self._wal is None or (clave[1] - self._wal[1]) & 0xFFFFFFFF == 1)
+            if not continua and not nueva_cadena:
+                return None
+            self._generacion += 1
+            if not continua and self._catalogo:
+                self._anotar({'tipo': 'corte', 'generacion': self._generacion, 'hora': time.time()})
+            self._wal, self._copiado, self._vaciado = clave, 0, False
+
+        return _confirmados(self.ruta_wal, cabecera, self._copiado), cabecera
+
+    def _paso(self, nueva_cadena=False, fijar=None):
+        """Un paso del archivo del WAL (con self._candado tomado); False si la cadena se cortó
+
+        Con el bloqueo de escritura solo se leen los frames nuevos y se fija
+        una transacción de lectura en ese punto (y la de `fijar`, si se pasa).
+        La escritura del segmento y el checkpoint van después, con la app ya
+        escribiendo: el lector fijo impide que el checkpoint pase del último
+        frame copiado, así que el WAL no puede volver a empezar con frames sin
+        copiar.
+        """
+        self._fijo.execute("BEGIN")
+        try:
+            with self._bloqueo():
+                leido = self._leer(nueva_cadena)
+                self._fijo.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+                if fijar is not None:
+                    fijar.execute("BEGIN")
+                    fijar.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            if leido is None:
+                return False
+            datos, cabecera = leido
+            if datos:
+                archivo = os.path.join('wal', f'{self._generacion:06d}-{self._copiado:012d}.wal')
+                _escribir(os.path.join(self.carpeta, archivo), datos)
+                fin = self._copiado + len(datos)
+                self._anotar({'tipo': 'wal', 'generacion': self._generacion, 'desde': self._copiado,
+                              'hasta': fin, 'hora': time.time(), 'archivo': archivo})
+                self._copiado = fin
+                self._vaciado = False
+
+            if cabecera is not None and not self._vaciado:
+                frames = max(self._copiado - _CABECERA_WAL, 0) // (_CABECERA_FRAME + cabecera[0])
+                if frames >= self.frames_checkpoint:
+                    ocupado, en_wal, aplicados = self._checkpoint.execute(
+                        "PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+                    # Vaciado solo si no llegó nada después: el próximo reinicio del WAL continúa la cadena
+                    self._vaciado = ocupado == 0 and en_wal == aplicados == frames
+        finally:
+            self._fijo.execute("ROLLBACK")
+        self.ultima_copia = time.time()
+        return True
+
+    def _bloqueo(self):
+        """Context manager: el bloqueo de escritura de la base mientras se leen los frames nuevos"""
+        respaldos = self
+
+        class _Bloqueo:
+            def __enter__(self):
+                respaldos._conn.execute("BEGIN IMMEDIATE")
+
+            def __exit__(self, *error):
+                respaldos._conn.execute("ROLLBACK")
+
+        return _Bloqueo()
+
+    def archivar_wal(self):
+        """Un paso del archivo del WAL; si la cadena se cortó, toma una base nueva"""
+        with self._candado:
+            continua = self._paso()
+        if not continua:
+            self.base()
+        return continua
+
+    # ---------------------------------------- bases
+
+    def base(self):
+        """Copia completa en pasos, sin bloquear a la app; devuelve la entrada del catálogo"""
+        with self._candado:
+            lector = sqlite3.connect(self.ruta_db, timeout=TIMEOUT_SEGUNDOS, isolation_level=None)
+            try:
+                # La transacción de lectura del lector fija el estado que se copia:
+                # lo confirmado hasta ese punto, que está en el archivo o en el WAL copiado
+                self._paso(nueva_cadena=True, fijar=lector)
+                generacion, desde, hora = self._generacion, self._copiado, time.time()
+
+                archivo = f"base-{generacion:06d}-{datetime.fromtimestamp(hora):%Y%m%d-%H%M%S}.db"
+                ruta = os.path.join(self.carpeta, archivo)
+                destino = sqlite3.connect(ruta + '.tmp')
+                try:
+                    lector.backup(destino, pages=self.paginas,
+                                  progress=lambda *_: time.sleep(self.pausa) if self.pausa else None)
+                finally:
+                    destino.close()
+                lector.execute("ROLLBACK")
+            finally:
+                lector.close()
+            with open(ruta + '.tmp', 'rb+') as f:
+                os.fsync(f.fileno())
+            os.replace(ruta + '.tmp', ruta)
+            entrada = {'tipo': 'base', 'generacion': generacion, 'desde': desde, 'hora': hora,
+                       'archivo': archivo}
+            self._anotar(entrada)
+            self.ultima_base = hora
+            self._retener()
+        return entrada
+
+    def _retener(self):
+        """Deja las últimas `conservar` bases y el WAL que las continúa"""
+        bases = [e for e in self._catalogo if e['tipo'] == 'base']
+        if len(bases) <= self.conservar:
+            return
+        primera = bases[-self.conservar]['generacion']
+        quedan = [e for e in self._catalogo
+                  if e['generacion'] >= primera and (e['tipo'] != 'base' or e in bases[-self.conservar:])]
+        ruta = os.path.join(self.carpeta, _CATALOGO)
+        _escribir(ruta, ''.join(json.dumps(e) + '\n' for e in quedan).encode('utf-8'))
+        # Primero el catálogo nuevo, después los archivos que ya no figuran
+        for entrada in self._catalogo:
+            if entrada not in quedan and 'archivo' in entrada:
+                try:
+                    os.remove(os.path.join(self.carpeta, entrada['archivo']))
+                except FileNotFoundError:
+                    pass
+        self._catalogo = quedan
+
+    # ---------------------------------------- hilo
+
+    def _bucle(self):
+        while not self._parar.wait(self.cada_wal):
+            try:
+                self.archivar_wal()
+                if time.time() - self.ultima_base >= self.cada_base:
+                    self.base()
+            except sqlite3.Error:
+                self.errores += 1
+
+    def cerrar(self):
+        """Detiene el hilo, archiva lo último del WAL y cierra las conexiones"""
+        if self._hilo is not None:
+            self._parar.set()
+            self._hilo.join()
+            self._hilo = None
+        self.archivar_wal()
+        for conn in (self._checkpoint, self._fijo, self._conn):
+            conn.close()
+
+# ========================================
+# RESTAURACIÓN Y VERIFICACIÓN
+# ========================================
+
+def _hora(texto):
+    """'YYYY-MM-DD HH:MM:SS' (hora local) a segundos desde epoch; None = lo último"""
+    return None if texto is None else time.mktime(datetime.strptime(texto, _FORMATO_HORA).timetuple())
+
+
+def restaurar(carpeta, destino, hasta=None):
+    """Reconstruye la base en `destino` tal como estaba en `hasta` (epoch; None = lo último archivado)
+
+    Devuelve un resumen: base usada, generaciones aplicadas y hora del
+    último frame aplicado. Lanza ValueError si no hay base anterior a `hasta`.
+    """
+    catalogo = leer_catalogo(carpeta)
+    limite = float('inf') if hasta is None else hasta
+    bases = [e for e in catalogo if e['tipo'] == 'base' and e['hora'] <= limite]
+    if not bases:
+        raise ValueError("No hay ninguna base anterior a ese momento")
+    base = bases[-1]
+
+    for sufijo in ('', '-wal', '-shm'):
+        if os.path.exists(destino + sufijo):
+            os.remove(destino + sufijo)
+    shutil.copyfile(os.path.join(carpeta, base['archivo']), destino)
+    conn = sqlite3.connect(destino)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.close()
+
+    # Segmentos por generación; un corte termina la cadena de esta base
+    generaciones = {}
+    cortes = {e['generacion'] for e in catalogo if e['tipo'] == 'corte'}
+    for entrada in catalogo:
+        if (entrada['tipo'] == 'wal' and entrada['generacion'] >= base['generacion']
+                and entrada['hora'] <= limite):
+            generaciones.setdefault(entrada['generacion'], []).append(entrada)
+    aplicadas = []
+    hora = base['hora']
+    cortada = False
+    # Si la base se tomó sin WAL, la cadena sigue en la generación siguiente
+    anterior = base['generacion'] - 1 if base['generacion'] in generaciones else base['generacion']
+    for generacion in sorted(generaciones):
+        if generacion != anterior + 1 or (generacion != base['generacion'] and generacion in cortes):
+            cortada = True
+            break
+        anterior = generacion
+        segmentos = sorted(generaciones[generacion], key=lambda e: e['desde'])
+        posicion = 0
+        datos = []
+        for segmento in segmentos:
+            if segmento['desde'] != posicion:
+                raise ValueError(f"Falta WAL de la generación {generacion} desde la posición {posicion}")
+            with open(os.path.join(carpeta, segmento['archivo']), 'rb') as f:
+                datos.append(f.read())
+            posicion = segmento['hasta']
+        with open(destino + '-wal', 'wb') as f:
+            f.write(b''.join(datos))
+        # Al abrir, SQLite recupera el WAL (valida sales y sumas) y el checkpoint lo pasa al archivo
+        conn = sqlite3.connect(destino)
+        ocupado, en_wal, aplicados = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        conn.close()
+        if ocupado or en_wal != aplicados:
+            raise ValueError(f"No se pudo aplicar el WAL de la generación {generacion}")
+        aplicadas.append(generacion)
+        hora = max(hora, segmentos[-1]['hora'])
+
+    conn = sqlite3.connect(destino)
+    conn.execute("PRAGMA journal_mode = DELETE")
+    # Un hueco que el catálogo no detectó deja páginas inconsistentes: mejor fallar aquí
+    problemas = [fila[0] for fila in conn.execute("PRAGMA quick_check(5)")]
+    conn.close()
+    if problemas != ['ok']:
+        raise ValueError(f"La base restaurada no pasa quick_check: {'; '.join(problemas)}")
+    return {'base': base['archivo'], 'generaciones': aplicadas, 'hora': hora, 'cortada': cortada}
+
+
+def huella(conn):
+    """{tabla: (filas, sha1 del contenido)} para comparar dos copias de la base"""
+    tablas = [fila[0] for fila in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' "
+        "AND sql NOT LIKE 'CREATE VIRTUAL%' ORDER BY name")]
+    resultado = {}
+    for tabla in tablas:
+        digesto = hashlib.sha1()
+        filas = 0
+        # NOT INDEXED: recorrido por la clave, el mismo orden en las dos copias
+        for fila in conn.execute(f'SELECT * FROM "{tabla}" NOT INDEXED'):
+            digesto.update(repr(fila).encode('utf-8'))
+            filas += 1
+        resultado[tabla] = (filas, digesto.hexdigest())
+    return resultado
+
+
+def verificar(carpeta, hasta=None, comparar_con=None):
+    """Restaura en un archivo temporal y lo revisa; devuelve True si está sano
+
+    Con comparar_con (ruta de la base en uso) compara además el contenido
+    tabla por tabla: sirve cuando la app no escribió después del último
+    archivo del WAL.
+    """
+    with tempfile.TemporaryDirectory() as temporal:
+        destino = os.path.join(temporal, 'verificacion.db')
+        t0 = time.perf_counter()
+        resumen = restaurar(carpeta, destino, hasta)
+        segundos = time.perf_counter() - t0
+        conn = sqlite3.connect(destino)
+        try:
+            integridad = conn.execute("PRAGMA integrity_check").fetchall()
+            claves = conn.execute("PRAGMA foreign_key_check").fetchall()
+            restaurada = huella(conn)
+        finally:
+            conn.close()
+
+    print(f"Base {resumen['base']} + {len(resumen['generaciones'])} generaciones de WAL "
+          f"→ estado de {datetime.fromtimestamp(resumen['hora']):%Y-%m-%d %H:%M:%S} ({segundos:.2f} s)")
+    if resumen['cortada']:
+        print("⚠️ La cadena de WAL tiene un corte: se restauró hasta antes del corte")
+    sana = integridad == [('ok',)]
+    print(f"{'✅' if sana else '❌'} integrity_check: {', '.join(f[0] for f in integridad[:5])}")
+    print(f"   foreign_key_check: {len(claves)} filas con referencias rotas")
+    print(f"   {len(restaurada)} tablas, {sum(f for f, _ in restaurada.values()):,} filas")
+    if comparar_con is not None:
+        origen = sqlite3.connect(f"file:{os.path.abspath(comparar_con)}?mode=ro", uri=True)
+        try:
+            actual = huella(origen)
+        finally:
+            origen.close()
+        distintas = sorted(t for t in set(actual) | set(restaurada) if actual.get(t) != restaurada.get(t))
+        print(f"{'✅' if not distintas else '❌'} contenido igual a {comparar_con}"
+              + (f" salvo: {', '.join(distintas)}" if distintas else ""))
+        sana = sana and not distintas
+    return sana
+
+
+def listar(carpeta):
+    """Bases guardadas y hasta dónde llega el WAL archivado"""
+    catalogo = leer_catalogo(carpeta)
+    for entrada in catalogo:
+        if entrada['tipo'] == 'base':
+            tamano = os.path.getsize(os.path.join(carpeta, entrada['archivo'])) / 1024 / 1024
+            print(f"  {entrada['archivo']:<36} {tamano:8.1f} MB")
+        elif entrada['tipo'] == 'corte':
+            print(f"  corte de la cadena en {datetime.fromtimestamp(entrada['hora']):%Y-%m-%d %H:%M:%S}")
+    segmentos = [e for e in catalogo if e['tipo'] == 'wal']
+    if segmentos:
+        tamano = sum(e['hasta'] - e['desde'] for e in segmentos) / 1024 / 1024
+        print(f"WAL archivado: {len(segmentos)} segmentos, {tamano:.1f} MB, hasta "
+              f"{datetime.fromtimestamp(segmentos[-1]['hora']):%Y-%m-%d %H:%M:%S}")
+
+# ========================================
+# BENCHMARK
+# ========================================
+
+def _latencias(db, hilos, segundos, pausa=0.01):
+    """Reservas desde `hilos` hilos durante `segundos` (con `pausa` entre una y otra): latencias en ms"""
+    from benchmark_concurrencia import _reservar
+    from concurrencia import horario_ocupado
+
+    latencias = []
+    candado = threading.Lock()
+    fin = time.perf_counter() + segundos
+
+    def _trabajar():
+        propias = []
+        while time.perf_counter() < fin:
+            t0 = time.perf_counter()
+            try:
+                db.transaccion(_reservar)
+            except sqlite3.IntegrityError as e:
+                # _reservar elige el horario al azar: alguna vez repite uno
+                if not horario_ocupado(e):
+                    raise
+            propias.append((time.perf_counter() - t0) * 1000)
+            time.sleep(pausa)
+        with candado:
+            latencias.extend(propias)
+
+    lista = [threading.Thread(target=_trabajar) for _ in range(hilos)]
+    for hilo in lista:
+        hilo.start()
+    for hilo in lista:
+        hilo.join()
+    return latencias
+
+
+def _percentiles(nombre, latencias, segundos):
+    cuantiles = statistics.quantiles(latencias, n=100)
+    print(f"{nombre:<17} {len(latencias) / segundos:6.0f} reservas/s   p50 {cuantiles[49]:6.2f} ms   "
+          f"p99 {cuantiles[98]:7.2f} ms   máx {max(latencias):7.2f} ms")
+    return cuantiles
+
+
+def _benchmark(citas=200000, hilos=4, segundos=5.0):
+    """Latencia de las reservas sin y con respaldos, y restauración a un momento"""
+    from benchmark_concurrencia import _reservar, preparar_base
+    from replicas import ReplicadorSQLite
+
+    random.seed(7)
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, 'taller.db')
+        preparar_base(ruta, citas)
+        print(f"Base de {os.path.getsize(ruta) / 1024 / 1024:.1f} MB, {hilos} hilos reservando {segundos:.0f} s")
+
+        db = BaseDatosSQLite(ruta)
+        try:
+            sin = _percentiles("Sin respaldos", _latencias(db, hilos, segundos), segundos)
+
+            respaldos = Respaldos(db, os.path.join(carpeta, 'respaldos'), cada_wal=0.5)
+            con = _percentiles("Archivo del WAL", _latencias(db, hilos, segundos), segundos)
+            # La réplica local late en la primaria por su cuenta: no debe cortar la cadena
+            replicador = ReplicadorSQLite(ruta, os.path.join(carpeta, 'replica.db'), cada=0.2)
+            _percentiles("+ réplica local", _latencias(db, hilos, segundos), segundos)
+            replicador.cerrar()
+            cortes = sum(e['tipo'] == 'corte' for e in leer_catalogo(respaldos.carpeta))
+            print(f"Réplica: {replicador.copias} copias, {cortes} cortes de la cadena de WAL")
+            assert cortes == 0
+            # Una base cada segundo: el peor caso, una copia completa siempre en curso
+            respaldos.cada_base = 1.0
+            peor = _percentiles("+ bases seguidas", _latencias(db, hilos, segundos), segundos)
+            print(f"Sobrecosto en p50/p99: WAL {con[49] - sin[49]:+.2f}/{con[98] - sin[98]:+.2f} ms, "
+                  f"WAL y bases {peor[49] - sin[49]:+.2f}/{peor[98] - sin[98]:+.2f} ms "
+                  f"({respaldos.errores} errores)")
+
+            # Restauración a un momento: el estado en `marca` y el final
+            respaldos.archivar_wal()
+            marca = time.time()
+            conn = sqlite3.connect(ruta)
+            en_marca = huella(conn)
+            time.sleep(0.01)
+            for _ in range(200):
+                db.transaccion(_reservar)
+            respaldos.cerrar()
+            al_final = huella(conn)
+            conn.close()
+
+            destino = os.path.join(carpeta, 'restaurada.db')
+            for nombre, hasta, esperado in (("A un momento", marca, en_marca), ("Lo último", None, al_final)):
+                t0 = time.perf_counter()
+                resumen = restaurar(os.path.join(carpeta, 'respaldos'), destino, hasta)
+                conn = sqlite3.connect(destino)
+                igual = huella(conn) == esperado
+                conn.close()
+                print(f"{nombre:<17} {len(resumen['generaciones'])} generaciones de WAL, "
+                      f"{time.perf_counter() - t0:.2f} s: {'✅ idéntica' if igual else '❌ distinta'}")
+                assert igual
+        finally:
+            db.cerrar()
+        listar(os.path.join(carpeta, 'respaldos'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Respaldos en línea y restauración a un momento (SQLite)")
+    parser.add_argument('--db', default='taller_automotriz.db', help="Archivo SQLite")
+    parser.add_argument('--carpeta', default=CARPETA_POR_DEFECTO, help="Carpeta de los respaldos")
+    parser.add_argument('--base', action='store_true', help="Tomar una base ahora y salir")
+    parser.add_argument('--listar', action='store_true', help="Bases y WAL archivado")
+    parser.add_argument('--restaurar', metavar='DESTINO', help="Reconstruir la base en DESTINO")
+    parser.add_argument('--hasta', help="Momento a restaurar, 'YYYY-MM-DD HH:MM:SS' (por defecto, lo último)")
+    parser.add_argument('--verificar', action='store_true', help="Restaurar en un temporal y revisarlo")
+    parser.add_argument('--comparar', action='store_true', help="Con --verificar: comparar con --db")
+    parser.add_argument('--benchmark', action='store_true', help="Sobrecosto en la latencia de las reservas")
+    parser.add_argument('--citas', type=int, default=200000, help="Citas de la base del benchmark")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        _benchmark(args.citas)
+    elif args.base:
+        respaldos = Respaldos(args.db, args.carpeta, continuo=False)
+        respaldos.cerrar()
+        listar(args.carpeta)
+    elif args.listar:
+        listar(args.carpeta)
+    elif args.restaurar:
+        resumen = restaurar(args.carpeta, args.restaurar, _hora(args.hasta))
+        print(f"{args.restaurar}: {resumen['base']} + generaciones {resumen['generaciones']} "
+              f"→ {datetime.fromtimestamp(resumen['hora']):%Y-%m-%d %H:%M:%S}")
+    elif args.verificar:
+        raise SystemExit(0 if verificar(args.carpeta, _hora(args.hasta),
+                                        args.db if args.comparar else None) else 1)
+    else:
+        # Archivo continuo desde otro proceso: los checkpoints de la app cortan la cadena
+        respaldos = Respaldos(args.db, args.carpeta)
+        print(f"Respaldando {args.db} en {args.carpeta} (Ctrl+C para salir)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            respaldos.cerrar()
+
+
+if __name__ == "__main__":
+    main()
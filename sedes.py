@@ -0,0 +1,193 @@
+# ========================================
+# SEDES DEL TALLER
+# Taller Automotriz - Sistema de Gestión
+# ========================================
+
+"""
+Alta y consulta de sedes, y el resumen del panel de una sede.
+
+Citas, Inventario, MovimientosInventario y Usuarios llevan sede_id (migración
+de sedes); los índices empiezan por sede_id, así que el resumen de una sede
+solo recorre las filas de esa sede y cuesta lo mismo aunque la cadena crezca.
+Al crear una sede se copia el catálogo de repuestos de otra, con stock 0:
+cada sede lleva su propio stock y sus propios movimientos.
+
+Uso:
+    sede_id = crear_sede(db, 'Miraflores', 'Av. Larco 456, Miraflores, Lima')
+    resumen_sede(db, sede_id)
+    python sedes.py --db taller_automotriz.db
+    python sedes.py --benchmark 200000
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from bd_sqlite import conexion_lectura, en_transaccion
+from migraciones import motor_de
+
+SEDE_PRINCIPAL = 1
+# El nombre comercial de cada sede es el de la cadena seguido del de la sede
+NOMBRE_CADENA = 'Taller Automotriz'
+
+_LISTAR = """
+SELECT id, nombre, direccion, telefono, email, latitud, longitud
+FROM Sedes
+WHERE activo = 1
+ORDER BY id
+"""
+
+_COPIAR_CATALOGO = """
+INSERT INTO Inventario (nombre, categoria, descripcion, stock_actual, stock_minimo,
+                        precio_unitario, proveedor, sede_id)
+SELECT nombre, categoria, descripcion, 0, stock_minimo, precio_unitario, proveedor, ?
+FROM Inventario
+WHERE sede_id = ? AND activo = 1
+"""
+
+# Cada consulta filtra por sede_id primero (índices IX_*_Sede_*)
+_RESUMEN = {
+    'citas_dia': """
+        SELECT COUNT(*) FROM Citas
+        WHERE sede_id = ? AND fecha_hora >= ? AND fecha_hora < ?
+        AND estado <> 'Cancelado'
+    """,
+    'clientes': "SELECT COUNT(DISTINCT cliente_id) FROM Citas WHERE sede_id = ?",
+    'stock_bajo': """
+        SELECT COUNT(*) FROM Inventario
+        WHERE sede_id = ? AND activo = 1 AND stock_actual <= stock_minimo
+    """,
+}
+
+
+def _consultar(origen, consulta, params=()):
+    with conexion_lectura(origen) as conn:
+        cursor = conn.cursor()
+        cursor.execute(consulta, params)
+        columnas = [desc[0] for desc in cursor.description]
+        return columnas, [tuple(fila) for fila in cursor.fetchall()]
+
+
+def nombre_taller(nombre_sede):
+    """'Taller Automotriz San Isidro' para la sede 'San Isidro'"""
+    return f"{NOMBRE_CADENA} {nombre_sede}" if nombre_sede else NOMBRE_CADENA
+
+
+def listar_sedes(origen):
+    """(columnas, filas) de las sedes activas"""
+    return _consultar(origen, _LISTAR)
+
+
+def crear_sede(destino, nombre, direccion, telefono=None, email=None, latitud=None, longitud=None,
+               copiar_inventario_de=SEDE_PRINCIPAL):
+    """Crea la sede con el catálogo de repuestos de otra (stock 0); devuelve su id"""
+    valores = (nombre, direccion, telefono, email, latitud, longitud)
+
+    if motor_de(destino) == 'sqlserver':
+        cursor = destino.cursor()
+        try:
+            cursor.execute("INSERT INTO Sedes (nombre, direccion, telefono, email, latitud, longitud) "
+                           "OUTPUT INSERTED.id VALUES (?, ?, ?, ?, ?, ?)", valores)
+            sede_id = int(cursor.fetchone()[0])
+            if copiar_inventario_de is not None:
+                cursor.execute(_COPIAR_CATALOGO, (sede_id, int(copiar_inventario_de)))
+            destino.commit()
+        except Exception:
+            destino.rollback()
+            raise
+        return sede_id
+
+    def _crear(conn):
+        sede_id = conn.execute("INSERT INTO Sedes (nombre, direccion, telefono, email, latitud, longitud) "
+                               "VALUES (?, ?, ?, ?, ?, ?)", valores).lastrowid
+        if copiar_inventario_de is not None:
+            conn.execute(_COPIAR_CATALOGO, (sede_id, int(copiar_inventario_de)))
+        return sede_id
+
+    return en_transaccion(destino, _crear)
+
+
+def resumen_sede(origen, sede_id, dia=None):
+    """Indicadores del panel de una sede: citas del día, clientes atendidos y stock bajo"""
+    desde = dia or date.today()
+    params = {
+        'citas_dia': (int(sede_id), desde.strftime('%Y-%m-%d'),
+                      (desde + timedelta(days=1)).strftime('%Y-%m-%d')),
+        'clientes': (int(sede_id),),
+        'stock_bajo': (int(sede_id),),
+    }
+    with conexion_lectura(origen) as conn:
+        cursor = conn.cursor()
+        resumen = {}
+        for clave, consulta in _RESUMEN.items():
+            cursor.execute(consulta, params[clave])
+            resumen[clave] = cursor.fetchone()[0]
+        return resumen
+
+# ========================================
+# BENCHMARK
+# ========================================
+
+def _benchmark(citas, repeticiones=50):
+    """Una sede grande y una chica en la misma base: el panel de la chica no se
+    encarece por las citas de la grande"""
+    from migraciones import migrar_sqlite
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, 'sedes.db')
+        migrar_sqlite(ruta)
+        conn = sqlite3.connect(ruta)
+        chica = crear_sede(conn, 'Sede chica', 'Av. Prueba 1')
+        conn.executemany("INSERT INTO Clientes (nombre, telefono) VALUES (?, ?)",
+                         [(f"Cliente {i}", f"9{i:08d}") for i in range(5000)])
+        inicio = datetime.combine(date.today() - timedelta(days=730), datetime.min.time())
+        reparto = ((SEDE_PRINCIPAL, citas), (chica, max(citas // 100, 1)))
+        for sede_id, cantidad in reparto:
+            paso = 730 * 86400 / cantidad
+            conn.executemany(
+                "INSERT INTO Citas (cliente_id, vehiculo_id, servicio_id, fecha_hora, sede_id) "
+                "VALUES (?, 1, ?, ?, ?)",
+                [(random.randint(1, 5000), random.randint(1, 8),
+                  (inicio + timedelta(seconds=i * paso)).strftime('%Y-%m-%d %H:%M:%S'), sede_id)
+                 for i in range(cantidad)])
+        conn.commit()
+
+        print(f"{'sede':<14}{'citas':>10}{'panel ms':>10}")
+        for sede_id, cantidad in reparto:
+            resumen_sede(conn, sede_id)
+            t0 = time.perf_counter()
+            for _ in range(repeticiones):
+                resumen_sede(conn, sede_id)
+            milisegundos = (time.perf_counter() - t0) / repeticiones * 1000
+            nombre = 'San Isidro' if sede_id == SEDE_PRINCIPAL else 'Sede chica'
+            print(f"{nombre:<14}{cantidad:>10,}{milisegundos:>10.2f}")
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sedes del taller")
+    parser.add_argument('--db', default='taller_automotriz.db', help="Archivo SQLite")
+    parser.add_argument('--benchmark', type=int, metavar='N',
+                        help="Comparar el panel de una sede con N citas y otra con N/100")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        _benchmark(args.benchmark)
+        return
+
+    conn = sqlite3.connect(args.db)
+    try:
+        columnas, filas = listar_sedes(conn)
+        print(columnas)
+        for fila in filas:
+            print(fila, resumen_sede(conn, fila[0]))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
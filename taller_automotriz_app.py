@@ -1,12 +1,34 @@
 import streamlit as st
 import pandas as pd
+import pyarrow as pa
 import pyodbc
 import hashlib
+import os
+import time
 from datetime import datetime, date, timedelta
 import folium
 from streamlit_folium import folium_static
 import plotly.express as px
 import plotly.graph_objects as go
+from adjuntos import TIPOS_ADJUNTO, AlmacenBlobs, ServidorAdjuntos, adjuntar, adjuntos_de_citas
+from mapa_clientes import NIVELES, actualizar_ubicaciones, agregado_clientes, mapa_clientes, nomenclator_desde
+from materiales import completar_dia, faltantes
+from metricas import (RESERVAS, ServidorMetricas, a_lo_sumo_cada, cache_referencia,
+                      contar_stock_bajo, medir_bd, registrar_replica, registrar_rerun,
+                      registrar_stock_bajo)
+from migraciones import aplicar_migraciones
+from prediccion_servicio import actualizar_predicciones, proximos_servicios
+from replicas import Enrutador, Latido, es_lectura
+from reposicion import actualizar_puntos_reorden, pedido_sugerido
+from sedes import SEDE_PRINCIPAL, listar_sedes
+from tiempos_estado import actualizar_tiempos_estado, resumen_tiempos
+from carga_arrow import tabla_de_cursor
+from carga_tipada import a_dataframe
+from concurrencia import HORARIO_OCUPADO
+from exportacion import EXPORTACIONES, ServidorExportaciones, formatos_disponibles
+from facturacion import TIPO_HTML, TIPO_PDF, comprobantes_del_dia, facturar
+from idempotencia import TTL_IDEMPOTENCIA, clave_formulario
+from ingresos import grafico_ingresos, ingresos_del_dia, serie_ingresos
 
 # Configuración de la página
 st.set_page_config(
@@ -16,50 +38,141 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Configuración de conexión a SQL Server
+# Configuración de conexión a SQL Server (configurar según tu instancia)
+CONNECTION_STRING = """
+Driver={ODBC Driver 17 for SQL Server};
+Server=localhost;
+Database=TallerAutomotriz;
+Trusted_Connection=yes;
+"""
+
+# Réplica de solo lectura para reportes y listados (opcional), p. ej. un
+# secundario legible del grupo de disponibilidad con ApplicationIntent=ReadOnly
+REPLICA_CONNECTION_STRING = os.environ.get('TALLER_REPLICA_DSN')
+
 @st.cache_resource
 def init_connection():
     """Inicializa la conexión a SQL Server"""
     try:
-        # Configurar según tu instancia de SQL Server
-        connection_string = """
-        Driver={ODBC Driver 17 for SQL Server};
-        Server=localhost;
-        Database=TallerAutomotriz;
-        Trusted_Connection=yes;
-        """
-        return pyodbc.connect(connection_string)
+        conn = pyodbc.connect(CONNECTION_STRING)
+        # Una sola consulta de versión si el esquema ya está al día
+        aplicar_migraciones(conn, 'sqlserver')
+        return conn
     except Exception as e:
         st.error(f"Error de conexión: {e}")
         return None
 
+@st.cache_resource
+def init_enrutador():
+    """Lecturas a la réplica (si hay TALLER_REPLICA_DSN) y escrituras a la primaria"""
+    primaria = init_connection()
+    if not primaria:
+        return None
+    if not REPLICA_CONNECTION_STRING:
+        return Enrutador(primaria)
+    try:
+        replica = pyodbc.connect(REPLICA_CONNECTION_STRING, readonly=True)
+    except Exception as e:
+        st.warning(f"Réplica no disponible, todo va a la primaria: {e}")
+        return Enrutador(primaria)
+    # El latido usa su propia conexión: corre en otro hilo
+    enrutador = Enrutador(primaria, replica, latido=Latido(lambda: pyodbc.connect(CONNECTION_STRING)))
+    registrar_replica(enrutador)
+    return enrutador
+
+@st.cache_resource
+def init_exportaciones():
+    """Servidor de descargas en streaming (puerto 8502, una conexión por descarga)"""
+    try:
+        return ServidorExportaciones(lambda: pyodbc.connect(CONNECTION_STRING))
+    except Exception as e:
+        st.error(f"No se pudo iniciar el servidor de exportaciones: {e}")
+        return None
+
+@st.cache_resource
+def init_adjuntos():
+    """Almacén de fotos (carpeta TALLER_ADJUNTOS, por defecto adjuntos/) y su servidor (puerto 8503)"""
+    try:
+        return ServidorAdjuntos(AlmacenBlobs(os.environ.get('TALLER_ADJUNTOS', 'adjuntos')))
+    except Exception as e:
+        st.error(f"No se pudo iniciar el servidor de adjuntos: {e}")
+        return None
+
+@st.cache_resource
+def init_metricas():
+    """Endpoint /metrics para Prometheus (puerto 9108 o METRICAS_PUERTO)"""
+    try:
+        servidor = ServidorMetricas()
+    except Exception as e:
+        st.error(f"No se pudo iniciar el servidor de métricas: {e}")
+        return None
+    # El scrape llega en otro hilo: conexión propia en vez de la de la app
+    registrar_stock_bajo(_contar_stock_bajo)
+    return servidor
+
+def _contar_stock_bajo():
+    conn = pyodbc.connect(CONNECTION_STRING)
+    try:
+        return contar_stock_bajo(conn)
+    finally:
+        conn.close()
+
 # Funciones de base de datos
 def ejecutar_procedimiento(procedure_name, params=None):
-    """Ejecuta un procedimiento almacenado"""
-    conn = init_connection()
-    if conn:
+    """Ejecuta un procedimiento almacenado (los de solo lectura en la réplica, si la hay)"""
+    enrutador = init_enrutador()
+    if enrutador:
+        conn = enrutador.para(procedure_name, st.session_state)
         try:
-            cursor = conn.cursor()
-            if params:
-                cursor.execute(f"EXEC {procedure_name} {','.join(['?' for _ in params])}", params)
-            else:
-                cursor.execute(f"EXEC {procedure_name}")
-            
-            # Si es una consulta SELECT
-            try:
-                result = cursor.fetchall()
-                columns = [desc[0] for desc in cursor.description]
-                return pd.DataFrame(result, columns=columns)
-            except:
-                conn.commit()
-                return True
+            with medir_bd(procedure_name):
+                cursor = conn.cursor()
+                if params:
+                    cursor.execute(f"EXEC {procedure_name} {','.join(['?' for _ in params])}", params)
+                else:
+                    cursor.execute(f"EXEC {procedure_name}")
+                
+                # Si es una consulta SELECT
+                try:
+                    result = cursor.fetchall()
+                    columns = [desc[0] for desc in cursor.description]
+                    # Los procedimientos que escriben también devuelven un SELECT
+                    conn.commit()
+                    if not es_lectura(procedure_name):
+                        enrutador.registrar_escritura(st.session_state)
+                    # Tipos compactos según el esquema del procedimiento
+                    return a_dataframe(columns, result, procedure_name)
+                except pyodbc.ProgrammingError:
+                    conn.commit()
+                    if not es_lectura(procedure_name):
+                        enrutador.registrar_escritura(st.session_state)
+                    return True
         except Exception as e:
+            conn.rollback()
             st.error(f"Error ejecutando procedimiento: {e}")
             return False
-        finally:
-            conn.close()
     return False
 
+def listar_procedimiento(procedure_name, params=None):
+    """Procedimiento de solo lectura como tabla Arrow, para pasar directo a st.dataframe
+
+    Mismo enrutamiento que ejecutar_procedimiento, sin DataFrame intermedio.
+    """
+    enrutador = init_enrutador()
+    if enrutador:
+        conn = enrutador.para(procedure_name, st.session_state)
+        try:
+            with medir_bd(procedure_name):
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(f"EXEC {procedure_name} {','.join(['?' for _ in params or ()])}",
+                                   params or ())
+                    return tabla_de_cursor(cursor, procedure_name)
+                finally:
+                    cursor.close()
+        except Exception as e:
+            st.error(f"Error ejecutando procedimiento: {e}")
+    return pa.table({})
+
 def hash_password(password):
     """Hashea la contraseña"""
     return hashlib.sha256(str.encode(password)).hexdigest()
@@ -120,10 +233,46 @@ if 'user_type' not in st.session_state:
     st.session_state.user_type = None
 if 'page' not in st.session_state:
     st.session_state.page = 'Inicio'
+if 'sede_id' not in st.session_state:
+    st.session_state.sede_id = SEDE_PRINCIPAL
+
+@cache_referencia('sedes', ttl=300)
+def obtener_sedes():
+    """Sedes activas (datos de referencia)"""
+    conn = init_connection()
+    if not conn:
+        return None
+    try:
+        with medir_bd('sedes'):
+            columnas, filas = listar_sedes(conn)
+        return a_dataframe(columnas, filas, 'sedes')
+    except Exception as e:
+        st.error(f"Error leyendo las sedes: {e}")
+        return None
+
+def sede_actual():
+    """Datos de la sede elegida en la sesión (la principal si no se pueden leer)"""
+    sedes_df = obtener_sedes()
+    if isinstance(sedes_df, pd.DataFrame) and not sedes_df.empty:
+        fila = sedes_df[sedes_df['id'] == st.session_state.sede_id]
+        if not fila.empty:
+            return fila.iloc[0].to_dict()
+    return {'id': SEDE_PRINCIPAL, 'nombre': 'San Isidro', 'direccion': 'Av. Petit Thouars 1234, San Isidro, Lima',
+            'telefono': '(01) 555-0123', 'email': 'info@tallersanisidro.com',
+            'latitud': -12.0986, 'longitud': -77.0428}
 
 # Sidebar de navegación
 def sidebar_navigation():
     st.sidebar.markdown("## 🔧 Taller Automotriz")
+    
+    sedes_df = obtener_sedes()
+    if isinstance(sedes_df, pd.DataFrame) and len(sedes_df) > 1:
+        nombres = dict(zip(sedes_df['id'], sedes_df['nombre']))
+        ids = list(nombres)
+        st.session_state.sede_id = st.sidebar.selectbox(
+            "Sede:", ids, index=ids.index(st.session_state.sede_id) if st.session_state.sede_id in ids else 0,
+            format_func=nombres.get)
+    
     st.sidebar.markdown("### Navegación")
     
     # Opciones para todos los usuarios
@@ -131,7 +280,7 @@ def sidebar_navigation():
     
     # Opciones adicionales para administradores
     if st.session_state.authenticated and st.session_state.user_type == 'admin':
-        pages.extend(['Panel Admin', 'Clientes', 'Inventario', 'Reportes'])
+        pages.extend(['Panel Admin', 'Clientes', 'Inventario', 'Reportes', 'Mapa de Clientes'])
     
     selected_page = st.sidebar.selectbox("Ir a:", pages)
     
@@ -152,14 +301,15 @@ def sidebar_navigation():
 # Página de inicio
 def pagina_inicio():
     load_css()
+    sede = sede_actual()
     
     # Header principal
-    st.markdown('<h1 class="main-header">🔧 Taller Automotriz San Isidro</h1>', unsafe_allow_html=True)
+    st.markdown(f'<h1 class="main-header">🔧 Taller Automotriz {sede["nombre"]}</h1>', unsafe_allow_html=True)
     
     col1, col2 = st.columns([2, 1])
     
     with col1:
-        st.markdown("""
+        st.markdown(f"""
         <div class="info-box">
         <h3>🚗 Bienvenido a nuestro taller</h3>
         <p>Somos especialistas en reparación y mantenimiento automotriz con más de 15 años de experiencia. 
@@ -173,9 +323,9 @@ def pagina_inicio():
         </ul>
         
         <h4>📍 Ubicación:</h4>
-        <p>Av. Petit Thouars 1234, San Isidro, Lima</p>
-        <p>📞 <strong>Teléfono:</strong> (01) 555-0123</p>
-        <p>📧 <strong>Email:</strong> info@tallersanisidro.com</p>
+        <p>{sede['direccion']}</p>
+        <p>📞 <strong>Teléfono:</strong> {sede['telefono']}</p>
+        <p>📧 <strong>Email:</strong> {sede['email']}</p>
         </div>
         """, unsafe_allow_html=True)
         
@@ -188,13 +338,12 @@ def pagina_inicio():
         # Mapa de Google Maps
         st.markdown("### 📍 Nuestra Ubicación")
         
-        # Coordenadas de San Isidro, Lima
-        lat, lon = -12.0986, -77.0428
+        lat, lon = float(sede['latitud']), float(sede['longitud'])
         
         m = folium.Map(location=[lat, lon], zoom_start=16)
         folium.Marker(
             [lat, lon],
-            popup="Taller Automotriz San Isidro",
+            popup=f"Taller Automotriz {sede['nombre']}",
             tooltip="Nuestra ubicación",
             icon=folium.Icon(color='red', icon='wrench', prefix='fa')
         ).add_to(m)
@@ -234,12 +383,18 @@ def pagina_inicio():
         </div>
         """, unsafe_allow_html=True)
 
+@cache_referencia('servicios', ttl=300)
+def obtener_servicios():
+    """Servicios activos; se leen en cada rerun de Servicios y Agendar Cita"""
+    servicios_df = ejecutar_procedimiento("sp_obtener_servicios")
+    return servicios_df if isinstance(servicios_df, pd.DataFrame) else None
+
 # Página de servicios
 def pagina_servicios():
     st.title("🛠️ Nuestros Servicios")
     
     # Obtener servicios de la base de datos
-    servicios_df = ejecutar_procedimiento("sp_obtener_servicios")
+    servicios_df = obtener_servicios()
     
     if isinstance(servicios_df, pd.DataFrame) and not servicios_df.empty:
         col1, col2 = st.columns(2)
@@ -253,6 +408,12 @@ def pagina_servicios():
     else:
         st.info("No hay servicios disponibles en este momento.")
 
+def _id_creado(resultado, columna):
+    """Id devuelto por un sp_crear_* (None si el procedimiento falló)"""
+    if isinstance(resultado, pd.DataFrame) and not resultado.empty and resultado[columna].iloc[0]:
+        return int(resultado[columna].iloc[0])
+    return None
+
 # Página de agendar cita
 def pagina_agendar_cita():
     st.title("📅 Agendar Nueva Cita")
@@ -276,7 +437,7 @@ def pagina_agendar_cita():
             st.subheader("Detalles de la Cita")
             
             # Obtener servicios disponibles
-            servicios_df = ejecutar_procedimiento("sp_obtener_servicios")
+            servicios_df = obtener_servicios()
             if isinstance(servicios_df, pd.DataFrame) and not servicios_df.empty:
                 servicio_options = dict(zip(servicios_df['nombre'], servicios_df['id']))
                 servicio = st.selectbox("Servicio solicitado *", options=list(servicio_options.keys()))
@@ -297,25 +458,34 @@ def pagina_agendar_cita():
         
         if submitted:
             if nombre and telefono and marca and modelo:
-                # Crear cliente y vehículo si no existen
-                params_cliente = [nombre, telefono, email]
-                cliente_result = ejecutar_procedimiento("sp_crear_cliente", params_cliente)
+                datetime_cita = datetime.combine(fecha_cita, datetime.strptime(hora_cita, "%H:%M").time())
+                sede_id = int(st.session_state.sede_id)
+                # Un doble clic o un rerun con los mismos datos no crea otra cita
+                clave = clave_formulario(st.session_state, 'agendar_cita', nombre, telefono, email, marca,
+                                         modelo, int(año), placa, int(servicio_id), datetime_cita,
+                                         descripcion, sede_id)
+                
+                # Cliente, vehículo y cita en una transacción; tr_Citas_Horario rechaza el horario ya tomado
+                params_cita = [clave, nombre, telefono, email, marca, modelo, int(año), placa or None,
+                               int(servicio_id), datetime_cita, descripcion, sede_id, TTL_IDEMPOTENCIA]
+                cita_result = ejecutar_procedimiento("sp_agendar_cita", params_cita)
                 
-                if cliente_result:
-                    # Crear cita
-                    datetime_cita = datetime.combine(fecha_cita, datetime.strptime(hora_cita, "%H:%M").time())
-                    params_cita = [servicio_id, datetime_cita, descripcion, "Pendiente"]
-                    
-                    cita_result = ejecutar_procedimiento("sp_crear_cita", params_cita)
-                    
-                    if cita_result:
+                if _id_creado(cita_result, 'cita_id'):
+                    if bool(cita_result['repetido'].iloc[0]):
+                        RESERVAS.inc(resultado='repetida')
+                        st.info("ℹ️ Esta cita ya estaba registrada; no se creó otra.")
+                    else:
+                        RESERVAS.inc(resultado='exito')
                         st.success("✅ Cita agendada exitosamente!")
                         st.balloons()
-                    else:
-                        st.error("Error al agendar la cita")
+                elif isinstance(cita_result, pd.DataFrame) and cita_result['mensaje'].iloc[0] == HORARIO_OCUPADO:
+                    RESERVAS.inc(resultado='ocupado')
+                    st.warning(f"⏰ El horario {hora_cita} del {fecha_cita} ya está ocupado. Elija otro.")
                 else:
-                    st.error("Error al registrar el cliente")
+                    RESERVAS.inc(resultado='error')
+                    st.error("Error al agendar la cita")
             else:
+                RESERVAS.inc(resultado='incompleta')
                 st.error("Por favor complete todos los campos obligatorios (*)")
 
 # Página de login
@@ -342,8 +512,21 @@ def pagina_login():
                 else:
                     st.error("❌ Credenciales incorrectas")
 
+def obtener_ingresos_hoy(sede_id):
+    """Ingresos de las citas completadas hoy en la sede (una fila de IngresosPeriodo)"""
+    conn = init_connection()
+    if not conn:
+        return 0.0
+    try:
+        with medir_bd('ingresos_del_dia'):
+            return ingresos_del_dia(conn, sede_id)[1]
+    except Exception as e:
+        st.error(f"Error leyendo los ingresos del día: {e}")
+        return 0.0
+
 # Panel administrativo
 def panel_admin():
+    sede_id = int(st.session_state.sede_id)
     st.title("👨‍💼 Panel de Administración")
     
     # Métricas principales
@@ -368,10 +551,10 @@ def panel_admin():
         """, unsafe_allow_html=True)
     
     with col3:
-        st.markdown("""
+        st.markdown(f"""
         <div class="metric-card">
         <h3>💰</h3>
-        <h2>S/. 5,240</h2>
+        <h2>S/. {obtener_ingresos_hoy(sede_id):,.2f}</h2>
         <p>Ingresos Hoy</p>
         </div>
         """, unsafe_allow_html=True)
@@ -402,6 +585,20 @@ def panel_admin():
         })
         
         st.dataframe(citas_hoy, use_container_width=True)
+        
+        # sp_completar_dia: un solo UPDATE; tr_Citas_Materiales descuenta los repuestos
+        if st.button("✅ Completar todas las citas en proceso de hoy"):
+            conn = init_connection()
+            if conn:
+                try:
+                    completadas = completar_dia(conn, sede_id=sede_id)
+                    init_enrutador().registrar_escritura(st.session_state)
+                    st.success(f"✅ {completadas} citas completadas y repuestos descontados")
+                except Exception as e:
+                    st.error(f"No se completó ninguna cita: {e}")
+                    columnas, filas = faltantes(conn, sede_id=sede_id)
+                    if filas:
+                        st.dataframe(a_dataframe(columnas, filas), use_container_width=True)
     
     with col2:
         st.subheader("🎯 Estado de Citas")
@@ -412,12 +609,205 @@ def panel_admin():
         
         fig = px.pie(values=valores, names=estados, title="Distribución de Estados")
         st.plotly_chart(fig, use_container_width=True)
+    
+    st.markdown("---")
+    seccion_listado_citas(sede_id)
+    
+    st.markdown("---")
+    seccion_ingresos(sede_id)
+    
+    st.markdown("---")
+    seccion_comprobantes(sede_id)
+    
+    st.markdown("---")
+    seccion_tiempos_estado()
+    
+    st.markdown("---")
+    seccion_proximos_servicios()
+    
+    st.markdown("---")
+    seccion_exportar(sede_id)
+
+def seccion_listado_citas(sede_id):
+    """Citas de la sede en un rango (sp_obtener_citas incluye el archivo si hace falta)"""
+    st.subheader("🗂️ Listado de Citas")
+    col1, col2 = st.columns(2)
+    with col1:
+        desde = st.date_input("Desde", value=date.today() - timedelta(days=30), key="listado_citas_desde")
+    with col2:
+        hasta = st.date_input("Hasta", value=date.today(), key="listado_citas_hasta")
+    citas = listar_procedimiento("sp_obtener_citas", (desde, hasta, None, sede_id))
+    if citas.num_rows:
+        st.caption(f"{citas.num_rows:,} citas")
+        # version solo sirve para el control optimista
+        st.dataframe(citas.drop_columns(['version']), use_container_width=True)
+        seccion_fotos_cita(citas.column('id').to_pylist())
+    else:
+        st.info("No hay citas en ese rango")
+
+def seccion_fotos_cita(cita_ids):
+    """Fotos de ingreso e inspección de una cita del listado"""
+    servidor = init_adjuntos()
+    conn = init_connection()
+    if not servidor or not conn:
+        return
+    cita_id = st.selectbox("📷 Fotos de la cita", cita_ids, format_func=lambda i: f"#{i}")
+    with st.form("adjuntar_fotos", clear_on_submit=True):
+        tipo = st.selectbox("Tipo de foto", TIPOS_ADJUNTO, format_func=str.capitalize)
+        archivos = st.file_uploader("Fotos", type=['jpg', 'jpeg', 'png', 'webp'], accept_multiple_files=True)
+        if st.form_submit_button("Adjuntar fotos") and archivos:
+            try:
+                with medir_bd('adjuntar'):
+                    for archivo in archivos:
+                        adjuntar(conn, servidor.almacen, archivo, archivo.name, archivo.type,
+                                 cita_id=int(cita_id), tipo=tipo)
+                init_enrutador().registrar_escritura(st.session_state)
+                st.success(f"✅ {len(archivos)} fotos adjuntadas a la cita #{cita_id}")
+            except Exception as e:
+                st.error(f"Error adjuntando fotos: {e}")
+    try:
+        columnas, filas = adjuntos_de_citas(init_enrutador().para_lectura(st.session_state), [cita_id])
+    except Exception as e:
+        st.error(f"Error leyendo fotos: {e}")
+        return
+    # El navegador pide las miniaturas al servidor de adjuntos; se generan la primera vez
+    celdas = st.columns(4)
+    for i, fila in enumerate(filas):
+        adjunto = dict(zip(columnas, fila))
+        with celdas[i % 4]:
+            st.image(servidor.url_miniatura(adjunto['sha256']), caption=adjunto['tipo'])
+            st.markdown(f"[Ver original]({servidor.url(adjunto['sha256'], adjunto['tipo_contenido'])})")
+
+def seccion_ingresos(sede_id):
+    """Ingresos del rango al grano que entra en el gráfico (tr_Citas_Ingresos mantiene IngresosPeriodo)"""
+    st.subheader("📈 Ingresos")
+    conn = init_connection()
+    if not conn:
+        return
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        desde = st.date_input("Desde", value=date.today() - timedelta(days=90), key="ingresos_desde")
+    with col2:
+        hasta = st.date_input("Hasta", value=date.today(), key="ingresos_hasta")
+    with col3:
+        todas = st.checkbox("Todas las sedes", key="ingresos_todas")
+    try:
+        with medir_bd('serie_ingresos'):
+            grano, serie = serie_ingresos(conn, desde, hasta, sede_id=None if todas else sede_id)
+    except Exception as e:
+        st.error(f"Error leyendo los ingresos: {e}")
+        return
+    st.plotly_chart(grafico_ingresos(grano, serie), use_container_width=True)
+    st.caption(f"{len(serie):,} puntos · {int(serie['citas'].sum()):,} citas completadas · "
+               f"S/. {serie['ingresos'].sum():,.2f}")
+
+def seccion_comprobantes(sede_id):
+    """Comprobantes (HTML y PDF) de las citas completadas del día, servidos desde el almacén de adjuntos"""
+    st.subheader("🧾 Comprobantes")
+    servidor = init_adjuntos()
+    conn = init_connection()
+    if not servidor or not conn:
+        return
+    dia = st.date_input("Día", value=date.today(), key="comprobantes_dia")
+    if st.button("Generar comprobantes del día"):
+        try:
+            # Solo se generan las citas nuevas o que cambiaron desde su último comprobante
+            with medir_bd('facturar'):
+                resumen = facturar(conn, servidor.almacen, dia, sede_id)
+            st.success(f"✅ {resumen['generados']} generados, {resumen['sin_cambios']} sin cambios "
+                       f"({resumen['segundos']:.1f} s)")
+        except Exception as e:
+            st.error(f"Error generando los comprobantes: {e}")
+    try:
+        columnas, filas = comprobantes_del_dia(conn, dia, sede_id)
+    except Exception as e:
+        st.error(f"Error leyendo los comprobantes: {e}")
+        return
+    if not filas:
+        st.info("No hay comprobantes generados para ese día")
+        return
+    comprobantes = pd.DataFrame(filas, columns=columnas)
+    comprobantes['HTML'] = [servidor.url(sha256, TIPO_HTML) for sha256 in comprobantes['sha256_html']]
+    comprobantes['PDF'] = [servidor.url(sha256, TIPO_PDF) for sha256 in comprobantes['sha256_pdf']]
+    st.dataframe(comprobantes.drop(columns=['sha256_html', 'sha256_pdf']), use_container_width=True,
+                 column_config={'HTML': st.column_config.LinkColumn(display_text="Ver"),
+                                'PDF': st.column_config.LinkColumn(display_text="Descargar")})
+
+@a_lo_sumo_cada('tiempos_estado', 60)
+def refrescar_tiempos_estado(destino):
+    """Suma al agregado los cambios de estado nuevos, como mucho una vez por minuto (no en cada rerun)"""
+    return actualizar_tiempos_estado(destino)
+
+def seccion_tiempos_estado():
+    """Promedio y p90 del tiempo en cada estado por servicio (agregado incremental)"""
+    st.subheader("⏱️ Tiempo en Cada Estado (últimos 30 días)")
+    conn = init_connection()
+    if not conn:
+        return
+    try:
+        # sp_actualizar_tiempos_estado solo procesa los cambios posteriores a su marca
+        refrescar_tiempos_estado(conn)
+        resumen = resumen_tiempos(conn, desde=date.today() - timedelta(days=30))
+    except Exception as e:
+        st.error(f"Error calculando tiempos por estado: {e}")
+        return
+    if resumen.empty:
+        st.info("Todavía no hay cambios de estado registrados")
+    else:
+        st.dataframe(resumen, use_container_width=True)
+        st.caption("Se actualiza como mucho una vez por minuto.")
+
+@a_lo_sumo_cada('predicciones', 300)
+def refrescar_predicciones(destino):
+    """Recalcula las predicciones de los vehículos con servicios nuevos, como mucho cada 5 minutos"""
+    return actualizar_predicciones(destino)
+
+def seccion_proximos_servicios():
+    """Vehículos cuyo próximo servicio preventivo vence en los próximos 30 días"""
+    st.subheader("🔮 Próximos Servicios Preventivos (30 días)")
+    conn = init_connection()
+    if not conn:
+        return
+    try:
+        # Solo recalcula los vehículos con citas completadas desde la última vez
+        refrescar_predicciones(conn)
+        columnas, filas = proximos_servicios(conn, dias=30)
+    except Exception as e:
+        st.error(f"Error calculando próximos servicios: {e}")
+        return
+    if filas:
+        st.dataframe(a_dataframe(columnas, filas), use_container_width=True)
+        st.caption("Se recalcula como mucho cada 5 minutos.")
+    else:
+        st.info("No hay servicios preventivos previstos para los próximos 30 días")
+
+def seccion_exportar(sede_id):
+    """Enlaces de descarga firmados (CSV/XLSX/Parquet) servidos en streaming, de la sede por defecto"""
+    st.subheader("📤 Exportar Datos")
+    servidor = init_exportaciones()
+    if not servidor:
+        return
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        exportacion = st.selectbox("Datos", sorted(EXPORTACIONES))
+    with col2:
+        formato = st.selectbox("Formato", formatos_disponibles())
+    with col3:
+        desde = st.date_input("Desde", value=None)
+    with col4:
+        hasta = st.date_input("Hasta", value=None)
+    toda_la_cadena = st.checkbox("Todas las sedes", key='exportar_cadena')
+    
+    st.link_button(f"⬇️ Descargar {exportacion}.{formato}",
+                   servidor.url(exportacion, formato, desde, hasta, None if toda_la_cadena else sede_id))
+    st.caption("El enlace vence en 10 minutos. La descarga empieza de inmediato aunque el rango sea grande.")
 
 # Página de inventario
 def pagina_inventario():
     st.title("📦 Gestión de Inventario")
     
-    tab1, tab2, tab3 = st.tabs(["Ver Inventario", "Agregar Item", "Stock Bajo"])
+    tab1, tab2, tab3, tab4 = st.tabs(["Ver Inventario", "Agregar Item", "Stock Bajo", "Movimientos"])
     
     with tab1:
         st.subheader("Lista de Inventario")
@@ -467,33 +857,124 @@ def pagina_inventario():
             st.dataframe(stock_bajo, use_container_width=True)
         else:
             st.success("✅ Todos los items tienen stock suficiente")
+        
+        seccion_pedido_sugerido()
+    
+    with tab4:
+        seccion_movimientos(int(st.session_state.sede_id))
+
+def seccion_movimientos(sede_id):
+    """Entradas y salidas de la sede (sp_obtener_movimientos_inventario)"""
+    col1, col2 = st.columns(2)
+    with col1:
+        desde = st.date_input("Desde", value=date.today() - timedelta(days=30), key="movimientos_desde")
+    with col2:
+        hasta = st.date_input("Hasta", value=date.today(), key="movimientos_hasta")
+    movimientos = listar_procedimiento("sp_obtener_movimientos_inventario", (None, desde, hasta, sede_id))
+    if movimientos.num_rows:
+        st.caption(f"{movimientos.num_rows:,} movimientos")
+        st.dataframe(movimientos, use_container_width=True)
+    else:
+        st.info("No hay movimientos en ese rango")
+
+def seccion_pedido_sugerido():
+    """Puntos de reorden calculados del historial y pedido sugerido por proveedor"""
+    st.markdown("---")
+    st.subheader("🛒 Pedido Sugerido")
+    conn = init_connection()
+    if not conn:
+        return
+    if st.button("🔄 Recalcular puntos de reorden"):
+        try:
+            # Copia el punto de reorden a stock_minimo de los items con historial
+            actualizar_puntos_reorden(conn)
+            st.success("✅ Puntos de reorden actualizados")
+        except Exception as e:
+            st.error(f"Error calculando puntos de reorden: {e}")
+    try:
+        columnas, filas = pedido_sugerido(conn, int(st.session_state.sede_id))
+    except Exception as e:
+        st.error(f"Error armando el pedido: {e}")
+        return
+    if filas:
+        pedido_df = a_dataframe(columnas, filas)
+        st.dataframe(pedido_df, use_container_width=True)
+        st.metric("Total del pedido", f"S/. {pedido_df['costo_total'].sum():,.2f}")
+    else:
+        st.info("No hace falta pedir nada por ahora")
+
+@cache_referencia('mapa_clientes', ttl=300)
+def obtener_mapa_clientes(nivel):
+    """Clientes agregados por distrito o celda (caché 5 min); antes ubica a los clientes nuevos o con dirección cambiada"""
+    conn = init_connection()
+    if not conn:
+        return None
+    try:
+        with medir_bd('mapa_clientes'):
+            # Con TALLER_NOMENCLATOR suma los lugares del CSV (se relee junto con la caché)
+            actualizar_ubicaciones(conn, nomenclator_desde())
+            return agregado_clientes(conn, nivel)
+    except Exception as e:
+        st.error(f"Error armando el mapa de clientes: {e}")
+        return None
+
+def pagina_mapa_clientes():
+    st.title("🗺️ Mapa de Clientes")
+    
+    etiquetas = {'distrito': 'Distrito', 'celda': 'Celda (~2 km)'}
+    nivel = st.radio("Agrupar por:", NIVELES, format_func=etiquetas.get, horizontal=True)
+    resultado = obtener_mapa_clientes(nivel)
+    if not resultado:
+        return
+    puntos, sin_ubicar = resultado
+    if not puntos:
+        st.info("No hay clientes con dirección reconocida")
+        return
+    
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Clientes ubicados", f"{sum(p['clientes'] for p in puntos):,}")
+    col2.metric("Sin ubicar", f"{sin_ubicar:,}")
+    col3.metric("Zonas", len(puntos))
+    
+    # Un marcador por zona: el navegador no recibe un punto por cliente
+    folium_static(mapa_clientes(puntos), width=900, height=550)
+    
+    st.dataframe(pd.DataFrame(puntos)[['nombre', 'clientes']], use_container_width=True)
 
 # Función principal
 def main():
+    init_metricas()
+    inicio = time.perf_counter()
     load_css()
     
-    # Navegación
-    if st.session_state.page == 'Login':
-        pagina_login()
-    else:
-        selected_page = sidebar_navigation()
-        
-        # Routing de páginas
-        if selected_page == 'Inicio':
-            pagina_inicio()
-        elif selected_page == 'Servicios':
-            pagina_servicios()
-        elif selected_page == 'Agendar Cita':
-            pagina_agendar_cita()
-        elif selected_page == 'Panel Admin' and st.session_state.authenticated:
-            panel_admin()
-        elif selected_page == 'Inventario' and st.session_state.authenticated:
-            pagina_inventario()
-        elif selected_page in ['Panel Admin', 'Clientes', 'Inventario', 'Reportes'] and not st.session_state.authenticated:
-            st.warning("🔐 Debe iniciar sesión como administrador para acceder a esta sección")
+    selected_page = 'Login'
+    try:
+        # Navegación
+        if st.session_state.page == 'Login':
             pagina_login()
         else:
-            pagina_inicio()
+            selected_page = sidebar_navigation()
+            
+            # Routing de páginas
+            if selected_page == 'Inicio':
+                pagina_inicio()
+            elif selected_page == 'Servicios':
+                pagina_servicios()
+            elif selected_page == 'Agendar Cita':
+                pagina_agendar_cita()
+            elif selected_page == 'Panel Admin' and st.session_state.authenticated:
+                panel_admin()
+            elif selected_page == 'Inventario' and st.session_state.authenticated:
+                pagina_inventario()
+            elif selected_page == 'Mapa de Clientes' and st.session_state.authenticated:
+                pagina_mapa_clientes()
+            elif selected_page in ['Panel Admin', 'Clientes', 'Inventario', 'Reportes', 'Mapa de Clientes'] and not st.session_state.authenticated:
+                st.warning("🔐 Debe iniciar sesión como administrador para acceder a esta sección")
+                pagina_login()
+            else:
+                pagina_inicio()
+    finally:
+        registrar_rerun(selected_page, time.perf_counter() - inicio)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,173 @@
+# ========================================
+# TIEMPO EN CADA ESTADO DE LAS CITAS
+# Taller Automotriz - Sistema de Gestión
+# ========================================
+
+"""
+Estadísticas de cuánto tiempo pasan las citas en Pendiente, Confirmado y En
+Proceso, por servicio y por día.
+
+Los triggers de la migración llenan CitasHistorialEstado (solo inserción).
+actualizar_tiempos_estado() procesa únicamente las filas posteriores a la
+última marca (MarcasAgregacion) y las suma en TiemposEstadoCubetas: por cada
+servicio/día/estado, cuántas transiciones cayeron en cada cubeta logarítmica
+(base 1.1, error relativo < 5 %) y el total de segundos. El promedio y el p90
+de cualquier rango de días salen de sumar esas cubetas, sin releer el
+historial.
+
+Uso:
+    actualizar_tiempos_estado(db)
+    df = resumen_tiempos(db, desde=date.today() - timedelta(days=30))
+    python tiempos_estado.py --db taller_automotriz.db --dias 30
+"""
+
+import argparse
+import math
+import sqlite3
+from datetime import date, timedelta
+
+import pandas as pd
+
+from bd_sqlite import conexion_lectura, en_transaccion
+from migraciones import motor_de
+
+BASE_CUBETAS = 1.1
+MARCA = 'TiemposEstado'
+ESTADOS_MEDIDOS = ('Pendiente', 'Confirmado', 'En Proceso')
+
+COLUMNAS_RESUMEN = ['servicio', 'estado', 'transiciones', 'promedio_horas', 'p90_horas']
+
+
+def cubeta(segundos):
+    """Cubeta logarítmica de una duración (igual que sp_actualizar_tiempos_estado)"""
+    if segundos < 1:
+        return 0
+    return int(math.floor(math.log(segundos) / math.log(BASE_CUBETAS))) + 1
+
+
+def valor_cubeta(numero):
+    """Duración representativa de la cubeta (punto medio geométrico)"""
+    if numero <= 0:
+        return 0.0
+    return BASE_CUBETAS ** (numero - 1) * math.sqrt(BASE_CUBETAS)
+
+
+def _acumular(conn):
+    fila = conn.execute("SELECT ultimo_id FROM MarcasAgregacion WHERE nombre = ?", (MARCA,)).fetchone()
+    desde = fila[0] if fila else 0
+    filas = conn.execute("""
+        SELECT id, COALESCE(servicio_id, 0), date(fecha), estado_anterior, segundos_en_estado_anterior
+        FROM CitasHistorialEstado
+        WHERE id > ?
+        ORDER BY id
+    """, (desde,)).fetchall()
+    if not filas:
+        return 0
+
+    acumulado = {}
+    for _, servicio_id, dia, estado, segundos in filas:
+        if estado is None or segundos is None:
+            continue
+        clave = (servicio_id, dia, estado, cubeta(segundos))
+        cantidad, total = acumulado.get(clave, (0, 0.0))
+        acumulado[clave] = (cantidad + 1, total + segundos)
+
+    conn.executemany("""
+        INSERT INTO TiemposEstadoCubetas (servicio_id, dia, estado, cubeta, cantidad, segundos_total)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (servicio_id, dia, estado, cubeta) DO UPDATE SET
+            cantidad = cantidad + excluded.cantidad,
+            segundos_total = segundos_total + excluded.segundos_total
+    """, [(*clave, cantidad, total) for clave, (cantidad, total) in acumulado.items()])
+    conn.execute("""
+        INSERT INTO MarcasAgregacion (nombre, ultimo_id) VALUES (?, ?)
+        ON CONFLICT (nombre) DO UPDATE SET ultimo_id = excluded.ultimo_id
+    """, (MARCA, filas[-1][0]))
+    return len(filas)
+
+
+def actualizar_tiempos_estado(destino):
+    """Suma al agregado los cambios de estado nuevos; devuelve cuántos procesó
+
+    destino es un BaseDatosSQLite, una conexión sqlite3 o una conexión pyodbc.
+    """
+    if motor_de(destino) == 'sqlserver':
+        cursor = destino.cursor()
+        cursor.execute("EXEC sp_actualizar_tiempos_estado")
+        cursor.fetchall()
+        destino.commit()
+        return None
+    # La marca y el agregado se actualizan en la misma transacción
+    return en_transaccion(destino, _acumular)
+
+
+def _cubetas_en_rango(conn, desde, hasta, por):
+    columna = 's.nombre' if por == 'servicio' else 't.dia'
+    filtros, params = [], []
+    if desde is not None:
+        filtros.append("t.dia >= ?")
+        params.append(str(desde))
+    if hasta is not None:
+        filtros.append("t.dia <= ?")
+        params.append(str(hasta))
+    where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT {columna} AS grupo, t.estado, t.cubeta, SUM(t.cantidad) AS cantidad,
+               SUM(t.segundos_total) AS segundos_total
+        FROM TiemposEstadoCubetas t
+        LEFT JOIN Servicios s ON s.id = t.servicio_id
+        {where}
+        GROUP BY {columna}, t.estado, t.cubeta
+    """, params)
+    return [tuple(fila) for fila in cursor.fetchall()]
+
+
+def resumen_tiempos(origen, desde=None, hasta=None, por='servicio'):
+    """Promedio y p90 (horas) por servicio o por día y estado en el rango de días"""
+    columnas = [por if por == 'dia' else 'servicio'] + COLUMNAS_RESUMEN[1:]
+    with conexion_lectura(origen) as conn:
+        filas = _cubetas_en_rango(conn, desde, hasta, por)
+    if not filas:
+        return pd.DataFrame(columns=columnas)
+
+    cubetas = pd.DataFrame(filas, columns=['grupo', 'estado', 'cubeta', 'cantidad', 'segundos_total'])
+    cubetas['grupo'] = cubetas['grupo'].fillna('(sin servicio)').astype(str)
+    cubetas = cubetas.sort_values(['grupo', 'estado', 'cubeta'])
+    claves = ['grupo', 'estado']
+    cubetas['acumulado'] = cubetas.groupby(claves)['cantidad'].cumsum()
+    totales = cubetas.groupby(claves).agg(transiciones=('cantidad', 'sum'),
+                                          segundos=('segundos_total', 'sum'))
+    cubetas = cubetas.join(totales['transiciones'], on=claves)
+    # p90: primera cubeta cuyo acumulado alcanza el 90 % de las transiciones
+    p90 = (cubetas[cubetas['acumulado'] >= 0.9 * cubetas['transiciones']]
+           .groupby(claves)['cubeta'].min().map(valor_cubeta))
+
+    resumen = totales.assign(promedio_horas=totales['segundos'] / totales['transiciones'] / 3600,
+                             p90_horas=p90 / 3600).reset_index()
+    orden = {estado: i for i, estado in enumerate(ESTADOS_MEDIDOS)}
+    resumen['orden'] = resumen['estado'].map(orden).fillna(len(orden))
+    resumen = resumen.sort_values(['grupo', 'orden']).rename(columns={'grupo': columnas[0]})
+    resumen[['promedio_horas', 'p90_horas']] = resumen[['promedio_horas', 'p90_horas']].round(2)
+    return resumen[columnas].reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo en cada estado de las citas")
+    parser.add_argument('--db', default='taller_automotriz.db', help="Archivo SQLite")
+    parser.add_argument('--dias', type=int, default=30, help="Días hacia atrás a resumir")
+    parser.add_argument('--por', choices=['servicio', 'dia'], default='servicio')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        procesadas = actualizar_tiempos_estado(conn)
+        print(f"Cambios de estado nuevos procesados: {procesadas}")
+        resumen = resumen_tiempos(conn, desde=date.today() - timedelta(days=args.dias), por=args.por)
+        print(resumen.to_string(index=False) if not resumen.empty else "Sin datos en el rango")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()